@@ -34,12 +34,11 @@ Features (Optional):
 Usage:
     # Core functionality (always available)
     from comfy_headless import ComfyClient
-    client = ComfyClient()
-    result = client.generate_image("a beautiful sunset")
+    with ComfyClient() as client:
+        result = client.generate_image("a beautiful sunset")
 
-    # Video generation
-    from comfy_headless import VIDEO_PRESETS
-    result = client.generate_video("a cat walking", preset="ltx_quality")
+        # Video generation
+        result = client.generate_video("a cat walking", preset="ltx_quality")
 
     # AI features (requires [ai] extra)
     from comfy_headless import analyze_prompt, enhance_prompt
@@ -68,6 +67,7 @@ from .config import (
 
 # Exceptions (with verbosity levels)
 from .exceptions import (
+    BackendOverloadedError,
     CircuitOpenError,
     ComfyHeadlessError,
     ComfyHeadlessExceptionGroup,
@@ -146,7 +146,9 @@ else:
     AsyncHttpClient = None
     get_async_http_client = None
 
-# Health checks - requires [health] extra for full functionality
+# Prompt batches (cancel as a unit)
+from .batch import AsyncPromptBatch, PromptBatch
+
 # Cleanup
 from .cleanup import (
     CleanupThread,
@@ -162,6 +164,8 @@ from .cleanup import (
 
 # Client
 from .client import ComfyClient
+
+# Health checks - requires [health] extra for full functionality
 from .health import (
     ComponentHealth,
     HealthChecker,
@@ -174,6 +178,24 @@ from .health import (
     is_healthy,
 )
 
+# Durable job queue
+from .jobstore import JobStore, JobWorker, StoredJob
+
+# Multi-backend routing
+from .pool import BackendStatus, ComfyPool
+
+# Generation result cache
+from .result_cache import ResultCache, get_result_cache
+
+# Priority job scheduling
+from .scheduler import JobScheduler, Priority, ScheduledJob
+
+# Async client only if httpx is available
+if FEATURES["ai"]:
+    from .async_client import AsyncComfyClient
+else:
+    AsyncComfyClient = None
+
 # WebSocket Client (async, real-time progress)
 try:
     from .websocket_client import (
@@ -182,12 +204,22 @@ try:
         WSMessageType,
         WSProgress,
     )
+    from .ws_session import (
+        PromptWatch,
+        WSSession,
+        WSSessionManager,
+        get_ws_session_manager,
+    )
 except ImportError:
     # websockets not installed
     WEBSOCKETS_AVAILABLE = False
     ComfyWSClient = None
     WSProgress = None
     WSMessageType = None
+    PromptWatch = None
+    WSSession = None
+    WSSessionManager = None
+    get_ws_session_manager = None
 
 # Intelligence module (v2.4: caching, few-shot, A/B testing)
 # Requires [ai] extra for full functionality (Ollama via httpx)
@@ -405,6 +437,7 @@ __all__ = [
     "TemplateNotFoundError",
     "RetryExhaustedError",
     "CircuitOpenError",
+    "BackendOverloadedError",
     "ValidationError",
     "InvalidPromptError",
     "InvalidParameterError",
@@ -466,12 +499,29 @@ __all__ = [
     "save_temp_video",
     # Client
     "ComfyClient",
+    "AsyncComfyClient",
+    "ComfyPool",
+    "BackendStatus",
+    "PromptBatch",
+    "AsyncPromptBatch",
+    "JobScheduler",
+    "Priority",
+    "ScheduledJob",
+    "JobStore",
+    "JobWorker",
+    "StoredJob",
+    "ResultCache",
+    "get_result_cache",
     "launch",
     # WebSocket Client
     "ComfyWSClient",
     "WSProgress",
     "WSMessageType",
     "WEBSOCKETS_AVAILABLE",
+    "WSSession",
+    "WSSessionManager",
+    "PromptWatch",
+    "get_ws_session_manager",
     # Intelligence (v2.4: caching, few-shot, A/B testing)
     "PromptIntelligence",
     "PromptAnalysis",
@@ -78,8 +78,8 @@ def main():
         print(f"Install with: {get_install_hint('ui')}")
         print("\nAlternatively, use comfy-headless as a library:")
         print("  from comfy_headless import ComfyClient")
-        print("  client = ComfyClient()")
-        print("  result = client.generate_image('your prompt')")
+        print("  with ComfyClient() as client:")
+        print("      result = client.generate_image('your prompt')")
         sys.exit(1)
 
     # Import launch only after checking feature
@@ -0,0 +1,266 @@
+"""
+Comfy Headless - Admission Control
+==================================
+
+Caps the prompts queued or running on each ComfyUI backend, so a caller
+submitting thousands of prompts can't build a pending queue that is too
+long to reprioritize or cancel cheaply. Opt-in: nothing is capped or
+tracked unless settings.comfyui.max_queued_prompts is above 0.
+
+- One controller per backend URL, shared by every client in the process
+- The load is the prompts this process queued there and hasn't seen finish,
+  plus prompts of other processes last seen in /queue
+- Clients release a prompt when they see it finish; while the backend is
+  full the count is also reconciled against /queue every
+  settings.comfyui.admission_reconcile_interval, so prompts nobody waits
+  for still free their slot
+- A full backend makes queue_prompt wait (or await) for room for up to
+  settings.comfyui.admission_timeout, then raise BackendOverloadedError;
+  timeout 0 rejects at once
+
+Usage:
+    from comfy_headless.admission import get_admission
+
+    admission = get_admission("http://localhost:8188")
+    admission.acquire(fetch_queue)  # Blocks while full; fetch_queue() -> /queue or None
+    try:
+        prompt_id = post_prompt()
+    except Exception:
+        admission.cancel_reservation()
+        raise
+    admission.admitted(prompt_id)
+"""
+
+import asyncio
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .config import settings
+from .exceptions import BackendOverloadedError
+from .logging_config import get_logger
+from .protocol import queue_prompt_ids
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "AdmissionController",
+    "get_admission",
+    "clear_admission",
+]
+
+# How often a waiting coroutine rechecks for room between reconciliations
+_ASYNC_RECHECK = 0.05
+
+
+class AdmissionController:
+    """
+    Queue-depth cap of one backend.
+
+    Args:
+        url: ComfyUI server URL
+        limit: Prompts queued or running before callers wait (default
+            settings.comfyui.max_queued_prompts; 0 = no limit)
+        reconcile_interval: Seconds between /queue reconciliations while
+            full (default settings.comfyui.admission_reconcile_interval)
+    """
+
+    def __init__(self, url: str, limit: int | None = None, reconcile_interval: float | None = None):
+        self.url = url
+        self.limit = settings.comfyui.max_queued_prompts if limit is None else limit
+        self.reconcile_interval = (
+            settings.comfyui.admission_reconcile_interval
+            if reconcile_interval is None
+            else reconcile_interval
+        )
+        self._prompts: dict[str, float] = {}  # prompt_id -> monotonic admission time
+        self._reserved = 0  # Admitted callers whose /prompt hasn't returned yet
+        self._external = 0  # Other processes' prompts in the last /queue
+        self._reconciled_at = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def load(self) -> int:
+        """Prompts counted against the limit."""
+        with self._cond:
+            return len(self._prompts) + self._reserved + self._external
+
+    def _has_room(self) -> bool:
+        return self.limit <= 0 or len(self._prompts) + self._reserved + self._external < self.limit
+
+    def _reconcile_due(self) -> bool:
+        return time.monotonic() - self._reconciled_at >= self.reconcile_interval
+
+    # =========================================================================
+    # ADMISSION
+    # =========================================================================
+
+    def try_acquire(self) -> bool:
+        """Reserve a slot if there is room, without waiting or reconciling."""
+        with self._cond:
+            if not self._has_room():
+                return False
+            self._reserved += 1
+            return True
+
+    def acquire(
+        self, fetch_queue: Callable[[], dict[str, Any] | None], timeout: float | None = None
+    ) -> None:
+        """
+        Reserve a slot, waiting while the backend is full.
+
+        Args:
+            fetch_queue: Returns the backend's /queue (None if unavailable)
+            timeout: Seconds to wait for room (default
+                settings.comfyui.admission_timeout; 0 = don't wait)
+
+        Raises:
+            BackendOverloadedError: If there is still no room after timeout
+        """
+        timeout = settings.comfyui.admission_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.try_acquire():
+                return
+            if self._reconcile_due():
+                self.reconcile(fetch_queue)
+                if self.try_acquire():
+                    return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise BackendOverloadedError(self.url, self.limit)
+            with self._cond:
+                if not self._has_room():
+                    next_reconcile = self._reconciled_at + self.reconcile_interval
+                    self._cond.wait(min(remaining, max(next_reconcile - time.monotonic(), 0.0)))
+
+    async def aacquire(
+        self,
+        fetch_queue: Callable[[], Awaitable[dict[str, Any] | None]],
+        timeout: float | None = None,
+    ) -> None:
+        """Async acquire(); fetch_queue is a coroutine function."""
+        timeout = settings.comfyui.admission_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.try_acquire():
+                return
+            if self._reconcile_due():
+                await self.areconcile(fetch_queue)
+                if self.try_acquire():
+                    return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise BackendOverloadedError(self.url, self.limit)
+            await asyncio.sleep(min(remaining, _ASYNC_RECHECK))
+
+    def admitted(self, prompt_id: str) -> None:
+        """Turn a reservation into a queued prompt (not tracked without a limit)."""
+        with self._cond:
+            self._reserved = max(self._reserved - 1, 0)
+            if self.limit > 0:
+                self._prompts[prompt_id] = time.monotonic()
+
+    def cancel_reservation(self) -> None:
+        """Give back a reservation whose prompt wasn't queued."""
+        with self._cond:
+            self._reserved = max(self._reserved - 1, 0)
+            self._cond.notify_all()
+
+    def release(self, prompt_id: str) -> None:
+        """Free a finished (or removed) prompt's slot."""
+        with self._cond:
+            if self._prompts.pop(prompt_id, None) is not None:
+                self._cond.notify_all()
+
+    def settle(self, prompt_id: str, fetch_queue: Callable[[], dict[str, Any] | None]) -> None:
+        """Free prompt_id's slot now unless a fresh /queue still lists it."""
+        with self._cond:
+            if prompt_id not in self._prompts:
+                return
+        self.reconcile(fetch_queue)
+
+    async def asettle(
+        self, prompt_id: str, fetch_queue: Callable[[], Awaitable[dict[str, Any] | None]]
+    ) -> None:
+        """Async settle()."""
+        with self._cond:
+            if prompt_id not in self._prompts:
+                return
+        await self.areconcile(fetch_queue)
+
+    # =========================================================================
+    # RECONCILIATION
+    # =========================================================================
+
+    def reconcile(self, fetch_queue: Callable[[], dict[str, Any] | None]) -> None:
+        """Correct the count from a fresh /queue."""
+        self._reconciled_at = time.monotonic()
+        started = time.monotonic()
+        try:
+            queue = fetch_queue()
+        except Exception as e:
+            logger.debug(f"Admission /queue check failed: {e}")
+            return
+        self._apply(queue, started)
+
+    async def areconcile(self, fetch_queue: Callable[[], Awaitable[dict[str, Any] | None]]) -> None:
+        """Async reconcile()."""
+        self._reconciled_at = time.monotonic()
+        started = time.monotonic()
+        try:
+            queue = await fetch_queue()
+        except Exception as e:
+            logger.debug(f"Admission /queue check failed: {e}")
+            return
+        self._apply(queue, started)
+
+    def _apply(self, queue: dict[str, Any] | None, started: float) -> None:
+        """
+        Apply a /queue snapshot requested at started (monotonic).
+
+        Prompts admitted after the request started may not be listed yet and
+        are kept.
+        """
+        if not isinstance(queue, dict):
+            return
+        active = queue_prompt_ids(queue.get("queue_running", [])) | queue_prompt_ids(
+            queue.get("queue_pending", [])
+        )
+        with self._cond:
+            finished = [
+                prompt_id
+                for prompt_id, admitted_at in self._prompts.items()
+                if admitted_at < started and prompt_id not in active
+            ]
+            for prompt_id in finished:
+                del self._prompts[prompt_id]
+            self._external = len(active - self._prompts.keys())
+            if finished or self._has_room():
+                self._cond.notify_all()
+        logger.debug(
+            "Admission reconciled",
+            extra={"url": self.url, "finished": len(finished), "external": self._external},
+        )
+
+
+_controllers: dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_admission(base_url: str | None = None) -> AdmissionController:
+    """Get the process-wide admission controller of a backend."""
+    url = (base_url or settings.comfyui.url).rstrip("/")
+    with _controllers_lock:
+        controller = _controllers.get(url)
+        if controller is None:
+            controller = AdmissionController(url)
+            _controllers[url] = controller
+        return controller
+
+
+def clear_admission() -> None:
+    """Forget all controllers (e.g. between tests)."""
+    with _controllers_lock:
+        _controllers.clear()
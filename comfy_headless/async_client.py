@@ -0,0 +1,1900 @@
+"""
+Comfy Headless - Async ComfyUI API Client
+==========================================
+
+Asyncio counterpart to ComfyClient with the same public API, built on
+AsyncHttpClient (httpx, HTTP/2, pooled connections).
+
+- Shares its backend's circuit breaker ("comfyui:<url>") with ComfyClient by default
+- Waits for completion on the shared WebSocket session when available
+- Optional token-bucket rate limiting (non-blocking for the event loop)
+- Workflow building and result parsing are shared with ComfyClient
+
+Usage:
+    from comfy_headless import AsyncComfyClient
+
+    async with AsyncComfyClient() as client:
+        if await client.is_online():
+            result = await client.generate_image("a beautiful sunset")
+"""
+
+import asyncio
+import io
+import itertools
+import json
+import os
+import shutil
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from .admission import get_admission
+from .batch import AsyncPromptBatch
+from .capabilities import CapabilitySnapshot, get_capability_cache
+from .client import ComfyClient
+from .config import settings
+from .downloads import (
+    DEFAULT_CHUNK_SIZE,
+    DownloadTarget,
+    async_download_slot,
+    output_files,
+    output_path,
+)
+from .exceptions import ComfyUIConnectionError, ComfyUIOfflineError
+from .http_client import HTTPX_AVAILABLE, AsyncHttpClient, httpx
+from .jsoncodec import JSON_HEADERS, dumps
+from .liveness import get_liveness
+from .logging_config import LogContext, get_logger
+from .protocol import (
+    MAX_POLL_INTERVAL,
+    WS_LIVENESS_INTERVAL,
+    WS_RETRY_COOLDOWN,
+    animatediff_workflow,
+    compile_preset_workflow,
+    dependency_report,
+    device_vram_bytes,
+    extract_input_options,
+    finalize_image_result,
+    finalize_video_result,
+    history_progress,
+    image_preset_for_vram,
+    preset_video_workflow,
+    queue_progress,
+    queue_prompt_ids,
+    safe_get_nested,
+    safe_json_parse,
+    txt2img_workflow,
+    video_preset_for_vram,
+    ws_event_progress,
+)
+from .result_cache import ResultCache, get_result_cache
+from .retry import RateLimiter, get_circuit_breaker
+from .transports import TRANSPORTS
+from .uploads import (
+    MultipartBody,
+    PreparedUpload,
+    UploadSource,
+    check_input_path,
+    get_upload_cache,
+    input_name,
+    input_ref,
+    is_input_name,
+    prepare_upload,
+)
+from .websocket_client import TERMINAL_STATUSES, WEBSOCKETS_AVAILABLE
+from .ws_session import WSSession, get_ws_session_manager
+
+logger = get_logger(__name__)
+
+__all__ = ["AsyncComfyClient"]
+
+# Progress callbacks may be plain functions or coroutines
+AsyncProgressCallback = Callable[[float, str], Awaitable[None] | None]
+AsyncDownloadProgressCallback = Callable[[int, int | None], Awaitable[None] | None]
+AsyncBatchProgressCallback = Callable[[int, int, float, str], Awaitable[None] | None]
+
+
+async def _maybe_await(value: Any) -> None:
+    """Await callback results that are awaitable, ignore the rest."""
+    if asyncio.iscoroutine(value) or isinstance(value, asyncio.Future):
+        await value
+
+
+class _AsyncProgressTracker:
+    """Forward monotonically increasing progress to an optional sync or async callback."""
+
+    def __init__(self, callback: AsyncProgressCallback | None):
+        self.callback = callback
+        self.last = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.callback is not None
+
+    async def update(self, progress: float, message: str) -> None:
+        if progress > self.last:
+            self.last = progress
+            await self._emit(progress, message)
+
+    async def complete(self) -> None:
+        await self._emit(1.0, "Completed")
+
+    async def error(self) -> None:
+        await self._emit(self.last, "Error")
+
+    async def _emit(self, progress: float, message: str) -> None:
+        if self.callback is None:
+            return
+        try:
+            await _maybe_await(self.callback(progress, message))
+        except Exception as e:
+            logger.debug(f"Progress callback error: {e}")
+
+
+class AsyncComfyClient:
+    """
+    Async HTTP client for ComfyUI API, mirroring ComfyClient.
+
+    Every network method is a coroutine; pure helpers (VRAM estimates)
+    stay synchronous.
+
+    Attributes:
+        base_url: ComfyUI server URL
+        client_id: Unique identifier for this client instance
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        rate_limit: int | None = None,
+        rate_limit_per_seconds: float = 1.0,
+        use_websocket: bool | None = None,
+        client_id: str | None = None,
+        circuit_name: str | None = None,
+        result_cache: ResultCache | bool | None = None,
+        transport: str | None = None,
+        uds_path: str | None = None,
+    ):
+        """
+        Initialize the async ComfyUI client.
+
+        Args:
+            base_url: ComfyUI server URL (default from settings)
+            rate_limit: Max requests per time window (None = no limit)
+            rate_limit_per_seconds: Time window for rate limiting
+            use_websocket: Wait for completion via WebSocket events when the
+                websockets package is installed (default from settings)
+            client_id: clientId sent with prompts (default: new UUID). Clients
+                sharing a client_id share one WebSocket connection.
+            circuit_name: Circuit breaker to use (default "comfyui:<base_url>",
+                one per backend); clients of independent backends should
+                not share one
+            result_cache: Reuse finished generations of identical workflows:
+                True for the process-wide cache, a ResultCache, or False
+                (default from settings.generation.result_cache)
+            transport: HTTP transport as for ComfyClient (default
+                settings.http.transport). Requests always go through httpx;
+                "uds" connects through uds_path.
+            uds_path: Unix domain socket for the "uds" transport (default
+                settings.http.uds_path). WebSocket events still use base_url.
+
+        Raises:
+            ValueError: If transport is unknown, or "uds" has no socket path
+        """
+        if not HTTPX_AVAILABLE:
+            raise ImportError(
+                "httpx is required for AsyncComfyClient. Install with: pip install comfy-headless[ai]"
+            )
+
+        self.base_url = (base_url or settings.comfyui.url).rstrip("/")
+        self.client_id = client_id or str(uuid.uuid4())
+        self.transport = transport or settings.http.transport
+        if self.transport not in TRANSPORTS:
+            raise ValueError(
+                f"Unknown HTTP transport {self.transport!r}; expected one of {TRANSPORTS}"
+            )
+        self._uds_path = None
+        if self.transport == "uds":
+            self._uds_path = uds_path or settings.http.uds_path
+            if not self._uds_path:
+                raise ValueError("The uds transport needs a socket path (http.uds_path)")
+        self._http: AsyncHttpClient | None = None
+        self._circuit_name = circuit_name or f"comfyui:{self.base_url}"
+        self._liveness = get_liveness(self.base_url)
+        self._liveness.watch(get_circuit_breaker(self._circuit_name))
+        self._admission = get_admission(self.base_url)
+
+        # Shared WebSocket session for completion events (acquired lazily)
+        if use_websocket is None:
+            use_websocket = settings.comfyui.use_websocket
+        self._use_websocket = use_websocket and WEBSOCKETS_AVAILABLE
+        self._ws_session: WSSession | None = None
+        self._ws_lock = asyncio.Lock()
+        self._ws_retry_at = 0.0
+
+        # Generation result cache (opt-in)
+        if result_cache is None:
+            result_cache = settings.generation.result_cache
+        if result_cache is True:
+            result_cache = get_result_cache()
+        self._result_cache = result_cache if isinstance(result_cache, ResultCache) else None
+
+        # Rate limiter (optional)
+        self._rate_limiter: RateLimiter | None = None
+        if rate_limit is not None and rate_limit > 0:
+            self._rate_limiter = RateLimiter(rate=rate_limit, per_seconds=rate_limit_per_seconds)
+            logger.debug(f"Rate limiter enabled: {rate_limit} req/{rate_limit_per_seconds}s")
+
+        logger.info(
+            "AsyncComfyClient initialized",
+            extra={"base_url": self.base_url, "client_id": self.client_id[:8]},
+        )
+
+    @property
+    def http(self) -> AsyncHttpClient:
+        """Get or create the pooled async HTTP client."""
+        if self._http is None:
+            self._http = AsyncHttpClient(
+                base_url=self.base_url,
+                timeout=settings.comfyui.timeout_read,
+                circuit_name=self._circuit_name,
+                uds_path=self._uds_path,
+            )
+        return self._http
+
+    async def close(self) -> None:
+        """Close the HTTP client, its connection pool and the completion WebSocket."""
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+            logger.debug("Async HTTP client closed")
+
+        ws_session, self._ws_session = self._ws_session, None
+        if ws_session is not None:
+            try:
+                await get_ws_session_manager().release(ws_session)
+            except Exception as e:
+                logger.debug(f"WebSocket release failed: {e}")
+
+    async def __aenter__(self) -> "AsyncComfyClient":
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        await self.close()
+
+    # =========================================================================
+    # INTERNAL REQUEST METHODS
+    # =========================================================================
+
+    async def _acquire_rate_limit(self, timeout: float = 30.0) -> bool:
+        """Acquire a rate limiter token without blocking the event loop."""
+        limiter = self._rate_limiter
+        if limiter is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while not limiter.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(limiter.per_seconds / limiter.rate)
+        return True
+
+    async def _request(
+        self, method: str, endpoint: str, timeout: float | None = None, **kwargs: Any
+    ) -> "httpx.Response":
+        """
+        Make an HTTP request with circuit breaker and rate limiter protection.
+
+        Args:
+            method: HTTP method (GET, POST, etc.)
+            endpoint: API endpoint (without base URL)
+            timeout: Request timeout
+            **kwargs: Additional request arguments
+
+        Returns:
+            Response object
+
+        Raises:
+            ComfyUIConnectionError: If connection fails
+        """
+        url = f"{self.base_url}{endpoint}"
+        timeout = timeout or settings.comfyui.timeout_read
+
+        # Apply rate limiting if configured
+        if not await self._acquire_rate_limit():
+            logger.warning(f"Rate limit timeout for {endpoint}")
+            raise ComfyUIConnectionError(
+                message="Rate limit timeout - too many requests", url=self.base_url
+            )
+
+        try:
+            response = await self.http.request(method, endpoint, timeout=timeout, **kwargs)
+            # A 5xx means the backend is reachable but failing; don't vouch for it
+            if response.status_code < 500:
+                self._liveness.mark_up()
+            return response
+
+        except ComfyUIConnectionError as e:
+            self._liveness.mark_down()
+            logger.warning(f"Connection error: {endpoint}", extra={"error": str(e)})
+            raise ComfyUIConnectionError(
+                message=f"Failed to connect to ComfyUI at {self.base_url}",
+                url=self.base_url,
+                cause=e,
+            ) from e
+        except httpx.TimeoutException as e:
+            logger.warning(f"Request timeout: {endpoint}", extra={"timeout": timeout})
+            raise ComfyUIConnectionError(
+                message=f"Request timed out after {timeout}s", url=url, cause=e
+            ) from e
+        except Exception as e:
+            logger.error(f"Request failed: {endpoint}", extra={"error": str(e)})
+            raise ComfyUIConnectionError(message=f"Request failed: {e}", url=url, cause=e) from e
+
+    async def _get(self, endpoint: str, **kwargs: Any) -> "httpx.Response":
+        """Make a GET request."""
+        return await self._request("GET", endpoint, **kwargs)
+
+    async def _get_json(self, endpoint: str, context: str) -> Any:
+        """
+        GET a JSON endpoint and parse the body.
+
+        Args:
+            endpoint: API endpoint (without base URL)
+            context: What is being fetched, for log messages
+
+        Returns:
+            Parsed JSON, or None if the request or parsing failed
+        """
+        try:
+            response = await self._get(endpoint)
+            if response.is_success:
+                return safe_json_parse(response, context)
+        except ComfyUIConnectionError:
+            # Connection or JSON parse error - already logged
+            pass
+        except Exception as e:
+            logger.debug(f"Failed {context}: {e}")
+        return None
+
+    async def _post(self, endpoint: str, **kwargs: Any) -> "httpx.Response":
+        """Make a POST request."""
+        return await self._request("POST", endpoint, **kwargs)
+
+    # =========================================================================
+    # CONNECTION
+    # =========================================================================
+
+    async def is_online(self) -> bool:
+        """
+        Check if ComfyUI is running and responsive.
+
+        Answers from the backend's liveness state while it is fresher than
+        settings.comfyui.liveness_ttl. The probe bypasses the circuit breaker
+        with a 1 second timeout for fast failure when ComfyUI is offline.
+
+        Returns:
+            True if ComfyUI is online, False otherwise
+        """
+
+        async def probe() -> bool:
+            try:
+                response = await self.http.client.get("/system_stats", timeout=1.0)
+                return response.status_code == 200
+            except Exception:
+                return False
+
+        return await self._liveness.acheck(probe)
+
+    @property
+    def circuit_open(self) -> bool:
+        """True while this client's circuit breaker rejects requests."""
+        return get_circuit_breaker(self._circuit_name).is_open
+
+    async def get_system_stats(self) -> dict | None:
+        """
+        Get ComfyUI system stats including GPU and VRAM info.
+
+        Returns:
+            Dict with system stats or None if unavailable
+        """
+        stats = await self._get_json("/system_stats", "getting system stats")
+        return stats if isinstance(stats, dict) else None
+
+    async def get_vram_gb(self) -> float:
+        """
+        Get available GPU VRAM in gigabytes.
+
+        Returns:
+            VRAM in GB (total, not free), 8GB if unable to detect
+        """
+        try:
+            vram_bytes = device_vram_bytes(await self.get_system_stats(), "vram_total")
+            if vram_bytes > 0:
+                vram_gb = vram_bytes / (1024**3)
+                logger.debug(f"Detected VRAM: {vram_gb:.1f}GB")
+                return vram_gb
+        except Exception as e:
+            logger.debug(f"VRAM detection failed: {e}")
+
+        # Fallback to reasonable default
+        logger.debug("Using default VRAM estimate: 8GB")
+        return 8.0
+
+    async def get_free_vram_gb(self) -> float:
+        """
+        Get free GPU VRAM in gigabytes.
+
+        Returns:
+            Free VRAM in GB
+        """
+        try:
+            vram_free = device_vram_bytes(await self.get_system_stats(), "vram_free")
+            if vram_free > 0:
+                return vram_free / (1024**3)
+        except Exception as e:
+            logger.debug(f"Free VRAM detection failed: {e}")
+        return 0.0
+
+    async def ensure_online(self) -> None:
+        """
+        Ensure ComfyUI is online, raising an exception if not.
+
+        Raises:
+            ComfyUIOfflineError: If ComfyUI is not running
+        """
+        if not await self.is_online():
+            raise ComfyUIOfflineError(url=self.base_url)
+
+    async def check_vram_available(
+        self, required_gb: float, raise_on_insufficient: bool = False
+    ) -> bool:
+        """
+        Check if sufficient VRAM is available for an operation.
+
+        Args:
+            required_gb: Required VRAM in gigabytes
+            raise_on_insufficient: If True, raise InsufficientVRAMError
+
+        Returns:
+            True if sufficient VRAM available
+
+        Raises:
+            InsufficientVRAMError: If raise_on_insufficient=True and not enough VRAM
+        """
+        from .exceptions import InsufficientVRAMError
+
+        free_vram = await self.get_free_vram_gb()
+
+        if free_vram <= 0:
+            # Can't detect free VRAM, assume it's ok
+            logger.debug("Cannot detect free VRAM, assuming sufficient")
+            return True
+
+        if free_vram < required_gb:
+            logger.warning(
+                "Insufficient VRAM", extra={"required_gb": required_gb, "available_gb": free_vram}
+            )
+            if raise_on_insufficient:
+                raise InsufficientVRAMError(required_gb=required_gb, available_gb=free_vram)
+            return False
+
+        return True
+
+    # VRAM estimates are pure arithmetic - shared verbatim with ComfyClient
+    estimate_vram_for_image = staticmethod(ComfyClient.estimate_vram_for_image)
+    estimate_vram_for_video = staticmethod(ComfyClient.estimate_vram_for_video)
+
+    async def recommend_image_preset(self, intent: str = "general") -> str:
+        """Recommend an image generation preset based on detected VRAM."""
+        return image_preset_for_vram(await self.get_vram_gb(), intent)
+
+    async def recommend_video_preset(self, intent: str = "general") -> str:
+        """Recommend a video generation preset based on detected VRAM."""
+        return video_preset_for_vram(await self.get_vram_gb(), intent)
+
+    # =========================================================================
+    # MODELS & INFO
+    # =========================================================================
+
+    async def _fetch_object_info(self) -> dict | None:
+        """Fetch the full /object_info (all installed nodes)."""
+        data = await self._get_json("/object_info", "getting all object info")
+        return data if isinstance(data, dict) else None
+
+    async def get_capabilities(self, force: bool = False) -> CapabilitySnapshot | None:
+        """Get the backend's /object_info snapshot (shared with ComfyClient)."""
+        return await get_capability_cache(self.base_url).aget(self._fetch_object_info, force=force)
+
+    async def _get_object_info(self, node_type: str, input_name: str) -> list[str]:
+        """Get input options for a node type."""
+        snapshot = await self.get_capabilities()
+        if snapshot is None:
+            return []
+        return extract_input_options(snapshot.nodes, node_type, input_name)
+
+    async def get_checkpoints(self) -> list[str]:
+        """Get available checkpoint models."""
+        return await self._get_object_info("CheckpointLoaderSimple", "ckpt_name")
+
+    async def get_samplers(self) -> list[str]:
+        """Get available samplers."""
+        samplers = await self._get_object_info("KSampler", "sampler_name")
+        return samplers or ["euler", "euler_ancestral", "dpmpp_2m", "dpmpp_sde"]
+
+    async def get_schedulers(self) -> list[str]:
+        """Get available schedulers."""
+        schedulers = await self._get_object_info("KSampler", "scheduler")
+        return schedulers or ["normal", "karras", "exponential", "sgm_uniform"]
+
+    async def get_loras(self) -> list[str]:
+        """Get available LoRA models."""
+        return await self._get_object_info("LoraLoader", "lora_name")
+
+    async def get_motion_models(self) -> list[str]:
+        """Get available AnimateDiff motion models."""
+        return await self._get_object_info("ADE_LoadAnimateDiffModel", "model_name")
+
+    async def get_all_installed_nodes(self) -> list[str]:
+        """Get all installed node types (class_types) in ComfyUI."""
+        snapshot = await self.get_capabilities()
+        return list(snapshot.nodes) if snapshot is not None else []
+
+    async def check_workflow_dependencies(self, workflow: dict) -> dict[str, Any]:
+        """Check if all nodes in a workflow are installed in ComfyUI."""
+        snapshot = await self.get_capabilities()
+        return dependency_report(workflow, snapshot.node_types if snapshot else frozenset())
+
+    # =========================================================================
+    # QUEUE MANAGEMENT
+    # =========================================================================
+
+    async def get_queue(self) -> dict:
+        """Get current queue status (empty if /queue couldn't be read)."""
+        return await self.fetch_queue() or {"queue_running": [], "queue_pending": []}
+
+    async def fetch_queue(self) -> dict | None:
+        """
+        Current /queue, or None if it couldn't be read.
+
+        Unlike get_queue(), a failed read can be told from an empty queue.
+        """
+        queue = await self._get_json("/queue", "getting queue status")
+        return queue if isinstance(queue, dict) else None
+
+    async def get_history(self, prompt_id: str | None = None) -> dict:
+        """Get execution history, optionally for a specific prompt."""
+        endpoint = f"/history/{prompt_id}" if prompt_id else "/history"
+        history = await self._get_json(endpoint, "getting history")
+        return history if isinstance(history, dict) else {}
+
+    async def cancel_current(self) -> bool:
+        """Cancel the currently running job."""
+        try:
+            response = await self._post("/interrupt")
+            if response.is_success:
+                logger.info("Cancelled current job")
+                return True
+        except Exception as e:
+            logger.warning(f"Failed to cancel job: {e}")
+        return False
+
+    async def clear_queue(self) -> bool:
+        """Clear all pending jobs from the queue."""
+        try:
+            response = await self._post("/queue", json={"clear": True})
+            if response.is_success:
+                logger.info("Cleared queue")
+                return True
+        except Exception as e:
+            logger.warning(f"Failed to clear queue: {e}")
+        return False
+
+    async def cancel(self, prompt_id: str) -> bool:
+        """Cancel one prompt without touching other jobs (see ComfyClient.cancel)."""
+        return prompt_id in await self.cancel_prompts([prompt_id])
+
+    async def cancel_prompts(self, prompt_ids: Iterable[str]) -> list[str]:
+        """
+        Cancel several prompts with one bulk /queue delete.
+
+        Same behaviour as ComfyClient.cancel_prompts.
+
+        Returns:
+            Prompt IDs removed from the pending queue or interrupted, in input order
+        """
+        wanted = list(dict.fromkeys(prompt_ids))
+        queue = await self.fetch_queue() if wanted else None
+        if queue is None:
+            return []
+        pending = queue_prompt_ids(queue.get("queue_pending", [])).intersection(wanted)
+        running = queue_prompt_ids(queue.get("queue_running", [])).intersection(wanted)
+
+        cancelled: set[str] = set()
+        if pending:
+            try:
+                response = await self._post("/queue", json={"delete": sorted(pending)})
+                if response.is_success:
+                    cancelled |= pending
+            except Exception as e:
+                logger.warning(f"Failed to delete prompts: {e}")
+            # A prompt may have left the pending queue before the delete landed
+            recheck = await self.fetch_queue() or {}
+            started = queue_prompt_ids(recheck.get("queue_running", [])) & pending
+            running |= started
+            cancelled -= started
+
+        for prompt_id in running:
+            if await self._interrupt(prompt_id):
+                cancelled.add(prompt_id)
+
+        for prompt_id in cancelled - running:
+            self._admission.release(prompt_id)
+        if cancelled:
+            logger.info("Cancelled prompts", extra={"count": len(cancelled)})
+        return [prompt_id for prompt_id in wanted if prompt_id in cancelled]
+
+    def batch(self, prompt_ids: Iterable[str] = ()) -> AsyncPromptBatch:
+        """Start an AsyncPromptBatch of prompts queued through this client."""
+        return AsyncPromptBatch(self, prompt_ids)
+
+    async def _interrupt(self, prompt_id: str) -> bool:
+        """Interrupt prompt_id if it is the one running."""
+        try:
+            response = await self._post("/interrupt", json={"prompt_id": prompt_id})
+            return response.is_success
+        except Exception as e:
+            logger.warning(f"Failed to interrupt prompt: {e}")
+        return False
+
+    # =========================================================================
+    # PROMPT EXECUTION
+    # =========================================================================
+
+    async def queue_prompt(
+        self,
+        workflow: dict,
+        front: bool = False,
+        prompt_id: str | None = None,
+        block: bool = True,
+        extra_data: dict[str, Any] | None = None,
+    ) -> str | None:
+        """
+        Queue a workflow for execution.
+
+        With admission control enabled (settings.comfyui.max_queued_prompts
+        above 0; off by default), awaits room while the backend already has
+        that many prompts queued or running.
+
+        Args:
+            workflow: ComfyUI workflow dict
+            front: Put the prompt at the front of ComfyUI's pending queue
+            prompt_id: ID to queue the prompt under (honoured by newer
+                ComfyUI versions; older ones assign their own)
+            block: Wait for room on a full backend (up to
+                settings.comfyui.admission_timeout); False rejects at once
+            extra_data: Sent as the prompt's extra_data; ComfyUI returns it
+                with the prompt in /queue and /history
+
+        Returns:
+            prompt_id if successful, None otherwise
+
+        Raises:
+            BackendOverloadedError: If the backend stays full
+        """
+        if not isinstance(workflow, dict):
+            logger.error("Invalid workflow: must be a dictionary")
+            return None
+
+        payload: dict[str, Any] = {"prompt": workflow, "client_id": self.client_id}
+        if front:
+            payload["front"] = True
+        if prompt_id:
+            payload["prompt_id"] = prompt_id
+        if extra_data:
+            payload["extra_data"] = extra_data
+
+        await self._admission.aacquire(self.fetch_queue, timeout=None if block else 0)
+        queued = None
+        try:
+            queued = await self._post_prompt(payload)
+            return queued
+        finally:
+            if queued:
+                self._admission.admitted(queued)
+            else:
+                self._admission.cancel_reservation()
+
+    async def _post_prompt(self, payload: dict) -> str | None:
+        """POST a /prompt payload and return the prompt_id."""
+        try:
+            response = await self._post(
+                "/prompt",
+                content=dumps(payload),
+                headers=JSON_HEADERS,
+                timeout=settings.comfyui.timeout_queue,
+            )
+
+            if response.is_success:
+                data = safe_json_parse(response, "queueing prompt")
+                prompt_id = data.get("prompt_id")
+                if not isinstance(prompt_id, str):
+                    logger.warning("Queue response missing prompt_id")
+                    return None
+                logger.info("Queued prompt", extra={"prompt_id": prompt_id[:8]})
+                return prompt_id
+
+            logger.warning(
+                f"Queue failed with status {response.status_code}",
+                extra={"status": response.status_code},
+            )
+            return None
+
+        except ComfyUIConnectionError:
+            raise
+        except Exception as e:
+            logger.error(f"Queue error: {e}", exc_info=True)
+            return None
+
+    async def wait_for_completion(
+        self,
+        prompt_id: str,
+        timeout: float | None = None,
+        poll_interval: float = 0.5,
+        on_progress: AsyncProgressCallback | None = None,
+    ) -> dict | None:
+        """
+        Wait for a prompt to complete.
+
+        Same strategy as ComfyClient.wait_for_completion: WebSocket events
+        from the shared session when available, /history polling (backing
+        off from poll_interval while nothing changes) otherwise or once the
+        socket drops mid-wait.
+
+        Args:
+            prompt_id: The prompt ID to wait for
+            timeout: Maximum wait time in seconds
+            poll_interval: Initial time between status checks when polling
+            on_progress: Optional callback (sync or async) called with
+                (progress: 0.0-1.0, status: str)
+
+        Returns:
+            History entry when complete, or None on timeout
+        """
+        timeout = timeout or settings.generation.generation_timeout
+        start = time.time()
+        tracker = _AsyncProgressTracker(on_progress)
+
+        logger.debug("Waiting for completion", extra={"prompt_id": prompt_id[:8]})
+
+        entry, finished = None, False
+        try:
+            ws = await self._ensure_websocket()
+            if ws is not None:
+                entry, finished = await self._wait_via_websocket(
+                    ws, prompt_id, start, timeout, tracker
+                )
+            if not finished:
+                entry = await self._poll_for_completion(
+                    prompt_id, start, timeout, poll_interval, tracker
+                )
+        finally:
+            if entry is not None:
+                self._admission.release(prompt_id)
+            else:
+                # Timed out or failed: keep the slot only while ComfyUI still has the prompt
+                await self._admission.asettle(prompt_id, self.fetch_queue)
+        return entry
+
+    async def _ensure_websocket(self) -> WSSession | None:
+        """Get the connected shared WebSocket session, acquiring it if needed."""
+        if not self._use_websocket:
+            return None
+
+        async with self._ws_lock:
+            session = self._ws_session
+            if session is not None and (session.connected or session.reconnecting):
+                return session
+            if time.monotonic() < self._ws_retry_at:
+                return None
+
+            manager = get_ws_session_manager()
+            stale, self._ws_session = self._ws_session, None
+            try:
+                if stale is not None:
+                    await manager.release(stale)
+                self._ws_session = await asyncio.wait_for(
+                    manager.acquire(self.base_url, self.client_id),
+                    timeout=settings.comfyui.timeout_connect,
+                )
+            except Exception as e:
+                self._ws_retry_at = time.monotonic() + WS_RETRY_COOLDOWN
+                logger.debug(f"WebSocket unavailable, polling instead: {e}")
+                return None
+
+            return self._ws_session
+
+    async def _wait_via_websocket(
+        self,
+        ws_session: WSSession,
+        prompt_id: str,
+        start: float,
+        timeout: float,
+        tracker: "_AsyncProgressTracker",
+    ) -> tuple[dict | None, bool]:
+        """
+        Wait for terminal WebSocket events for a prompt.
+
+        Returns:
+            (history entry or None, finished). finished is False when the
+            caller should continue by polling.
+        """
+        watch = ws_session.watch(prompt_id)
+        try:
+            # The prompt may have finished before the watch was registered
+            history = await self.get_history(prompt_id)
+            entry = await self._terminal_entry(prompt_id, history, start, tracker)
+            if entry is not None:
+                return entry, True
+
+            while (remaining := timeout - (time.time() - start)) > 0:
+                event = await watch.get(min(remaining, WS_LIVENESS_INTERVAL))
+                if event is None or event.status == "disconnected":
+                    if not (ws_session.connected or ws_session.reconnecting):
+                        logger.info(
+                            "WebSocket lost, polling for completion",
+                            extra={"prompt_id": prompt_id[:8]},
+                        )
+                        return None, False
+                    continue
+
+                if event.status in TERMINAL_STATUSES:
+                    history = await self.get_history(prompt_id)
+                    entry = await self._terminal_entry(prompt_id, history, start, tracker)
+                    # History may lag the event slightly - polling picks it up
+                    return entry, entry is not None
+
+                update = ws_event_progress(event)
+                if update is not None:
+                    await tracker.update(*update)
+        finally:
+            watch.close()
+
+        logger.warning(
+            "Generation timed out", extra={"prompt_id": prompt_id[:8], "timeout": timeout}
+        )
+        return None, True
+
+    async def _poll_for_completion(
+        self,
+        prompt_id: str,
+        start: float,
+        timeout: float,
+        poll_interval: float,
+        tracker: "_AsyncProgressTracker",
+    ) -> dict | None:
+        """Poll /history until the prompt finishes, backing off while nothing changes."""
+        interval = poll_interval
+        max_interval = max(poll_interval, MAX_POLL_INTERVAL)
+        last_phase = None
+
+        while time.time() - start < timeout:
+            phase = None
+            try:
+                elapsed = time.time() - start
+                history = await self.get_history(prompt_id)
+
+                entry = await self._terminal_entry(prompt_id, history, start, tracker)
+                if entry is not None:
+                    return entry
+
+                if prompt_id in history:
+                    phase = "running"
+                    if tracker.active:
+                        status = history[prompt_id].get("status", {})
+                        await tracker.update(*history_progress(status, elapsed, timeout))
+                elif tracker.active:
+                    # Not in history yet - still in queue
+                    progress, phase = queue_progress(await self.get_queue(), prompt_id)
+                    await tracker.update(progress, phase)
+
+            except Exception as e:
+                logger.debug(f"Poll error: {e}")
+
+            await asyncio.sleep(interval)
+            # Poll quickly around state changes, back off while nothing moves
+            interval = poll_interval if phase != last_phase else min(interval * 1.5, max_interval)
+            last_phase = phase
+
+        logger.warning(
+            "Generation timed out", extra={"prompt_id": prompt_id[:8], "timeout": timeout}
+        )
+        return None
+
+    @staticmethod
+    async def _terminal_entry(
+        prompt_id: str, history: dict, start: float, tracker: "_AsyncProgressTracker"
+    ) -> dict | None:
+        """Return the history entry if the prompt completed or failed."""
+        entry = history.get(prompt_id) if isinstance(history, dict) else None
+        if not isinstance(entry, dict):
+            return None
+
+        status = entry.get("status", {})
+        if status.get("completed", False):
+            await tracker.complete()
+            logger.info(
+                "Generation completed",
+                extra={"prompt_id": prompt_id[:8], "elapsed": f"{time.time() - start:.1f}s"},
+            )
+            return entry
+
+        if status.get("status_str") == "error":
+            await tracker.error()
+            logger.warning(
+                "Generation failed", extra={"prompt_id": prompt_id[:8], "status": status}
+            )
+            return entry
+
+        return None
+
+    # =========================================================================
+    # FILE DOWNLOADS
+    # =========================================================================
+
+    async def get_image(
+        self, filename: str, subfolder: str = "", folder_type: str = "output"
+    ) -> bytes | None:
+        """Download a generated image."""
+        try:
+            params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+            response = await self._get(
+                "/view", params=params, timeout=settings.comfyui.timeout_image
+            )
+            if response.is_success:
+                logger.debug(f"Downloaded image: {filename}")
+                return response.content
+        except Exception as e:
+            logger.warning(f"Failed to download image {filename}: {e}")
+        return None
+
+    async def get_video(
+        self, filename: str, subfolder: str = "", folder_type: str = "output"
+    ) -> bytes | None:
+        """Download a generated video."""
+        try:
+            params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+            response = await self._get(
+                "/view", params=params, timeout=settings.comfyui.timeout_video
+            )
+            if response.is_success:
+                logger.debug(f"Downloaded video: {filename}")
+                return response.content
+        except Exception as e:
+            logger.warning(f"Failed to download video {filename}: {e}")
+        return None
+
+    async def download_output(
+        self,
+        filename: str,
+        dest: str | os.PathLike | BinaryIO,
+        subfolder: str = "",
+        folder_type: str = "output",
+        on_progress: AsyncDownloadProgressCallback | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_resumes: int = 3,
+        timeout: float | None = None,
+    ) -> int | None:
+        """
+        Stream an output file to disk with bounded memory.
+
+        Same behaviour as ComfyClient.download_output: ".part" files for path
+        destinations, HTTP Range resume after dropped connections (starting
+        over if the file changed), progress as (bytes_done, total_bytes or None).
+
+        Returns:
+            Total bytes written, or None if the download failed
+        """
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+        timeout = timeout or settings.comfyui.timeout_video
+        resumes = 0
+        target = None
+
+        try:
+            target = DownloadTarget(dest)
+            while True:
+                offset = target.written
+                try:
+                    async with self.http.stream(
+                        "GET",
+                        "/view",
+                        params=params,
+                        headers=target.request_headers(),
+                        timeout=timeout,
+                    ) as response:
+                        if response.status_code == 416 and offset:
+                            if target.complete_on_416(response.headers):
+                                break
+                            continue
+                        if not response.is_success:
+                            logger.warning(
+                                f"Download failed with status {response.status_code}: {filename}"
+                            )
+                            return None
+                        if not target.start_response(response.status_code, response.headers):
+                            # The file changed since the download started
+                            continue
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            target.write(chunk)
+                            if on_progress:
+                                await _maybe_await(on_progress(target.written, target.total))
+                    break
+                except (httpx.TransportError, ComfyUIConnectionError) as e:
+                    resumes += 1
+                    if resumes > max_resumes:
+                        raise
+                    logger.info(
+                        f"Download interrupted, resuming: {filename}",
+                        extra={"bytes": target.written, "attempt": resumes, "error": str(e)},
+                    )
+
+            target.finish()
+            logger.debug(f"Downloaded {filename}", extra={"bytes": target.written})
+            return target.written
+
+        except Exception as e:
+            logger.warning(f"Failed to download {filename}: {e}")
+            return None
+        finally:
+            if target is not None:
+                target.close()
+
+    async def download_outputs(
+        self,
+        files: list[dict[str, Any]] | dict,
+        dest_dir: str | os.PathLike | None = None,
+    ) -> list[bytes | Path | None]:
+        """
+        Download several outputs concurrently, returned in output order.
+
+        Each file is its own task; in-flight downloads per backend are capped
+        by settings.http.max_downloads_per_host across the event loop.
+
+        Args:
+            files: File refs such as result["images"], or a history entry
+            dest_dir: Stream files into this directory and return paths;
+                otherwise return bytes
+
+        Returns:
+            List aligned with files: bytes or Path, None where a download failed
+        """
+        if isinstance(files, dict):
+            files = output_files(files)
+        if not files:
+            return []
+
+        slot = async_download_slot(self.base_url)
+
+        async def fetch(ref: dict[str, Any]) -> bytes | Path | None:
+            async with slot:
+                return await self._fetch_output(ref, dest_dir)
+
+        return list(await asyncio.gather(*(fetch(ref) for ref in files)))
+
+    async def _fetch_output(
+        self, ref: dict[str, Any], dest_dir: str | os.PathLike | None
+    ) -> bytes | Path | None:
+        """Download one file ref to dest_dir (returns Path) or memory (returns bytes)."""
+        filename = ref.get("filename")
+        if not filename:
+            return None
+        subfolder = ref.get("subfolder", "")
+        folder_type = ref.get("type", "output")
+
+        cached = self._result_cache.path_for(ref) if self._result_cache is not None else None
+        if cached is not None:
+            try:
+                if dest_dir is None:
+                    return await asyncio.to_thread(cached.read_bytes)
+                path = output_path(dest_dir, filename)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                await asyncio.to_thread(shutil.copyfile, cached, path)
+                return path
+            except OSError as e:
+                # Evicted meanwhile - fetch from ComfyUI instead
+                logger.debug(f"Cached output unavailable: {e}")
+
+        if dest_dir is not None:
+            path = output_path(dest_dir, filename)
+            written = await self.download_output(filename, path, subfolder, folder_type)
+            return path if written is not None else None
+
+        buffer = io.BytesIO()
+        written = await self.download_output(filename, buffer, subfolder, folder_type)
+        return buffer.getvalue() if written is not None else None
+
+    # =========================================================================
+    # FILE UPLOADS
+    # =========================================================================
+
+    async def upload_image(
+        self,
+        image: UploadSource,
+        subfolder: str = "",
+        folder_type: str = "input",
+        timeout: float | None = None,
+    ) -> str | None:
+        """
+        Upload an input image for LoadImage nodes.
+
+        Same arguments and deduplication as ComfyClient.upload_image.
+
+        Returns:
+            Name to put in a LoadImage "image" input, or None if the upload failed
+        """
+        try:
+            upload = await asyncio.to_thread(prepare_upload, image)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read image for upload: {e}")
+            return None
+        return await self._upload("/upload/image", upload, subfolder, folder_type, {}, timeout)
+
+    async def upload_mask(
+        self,
+        mask: UploadSource,
+        original: str,
+        subfolder: str = "",
+        folder_type: str = "input",
+        timeout: float | None = None,
+    ) -> str | None:
+        """
+        Upload an inpainting mask for an already uploaded image.
+
+        Same arguments as ComfyClient.upload_mask.
+
+        Returns:
+            Name of the masked image for LoadImage, or None if the upload failed
+        """
+        try:
+            upload = await asyncio.to_thread(prepare_upload, mask)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read mask for upload: {e}")
+            return None
+        upload = upload.keyed(original, suffix=".png")
+        fields = {"original_ref": json.dumps(input_ref(original, folder_type))}
+        return await self._upload("/upload/mask", upload, subfolder, folder_type, fields, timeout)
+
+    async def _upload(
+        self,
+        endpoint: str,
+        upload: PreparedUpload,
+        subfolder: str,
+        folder_type: str,
+        fields: dict[str, str],
+        timeout: float | None,
+    ) -> str | None:
+        """Upload once per backend and content, returning the input name."""
+        cache = get_upload_cache(self.base_url)
+        key = (endpoint, upload.digest, subfolder, folder_type)
+        if (name := cache.get(key)) is not None:
+            return name
+
+        ref = {"filename": upload.name, "subfolder": subfolder, "type": folder_type}
+        try:
+            if await self._input_exists(ref):
+                name = input_name(ref)
+            else:
+                body = MultipartBody(
+                    {**fields, "subfolder": subfolder, "type": folder_type, "overwrite": "true"},
+                    "image",
+                    upload,
+                )
+                response = await self._post(
+                    endpoint,
+                    content=body.aiter(),
+                    headers=body.headers,
+                    timeout=timeout or settings.comfyui.timeout_image,
+                )
+                if not response.is_success:
+                    logger.warning(
+                        f"Upload failed with status {response.status_code}: {upload.name}"
+                    )
+                    return None
+                name = input_name(safe_json_parse(response, "uploading image"))
+                logger.debug(f"Uploaded {name}", extra={"bytes": upload.size})
+        except Exception as e:
+            logger.warning(f"Failed to upload {upload.name}: {e}")
+            return None
+        cache.add(key, name)
+        return name
+
+    async def _input_exists(self, ref: dict[str, str]) -> bool:
+        """Check whether the backend already has an input file."""
+        try:
+            response = await self._request(
+                "HEAD", "/view", params=ref, timeout=settings.comfyui.timeout_connect
+            )
+            return response.status_code == 200
+        except ComfyUIConnectionError:
+            return False
+
+    async def _input_image(self, image: UploadSource | None) -> str | None:
+        """Input name of an init image, uploading it unless it already is one."""
+        if image is None:
+            return None
+        if isinstance(image, str) and is_input_name(image, get_upload_cache(self.base_url)):
+            return image
+        check_input_path(image)
+        name = await self.upload_image(image)
+        if name is None:
+            raise ValueError("Failed to upload init image")
+        return name
+
+    # =========================================================================
+    # WORKFLOW BUILDERS
+    # =========================================================================
+
+    async def build_txt2img_workflow(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        checkpoint: str = "",
+        width: int = 1024,
+        height: int = 1024,
+        steps: int = 20,
+        cfg: float = 7.0,
+        sampler: str = "euler",
+        scheduler: str = "normal",
+        seed: int = -1,
+        batch_size: int = 1,
+    ) -> dict:
+        """Build a basic txt2img workflow."""
+        if not checkpoint:
+            checkpoints = await self.get_checkpoints()
+            checkpoint = checkpoints[0] if checkpoints else "model.safetensors"
+
+        return txt2img_workflow(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            checkpoint=checkpoint,
+            width=width,
+            height=height,
+            steps=steps,
+            cfg=cfg,
+            sampler=sampler,
+            scheduler=scheduler,
+            seed=seed,
+            batch_size=batch_size,
+        )
+
+    async def build_video_workflow(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        checkpoint: str = "",
+        motion_model: str = "",
+        width: int = 512,
+        height: int = 512,
+        frames: int = 16,
+        fps: int = 8,
+        steps: int = 20,
+        cfg: float = 7.0,
+        seed: int = -1,
+        motion_scale: float = 1.0,
+    ) -> dict:
+        """Build an AnimateDiff video workflow."""
+        if not checkpoint:
+            checkpoints = await self.get_checkpoints()
+            checkpoint = checkpoints[0] if checkpoints else "dreamshaper_8.safetensors"
+
+        if not motion_model:
+            motion_models = await self.get_motion_models()
+            motion_model = motion_models[0] if motion_models else "v3_sd15_mm.ckpt"
+
+        return animatediff_workflow(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            checkpoint=checkpoint,
+            motion_model=motion_model,
+            width=width,
+            height=height,
+            frames=frames,
+            fps=fps,
+            steps=steps,
+            cfg=cfg,
+            seed=seed,
+            motion_scale=motion_scale,
+        )
+
+    async def _build_image_workflow(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        preset: str = "",
+        checkpoint: str = "",
+        width: int = 1024,
+        height: int = 1024,
+        steps: int = 20,
+        cfg: float = 7.0,
+        sampler: str = "euler",
+        scheduler: str = "normal",
+        seed: int = -1,
+    ) -> tuple[dict, int]:
+        """Build an image workflow, preferring the WorkflowCompiler for presets."""
+        if preset:
+            workflow = compile_preset_workflow(
+                prompt, negative_prompt, preset, checkpoint, sampler, scheduler, seed
+            )
+            if workflow is not None:
+                return workflow, safe_get_nested(workflow, "3", "inputs", "seed", default=seed)
+
+        workflow = await self.build_txt2img_workflow(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            checkpoint=checkpoint,
+            width=width,
+            height=height,
+            steps=steps,
+            cfg=cfg,
+            sampler=sampler,
+            scheduler=scheduler,
+            seed=seed,
+        )
+        return workflow, safe_get_nested(workflow, "3", "inputs", "seed", default=seed)
+
+    # =========================================================================
+    # HIGH-LEVEL GENERATION
+    # =========================================================================
+
+    async def _queue_and_wait(
+        self,
+        workflow: dict,
+        result: dict[str, Any],
+        wait: bool,
+        timeout: float,
+        on_progress: AsyncProgressCallback | None,
+    ) -> dict | None:
+        """Async ComfyClient._queue_and_wait()."""
+        if wait and self._result_cache is not None:
+            prompt_id, history, cached = await self._run_cached(
+                self._result_cache, workflow, timeout, on_progress
+            )
+            result["cached"] = cached
+        else:
+            prompt_id = await self.queue_prompt(workflow)
+            history = None
+
+        if not prompt_id:
+            result["error"] = "Failed to queue prompt"
+            return None
+
+        result["prompt_id"] = prompt_id
+
+        if not wait:
+            result["success"] = True
+            return None
+
+        if history is None:
+            history = await self.wait_for_completion(
+                prompt_id, timeout=timeout, on_progress=on_progress
+            )
+        if not history:
+            result["error"] = f"Generation timed out after {timeout}s"
+            return None
+        return history
+
+    async def _run_cached(
+        self,
+        cache: ResultCache,
+        workflow: dict,
+        timeout: float,
+        on_progress: AsyncProgressCallback | None,
+    ) -> tuple[str | None, dict | None, bool]:
+        """
+        Run a workflow through the result cache.
+
+        Async ComfyClient._run_cached(): concurrent identical workflows on
+        this event loop share one ComfyUI job, across clients.
+
+        Returns:
+            (prompt_id, history or None, whether the result came from the cache)
+        """
+        key = cache.key(workflow)
+
+        async def run() -> tuple[str | None, dict | None, bool]:
+            entry = await asyncio.to_thread(cache.get, key)
+            if entry is not None:
+                return entry.prompt_id, cache.tagged_history(entry), True
+
+            prompt_id = await self.queue_prompt(workflow)
+            if not prompt_id:
+                return None, None, False
+            history = await self.wait_for_completion(
+                prompt_id, timeout=timeout, on_progress=on_progress
+            )
+            if history and history.get("status", {}).get("status_str") != "error":
+                refs = output_files(history)
+                # Outputs are staged under their file names, which must not collide
+                names = {Path(ref.get("filename") or "").name for ref in refs}
+                if refs and len(names) == len(refs):
+                    staging = await asyncio.to_thread(cache.staging_dir, key)
+                    try:
+                        paths = await self.download_outputs(refs, dest_dir=staging)
+                        outputs = [
+                            (ref, path) for ref, path in zip(refs, paths) if isinstance(path, Path)
+                        ]
+                        if len(outputs) == len(refs):
+                            await asyncio.to_thread(
+                                cache.put, key, prompt_id, history, outputs, url=self.base_url
+                            )
+                    finally:
+                        await asyncio.to_thread(shutil.rmtree, staging, ignore_errors=True)
+            return prompt_id, history, False
+
+        prompt_id, history, cached = await cache.arun(key, run)
+
+        if cached:
+            logger.info("Using cached result", extra={"key": key, "prompt_id": prompt_id})
+            await _AsyncProgressTracker(on_progress).complete()
+        return prompt_id, history, cached
+
+    async def generate_image(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        preset: str = "",
+        checkpoint: str = "",
+        width: int = 1024,
+        height: int = 1024,
+        steps: int = 20,
+        cfg: float = 7.0,
+        sampler: str = "euler",
+        scheduler: str = "normal",
+        seed: int = -1,
+        wait: bool = True,
+        timeout: float | None = None,
+        on_progress: AsyncProgressCallback | None = None,
+        batch: AsyncPromptBatch | None = None,
+    ) -> dict[str, Any]:
+        """
+        High-level image generation with optional preset support.
+
+        Same arguments and result dict as ComfyClient.generate_image;
+        on_progress may be a plain function or a coroutine function. With
+        batch, the prompt is queued and waited on through that
+        AsyncPromptBatch, and fails with error "Cancelled" once cancelled.
+
+        Returns:
+            Dict with success, prompt_id, images, error, seed, preset
+        """
+        result: dict[str, Any] = {
+            "success": False,
+            "prompt_id": None,
+            "images": [],
+            "error": None,
+            "seed": seed,
+            "preset": preset or None,
+        }
+        await self._generate_image_into(
+            result,
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            preset=preset,
+            checkpoint=checkpoint,
+            width=width,
+            height=height,
+            steps=steps,
+            cfg=cfg,
+            sampler=sampler,
+            scheduler=scheduler,
+            seed=seed,
+            wait=wait,
+            timeout=timeout,
+            on_progress=on_progress,
+            batch=batch,
+        )
+        return result
+
+    async def _generate_image_into(
+        self,
+        result: dict[str, Any],
+        prompt: str,
+        negative_prompt: str,
+        preset: str,
+        checkpoint: str,
+        width: int,
+        height: int,
+        steps: int,
+        cfg: float,
+        sampler: str,
+        scheduler: str,
+        seed: int,
+        wait: bool,
+        timeout: float | None,
+        on_progress: AsyncProgressCallback | None,
+        batch: AsyncPromptBatch | None,
+    ) -> None:
+        """
+        Body of generate_image, filling a result dict the caller already holds.
+
+        result["prompt_id"] is set as soon as the prompt is queued, so a
+        caller that cancels the task still knows which prompt it started.
+        """
+        request_id = str(uuid.uuid4())[:8]
+        timeout = timeout or settings.generation.generation_timeout
+
+        with LogContext(request_id):
+            logger.info(
+                "Starting image generation",
+                extra={"width": width, "height": height, "steps": steps, "preset": preset},
+            )
+
+            try:
+                await self.ensure_online()
+            except ComfyUIOfflineError as e:
+                result["error"] = str(e)
+                return
+
+            workflow, result["seed"] = await self._build_image_workflow(
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                preset=preset,
+                checkpoint=checkpoint,
+                width=width,
+                height=height,
+                steps=steps,
+                cfg=cfg,
+                sampler=sampler,
+                scheduler=scheduler,
+                seed=seed,
+            )
+
+            if batch is None:
+                history = await self._queue_and_wait(workflow, result, wait, timeout, on_progress)
+                if history is None:
+                    return
+            else:
+                prompt_id = await batch.queue(workflow)
+                if not prompt_id:
+                    result["error"] = "Cancelled" if batch.cancelled else "Failed to queue prompt"
+                    return
+
+                result["prompt_id"] = prompt_id
+
+                if not wait:
+                    result["success"] = True
+                    return
+
+                history = await batch.wait_for_completion(
+                    prompt_id, timeout=timeout, on_progress=on_progress
+                )
+                if not history:
+                    if batch.was_cancelled(prompt_id):
+                        result["error"] = "Cancelled"
+                    else:
+                        result["error"] = f"Generation timed out after {timeout}s"
+                    return
+
+            finalize_image_result(result, history)
+
+            if result["success"]:
+                logger.info("Generation complete", extra={"image_count": len(result["images"])})
+            elif not result["error"]:
+                logger.warning("Generation produced no images")
+
+    async def generate_batch(
+        self,
+        prompts: list[str],
+        negative_prompt: str = "",
+        preset: str = "fast",
+        checkpoint: str = "",
+        width: int = 1024,
+        height: int = 1024,
+        steps: int = 20,
+        cfg: float = 7.0,
+        sampler: str = "euler",
+        scheduler: str = "normal",
+        seeds: list[int] | None = None,
+        max_concurrent: int = 1,
+        check_vram: bool = True,
+        on_progress: AsyncBatchProgressCallback | None = None,
+        timeout: float | None = None,
+        download: bool = False,
+        batch: AsyncPromptBatch | None = None,
+    ) -> dict[str, Any]:
+        """
+        Generate multiple images from a list of prompts.
+
+        Up to max_concurrent prompts are in flight at once (each as its own
+        task); results are returned in input order. With batch, the prompts
+        are queued under that AsyncPromptBatch: cancelling it stops the
+        batch, and items not yet finished fail with error "Cancelled".
+
+        Returns:
+            Dict with success, results (list of individual results), errors
+        """
+        total = len(prompts)
+        if total == 0:
+            return {"success": False, "results": [], "errors": ["No prompts provided"]}
+
+        timeout = timeout or settings.generation.generation_timeout
+
+        if seeds is None:
+            seeds = [-1] * total
+        elif len(seeds) < total:
+            seeds = seeds + [-1] * (total - len(seeds))
+
+        if check_vram:
+            estimated = self.estimate_vram_for_image(width, height, 1)
+            if not await self.check_vram_available(estimated):
+                logger.warning(
+                    "Batch may exceed VRAM", extra={"estimated_gb": estimated, "batch_size": total}
+                )
+
+        # Every slot is filled by generate_batch_iter before we read them
+        results: list[dict[str, Any]] = [{} for _ in range(total)]
+        start_time = time.time()
+        done = 0
+
+        async for idx, result in self.generate_batch_iter(
+            prompts,
+            negative_prompt=negative_prompt,
+            preset=preset,
+            checkpoint=checkpoint,
+            width=width,
+            height=height,
+            steps=steps,
+            cfg=cfg,
+            sampler=sampler,
+            scheduler=scheduler,
+            seeds=seeds,
+            max_concurrent=max_concurrent,
+            check_vram=False,
+            timeout=timeout,
+            download=download,
+            batch=batch,
+        ):
+            results[idx] = result
+            done += 1
+            if on_progress:
+                status = "Complete" if result["success"] else "Failed"
+                await _maybe_await(
+                    on_progress(idx, total, done / total, f"[{idx + 1}/{total}] {status}")
+                )
+
+        errors = [
+            f"Prompt {idx}: {r.get('error') or 'Unknown error'}"
+            for idx, r in enumerate(results)
+            if not r.get("success", False)
+        ]
+        elapsed = time.time() - start_time
+        success_count = sum(1 for r in results if r.get("success", False))
+
+        logger.info(
+            "Batch complete",
+            extra={
+                "total": total,
+                "success": success_count,
+                "failed": total - success_count,
+                "elapsed": f"{elapsed:.1f}s",
+            },
+        )
+
+        return {
+            "success": success_count == total,
+            "results": results,
+            "errors": errors,
+            "total": total,
+            "success_count": success_count,
+            "elapsed_seconds": elapsed,
+        }
+
+    async def generate_batch_iter(
+        self,
+        prompts: Iterable[str],
+        negative_prompt: str = "",
+        preset: str = "fast",
+        checkpoint: str = "",
+        width: int = 1024,
+        height: int = 1024,
+        steps: int = 20,
+        cfg: float = 7.0,
+        sampler: str = "euler",
+        scheduler: str = "normal",
+        seeds: Iterable[int] | None = None,
+        max_concurrent: int = 1,
+        check_vram: bool = True,
+        timeout: float | None = None,
+        download: bool = False,
+        batch: AsyncPromptBatch | None = None,
+    ) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+        """
+        Generate images from prompts, yielding each result as soon as it completes.
+
+        Same arguments as ComfyClient.generate_batch_iter: up to
+        max_concurrent items run as tasks at once, prompts and seeds are read
+        lazily as tasks finish, and (index, result) tuples come out in
+        completion order. Closing the iterator early cancels the prompts it
+        still has queued or running on ComfyUI; other prompts of batch are
+        left alone.
+
+        Yields:
+            Tuples of (input index, result dict)
+        """
+        timeout = timeout or settings.generation.generation_timeout
+
+        if check_vram:
+            estimated = self.estimate_vram_for_image(width, height, 1)
+            if not await self.check_vram_available(estimated):
+                logger.warning("Batch may exceed VRAM", extra={"estimated_gb": estimated})
+
+        batch = batch if batch is not None else self.batch()
+        items = enumerate(zip(prompts, itertools.chain(seeds or (), itertools.repeat(-1))))
+        limit = max(1, max_concurrent)
+
+        async def run_item(
+            idx: int, prompt: str, seed: int, result: dict[str, Any]
+        ) -> tuple[int, dict[str, Any]]:
+            try:
+                await self._generate_image_into(
+                    result,
+                    prompt=prompt,
+                    negative_prompt=negative_prompt,
+                    preset=preset,
+                    checkpoint=checkpoint,
+                    width=width,
+                    height=height,
+                    steps=steps,
+                    cfg=cfg,
+                    sampler=sampler,
+                    scheduler=scheduler,
+                    seed=seed,
+                    wait=True,
+                    timeout=timeout,
+                    on_progress=None,
+                    batch=batch,
+                )
+                if download and result["success"]:
+                    result["image_data"] = await self.download_outputs(result["images"])
+            except Exception as e:
+                logger.error(f"Batch item {idx} failed: {e}")
+                result.update(success=False, error=str(e), images=[])
+            return idx, result
+
+        running: set[asyncio.Task] = set()
+        # Task -> the result dict it fills (holds its prompt_id once queued)
+        results: dict[asyncio.Task, dict[str, Any]] = {}
+        try:
+            while True:
+                while len(running) < limit and (item := next(items, None)) is not None:
+                    idx, (prompt, seed) = item
+                    result: dict[str, Any] = {
+                        "success": False,
+                        "prompt_id": None,
+                        "images": [],
+                        "error": None,
+                        "seed": seed,
+                        "preset": preset or None,
+                    }
+                    task = asyncio.create_task(run_item(idx, prompt, seed, result))
+                    results[task] = result
+                    running.add(task)
+                if not running:
+                    return
+                finished, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    del results[task]
+                    yield task.result()
+        finally:
+            if running:
+                # Withdraw only the prompts this iterator started
+                started = [results[task]["prompt_id"] for task in running]
+                started = [prompt_id for prompt_id in started if prompt_id]
+                if started:
+                    await self.cancel_prompts(started)
+                    for prompt_id in started:
+                        batch.mark_finished(prompt_id)
+                for task in running:
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def generate_video(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        preset: str = "standard",
+        init_image: str | None = None,
+        wait: bool = True,
+        timeout: float | None = None,
+        on_progress: AsyncProgressCallback | None = None,
+        # Override individual settings (backwards compatible)
+        checkpoint: str = "",
+        motion_model: str = "",
+        width: int | None = None,
+        height: int | None = None,
+        frames: int | None = None,
+        fps: int | None = None,
+        steps: int | None = None,
+        cfg: float | None = None,
+        seed: int = -1,
+        motion_scale: float | None = None,
+    ) -> dict[str, Any]:
+        """
+        High-level video generation using multi-model VideoWorkflowBuilder.
+
+        Same arguments and result dict as ComfyClient.generate_video.
+
+        Returns:
+            Dict with success, prompt_id, videos, error, seed, preset
+        """
+        request_id = str(uuid.uuid4())[:8]
+        timeout = timeout or settings.generation.video_timeout
+
+        with LogContext(request_id):
+            result: dict[str, Any] = {
+                "success": False,
+                "prompt_id": None,
+                "videos": [],
+                "error": None,
+                "seed": seed,
+                "preset": preset,
+            }
+
+            logger.info(
+                "Starting video generation", extra={"preset": preset, "prompt_length": len(prompt)}
+            )
+
+            try:
+                await self.ensure_online()
+                init_image = await self._input_image(init_image)
+            except (ComfyUIOfflineError, ValueError) as e:
+                result["error"] = str(e)
+                return result
+
+            try:
+                workflow, result["seed"] = preset_video_workflow(
+                    prompt=prompt,
+                    negative_prompt=negative_prompt,
+                    preset=preset,
+                    init_image=init_image,
+                    checkpoint=checkpoint,
+                    width=width,
+                    height=height,
+                    frames=frames,
+                    fps=fps,
+                    steps=steps,
+                    cfg=cfg,
+                    seed=seed,
+                    motion_scale=motion_scale,
+                )
+            except Exception as e:
+                logger.warning(f"VideoWorkflowBuilder failed, falling back to legacy: {e}")
+                workflow = await self.build_video_workflow(
+                    prompt=prompt,
+                    negative_prompt=negative_prompt,
+                    checkpoint=checkpoint,
+                    motion_model=motion_model,
+                    width=width or 512,
+                    height=height or 512,
+                    frames=frames or 16,
+                    fps=fps or 8,
+                    steps=steps or 20,
+                    cfg=cfg or 7.0,
+                    seed=seed,
+                    motion_scale=motion_scale or 1.0,
+                )
+                result["seed"] = safe_get_nested(workflow, "7", "inputs", "seed", default=seed)
+
+            history = await self._queue_and_wait(workflow, result, wait, timeout, on_progress)
+            if history is None:
+                return result
+
+            finalize_video_result(result, history)
+
+            if result["success"]:
+                logger.info(
+                    "Video generation complete", extra={"video_count": len(result["videos"])}
+                )
+
+            return result
@@ -0,0 +1,209 @@
+"""
+Comfy Headless - Prompt Batches
+===============================
+
+Handles for a group of prompts queued together, so an aborted batch can be
+withdrawn from ComfyUI without touching anyone else's work:
+
+- cancel() removes every outstanding prompt of the batch from the pending
+  queue with one bulk /queue delete, and interrupts the running prompt only
+  if it belongs to the batch
+- Prompts the batch has seen finish are not touched again
+- A cancelled batch queues nothing more; generate_batch(batch=...) stops
+  submitting and reports the removed prompts as cancelled instead of waiting
+  for them to time out
+
+Usage:
+    from comfy_headless import ComfyClient
+
+    with ComfyClient() as client:
+        batch = client.batch()
+        for workflow in workflows:
+            batch.queue(workflow)
+        ...
+        batch.cancel()  # -> prompt IDs removed or interrupted
+"""
+
+import asyncio
+import threading
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Any
+
+from .logging_config import get_logger
+
+if TYPE_CHECKING:
+    from .async_client import AsyncComfyClient
+    from .client import ComfyClient
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "PromptBatch",
+    "AsyncPromptBatch",
+]
+
+
+class _BatchState:
+    """Prompt bookkeeping shared by the sync and async handles."""
+
+    def __init__(self, prompt_ids: Iterable[str] = ()):
+        self.prompt_ids: list[str] = []
+        self._finished: set[str] = set()
+        self._removed: set[str] = set()
+        self._cancelled = False
+        self._lock = threading.Lock()
+        for prompt_id in prompt_ids:
+            self.add(prompt_id)
+
+    def __len__(self) -> int:
+        return len(self.prompt_ids)
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancel() has been called."""
+        return self._cancelled
+
+    @property
+    def outstanding(self) -> list[str]:
+        """Prompts not yet seen finishing or cancelled, in queue order."""
+        with self._lock:
+            return [
+                prompt_id
+                for prompt_id in self.prompt_ids
+                if prompt_id not in self._finished and prompt_id not in self._removed
+            ]
+
+    def add(self, prompt_id: str) -> None:
+        """Track a prompt queued outside the handle."""
+        with self._lock:
+            self.prompt_ids.append(prompt_id)
+
+    def mark_finished(self, prompt_id: str) -> None:
+        """Record that a prompt finished, so cancel() leaves it alone."""
+        with self._lock:
+            self._finished.add(prompt_id)
+
+    def was_cancelled(self, prompt_id: str) -> bool:
+        """Whether cancel() removed or interrupted this prompt."""
+        with self._lock:
+            return prompt_id in self._removed
+
+    def _begin_cancel(self) -> list[str]:
+        self._cancelled = True
+        return self.outstanding
+
+    def _end_cancel(self, requested: list[str], removed: list[str]) -> list[str]:
+        with self._lock:
+            self._removed.update(removed)
+        logger.info(
+            "Batch cancelled",
+            extra={"outstanding": len(requested), "cancelled": len(removed)},
+        )
+        return removed
+
+
+class PromptBatch(_BatchState):
+    """
+    Prompts queued on one ComfyClient as a unit.
+
+    Args:
+        client: Client the prompts are queued through
+        prompt_ids: Prompts already queued that belong to the batch
+    """
+
+    def __init__(self, client: "ComfyClient", prompt_ids: Iterable[str] = ()):
+        self.client = client
+        super().__init__(prompt_ids)
+
+    def queue(self, workflow: dict, **kwargs: Any) -> str | None:
+        """
+        Queue a workflow as part of the batch.
+
+        Takes the same keyword arguments as ComfyClient.queue_prompt.
+
+        Returns:
+            prompt_id, or None if queueing failed or the batch is cancelled
+        """
+        if self._cancelled:
+            return None
+        prompt_id = self.client.queue_prompt(workflow, **kwargs)
+        if prompt_id:
+            self.add(prompt_id)
+            # cancel() ran while the prompt was being queued
+            if self._cancelled and self.client.cancel(prompt_id):
+                self._end_cancel([prompt_id], [prompt_id])
+        return prompt_id
+
+    def cancel(self) -> list[str]:
+        """
+        Cancel every outstanding prompt with one bulk /queue delete.
+
+        Returns:
+            Prompt IDs removed from the pending queue or interrupted
+        """
+        requested = self._begin_cancel()
+        removed = self.client.cancel_prompts(requested) if requested else []
+        return self._end_cancel(requested, removed)
+
+
+class AsyncPromptBatch(_BatchState):
+    """
+    Prompts queued on one AsyncComfyClient as a unit.
+
+    Waits started with wait_for_completion() on the batch's prompts are
+    cancelled along with the prompts.
+
+    Args:
+        client: Client the prompts are queued through
+        prompt_ids: Prompts already queued that belong to the batch
+    """
+
+    def __init__(self, client: "AsyncComfyClient", prompt_ids: Iterable[str] = ()):
+        self.client = client
+        self._waiters: dict[str, asyncio.Task] = {}
+        super().__init__(prompt_ids)
+
+    async def queue(self, workflow: dict, **kwargs: Any) -> str | None:
+        """Async PromptBatch.queue()."""
+        if self._cancelled:
+            return None
+        prompt_id = await self.client.queue_prompt(workflow, **kwargs)
+        if prompt_id:
+            self.add(prompt_id)
+            if self._cancelled and await self.client.cancel(prompt_id):
+                self._end_cancel([prompt_id], [prompt_id])
+        return prompt_id
+
+    async def wait_for_completion(self, prompt_id: str, **kwargs: Any) -> dict | None:
+        """
+        Wait for one of the batch's prompts.
+
+        Takes the same keyword arguments as AsyncComfyClient.wait_for_completion.
+
+        Returns:
+            History entry, or None on timeout or if the prompt was cancelled
+        """
+        waiter = asyncio.ensure_future(self.client.wait_for_completion(prompt_id, **kwargs))
+        self._waiters[prompt_id] = waiter
+        try:
+            entry = await waiter
+        except asyncio.CancelledError:
+            if not self.was_cancelled(prompt_id):
+                raise
+            return None
+        finally:
+            self._waiters.pop(prompt_id, None)
+        if entry is not None:
+            self.mark_finished(prompt_id)
+        return entry
+
+    async def cancel(self) -> list[str]:
+        """Async PromptBatch.cancel()."""
+        requested = self._begin_cancel()
+        removed = await self.client.cancel_prompts(requested) if requested else []
+        self._end_cancel(requested, removed)
+        for prompt_id in removed:
+            waiter = self._waiters.get(prompt_id)
+            if waiter is not None:
+                waiter.cancel()
+        return removed
@@ -0,0 +1,287 @@
+"""
+Comfy Headless - Backend Capability Cache
+==========================================
+
+One /object_info snapshot per ComfyUI backend, shared by every client,
+the workflow validator and the UI.
+
+- Fetched once (the full /object_info) and indexed by node type
+- Refreshed when older than settings.comfyui.object_info_ttl
+- Persisted to the cache dir, so a restart starts warm
+- A stale snapshot is still served if a refresh fails
+
+The cache does not do HTTP itself: callers pass a fetch function, so
+requests go through the caller's session, rate limiter and circuit breaker.
+
+Usage:
+    from comfy_headless.capabilities import get_capability_cache
+
+    cache = get_capability_cache("http://localhost:8188")
+    snapshot = cache.get(fetch)  # fetch() -> parsed /object_info or None
+    if snapshot and snapshot.has_node("KSampler"):
+        ...
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import Any
+
+from .config import get_cache_dir, settings
+from .jsoncodec import dumps, loads
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "CapabilitySnapshot",
+    "CapabilityCache",
+    "get_capability_cache",
+    "clear_capability_caches",
+]
+
+# Called to fetch the full /object_info; returns the parsed JSON or None
+ObjectInfoFetch = Callable[[], "dict[str, Any] | None"]
+AsyncObjectInfoFetch = Callable[[], Awaitable["dict[str, Any] | None"]]
+
+
+@dataclass(frozen=True)
+class CapabilitySnapshot:
+    """Full /object_info of one backend at one point in time."""
+
+    url: str
+    nodes: dict[str, Any] = field(repr=False)
+    fetched_at: float = 0.0  # Wall clock, so ages survive restarts
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was fetched."""
+        return max(0.0, time.time() - self.fetched_at)
+
+    @cached_property
+    def node_types(self) -> frozenset[str]:
+        """All installed node class_types."""
+        return frozenset(self.nodes)
+
+    def has_node(self, node_type: str) -> bool:
+        """Check if a node class_type is installed."""
+        return node_type in self.nodes
+
+    def node_info(self, node_type: str) -> dict[str, Any] | None:
+        """The /object_info entry for a node class_type."""
+        info = self.nodes.get(node_type)
+        return info if isinstance(info, dict) else None
+
+    @cached_property
+    def outputs(self) -> dict[str, list[str]]:
+        """Output types per node class_type."""
+        result: dict[str, list[str]] = {}
+        for node_type, info in self.nodes.items():
+            output = info.get("output", []) if isinstance(info, dict) else []
+            result[node_type] = list(output) if isinstance(output, list) else []
+        return result
+
+
+class CapabilityCache:
+    """
+    Capability snapshot holder for one backend URL.
+
+    Thread-safe; concurrent refreshes share a single fetch.
+
+    Args:
+        url: ComfyUI server URL
+        ttl: Seconds before a snapshot is refreshed (default from settings)
+        persist: Save snapshots to the cache dir (default from settings)
+    """
+
+    def __init__(self, url: str, ttl: float | None = None, persist: bool | None = None):
+        self.url = url.rstrip("/")
+        self.ttl = settings.comfyui.object_info_ttl if ttl is None else ttl
+        self.persist = settings.comfyui.object_info_persist if persist is None else persist
+        self._snapshot: CapabilitySnapshot | None = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._async_locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def path(self) -> Path:
+        """File the snapshot is persisted to."""
+        digest = hashlib.sha256(self.url.encode()).hexdigest()[:16]
+        return get_cache_dir() / "object_info" / f"{digest}.json"
+
+    @property
+    def snapshot(self) -> CapabilitySnapshot | None:
+        """Current snapshot (possibly stale), loading the persisted one on first use."""
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                if self.persist:
+                    self._snapshot = self._load()
+            return self._snapshot
+
+    def is_fresh(self, snapshot: CapabilitySnapshot | None = None) -> bool:
+        """Check if a snapshot (default: the current one) is within the TTL."""
+        snapshot = snapshot if snapshot is not None else self.snapshot
+        return snapshot is not None and snapshot.age < self.ttl
+
+    def get(self, fetch: ObjectInfoFetch, force: bool = False) -> CapabilitySnapshot | None:
+        """
+        Get the snapshot, refreshing it via fetch() if stale.
+
+        Args:
+            fetch: Returns the parsed full /object_info, or None on failure
+            force: Refresh even if the snapshot is fresh
+
+        Returns:
+            The snapshot, a stale one if the refresh failed, or None
+        """
+        started = time.time()
+        snapshot = self.snapshot
+        if not force and self.is_fresh(snapshot):
+            return snapshot
+
+        with self._fetch_lock:
+            # Another thread may have refreshed while we waited
+            snapshot = self.snapshot
+            if snapshot is not None and (
+                snapshot.fetched_at >= started or (not force and self.is_fresh(snapshot))
+            ):
+                return snapshot
+            try:
+                data = fetch()
+            except Exception as e:
+                logger.debug(f"Failed to fetch object info: {e}", extra={"url": self.url})
+                data = None
+            return self.update(data) if data is not None else snapshot
+
+    async def aget(
+        self, fetch: AsyncObjectInfoFetch, force: bool = False
+    ) -> CapabilitySnapshot | None:
+        """Async get(); concurrent refreshes on one event loop share a fetch."""
+        started = time.time()
+        snapshot = self.snapshot
+        if not force and self.is_fresh(snapshot):
+            return snapshot
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            lock = self._async_locks.setdefault(loop, asyncio.Lock())
+
+        async with lock:
+            snapshot = self.snapshot
+            if snapshot is not None and (
+                snapshot.fetched_at >= started or (not force and self.is_fresh(snapshot))
+            ):
+                return snapshot
+            try:
+                data = await fetch()
+            except Exception as e:
+                logger.debug(f"Failed to fetch object info: {e}", extra={"url": self.url})
+                data = None
+            return self.update(data) if data is not None else snapshot
+
+    def update(self, data: dict[str, Any]) -> CapabilitySnapshot | None:
+        """
+        Replace the snapshot with freshly fetched /object_info data.
+
+        Returns:
+            The new snapshot, or the previous one if data is not a dict
+        """
+        if not isinstance(data, dict):
+            logger.debug("Ignoring malformed object info", extra={"url": self.url})
+            return self.snapshot
+
+        snapshot = CapabilitySnapshot(url=self.url, nodes=data, fetched_at=time.time())
+        with self._lock:
+            self._snapshot = snapshot
+            self._loaded = True
+        if self.persist:
+            self._save(snapshot)
+
+        logger.debug(
+            "Capability snapshot refreshed", extra={"url": self.url, "node_count": len(data)}
+        )
+        return snapshot
+
+    def invalidate(self) -> None:
+        """Forget the snapshot (memory and disk); the next get() refetches."""
+        with self._lock:
+            self._snapshot = None
+            self._loaded = True
+        if self.persist:
+            with contextlib.suppress(OSError):
+                self.path.unlink(missing_ok=True)
+
+    def _load(self) -> CapabilitySnapshot | None:
+        try:
+            with open(self.path, "rb") as f:
+                payload = loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable capability cache: {e}", extra={"url": self.url})
+            return None
+
+        if (
+            not isinstance(payload, dict)
+            or payload.get("url") != self.url
+            or not isinstance(payload.get("nodes"), dict)
+            or not isinstance(payload.get("fetched_at"), (int, float))
+        ):
+            return None
+        return CapabilitySnapshot(
+            url=self.url, nodes=payload["nodes"], fetched_at=float(payload["fetched_at"])
+        )
+
+    def _save(self, snapshot: CapabilitySnapshot) -> None:
+        path = self.path
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(
+                    dumps(
+                        {
+                            "url": snapshot.url,
+                            "fetched_at": snapshot.fetched_at,
+                            "nodes": snapshot.nodes,
+                        }
+                    )
+                )
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.debug(f"Failed to persist capability cache: {e}", extra={"url": self.url})
+            with contextlib.suppress(OSError):
+                tmp.unlink(missing_ok=True)
+
+
+_caches: dict[str, CapabilityCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_capability_cache(base_url: str | None = None) -> CapabilityCache:
+    """Get the process-wide capability cache for a backend URL."""
+    url = (base_url or settings.comfyui.url).rstrip("/")
+    with _caches_lock:
+        cache = _caches.get(url)
+        if cache is None:
+            cache = CapabilityCache(url)
+            _caches[url] = cache
+        return cache
+
+
+def clear_capability_caches() -> None:
+    """Drop all in-memory capability caches (persisted snapshots are kept)."""
+    with _caches_lock:
+        _caches.clear()
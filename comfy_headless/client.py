@@ -3,7 +3,8 @@ Comfy Headless - ComfyUI API Client
 =====================================
 
 Production-ready HTTP client for ComfyUI communication with:
-- Connection pooling via requests.Session
+- Connection pooling via requests.Session, or httpx (HTTP/2 or a Unix
+  domain socket) - see the transports module
 - Automatic retry with exponential backoff
 - Circuit breaker for failure resilience
 - Structured logging
@@ -12,82 +13,90 @@ Production-ready HTTP client for ComfyUI communication with:
 Usage:
     from comfy_headless import ComfyClient
 
-    client = ComfyClient()
-    if client.is_online():
-        result = client.generate_image("a beautiful sunset")
+    with ComfyClient() as client:
+        if client.is_online():
+            result = client.generate_image("a beautiful sunset")
 """
 
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import itertools
 import json
+import os
+import shutil
+import threading
 import time
 import uuid
-from collections.abc import Callable
-from typing import Any
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO
 
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
+from .admission import get_admission
+from .batch import PromptBatch
+from .capabilities import CapabilitySnapshot, get_capability_cache
 from .config import settings
+from .downloads import (
+    DEFAULT_CHUNK_SIZE,
+    DownloadProgressCallback,
+    DownloadTarget,
+    download_slot,
+    output_files,
+    output_path,
+)
 from .exceptions import (
     ComfyUIConnectionError,
     ComfyUIOfflineError,
 )
+from .jsoncodec import JSON_HEADERS, dumps
+from .liveness import get_liveness
 from .logging_config import LogContext, get_logger
-from .retry import RateLimiter, get_circuit_breaker
-
-
-def _safe_json_parse(response: "requests.Response", context: str = "") -> dict:
-    """
-    Safely parse JSON from a response with proper error handling.
-
-    Args:
-        response: The requests Response object
-        context: Description of what we were trying to do (for error messages)
-
-    Returns:
-        Parsed JSON as dict
-
-    Raises:
-        ComfyUIConnectionError: If JSON parsing fails
-    """
-    try:
-        return response.json()
-    except json.JSONDecodeError as e:
-        logger.error(
-            f"Invalid JSON response{f' ({context})' if context else ''}",
-            extra={"error": str(e), "response_text": response.text[:200] if response.text else ""},
-        )
-        raise ComfyUIConnectionError(
-            message=f"Invalid JSON response from ComfyUI{f' while {context}' if context else ''}",
-            url=response.url,
-            cause=e,
-        ) from e
-
-
-def _safe_get_nested(data: Any, *keys: str, default: Any = None) -> Any:
-    """
-    Safely navigate nested dictionaries without raising KeyError or TypeError.
-
-    Args:
-        data: The root dictionary to navigate
-        *keys: Sequence of keys to traverse
-        default: Value to return if path doesn't exist or has wrong type
-
-    Returns:
-        The value at the nested path, or default if not found
-
-    Example:
-        _safe_get_nested(workflow, "3", "inputs", "seed", default=-1)
-    """
-    current = data
-    for key in keys:
-        if not isinstance(current, dict):
-            return default
-        current = current.get(key)
-        if current is None:
-            return default
-    return current
-
+from .protocol import (
+    MAX_POLL_INTERVAL,
+    WS_LIVENESS_INTERVAL,
+    WS_RETRY_COOLDOWN,
+    animatediff_workflow,
+    compile_preset_workflow,
+    dependency_report,
+    device_vram_bytes,
+    extract_input_options,
+    finalize_image_result,
+    finalize_video_result,
+    history_progress,
+    image_preset_for_vram,
+    preset_video_workflow,
+    queue_progress,
+    queue_prompt_ids,
+    safe_get_nested,
+    safe_json_parse,
+    txt2img_workflow,
+    video_preset_for_vram,
+    ws_event_progress,
+)
+from .result_cache import ResultCache, get_result_cache
+from .retry import RateLimiter, SingleFlight, get_circuit_breaker
+from .transports import TRANSPORTS, HttpxSession, create_session
+from .uploads import (
+    MultipartBody,
+    PreparedUpload,
+    UploadSource,
+    check_input_path,
+    get_upload_cache,
+    input_name,
+    input_ref,
+    is_input_name,
+    prepare_upload,
+)
+from .websocket_client import (
+    TERMINAL_STATUSES,
+    WEBSOCKETS_AVAILABLE,
+    get_background_loop,
+)
+from .ws_session import WSSession, get_ws_session_manager
 
 # Lazy import for video module to avoid circular imports
 _video_builder = None
@@ -103,6 +112,37 @@ def _get_video_builder():
     return _video_builder
 
 
+class _ProgressTracker:
+    """Forward monotonically increasing progress to an optional callback."""
+
+    def __init__(self, callback: Callable[[float, str], None] | None):
+        self.callback = callback
+        self.last = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.callback is not None
+
+    def update(self, progress: float, message: str) -> None:
+        if progress > self.last:
+            self.last = progress
+            self._emit(progress, message)
+
+    def complete(self) -> None:
+        self._emit(1.0, "Completed")
+
+    def error(self) -> None:
+        self._emit(self.last, "Error")
+
+    def _emit(self, progress: float, message: str) -> None:
+        if self.callback is None:
+            return
+        try:
+            self.callback(progress, message)
+        except Exception as e:
+            logger.debug(f"Progress callback error: {e}")
+
+
 logger = get_logger(__name__)
 
 __all__ = ["ComfyClient"]
@@ -122,6 +162,12 @@ class ComfyClient:
         base_url: str | None = None,
         rate_limit: int | None = None,
         rate_limit_per_seconds: float = 1.0,
+        use_websocket: bool | None = None,
+        client_id: str | None = None,
+        circuit_name: str | None = None,
+        result_cache: ResultCache | bool | None = None,
+        transport: str | None = None,
+        uds_path: str | None = None,
     ):
         """
         Initialize the ComfyUI client.
@@ -130,11 +176,55 @@ class ComfyClient:
             base_url: ComfyUI server URL (default from settings)
             rate_limit: Max requests per time window (None = no limit)
             rate_limit_per_seconds: Time window for rate limiting
+            use_websocket: Wait for completion via WebSocket events when the
+                websockets package is installed (default from settings)
+            client_id: clientId sent with prompts (default: new UUID). Clients
+                sharing a client_id share one WebSocket connection.
+            circuit_name: Circuit breaker to use (default "comfyui:<base_url>",
+                one per backend); clients of independent backends should
+                not share one
+            result_cache: Reuse finished generations of identical workflows:
+                True for the process-wide cache, a ResultCache, or False
+                (default from settings.generation.result_cache)
+            transport: HTTP transport - "requests", "httpx" (HTTP/2 where
+                negotiated) or "uds" (default settings.http.transport)
+            uds_path: Unix domain socket of a co-located ComfyUI for the "uds"
+                transport (default settings.http.uds_path). WebSocket events
+                still use base_url.
+
+        Raises:
+            ValueError: If transport is unknown
         """
         self.base_url = (base_url or settings.comfyui.url).rstrip("/")
-        self.client_id = str(uuid.uuid4())
-        self._session: requests.Session | None = None
-        self._circuit = get_circuit_breaker("comfyui")
+        self.client_id = client_id or str(uuid.uuid4())
+        self.transport = transport or settings.http.transport
+        if self.transport not in TRANSPORTS:
+            raise ValueError(
+                f"Unknown HTTP transport {self.transport!r}; expected one of {TRANSPORTS}"
+            )
+        self._uds_path = uds_path
+        self._session: requests.Session | HttpxSession | None = None
+        self._circuit = get_circuit_breaker(circuit_name or f"comfyui:{self.base_url}")
+        self._liveness = get_liveness(self.base_url)
+        self._liveness.watch(self._circuit)
+        self._admission = get_admission(self.base_url)
+        # Identical concurrent JSON GETs of this client share one request
+        self._get_flights = SingleFlight()
+
+        # Shared WebSocket session for completion events (acquired lazily)
+        if use_websocket is None:
+            use_websocket = settings.comfyui.use_websocket
+        self._use_websocket = use_websocket and WEBSOCKETS_AVAILABLE
+        self._ws_session: WSSession | None = None
+        self._ws_lock = threading.Lock()
+        self._ws_retry_at = 0.0
+
+        # Generation result cache (opt-in)
+        if result_cache is None:
+            result_cache = settings.generation.result_cache
+        if result_cache is True:
+            result_cache = get_result_cache()
+        self._result_cache = result_cache if isinstance(result_cache, ResultCache) else None
 
         # Rate limiter (optional)
         self._rate_limiter: RateLimiter | None = None
@@ -148,42 +238,32 @@ class ComfyClient:
         )
 
     @property
-    def session(self) -> requests.Session:
+    def session(self) -> requests.Session | HttpxSession:
         """Get or create the HTTP session with connection pooling."""
         if self._session is None or not hasattr(self._session, "headers"):
             self._session = self._create_session()
         return self._session
 
-    def _create_session(self) -> requests.Session:
-        """Create a configured requests session."""
-        session = requests.Session()
-
-        # Configure retry for transient errors
-        retry_strategy = Retry(
-            total=settings.retry.max_retries,
-            backoff_factor=settings.retry.backoff_base,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "OPTIONS", "POST"],
-        )
-
-        adapter = HTTPAdapter(
-            max_retries=retry_strategy,
-            pool_connections=10,
-            pool_maxsize=20,
-        )
-
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-
-        return session
+    def _create_session(self) -> requests.Session | HttpxSession:
+        """Create a session for the configured transport."""
+        return create_session(self.transport, self._uds_path)
 
     def close(self):
-        """Close the HTTP session."""
+        """Close the HTTP session and the completion WebSocket."""
         if self._session:
             self._session.close()
             self._session = None
             logger.debug("HTTP session closed")
 
+        ws_session, self._ws_session = self._ws_session, None
+        if ws_session is not None:
+            release = get_ws_session_manager().release(ws_session)
+            future = asyncio.run_coroutine_threadsafe(release, get_background_loop())
+            try:
+                future.result(timeout=settings.comfyui.timeout_connect)
+            except Exception as e:
+                logger.debug(f"WebSocket release failed: {e}")
+
     def __enter__(self):
         return self
 
@@ -215,7 +295,12 @@ class ComfyClient:
         """
         url = f"{self.base_url}{endpoint}"
         timeout = timeout or settings.comfyui.timeout_read
+        return self._send(method, endpoint, url, timeout, **kwargs)
 
+    def _send(
+        self, method: str, endpoint: str, url: str, timeout: float, **kwargs
+    ) -> requests.Response:
+        """Send one request through the rate limiter and circuit breaker."""
         # Apply rate limiting if configured
         if self._rate_limiter is not None and not self._rate_limiter.acquire(
             blocking=True, timeout=30.0
@@ -228,9 +313,13 @@ class ComfyClient:
         try:
             with self._circuit:
                 response = self.session.request(method, url, timeout=timeout, **kwargs)
-                return response
+            # A 5xx means the backend is reachable but failing; don't vouch for it
+            if response.status_code < 500:
+                self._liveness.mark_up()
+            return response
 
         except requests.exceptions.ConnectionError as e:
+            self._liveness.mark_down()
             logger.warning(f"Connection error: {endpoint}", extra={"error": str(e)})
             raise ComfyUIConnectionError(
                 message=f"Failed to connect to ComfyUI at {self.base_url}",
@@ -250,6 +339,37 @@ class ComfyClient:
         """Make a GET request."""
         return self._request("GET", endpoint, **kwargs)
 
+    def _get_json(self, endpoint: str, context: str) -> Any:
+        """
+        GET a JSON endpoint and parse the body.
+
+        Identical concurrent calls on this client share one request (and
+        results are reused for settings.http.coalesce_ttl); each caller
+        parses the body into its own objects.
+
+        Args:
+            endpoint: API endpoint (without base URL)
+            context: What is being fetched, for log messages
+
+        Returns:
+            Parsed JSON, or None if the request or parsing failed
+        """
+        try:
+            if settings.http.coalesce_gets:
+                response = self._get_flights.do(
+                    endpoint, lambda: self._get(endpoint), ttl=settings.http.coalesce_ttl
+                )
+            else:
+                response = self._get(endpoint)
+            if response.ok:
+                return safe_json_parse(response, context)
+        except ComfyUIConnectionError:
+            # Connection or JSON parse error - already logged
+            pass
+        except Exception as e:
+            logger.debug(f"Failed {context}: {e}")
+        return None
+
     def _post(self, endpoint: str, **kwargs) -> requests.Response:
         """Make a POST request."""
         return self._request("POST", endpoint, **kwargs)
@@ -262,22 +382,42 @@ class ComfyClient:
         """
         Check if ComfyUI is running and responsive.
 
-        Uses a quick check that bypasses circuit breaker and session retries
-        for fast UI initialization when ComfyUI is offline.
+        Answers from the backend's liveness state, which every request keeps
+        current, and only probes when that state is older than
+        settings.comfyui.liveness_ttl. The probe bypasses circuit breaker
+        and session retries for fast UI initialization when ComfyUI is offline.
 
         Returns:
             True if ComfyUI is online, False otherwise
         """
-        try:
-            # Bypass session (which has retry adapter) - use raw requests
-            # Use tuple timeout: (connect_timeout, read_timeout) for faster failure
-            response = requests.get(
-                f"{self.base_url}/system_stats",
-                timeout=(1.0, 1.0),  # Fast fail - 1 second connect, 1 second read
-            )
-            return response.status_code == 200
-        except Exception:
-            return False
+        return self._liveness.check(self._probe_online)
+
+    @property
+    def circuit_open(self) -> bool:
+        """True while this client's circuit breaker rejects requests."""
+        return self._circuit.is_open
+
+    def _probe_online(self) -> bool:
+        """Probe /system_stats with a short timeout."""
+
+        def probe() -> bool:
+            try:
+                # Bypass the requests session (which has retry adapter) - use raw
+                # requests; other transports have to go through their session
+                get = requests.get if self.transport == "requests" else self.session.get
+                # Use tuple timeout: (connect_timeout, read_timeout) for faster failure
+                response = get(
+                    f"{self.base_url}/system_stats",
+                    timeout=(1.0, 1.0),  # Fast fail - 1 second connect, 1 second read
+                )
+                return response.status_code == 200
+            except Exception:
+                return False
+
+        if not settings.http.coalesce_gets:
+            return probe()
+        # Concurrent checks share a probe
+        return self._get_flights.do(("is_online",), probe, ttl=settings.http.coalesce_ttl)
 
     def get_system_stats(self) -> dict | None:
         """
@@ -286,16 +426,7 @@ class ComfyClient:
         Returns:
             Dict with system stats or None if unavailable
         """
-        try:
-            response = self._get("/system_stats")
-            if response.ok:
-                return _safe_json_parse(response, "getting system stats")
-        except ComfyUIConnectionError:
-            # JSON parse error - already logged
-            pass
-        except Exception as e:
-            logger.debug(f"Failed to get system stats: {e}")
-        return None
+        return self._get_json("/system_stats", "getting system stats")
 
     def get_vram_gb(self) -> float:
         """
@@ -308,16 +439,11 @@ class ComfyClient:
             VRAM in GB (total, not free)
         """
         try:
-            stats = self.get_system_stats()
-            if stats:
-                # ComfyUI returns devices array with vram_total in bytes
-                devices = stats.get("devices", [])
-                if devices:
-                    vram_bytes = devices[0].get("vram_total", 0)
-                    if vram_bytes > 0:
-                        vram_gb = vram_bytes / (1024**3)
-                        logger.debug(f"Detected VRAM: {vram_gb:.1f}GB")
-                        return vram_gb
+            vram_bytes = device_vram_bytes(self.get_system_stats(), "vram_total")
+            if vram_bytes > 0:
+                vram_gb = vram_bytes / (1024**3)
+                logger.debug(f"Detected VRAM: {vram_gb:.1f}GB")
+                return vram_gb
         except Exception as e:
             logger.debug(f"VRAM detection failed: {e}")
 
@@ -333,13 +459,9 @@ class ComfyClient:
             Free VRAM in GB
         """
         try:
-            stats = self.get_system_stats()
-            if stats:
-                devices = stats.get("devices", [])
-                if devices:
-                    vram_free = devices[0].get("vram_free", 0)
-                    if vram_free > 0:
-                        return vram_free / (1024**3)
+            vram_free = device_vram_bytes(self.get_system_stats(), "vram_free")
+            if vram_free > 0:
+                return vram_free / (1024**3)
         except Exception as e:
             logger.debug(f"Free VRAM detection failed: {e}")
         return 0.0
@@ -390,8 +512,9 @@ class ComfyClient:
         )
         return True
 
+    @staticmethod
     def estimate_vram_for_image(
-        self, width: int = 1024, height: int = 1024, batch_size: int = 1
+        width: int = 1024, height: int = 1024, batch_size: int = 1
     ) -> float:
         """
         Estimate VRAM required for image generation.
@@ -424,8 +547,9 @@ class ComfyClient:
         )
         return total
 
+    @staticmethod
     def estimate_vram_for_video(
-        self, width: int = 512, height: int = 512, frames: int = 16, model: str = "animatediff"
+        width: int = 512, height: int = 512, frames: int = 16, model: str = "animatediff"
     ) -> float:
         """
         Estimate VRAM required for video generation.
@@ -499,22 +623,7 @@ class ComfyClient:
         Returns:
             Recommended preset name
         """
-        vram = self.get_vram_gb()
-
-        if vram < 6:
-            return "draft"
-        elif vram < 8:
-            return "fast"
-        elif vram < 12:
-            if intent == "portrait":
-                return "portrait"
-            elif intent == "landscape":
-                return "landscape"
-            return "quality"
-        else:  # 12GB+
-            if intent in ("cinematic", "film"):
-                return "cinematic"
-            return "hd"
+        return image_preset_for_vram(self.get_vram_gb(), intent)
 
     def recommend_video_preset(self, intent: str = "general") -> str:
         """
@@ -526,59 +635,39 @@ class ComfyClient:
         Returns:
             Recommended preset name
         """
-        vram = self.get_vram_gb()
-
-        try:
-            from .video import get_recommended_preset
-
-            return get_recommended_preset(intent=intent, vram_gb=vram)
-        except ImportError:
-            # Fallback if video module unavailable
-            # v2.5.0: Updated recommendations with new models
-            if vram < 8:
-                return "quick"  # AnimateDiff Lightning
-            elif vram < 12:
-                return "wan_1.3b"  # Wan 1.3B is efficient
-            elif vram < 16:
-                return "ltx_standard"  # LTX-Video is great at 16GB
-            elif vram < 24:
-                return "hunyuan15_720p"  # Hunyuan 1.5 at 720p
-            else:
-                return "hunyuan15_quality"  # Full quality Hunyuan 1.5
+        return video_preset_for_vram(self.get_vram_gb(), intent)
 
     # =========================================================================
     # MODELS & INFO
     # =========================================================================
 
+    def _fetch_object_info(self) -> dict | None:
+        """Fetch the full /object_info (all installed nodes)."""
+        data = self._get_json("/object_info", "getting all object info")
+        return data if isinstance(data, dict) else None
+
+    def get_capabilities(self, force: bool = False) -> CapabilitySnapshot | None:
+        """
+        Get the backend's /object_info snapshot.
+
+        The snapshot is shared with every client, validator and UI talking to
+        the same URL, refreshed after settings.comfyui.object_info_ttl and
+        persisted to the cache dir.
+
+        Args:
+            force: Refetch even if the snapshot is fresh (e.g. after installing models)
+
+        Returns:
+            The snapshot (possibly stale if ComfyUI is unreachable), or None
+        """
+        return get_capability_cache(self.base_url).get(self._fetch_object_info, force=force)
+
     def _get_object_info(self, node_type: str, input_name: str) -> list[str]:
         """Get input options for a node type."""
-        try:
-            response = self._get(f"/object_info/{node_type}")
-            if response.ok:
-                data = _safe_json_parse(response, f"getting object info for {node_type}")
-                # Safe dictionary navigation with bounds checking
-                node_data = data.get(node_type, {})
-                if not isinstance(node_data, dict):
-                    return []
-                input_data = node_data.get("input", {})
-                if not isinstance(input_data, dict):
-                    return []
-                required_data = input_data.get("required", {})
-                if not isinstance(required_data, dict):
-                    return []
-                options = required_data.get(input_name, [])
-                # Options should be a list with at least one element (the options list)
-                if isinstance(options, list) and len(options) > 0:
-                    first_element = options[0]
-                    if isinstance(first_element, list):
-                        return first_element
-                return []
-        except ComfyUIConnectionError:
-            # JSON parse error - already logged
-            pass
-        except Exception as e:
-            logger.debug(f"Failed to get object info for {node_type}: {e}")
-        return []
+        snapshot = self.get_capabilities()
+        if snapshot is None:
+            return []
+        return extract_input_options(snapshot.nodes, node_type, input_name)
 
     def get_checkpoints(self) -> list[str]:
         """Get available checkpoint models."""
@@ -606,24 +695,14 @@ class ComfyClient:
         """
         Get all installed node types (class_types) in ComfyUI.
 
-        This queries the /object_info endpoint to get all available nodes,
+        Reads the shared /object_info capability snapshot (see get_capabilities),
         which is useful for checking workflow dependencies.
 
         Returns:
             List of all installed node class_type names (e.g., ["KSampler", "CLIPTextEncode", ...])
         """
-        try:
-            response = self._get("/object_info")
-            if response.ok:
-                data = _safe_json_parse(response, "getting all object info")
-                if isinstance(data, dict):
-                    return list(data.keys())
-        except ComfyUIConnectionError:
-            # JSON parse error - already logged
-            pass
-        except Exception as e:
-            logger.debug(f"Failed to get all installed nodes: {e}")
-        return []
+        snapshot = self.get_capabilities()
+        return list(snapshot.nodes) if snapshot is not None else []
 
     def check_workflow_dependencies(self, workflow: dict) -> dict[str, Any]:
         """
@@ -639,67 +718,29 @@ class ComfyClient:
                 - all_installed: bool indicating if all dependencies are met
                 - details: Dict mapping class_type to list of node_ids using it
         """
-        # Extract all class_types from the workflow
-        workflow_nodes = {}
-        for node_id, node in workflow.items():
-            if isinstance(node, dict) and "class_type" in node:
-                class_type = node["class_type"]
-                if class_type not in workflow_nodes:
-                    workflow_nodes[class_type] = []
-                workflow_nodes[class_type].append(node_id)
-
-        # Get all installed nodes
-        installed_nodes = set(self.get_all_installed_nodes())
-
-        # Check which are installed/missing
-        installed = []
-        missing = []
-
-        for class_type in workflow_nodes:
-            if class_type in installed_nodes:
-                installed.append(class_type)
-            else:
-                missing.append(class_type)
-
-        return {
-            "installed": sorted(installed),
-            "missing": sorted(missing),
-            "all_installed": len(missing) == 0,
-            "details": workflow_nodes,
-            "total_nodes": sum(len(ids) for ids in workflow_nodes.values()),
-            "unique_types": len(workflow_nodes),
-        }
+        snapshot = self.get_capabilities()
+        return dependency_report(workflow, snapshot.node_types if snapshot else frozenset())
 
     # =========================================================================
     # QUEUE MANAGEMENT
     # =========================================================================
 
     def get_queue(self) -> dict:
-        """Get current queue status."""
-        try:
-            response = self._get("/queue")
-            if response.ok:
-                return _safe_json_parse(response, "getting queue status")
-        except ComfyUIConnectionError:
-            # JSON parse error - already logged
-            pass
-        except Exception as e:
-            logger.debug(f"Failed to get queue: {e}")
-        return {"queue_running": [], "queue_pending": []}
+        """Get current queue status (empty if /queue couldn't be read)."""
+        return self.fetch_queue() or {"queue_running": [], "queue_pending": []}
+
+    def fetch_queue(self) -> dict | None:
+        """
+        Current /queue, or None if it couldn't be read.
+
+        Unlike get_queue(), a failed read can be told from an empty queue.
+        """
+        return self._get_json("/queue", "getting queue status")
 
     def get_history(self, prompt_id: str | None = None) -> dict:
         """Get execution history, optionally for a specific prompt."""
-        try:
-            endpoint = f"/history/{prompt_id}" if prompt_id else "/history"
-            response = self._get(endpoint)
-            if response.ok:
-                return _safe_json_parse(response, "getting history")
-        except ComfyUIConnectionError:
-            # JSON parse error - already logged
-            pass
-        except Exception as e:
-            logger.debug(f"Failed to get history: {e}")
-        return {}
+        endpoint = f"/history/{prompt_id}" if prompt_id else "/history"
+        return self._get_json(endpoint, "getting history") or {}
 
     def cancel_current(self) -> bool:
         """Cancel the currently running job."""
@@ -723,21 +764,110 @@ class ComfyClient:
             logger.warning(f"Failed to clear queue: {e}")
         return False
 
+    def cancel(self, prompt_id: str) -> bool:
+        """
+        Cancel one prompt without touching other jobs.
+
+        A pending prompt is deleted from the queue; the running prompt is
+        interrupted only if it is this one.
+
+        Returns:
+            True if the prompt was removed or interrupted
+        """
+        return prompt_id in self.cancel_prompts([prompt_id])
+
+    def cancel_prompts(self, prompt_ids: Iterable[str]) -> list[str]:
+        """
+        Cancel several prompts with one bulk /queue delete.
+
+        Prompts that already finished (or that ComfyUI doesn't know) are
+        skipped. A prompt that starts running while the delete is in flight
+        is interrupted.
+
+        Args:
+            prompt_ids: Prompts to cancel
+
+        Returns:
+            Prompt IDs removed from the pending queue or interrupted, in input order
+        """
+        wanted = list(dict.fromkeys(prompt_ids))
+        queue = self.fetch_queue() if wanted else None
+        if queue is None:
+            return []
+        pending = queue_prompt_ids(queue.get("queue_pending", [])).intersection(wanted)
+        running = queue_prompt_ids(queue.get("queue_running", [])).intersection(wanted)
+
+        cancelled: set[str] = set()
+        if pending:
+            try:
+                response = self._post("/queue", json={"delete": sorted(pending)})
+                if response.ok:
+                    cancelled |= pending
+            except Exception as e:
+                logger.warning(f"Failed to delete prompts: {e}")
+            # A prompt may have left the pending queue before the delete landed
+            recheck = self.fetch_queue() or {}
+            started = queue_prompt_ids(recheck.get("queue_running", [])) & pending
+            running |= started
+            cancelled -= started
+
+        for prompt_id in running:
+            if self._interrupt(prompt_id):
+                cancelled.add(prompt_id)
+
+        for prompt_id in cancelled - running:
+            self._admission.release(prompt_id)
+        if cancelled:
+            logger.info("Cancelled prompts", extra={"count": len(cancelled)})
+        return [prompt_id for prompt_id in wanted if prompt_id in cancelled]
+
+    def batch(self, prompt_ids: Iterable[str] = ()) -> PromptBatch:
+        """Start a PromptBatch of prompts queued through this client."""
+        return PromptBatch(self, prompt_ids)
+
+    def _interrupt(self, prompt_id: str) -> bool:
+        """Interrupt prompt_id if it is the one running."""
+        try:
+            response = self._post("/interrupt", json={"prompt_id": prompt_id})
+            return response.ok
+        except Exception as e:
+            logger.warning(f"Failed to interrupt prompt: {e}")
+        return False
+
     # =========================================================================
     # PROMPT EXECUTION
     # =========================================================================
 
-    def queue_prompt(self, workflow: dict) -> str | None:
+    def queue_prompt(
+        self,
+        workflow: dict,
+        front: bool = False,
+        prompt_id: str | None = None,
+        block: bool = True,
+        extra_data: dict[str, Any] | None = None,
+    ) -> str | None:
         """
         Queue a workflow for execution.
 
+        With admission control enabled (settings.comfyui.max_queued_prompts
+        above 0; off by default), waits while the backend already has that
+        many prompts queued or running (see the admission module).
+
         Args:
             workflow: ComfyUI workflow dict
+            front: Put the prompt at the front of ComfyUI's pending queue
+            prompt_id: ID to queue the prompt under (honoured by newer
+                ComfyUI versions; older ones assign their own)
+            block: Wait for room on a full backend (up to
+                settings.comfyui.admission_timeout); False rejects at once
+            extra_data: Sent as the prompt's extra_data; ComfyUI returns it
+                with the prompt in /queue and /history
 
         Returns:
             prompt_id if successful, None otherwise
 
         Raises:
+            BackendOverloadedError: If the backend stays full
             QueueError: If queueing fails
         """
         # Input validation
@@ -745,12 +875,37 @@ class ComfyClient:
             logger.error("Invalid workflow: must be a dictionary")
             return None
 
+        payload = {"prompt": workflow, "client_id": self.client_id}
+        if front:
+            payload["front"] = True
+        if prompt_id:
+            payload["prompt_id"] = prompt_id
+        if extra_data:
+            payload["extra_data"] = extra_data
+
+        self._admission.acquire(self.fetch_queue, timeout=None if block else 0)
+        queued = None
         try:
-            payload = {"prompt": workflow, "client_id": self.client_id}
-            response = self._post("/prompt", json=payload, timeout=settings.comfyui.timeout_queue)
+            queued = self._post_prompt(payload)
+            return queued
+        finally:
+            if queued:
+                self._admission.admitted(queued)
+            else:
+                self._admission.cancel_reservation()
+
+    def _post_prompt(self, payload: dict) -> str | None:
+        """POST a /prompt payload and return the prompt_id."""
+        try:
+            response = self._post(
+                "/prompt",
+                data=dumps(payload),
+                headers=JSON_HEADERS,
+                timeout=settings.comfyui.timeout_queue,
+            )
 
             if response.ok:
-                data = _safe_json_parse(response, "queueing prompt")
+                data = safe_json_parse(response, "queueing prompt")
                 prompt_id = data.get("prompt_id")
                 if not isinstance(prompt_id, str):
                     logger.warning("Queue response missing prompt_id")
@@ -780,10 +935,15 @@ class ComfyClient:
         """
         Wait for a prompt to complete.
 
+        Listens for ComfyUI's WebSocket events when available, so completion
+        is seen immediately and progress reflects sampler steps. Falls back to
+        /history polling (backing off from poll_interval while nothing
+        changes) when the socket is unavailable or drops mid-wait.
+
         Args:
             prompt_id: The prompt ID to wait for
             timeout: Maximum wait time in seconds
-            poll_interval: Time between status checks
+            poll_interval: Initial time between status checks when polling
             on_progress: Optional callback called with (progress: 0.0-1.0, status: str)
 
         Returns:
@@ -791,108 +951,220 @@ class ComfyClient:
         """
         timeout = timeout or settings.generation.generation_timeout
         start = time.time()
+        tracker = _ProgressTracker(on_progress)
 
         logger.debug("Waiting for completion", extra={"prompt_id": prompt_id[:8]})
 
-        last_progress = 0.0
+        entry, finished = None, False
+        try:
+            ws = self._ensure_websocket()
+            if ws is not None:
+                entry, finished = self._wait_via_websocket(ws, prompt_id, start, timeout, tracker)
+            if not finished:
+                entry = self._poll_for_completion(prompt_id, start, timeout, poll_interval, tracker)
+        finally:
+            if entry is not None:
+                self._admission.release(prompt_id)
+            else:
+                # Timed out or failed: keep the slot only while ComfyUI still has the prompt
+                self._admission.settle(prompt_id, self.fetch_queue)
+        return entry
 
-        while time.time() - start < timeout:
+    def _ensure_websocket(self) -> WSSession | None:
+        """Get the connected shared WebSocket session, acquiring it if needed."""
+        if not self._use_websocket:
+            return None
+
+        with self._ws_lock:
+            session = self._ws_session
+            if session is not None and (session.connected or session.reconnecting):
+                return session
+            if time.monotonic() < self._ws_retry_at:
+                return None
+
+            manager = get_ws_session_manager()
+            stale, self._ws_session = self._ws_session, None
+
+            async def acquire() -> WSSession:
+                if stale is not None:
+                    await manager.release(stale)
+                return await manager.acquire(self.base_url, self.client_id)
+
+            future = asyncio.run_coroutine_threadsafe(acquire(), get_background_loop())
             try:
-                elapsed = time.time() - start
-                history = self.get_history(prompt_id)
+                self._ws_session = future.result(timeout=settings.comfyui.timeout_connect)
+            except Exception as e:
+                future.cancel()
+                self._ws_retry_at = time.monotonic() + WS_RETRY_COOLDOWN
+                logger.debug(f"WebSocket unavailable, polling instead: {e}")
+                return None
 
-                if prompt_id in history:
-                    entry = history[prompt_id]
-                    status = entry.get("status", {})
+            return self._ws_session
 
-                    if status.get("completed", False):
-                        if on_progress:
-                            on_progress(1.0, "Completed")
+    def _wait_via_websocket(
+        self,
+        ws_session: WSSession,
+        prompt_id: str,
+        start: float,
+        timeout: float,
+        tracker: "_ProgressTracker",
+    ) -> tuple[dict | None, bool]:
+        """
+        Wait for terminal WebSocket events for a prompt.
+
+        Returns:
+            (history entry or None, finished). finished is False when the
+            caller should continue by polling.
+        """
+        loop = get_background_loop()
+        grace = settings.comfyui.timeout_connect
+
+        lock = threading.Lock()
+        state: dict[str, Any] = {"abandoned": False, "watch": None}
+
+        async def subscribe():
+            watch = ws_session.watch(prompt_id)
+            with lock:
+                if state["abandoned"]:
+                    # The caller already gave up waiting and fell back to polling
+                    watch.close()
+                else:
+                    state["watch"] = watch
+            return watch
+
+        subscribing = asyncio.run_coroutine_threadsafe(subscribe(), loop)
+        try:
+            watch = subscribing.result(timeout=grace)
+        except concurrent.futures.TimeoutError:
+            # Background loop too busy; close the watch if it was registered
+            # meanwhile, otherwise subscribe() closes it once it runs
+            subscribing.cancel()
+            with lock:
+                state["abandoned"] = True
+                if state["watch"] is not None:
+                    loop.call_soon_threadsafe(state["watch"].close)
+            logger.info(
+                "WebSocket subscribe timed out, polling for completion",
+                extra={"prompt_id": prompt_id[:8]},
+            )
+            return None, False
+        try:
+            # The prompt may have finished before the watch was registered
+            entry = self._terminal_entry(prompt_id, self.get_history(prompt_id), start, tracker)
+            if entry is not None:
+                return entry, True
+
+            while (remaining := timeout - (time.time() - start)) > 0:
+                wait = min(remaining, WS_LIVENESS_INTERVAL)
+                future = asyncio.run_coroutine_threadsafe(watch.get(wait), loop)
+                try:
+                    event = future.result(timeout=wait + grace)
+                except concurrent.futures.TimeoutError:
+                    future.cancel()
+                    logger.info(
+                        "WebSocket events stalled, polling for completion",
+                        extra={"prompt_id": prompt_id[:8]},
+                    )
+                    return None, False
+                if event is None or event.status == "disconnected":
+                    if not (ws_session.connected or ws_session.reconnecting):
                         logger.info(
-                            "Generation completed",
-                            extra={"prompt_id": prompt_id[:8], "elapsed": f"{elapsed:.1f}s"},
+                            "WebSocket lost, polling for completion",
+                            extra={"prompt_id": prompt_id[:8]},
                         )
-                        return entry
+                        return None, False
+                    continue
 
-                    if status.get("status_str") == "error":
-                        if on_progress:
-                            on_progress(last_progress, "Error")
-                        logger.warning(
-                            "Generation failed",
-                            extra={"prompt_id": prompt_id[:8], "status": status},
-                        )
-                        return entry
+                if event.status in TERMINAL_STATUSES:
+                    history = self.get_history(prompt_id)
+                    entry = self._terminal_entry(prompt_id, history, start, tracker)
+                    # History may lag the event slightly - polling picks it up
+                    return entry, entry is not None
 
-                    # Calculate progress from execution info
-                    if on_progress:
-                        # Try to get node progress from status messages
-                        messages = status.get("messages", [])
-                        for msg in messages:
-                            if isinstance(msg, list) and len(msg) >= 2:
-                                if msg[0] == "execution_cached":
-                                    # Some nodes were cached
-                                    pass
-                                elif msg[0] == "executing":
-                                    msg[1] if len(msg) > 1 else None
-
-                        # Estimate progress based on elapsed time
-                        time_progress = min(0.95, elapsed / timeout)
-
-                        # If we have execution info, use it
-                        status_str = status.get("status_str", "processing")
-                        if status_str == "queued":
-                            progress = 0.05
-                            status_msg = "Queued"
-                        else:
-                            progress = max(0.1, time_progress)
-                            status_msg = f"Processing ({elapsed:.0f}s)"
+                update = ws_event_progress(event)
+                if update is not None:
+                    tracker.update(*update)
+        finally:
+            loop.call_soon_threadsafe(watch.close)
 
-                        if progress > last_progress:
-                            last_progress = progress
-                            on_progress(progress, status_msg)
-                else:
-                    # Not in history yet - still in queue
-                    if on_progress:
-                        queue = self.get_queue()
-                        pending = queue.get("queue_pending", [])
-                        running = queue.get("queue_running", [])
-
-                        # Find position in queue
-                        queue_pos = None
-                        for i, item in enumerate(pending):
-                            if isinstance(item, list) and len(item) > 1 and item[1] == prompt_id:
-                                queue_pos = i + 1
-                                break
+        logger.warning(
+            "Generation timed out", extra={"prompt_id": prompt_id[:8], "timeout": timeout}
+        )
+        return None, True
 
-                        is_running = any(
-                            isinstance(item, list) and len(item) > 1 and item[1] == prompt_id
-                            for item in running
-                        )
+    def _poll_for_completion(
+        self,
+        prompt_id: str,
+        start: float,
+        timeout: float,
+        poll_interval: float,
+        tracker: "_ProgressTracker",
+    ) -> dict | None:
+        """Poll /history until the prompt finishes, backing off while nothing changes."""
+        interval = poll_interval
+        max_interval = max(poll_interval, MAX_POLL_INTERVAL)
+        last_phase = None
 
-                        if is_running:
-                            progress = 0.1
-                            status_msg = "Starting"
-                        elif queue_pos is not None:
-                            progress = 0.02
-                            status_msg = f"Queue position {queue_pos}"
-                        else:
-                            progress = 0.05
-                            status_msg = "Waiting"
+        while time.time() - start < timeout:
+            phase = None
+            try:
+                elapsed = time.time() - start
+                history = self.get_history(prompt_id)
+
+                entry = self._terminal_entry(prompt_id, history, start, tracker)
+                if entry is not None:
+                    return entry
 
-                        if progress > last_progress:
-                            last_progress = progress
-                            on_progress(progress, status_msg)
+                if prompt_id in history:
+                    phase = "running"
+                    if tracker.active:
+                        status = history[prompt_id].get("status", {})
+                        tracker.update(*history_progress(status, elapsed, timeout))
+                elif tracker.active:
+                    # Not in history yet - still in queue
+                    progress, phase = queue_progress(self.get_queue(), prompt_id)
+                    tracker.update(progress, phase)
 
             except Exception as e:
                 logger.debug(f"Poll error: {e}")
 
-            time.sleep(poll_interval)
+            time.sleep(interval)
+            # Poll quickly around state changes, back off while nothing moves
+            interval = poll_interval if phase != last_phase else min(interval * 1.5, max_interval)
+            last_phase = phase
 
         logger.warning(
             "Generation timed out", extra={"prompt_id": prompt_id[:8], "timeout": timeout}
         )
         return None
 
+    @staticmethod
+    def _terminal_entry(
+        prompt_id: str, history: dict, start: float, tracker: "_ProgressTracker"
+    ) -> dict | None:
+        """Return the history entry if the prompt completed or failed."""
+        entry = history.get(prompt_id) if isinstance(history, dict) else None
+        if not isinstance(entry, dict):
+            return None
+
+        status = entry.get("status", {})
+        if status.get("completed", False):
+            tracker.complete()
+            logger.info(
+                "Generation completed",
+                extra={"prompt_id": prompt_id[:8], "elapsed": f"{time.time() - start:.1f}s"},
+            )
+            return entry
+
+        if status.get("status_str") == "error":
+            tracker.error()
+            logger.warning(
+                "Generation failed", extra={"prompt_id": prompt_id[:8], "status": status}
+            )
+            return entry
+
+        return None
+
     # =========================================================================
     # FILE DOWNLOADS
     # =========================================================================
@@ -911,8 +1183,8 @@ class ComfyClient:
         Returns:
             Image bytes or None if download fails
         """
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
         try:
-            params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
             response = self._get("/view", params=params, timeout=settings.comfyui.timeout_image)
             if response.ok:
                 logger.debug(f"Downloaded image: {filename}")
@@ -925,8 +1197,8 @@ class ComfyClient:
         self, filename: str, subfolder: str = "", folder_type: str = "output"
     ) -> bytes | None:
         """Download a generated video."""
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
         try:
-            params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
             response = self._get("/view", params=params, timeout=settings.comfyui.timeout_video)
             if response.ok:
                 logger.debug(f"Downloaded video: {filename}")
@@ -935,6 +1207,304 @@ class ComfyClient:
             logger.warning(f"Failed to download video {filename}: {e}")
         return None
 
+    def download_output(
+        self,
+        filename: str,
+        dest: str | os.PathLike | BinaryIO,
+        subfolder: str = "",
+        folder_type: str = "output",
+        on_progress: DownloadProgressCallback | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_resumes: int = 3,
+        timeout: float | None = None,
+    ) -> int | None:
+        """
+        Stream an output file to disk with bounded memory.
+
+        Path destinations are written to "<dest>.part" and renamed when
+        complete; a leftover partial file from an earlier call is replaced.
+        Dropped connections are resumed with an HTTP Range request, starting
+        over if the file on the server changed meanwhile.
+
+        Args:
+            filename: Output filename
+            dest: File path or writable binary file object
+            subfolder: Subfolder within output directory
+            folder_type: Folder type (usually "output")
+            on_progress: Optional callback called with (bytes_done, total_bytes or None)
+            chunk_size: Bytes read per chunk
+            max_resumes: Reconnect attempts after a dropped connection
+            timeout: Per-request timeout (default: video timeout)
+
+        Returns:
+            Total bytes written, or None if the download failed
+        """
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+        timeout = timeout or settings.comfyui.timeout_video
+        resumes = 0
+        target = None
+
+        try:
+            target = DownloadTarget(dest)
+            while True:
+                offset = target.written
+                try:
+                    response = self._get(
+                        "/view",
+                        params=params,
+                        headers=target.request_headers(),
+                        stream=True,
+                        timeout=timeout,
+                    )
+                    with contextlib.closing(response):
+                        if response.status_code == 416 and offset:
+                            if target.complete_on_416(response.headers):
+                                break
+                            continue
+                        if not response.ok:
+                            logger.warning(
+                                f"Download failed with status {response.status_code}: {filename}"
+                            )
+                            return None
+                        if not target.start_response(response.status_code, response.headers):
+                            # The file changed since the download started
+                            continue
+                        for chunk in response.iter_content(chunk_size):
+                            target.write(chunk)
+                            if on_progress:
+                                on_progress(target.written, target.total)
+                    break
+                except (
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError,
+                    ComfyUIConnectionError,
+                ) as e:
+                    resumes += 1
+                    if resumes > max_resumes:
+                        raise
+                    logger.info(
+                        f"Download interrupted, resuming: {filename}",
+                        extra={"bytes": target.written, "attempt": resumes, "error": str(e)},
+                    )
+
+            target.finish()
+            logger.debug(f"Downloaded {filename}", extra={"bytes": target.written})
+            return target.written
+
+        except Exception as e:
+            logger.warning(f"Failed to download {filename}: {e}")
+            return None
+        finally:
+            if target is not None:
+                target.close()
+
+    def download_outputs(
+        self,
+        files: list[dict[str, Any]] | dict,
+        dest_dir: str | os.PathLike | None = None,
+        max_workers: int | None = None,
+    ) -> list[bytes | Path | None]:
+        """
+        Download several outputs concurrently, returned in output order.
+
+        Runs on a thread pool; in-flight downloads per backend are capped by
+        settings.http.max_downloads_per_host across all callers.
+
+        Args:
+            files: File refs such as result["images"], or a history entry
+            dest_dir: Stream files into this directory and return paths;
+                otherwise return bytes
+            max_workers: Threads for this call (default: per-backend cap)
+
+        Returns:
+            List aligned with files: bytes or Path, None where a download failed
+        """
+        if isinstance(files, dict):
+            files = output_files(files)
+        if not files:
+            return []
+
+        slot = download_slot(self.base_url)
+
+        def fetch(ref: dict[str, Any]) -> bytes | Path | None:
+            with slot:
+                return self._fetch_output(ref, dest_dir)
+
+        workers = min(len(files), max_workers or settings.http.max_downloads_per_host)
+        if workers <= 1:
+            return [fetch(ref) for ref in files]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="comfy-download") as pool:
+            return list(pool.map(fetch, files))
+
+    def _fetch_output(
+        self, ref: dict[str, Any], dest_dir: str | os.PathLike | None
+    ) -> bytes | Path | None:
+        """Download one file ref to dest_dir (returns Path) or memory (returns bytes)."""
+        filename = ref.get("filename")
+        if not filename:
+            return None
+        subfolder = ref.get("subfolder", "")
+        folder_type = ref.get("type", "output")
+
+        cached = self._result_cache.path_for(ref) if self._result_cache is not None else None
+        if cached is not None:
+            try:
+                if dest_dir is None:
+                    return cached.read_bytes()
+                path = output_path(dest_dir, filename)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(cached, path)
+                return path
+            except OSError as e:
+                # Evicted meanwhile - fetch from ComfyUI instead
+                logger.debug(f"Cached output unavailable: {e}")
+
+        if dest_dir is not None:
+            path = output_path(dest_dir, filename)
+            written = self.download_output(filename, path, subfolder, folder_type)
+            return path if written is not None else None
+
+        buffer = io.BytesIO()
+        written = self.download_output(filename, buffer, subfolder, folder_type)
+        return buffer.getvalue() if written is not None else None
+
+    # =========================================================================
+    # FILE UPLOADS
+    # =========================================================================
+
+    def upload_image(
+        self,
+        image: UploadSource,
+        subfolder: str = "",
+        folder_type: str = "input",
+        timeout: float | None = None,
+    ) -> str | None:
+        """
+        Upload an input image for LoadImage nodes (img2img, inpaint, img2vid).
+
+        The file is streamed under a content-addressed name; content this
+        backend already has (uploaded earlier in this process, or present in
+        its input folder) is not sent again.
+
+        Args:
+            image: Image bytes, path, binary file object or base64 string
+            subfolder: Subfolder within the input directory
+            folder_type: Folder type ("input" or "temp")
+            timeout: Request timeout (default: image timeout)
+
+        Returns:
+            Name to put in a LoadImage "image" input, or None if the upload failed
+        """
+        try:
+            upload = prepare_upload(image)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read image for upload: {e}")
+            return None
+        return self._upload("/upload/image", upload, subfolder, folder_type, {}, timeout)
+
+    def upload_mask(
+        self,
+        mask: UploadSource,
+        original: str,
+        subfolder: str = "",
+        folder_type: str = "input",
+        timeout: float | None = None,
+    ) -> str | None:
+        """
+        Upload an inpainting mask for an already uploaded image.
+
+        ComfyUI stores a copy of the original with the mask's alpha channel
+        as its alpha, which LoadImage then returns as MASK.
+
+        Args:
+            mask: Mask image (bytes, path, binary file object or base64 string)
+            original: Name returned by upload_image for the image to mask
+            subfolder: Subfolder within the input directory
+            folder_type: Folder type ("input" or "temp")
+            timeout: Request timeout (default: image timeout)
+
+        Returns:
+            Name of the masked image for LoadImage, or None if the upload failed
+        """
+        try:
+            upload = prepare_upload(mask).keyed(original, suffix=".png")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read mask for upload: {e}")
+            return None
+        fields = {"original_ref": json.dumps(input_ref(original, folder_type))}
+        return self._upload("/upload/mask", upload, subfolder, folder_type, fields, timeout)
+
+    def _upload(
+        self,
+        endpoint: str,
+        upload: PreparedUpload,
+        subfolder: str,
+        folder_type: str,
+        fields: dict[str, str],
+        timeout: float | None,
+    ) -> str | None:
+        """Upload once per backend and content, returning the input name."""
+        cache = get_upload_cache(self.base_url)
+        key = (endpoint, upload.digest, subfolder, folder_type)
+        if (name := cache.get(key)) is not None:
+            return name
+
+        def run() -> str | None:
+            if (name := cache.get(key)) is not None:
+                return name
+            ref = {"filename": upload.name, "subfolder": subfolder, "type": folder_type}
+            if self._input_exists(ref):
+                name = input_name(ref)
+            else:
+                body = MultipartBody(
+                    {**fields, "subfolder": subfolder, "type": folder_type, "overwrite": "true"},
+                    "image",
+                    upload,
+                )
+                response = self._post(
+                    endpoint,
+                    data=body,
+                    headers=body.headers,
+                    timeout=timeout or settings.comfyui.timeout_image,
+                )
+                if not response.ok:
+                    logger.warning(
+                        f"Upload failed with status {response.status_code}: {upload.name}"
+                    )
+                    return None
+                name = input_name(safe_json_parse(response, "uploading image"))
+                logger.debug(f"Uploaded {name}", extra={"bytes": upload.size})
+            cache.add(key, name)
+            return name
+
+        try:
+            return cache.run(key, run)
+        except Exception as e:
+            logger.warning(f"Failed to upload {upload.name}: {e}")
+            return None
+
+    def _input_exists(self, ref: dict[str, str]) -> bool:
+        """Check whether the backend already has an input file."""
+        try:
+            response = self._request(
+                "HEAD", "/view", params=ref, timeout=settings.comfyui.timeout_connect
+            )
+            return response.status_code == 200
+        except ComfyUIConnectionError:
+            return False
+
+    def _input_image(self, image: UploadSource | None) -> str | None:
+        """Input name of an init image, uploading it unless it already is one."""
+        if image is None:
+            return None
+        if is_input_name(image, get_upload_cache(self.base_url)):
+            return image
+        check_input_path(image)
+        name = self.upload_image(image)
+        if name is None:
+            raise ValueError("Failed to upload init image")
+        return name
+
     # =========================================================================
     # WORKFLOW BUILDERS
     # =========================================================================
@@ -954,57 +1524,23 @@ class ComfyClient:
         batch_size: int = 1,
     ) -> dict:
         """Build a basic txt2img workflow."""
-        if seed == -1:
-            seed = int(time.time() * 1000) % (2**32)
-
         if not checkpoint:
             checkpoints = self.get_checkpoints()
             checkpoint = checkpoints[0] if checkpoints else "model.safetensors"
 
-        return {
-            "3": {
-                "class_type": "KSampler",
-                "inputs": {
-                    "cfg": cfg,
-                    "denoise": 1.0,
-                    "latent_image": ["5", 0],
-                    "model": ["4", 0],
-                    "negative": ["7", 0],
-                    "positive": ["6", 0],
-                    "sampler_name": sampler,
-                    "scheduler": scheduler,
-                    "seed": seed,
-                    "steps": steps,
-                },
-            },
-            "4": {
-                "class_type": "CheckpointLoaderSimple",
-                "inputs": {"ckpt_name": checkpoint},
-            },
-            "5": {
-                "class_type": "EmptyLatentImage",
-                "inputs": {"batch_size": batch_size, "height": height, "width": width},
-            },
-            "6": {
-                "class_type": "CLIPTextEncode",
-                "inputs": {"clip": ["4", 1], "text": prompt},
-            },
-            "7": {
-                "class_type": "CLIPTextEncode",
-                "inputs": {
-                    "clip": ["4", 1],
-                    "text": negative_prompt or "bad quality, blurry, distorted",
-                },
-            },
-            "8": {
-                "class_type": "VAEDecode",
-                "inputs": {"samples": ["3", 0], "vae": ["4", 2]},
-            },
-            "9": {
-                "class_type": "SaveImage",
-                "inputs": {"filename_prefix": "comfy_headless", "images": ["8", 0]},
-            },
-        }
+        return txt2img_workflow(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            checkpoint=checkpoint,
+            width=width,
+            height=height,
+            steps=steps,
+            cfg=cfg,
+            sampler=sampler,
+            scheduler=scheduler,
+            seed=seed,
+            batch_size=batch_size,
+        )
 
     def build_video_workflow(
         self,
@@ -1022,9 +1558,6 @@ class ComfyClient:
         motion_scale: float = 1.0,
     ) -> dict:
         """Build an AnimateDiff video workflow."""
-        if seed == -1:
-            seed = int(time.time() * 1000) % (2**32)
-
         if not checkpoint:
             checkpoints = self.get_checkpoints()
             checkpoint = checkpoints[0] if checkpoints else "dreamshaper_8.safetensors"
@@ -1033,74 +1566,162 @@ class ComfyClient:
             motion_models = self.get_motion_models()
             motion_model = motion_models[0] if motion_models else "v3_sd15_mm.ckpt"
 
-        return {
-            "1": {
-                "class_type": "CheckpointLoaderSimple",
-                "inputs": {"ckpt_name": checkpoint},
-            },
-            "2": {
-                "class_type": "ADE_LoadAnimateDiffModel",
-                "inputs": {"model_name": motion_model},
-            },
-            "3": {
-                "class_type": "ADE_ApplyAnimateDiffModel",
-                "inputs": {
-                    "model": ["1", 0],
-                    "motion_model": ["2", 0],
-                    "scale_multival": motion_scale,
-                },
-            },
-            "4": {
-                "class_type": "ADE_EmptyLatentImageLarge",
-                "inputs": {"width": width, "height": height, "batch_size": frames},
-            },
-            "5": {
-                "class_type": "CLIPTextEncode",
-                "inputs": {"text": prompt, "clip": ["1", 1]},
-            },
-            "6": {
-                "class_type": "CLIPTextEncode",
-                "inputs": {
-                    "text": negative_prompt or "bad quality, blurry, distorted",
-                    "clip": ["1", 1],
-                },
-            },
-            "7": {
-                "class_type": "KSampler",
-                "inputs": {
-                    "model": ["3", 0],
-                    "positive": ["5", 0],
-                    "negative": ["6", 0],
-                    "latent_image": ["4", 0],
-                    "seed": seed,
-                    "steps": steps,
-                    "cfg": cfg,
-                    "sampler_name": "euler",
-                    "scheduler": "normal",
-                    "denoise": 1.0,
-                },
-            },
-            "8": {
-                "class_type": "VAEDecode",
-                "inputs": {"samples": ["7", 0], "vae": ["1", 2]},
-            },
-            "9": {
-                "class_type": "VHS_VideoCombine",
-                "inputs": {
-                    "images": ["8", 0],
-                    "frame_rate": fps,
-                    "loop_count": 0,
-                    "filename_prefix": "comfy_headless_video",
-                    "format": "video/h264-mp4",
-                    "save_output": True,
-                },
-            },
-        }
+        return animatediff_workflow(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            checkpoint=checkpoint,
+            motion_model=motion_model,
+            width=width,
+            height=height,
+            frames=frames,
+            fps=fps,
+            steps=steps,
+            cfg=cfg,
+            seed=seed,
+            motion_scale=motion_scale,
+        )
 
     # =========================================================================
     # HIGH-LEVEL GENERATION
     # =========================================================================
 
+    def _build_image_workflow(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        preset: str = "",
+        checkpoint: str = "",
+        width: int = 1024,
+        height: int = 1024,
+        steps: int = 20,
+        cfg: float = 7.0,
+        sampler: str = "euler",
+        scheduler: str = "normal",
+        seed: int = -1,
+    ) -> tuple[dict, int]:
+        """
+        Build an image workflow, preferring the WorkflowCompiler for presets.
+
+        Returns:
+            Tuple of (workflow, actual seed used)
+        """
+        # Try using WorkflowCompiler if preset is specified
+        if preset:
+            workflow = compile_preset_workflow(
+                prompt, negative_prompt, preset, checkpoint, sampler, scheduler, seed
+            )
+            if workflow is not None:
+                # Extract seed from compiled workflow (safe nested access)
+                return workflow, safe_get_nested(workflow, "3", "inputs", "seed", default=seed)
+
+        # Legacy workflow builder (when no preset or compiler failed)
+        workflow = self.build_txt2img_workflow(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            checkpoint=checkpoint,
+            width=width,
+            height=height,
+            steps=steps,
+            cfg=cfg,
+            sampler=sampler,
+            scheduler=scheduler,
+            seed=seed,
+        )
+        # Store actual seed used (safe nested access)
+        return workflow, safe_get_nested(workflow, "3", "inputs", "seed", default=seed)
+
+    def _queue_and_wait(
+        self,
+        workflow: dict,
+        result: dict[str, Any],
+        wait: bool,
+        timeout: float,
+        on_progress: Callable[[float, str], None] | None,
+    ) -> dict | None:
+        """
+        Queue a workflow and wait for it, recording prompt_id/error in result.
+
+        Returns:
+            The completed history entry, or None if there is nothing to
+            finalize (queueing failed, timed out, or wait=False)
+        """
+        if wait and self._result_cache is not None:
+            prompt_id, history, cached = self._run_cached(
+                self._result_cache, workflow, timeout, on_progress
+            )
+            result["cached"] = cached
+        else:
+            prompt_id = self.queue_prompt(workflow)
+            history = None
+
+        if not prompt_id:
+            result["error"] = "Failed to queue prompt"
+            return None
+
+        result["prompt_id"] = prompt_id
+
+        if not wait:
+            result["success"] = True
+            return None
+
+        if history is None:
+            history = self.wait_for_completion(prompt_id, timeout=timeout, on_progress=on_progress)
+        if not history:
+            result["error"] = f"Generation timed out after {timeout}s"
+            return None
+        return history
+
+    def _run_cached(
+        self,
+        cache: ResultCache,
+        workflow: dict,
+        timeout: float,
+        on_progress: Callable[[float, str], None] | None,
+    ) -> tuple[str | None, dict | None, bool]:
+        """
+        Run a workflow through the result cache.
+
+        A cached result is returned without touching ComfyUI; concurrent
+        identical workflows share one ComfyUI job (only the caller that runs
+        it gets progress callbacks).
+
+        Returns:
+            (prompt_id, history or None, whether the result came from the cache)
+        """
+        key = cache.key(workflow)
+
+        def run() -> tuple[str | None, dict | None, bool]:
+            entry = cache.get(key)
+            if entry is not None:
+                return entry.prompt_id, cache.tagged_history(entry), True
+
+            prompt_id = self.queue_prompt(workflow)
+            if not prompt_id:
+                return None, None, False
+            history = self.wait_for_completion(prompt_id, timeout=timeout, on_progress=on_progress)
+            if history and history.get("status", {}).get("status_str") != "error":
+                refs = output_files(history)
+                # Outputs are staged under their file names, which must not collide
+                names = {Path(ref.get("filename") or "").name for ref in refs}
+                if refs and len(names) == len(refs):
+                    staging = cache.staging_dir(key)
+                    try:
+                        paths = self.download_outputs(refs, dest_dir=staging)
+                        outputs = [
+                            (ref, path) for ref, path in zip(refs, paths) if isinstance(path, Path)
+                        ]
+                        if len(outputs) == len(refs):
+                            cache.put(key, prompt_id, history, outputs, url=self.base_url)
+                    finally:
+                        shutil.rmtree(staging, ignore_errors=True)
+            return prompt_id, history, False
+
+        prompt_id, history, cached = cache.run(key, run)
+        if cached:
+            logger.info("Using cached result", extra={"key": key, "prompt_id": prompt_id})
+            _ProgressTracker(on_progress).complete()
+        return prompt_id, history, cached
+
     def generate_image(
         self,
         prompt: str,
@@ -1165,99 +1786,29 @@ class ComfyClient:
                 result["error"] = str(e)
                 return result
 
-            # Try using WorkflowCompiler if preset is specified
-            if preset:
-                try:
-                    from .workflows import GENERATION_PRESETS, compile_workflow
-
-                    if preset in GENERATION_PRESETS:
-                        compiled = compile_workflow(
-                            prompt=prompt,
-                            negative=negative_prompt,
-                            preset=preset,
-                            checkpoint=checkpoint or "auto",
-                            sampler=sampler,
-                            scheduler=scheduler,
-                            seed=seed,
-                        )
-                        if compiled.is_valid:
-                            workflow = compiled.workflow
-                            # Extract seed from compiled workflow (safe nested access)
-                            result["seed"] = _safe_get_nested(
-                                workflow, "3", "inputs", "seed", default=seed
-                            )
-                            logger.debug(f"Using WorkflowCompiler with preset '{preset}'")
-                        else:
-                            logger.warning(f"Workflow compilation errors: {compiled.errors}")
-                            preset = ""  # Fall back to legacy
-                    else:
-                        logger.warning(f"Unknown preset '{preset}', falling back to legacy")
-                        preset = ""
-                except Exception as e:
-                    logger.warning(f"WorkflowCompiler failed: {e}, using legacy builder")
-                    preset = ""
-
-            # Legacy workflow builder (when no preset or compiler failed)
-            if not preset:
-                workflow = self.build_txt2img_workflow(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    checkpoint=checkpoint,
-                    width=width,
-                    height=height,
-                    steps=steps,
-                    cfg=cfg,
-                    sampler=sampler,
-                    scheduler=scheduler,
-                    seed=seed,
-                )
-                # Store actual seed used (safe nested access)
-                result["seed"] = _safe_get_nested(workflow, "3", "inputs", "seed", default=seed)
-
-            prompt_id = self.queue_prompt(workflow)
-            if not prompt_id:
-                result["error"] = "Failed to queue prompt"
-                return result
-
-            result["prompt_id"] = prompt_id
-
-            if not wait:
-                result["success"] = True
-                return result
-
-            history = self.wait_for_completion(prompt_id, timeout=timeout, on_progress=on_progress)
-            if not history:
-                result["error"] = f"Generation timed out after {timeout}s"
-                return result
+            workflow, result["seed"] = self._build_image_workflow(
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                preset=preset,
+                checkpoint=checkpoint,
+                width=width,
+                height=height,
+                steps=steps,
+                cfg=cfg,
+                sampler=sampler,
+                scheduler=scheduler,
+                seed=seed,
+            )
 
-            status = history.get("status", {})
-            if status.get("status_str") == "error":
-                error_msgs = status.get("messages", [["Unknown error"]])
-                result["error"] = str(error_msgs[0] if error_msgs else "Unknown error")
+            history = self._queue_and_wait(workflow, result, wait, timeout, on_progress)
+            if history is None:
                 return result
 
-            # Extract images (with type validation)
-            outputs = history.get("outputs", {})
-            if isinstance(outputs, dict):
-                for node_output in outputs.values():
-                    if isinstance(node_output, dict) and "images" in node_output:
-                        images_list = node_output["images"]
-                        if isinstance(images_list, list):
-                            for img in images_list:
-                                if isinstance(img, dict):
-                                    result["images"].append(
-                                        {
-                                            "filename": img.get("filename"),
-                                            "subfolder": img.get("subfolder", ""),
-                                            "type": img.get("type", "output"),
-                                        }
-                                    )
-
-            result["success"] = len(result["images"]) > 0
+            finalize_image_result(result, history)
 
             if result["success"]:
                 logger.info("Generation complete", extra={"image_count": len(result["images"])})
-            else:
+            elif not result["error"]:
                 logger.warning("Generation produced no images")
 
             return result
@@ -1278,10 +1829,19 @@ class ComfyClient:
         max_concurrent: int = 1,
         check_vram: bool = True,
         on_progress: Callable[[int, int, float, str], None] | None = None,
+        timeout: float | None = None,
+        download: bool = False,
+        batch: PromptBatch | None = None,
     ) -> dict[str, Any]:
         """
         Generate multiple images from a list of prompts.
 
+        With max_concurrent > 1 (or a batch handle) the batch is pipelined:
+        up to max_concurrent prompts are kept queued on ComfyUI at once,
+        completions are detected with a single /queue poll per cycle, and
+        outputs are collected as each prompt finishes. Results are always
+        returned in input order.
+
         Args:
             prompts: List of prompts to generate
             negative_prompt: Shared negative prompt
@@ -1289,9 +1849,15 @@ class ComfyClient:
             checkpoint: Model checkpoint
             width, height, steps, cfg, sampler, scheduler: Generation params
             seeds: Optional list of seeds (one per prompt, -1 for random)
-            max_concurrent: Max concurrent generations (use 1 for sequential)
+            max_concurrent: Max prompts queued on ComfyUI at once (use 1 for sequential)
             check_vram: If True, check VRAM before starting
             on_progress: Callback(current_idx, total, progress, status)
+            timeout: Per-prompt timeout, counted from when the prompt leaves
+                ComfyUI's pending queue
+            download: If True, each result also gets "image_data" (list of bytes)
+            batch: PromptBatch the prompts are queued under; cancelling it
+                (e.g. from another thread) stops the batch, and items it
+                removed fail with error "Cancelled"
 
         Returns:
             Dict with success, results (list of individual results), errors
@@ -1302,75 +1868,105 @@ class ComfyClient:
         if total == 0:
             return {"success": False, "results": [], "errors": ["No prompts provided"]}
 
+        timeout = timeout or settings.generation.generation_timeout
+
         # Prepare seeds
         if seeds is None:
             seeds = [-1] * total
         elif len(seeds) < total:
             seeds = seeds + [-1] * (total - len(seeds))
 
-        # Check VRAM if requested
+        # Check VRAM if requested. Queued prompts run one after another on
+        # ComfyUI, so only the pipelined depth of 1 is resident at a time.
         if check_vram:
-            estimated = self.estimate_vram_for_image(width, height, max_concurrent)
+            estimated = self.estimate_vram_for_image(width, height, 1)
             if not self.check_vram_available(estimated):
                 logger.warning(
                     "Batch may exceed VRAM", extra={"estimated_gb": estimated, "batch_size": total}
                 )
 
-        results = []
-        errors = []
+        results: list[dict[str, Any] | None] = [None] * total
         start_time = time_module.time()
 
-        for idx, (prompt, seed) in enumerate(zip(prompts, seeds)):
-            try:
-                # Progress callback
+        if max_concurrent > 1 or batch is not None:
+            pipeline = self.generate_batch_iter(
+                prompts,
+                negative_prompt=negative_prompt,
+                preset=preset,
+                checkpoint=checkpoint,
+                width=width,
+                height=height,
+                steps=steps,
+                cfg=cfg,
+                sampler=sampler,
+                scheduler=scheduler,
+                seeds=seeds,
+                max_concurrent=max_concurrent,
+                check_vram=False,
+                timeout=timeout,
+                download=download,
+                batch=batch,
+            )
+            for done, (idx, result) in enumerate(pipeline, start=1):
+                results[idx] = result
                 if on_progress:
-                    on_progress(idx, total, 0.0, f"Starting {idx + 1}/{total}")
+                    status = "Complete" if result["success"] else "Failed"
+                    on_progress(idx, total, done / total, f"[{idx + 1}/{total}] {status}")
+        else:
+            for idx, (prompt, seed) in enumerate(zip(prompts, seeds)):
+                try:
+                    # Progress callback
+                    if on_progress:
+                        on_progress(idx, total, 0.0, f"Starting {idx + 1}/{total}")
 
-                # Wrap individual progress - bind loop vars as defaults (B023)
-                def item_progress(prog: float, status: str, idx: int = idx, total: int = total):
+                    # Wrap individual progress - bind loop vars as defaults (B023)
+                    def item_progress(prog: float, status: str, idx: int = idx, total: int = total):
+                        if on_progress:
+                            overall = (idx + prog) / total
+                            on_progress(idx, total, overall, f"[{idx + 1}/{total}] {status}")
+
+                    result = self.generate_image(
+                        prompt=prompt,
+                        negative_prompt=negative_prompt,
+                        preset=preset,
+                        checkpoint=checkpoint,
+                        width=width,
+                        height=height,
+                        steps=steps,
+                        cfg=cfg,
+                        sampler=sampler,
+                        scheduler=scheduler,
+                        seed=seed,
+                        wait=True,
+                        timeout=timeout,
+                        on_progress=item_progress,
+                    )
+                    if download and result["success"]:
+                        result["image_data"] = self.download_outputs(result["images"])
+
+                    results[idx] = result
+
+                    # Final progress for this item
                     if on_progress:
-                        overall = (idx + prog) / total
+                        overall = (idx + 1) / total
+                        status = "Complete" if result["success"] else "Failed"
                         on_progress(idx, total, overall, f"[{idx + 1}/{total}] {status}")
 
-                result = self.generate_image(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    preset=preset,
-                    checkpoint=checkpoint,
-                    width=width,
-                    height=height,
-                    steps=steps,
-                    cfg=cfg,
-                    sampler=sampler,
-                    scheduler=scheduler,
-                    seed=seed,
-                    wait=True,
-                    on_progress=item_progress,
-                )
-
-                results.append(result)
-
-                if not result["success"]:
-                    errors.append(f"Prompt {idx}: {result.get('error', 'Unknown error')}")
-
-                # Final progress for this item
-                if on_progress:
-                    overall = (idx + 1) / total
-                    status = "Complete" if result["success"] else "Failed"
-                    on_progress(idx, total, overall, f"[{idx + 1}/{total}] {status}")
-
-            except Exception as e:
-                logger.error(f"Batch item {idx} failed: {e}")
-                errors.append(f"Prompt {idx}: {str(e)}")
-                results.append(
-                    {
+                except Exception as e:
+                    logger.error(f"Batch item {idx} failed: {e}")
+                    results[idx] = {
                         "success": False,
                         "error": str(e),
                         "images": [],
                         "prompt_id": None,
                         "seed": seed,
                     }
-                )
+
+        errors = [
+            f"Prompt {idx}: {r.get('error') or 'Unknown error'}"
+            for idx, r in enumerate(results)
+            if not r.get("success", False)
+        ]
 
         elapsed = time_module.time() - start_time
         success_count = sum(1 for r in results if r.get("success", False))
@@ -1394,6 +1990,239 @@ class ComfyClient:
             "elapsed_seconds": elapsed,
         }
 
+    def generate_batch_iter(
+        self,
+        prompts: Iterable[str],
+        negative_prompt: str = "",
+        preset: str = "fast",
+        checkpoint: str = "",
+        width: int = 1024,
+        height: int = 1024,
+        steps: int = 20,
+        cfg: float = 7.0,
+        sampler: str = "euler",
+        scheduler: str = "normal",
+        seeds: Iterable[int] | None = None,
+        max_concurrent: int = 1,
+        check_vram: bool = True,
+        timeout: float | None = None,
+        download: bool = False,
+        batch: PromptBatch | None = None,
+    ) -> Iterator[tuple[int, dict[str, Any]]]:
+        """
+        Generate images from prompts, yielding each result as soon as it completes.
+
+        Runs the same pipeline as generate_batch, but yields (index, result)
+        in completion order instead of collecting a list, so work on early
+        results overlaps with generation of the rest. prompts and seeds are
+        read lazily, only when a slot on ComfyUI frees up, so generators of
+        any length keep memory use flat.
+
+        Closing the iterator early (e.g. break) cancels the prompts it still
+        has queued or running on ComfyUI; other prompts of batch are left
+        alone.
+
+        Args:
+            prompts: Prompts to generate (any iterable)
+            seeds: Optional seeds, one per prompt (-1 for random; missing = -1)
+            max_concurrent: Max prompts queued on ComfyUI at once
+            batch: PromptBatch to queue under (one is created otherwise)
+            Other arguments: as for generate_batch
+
+        Yields:
+            Tuples of (input index, result dict)
+        """
+        timeout = timeout or settings.generation.generation_timeout
+
+        if check_vram:
+            estimated = self.estimate_vram_for_image(width, height, 1)
+            if not self.check_vram_available(estimated):
+                logger.warning("Batch may exceed VRAM", extra={"estimated_gb": estimated})
+
+        seed_values = itertools.chain(seeds or (), itertools.repeat(-1))
+        jobs = (
+            {
+                "prompt": prompt,
+                "negative_prompt": negative_prompt,
+                "preset": preset,
+                "checkpoint": checkpoint,
+                "width": width,
+                "height": height,
+                "steps": steps,
+                "cfg": cfg,
+                "sampler": sampler,
+                "scheduler": scheduler,
+                "seed": seed,
+            }
+            for prompt, seed in zip(prompts, seed_values)
+        )
+        yield from self._iter_batch_pipelined(
+            jobs,
+            max_concurrent=max(1, max_concurrent),
+            timeout=timeout,
+            download=download,
+            batch=batch if batch is not None else self.batch(),
+        )
+
+    def _iter_batch_pipelined(
+        self,
+        jobs: Iterable[dict[str, Any]],
+        max_concurrent: int,
+        timeout: float,
+        poll_interval: float = 0.5,
+        download: bool = False,
+        batch: PromptBatch | None = None,
+    ) -> Iterator[tuple[int, dict[str, Any]]]:
+        """
+        Pipelined submit/wait engine behind generate_batch and generate_batch_iter.
+
+        Keeps up to max_concurrent prompts queued on ComfyUI so the GPU never
+        idles between jobs, watches every in-flight prompt with one /queue
+        request per cycle, and only fetches /history for prompts that have left
+        the queue. Jobs are read lazily, only as slots free up. Yields
+        (index, result) in completion order.
+
+        Args:
+            jobs: Keyword arguments for _build_image_workflow, one dict per item
+            max_concurrent: Max prompts queued on ComfyUI at once
+            timeout: Per-prompt timeout, counted from when it leaves the pending queue
+            poll_interval: Delay between /queue polls when nothing finished
+            download: Attach downloaded bytes as result["image_data"]
+            batch: PromptBatch to queue under; once it is cancelled nothing
+                more is queued and the prompts it removed are reported
+
+        Yields:
+            Tuples of (job index, result dict)
+        """
+        waiting = enumerate(jobs)
+        more = True
+        # prompt_id -> (job index, result, clock start for the timeout)
+        inflight: dict[str, tuple[int, dict[str, Any], float]] = {}
+
+        try:
+            self.ensure_online()
+        except ComfyUIOfflineError as e:
+            for idx, params in waiting:
+                yield idx, self._new_batch_result(params, error=str(e))
+            return
+
+        try:
+            while more or inflight:
+                if batch is not None and batch.cancelled:
+                    for idx, params in waiting:
+                        yield idx, self._new_batch_result(params, error="Cancelled")
+
+                # Top up ComfyUI's queue before blocking on anything
+                while len(inflight) < max_concurrent:
+                    item = next(waiting, None)
+                    if item is None:
+                        more = False
+                        break
+                    idx, params = item
+                    result = self._new_batch_result(params)
+                    try:
+                        workflow, result["seed"] = self._build_image_workflow(**params)
+                        if batch is not None:
+                            prompt_id = batch.queue(workflow)
+                        else:
+                            prompt_id = self.queue_prompt(workflow)
+                    except Exception as e:
+                        logger.error(f"Batch item {idx} failed: {e}")
+                        result["error"] = str(e)
+                        yield idx, result
+                        continue
+                    if not prompt_id:
+                        cancelled = batch is not None and batch.cancelled
+                        result["error"] = "Cancelled" if cancelled else "Failed to queue prompt"
+                        yield idx, result
+                        continue
+                    result["prompt_id"] = prompt_id
+                    inflight[prompt_id] = (idx, result, time.time())
+
+                if not inflight:
+                    continue
+
+                queue = self.get_queue()
+                running = queue_prompt_ids(queue.get("queue_running", []))
+                pending = queue_prompt_ids(queue.get("queue_pending", []))
+
+                finished_any = False
+                timed_out: dict[str, tuple[int, dict[str, Any]]] = {}
+                now = time.time()
+                for prompt_id in list(inflight):
+                    idx, result, clock = inflight[prompt_id]
+
+                    if batch is not None and batch.was_cancelled(prompt_id):
+                        del inflight[prompt_id]
+                        finished_any = True
+                        result["error"] = "Cancelled"
+                        yield idx, result
+                        continue
+
+                    if prompt_id in pending:
+                        # Waiting behind our own pipeline is not generation time
+                        inflight[prompt_id] = (idx, result, now)
+                        continue
+
+                    if prompt_id not in running:
+                        entry = self.get_history(prompt_id).get(prompt_id)
+                        status = entry.get("status", {}) if isinstance(entry, dict) else {}
+                        if status.get("completed", False) or status.get("status_str") == "error":
+                            del inflight[prompt_id]
+                            self._admission.release(prompt_id)
+                            if batch is not None:
+                                batch.mark_finished(prompt_id)
+                            finished_any = True
+                            finalize_image_result(result, entry)
+                            if download and result["success"]:
+                                result["image_data"] = self.download_outputs(result["images"])
+                            yield idx, result
+                            continue
+
+                    if now - clock > timeout:
+                        del inflight[prompt_id]
+                        logger.warning(
+                            "Generation timed out",
+                            extra={"prompt_id": prompt_id[:8], "timeout": timeout},
+                        )
+                        result["error"] = f"Generation timed out after {timeout}s"
+                        timed_out[prompt_id] = (idx, result)
+
+                if timed_out:
+                    # Don't leave abandoned prompts burning GPU time or admission slots
+                    finished_any = True
+                    self.cancel_prompts(timed_out)
+                    for prompt_id, (idx, result) in timed_out.items():
+                        self._admission.release(prompt_id)
+                        if batch is not None:
+                            batch.mark_finished(prompt_id)
+                        yield idx, result
+
+                if inflight and not finished_any:
+                    time.sleep(poll_interval)
+        except GeneratorExit:
+            # Closed early: withdraw only the prompts this run still has on
+            # ComfyUI; others in the caller's batch are left alone
+            if inflight:
+                self.cancel_prompts(list(inflight))
+                for prompt_id in inflight:
+                    self._admission.release(prompt_id)
+                    if batch is not None:
+                        batch.mark_finished(prompt_id)
+            raise
+
+    @staticmethod
+    def _new_batch_result(params: dict[str, Any], error: str | None = None) -> dict[str, Any]:
+        """Create an empty per-item result for the batch engine."""
+        return {
+            "success": False,
+            "prompt_id": None,
+            "images": [],
+            "error": error,
+            "seed": params.get("seed", -1),
+            "preset": params.get("preset") or None,
+        }
+
     def generate_video(
         self,
         prompt: str,
@@ -1425,7 +2254,8 @@ class ComfyClient:
             negative_prompt: What to avoid
             preset: Video preset (quick, standard, quality, cinematic, portrait,
                    action, svd_short, svd_long, cogvideo, hunyuan, hunyuan_fast)
-            init_image: Base64 image for img2vid models (SVD)
+            init_image: Init image for img2vid models (SVD, LTXV, Wan): an input
+                name from upload_image, or a path or base64 image to upload
             wait: Whether to wait for completion
             timeout: Generation timeout
             on_progress: Optional callback(progress: 0.0-1.0, status: str) for progress updates
@@ -1455,54 +2285,29 @@ class ComfyClient:
 
             try:
                 self.ensure_online()
-            except ComfyUIOfflineError as e:
+                init_image = self._input_image(init_image)
+            except (ComfyUIOfflineError, ValueError) as e:
                 result["error"] = str(e)
                 return result
 
             # Build workflow using VideoWorkflowBuilder
             try:
-                from .video import build_video_workflow
-
-                # Build overrides dict from non-None parameters
-                overrides = {}
-                if checkpoint:
-                    overrides["checkpoint"] = checkpoint
-                if width is not None:
-                    overrides["width"] = width
-                if height is not None:
-                    overrides["height"] = height
-                if frames is not None:
-                    overrides["frames"] = frames
-                if fps is not None:
-                    overrides["fps"] = fps
-                if steps is not None:
-                    overrides["steps"] = steps
-                if cfg is not None:
-                    overrides["cfg"] = cfg
-                if seed != -1:
-                    overrides["seed"] = seed
-                if motion_scale is not None:
-                    overrides["motion_scale"] = motion_scale
-
-                workflow = build_video_workflow(
+                workflow, result["seed"] = preset_video_workflow(
                     prompt=prompt,
-                    negative=negative_prompt or "ugly, blurry, low quality, distorted",
+                    negative_prompt=negative_prompt,
                     preset=preset,
                     init_image=init_image,
-                    **overrides,
+                    checkpoint=checkpoint,
+                    width=width,
+                    height=height,
+                    frames=frames,
+                    fps=fps,
+                    steps=steps,
+                    cfg=cfg,
+                    seed=seed,
+                    motion_scale=motion_scale,
                 )
 
-                # Extract actual seed from workflow (video.py generates random if -1)
-                # Find KSampler node and extract seed (safe access)
-                if isinstance(workflow, dict):
-                    for node in workflow.values():
-                        if isinstance(node, dict) and node.get("class_type") in (
-                            "KSampler",
-                            "HunyuanVideoSampler",
-                        ):
-                            result["seed"] = _safe_get_nested(node, "inputs", "seed", default=seed)
-                            break
-
             except Exception as e:
                 logger.warning(f"VideoWorkflowBuilder failed, falling back to legacy: {e}")
                 # Fallback to legacy build_video_workflow method
@@ -1521,50 +2326,13 @@ class ComfyClient:
                     motion_scale=motion_scale or 1.0,
                 )
                 # Safe nested access for legacy workflow
-                result["seed"] = _safe_get_nested(workflow, "7", "inputs", "seed", default=seed)
-
-            prompt_id = self.queue_prompt(workflow)
-            if not prompt_id:
-                result["error"] = "Failed to queue prompt"
-                return result
-
-            result["prompt_id"] = prompt_id
-
-            if not wait:
-                result["success"] = True
-                return result
-
-            history = self.wait_for_completion(prompt_id, timeout=timeout, on_progress=on_progress)
-            if not history:
-                result["error"] = f"Generation timed out after {timeout}s"
-                return result
+                result["seed"] = safe_get_nested(workflow, "7", "inputs", "seed", default=seed)
 
-            status = history.get("status", {})
-            if status.get("status_str") == "error":
-                error_msgs = status.get("messages", [["Unknown error"]])
-                result["error"] = str(error_msgs[0] if error_msgs else "Unknown error")
+            history = self._queue_and_wait(workflow, result, wait, timeout, on_progress)
+            if history is None:
                 return result
 
-            # Extract videos (check both 'gifs' and 'videos' keys, with type validation)
-            outputs = history.get("outputs", {})
-            if isinstance(outputs, dict):
-                for node_output in outputs.values():
-                    if isinstance(node_output, dict):
-                        for key in ("gifs", "videos"):
-                            if key in node_output:
-                                video_list = node_output[key]
-                                if isinstance(video_list, list):
-                                    for vid in video_list:
-                                        if isinstance(vid, dict):
-                                            result["videos"].append(
-                                                {
-                                                    "filename": vid.get("filename"),
-                                                    "subfolder": vid.get("subfolder", ""),
-                                                    "type": vid.get("type", "output"),
-                                                }
-                                            )
-
-            result["success"] = len(result["videos"]) > 0
+            finalize_video_result(result, history)
 
             if result["success"]:
                 logger.info(
@@ -71,6 +71,28 @@ if PYDANTIC_SETTINGS_AVAILABLE:
         timeout_queue: float = 10.0
         timeout_image: float = 60.0
         timeout_video: float = 120.0
+        # Wait for completion via WebSocket events instead of polling /history
+        use_websocket: bool = True
+        # /object_info capability snapshot: refresh age and persistence to the cache dir
+        object_info_ttl: float = 300.0
+        object_info_persist: bool = True
+        # Trust the last observed reachability this long before probing again
+        liveness_ttl: float = 10.0
+        # Live previews delivered per second to each subscriber (0 = every frame)
+        preview_max_fps: float = 4.0
+        # Keep reconnecting a dropped WebSocket this long (0 = don't reconnect)
+        ws_reconnect_timeout: float = 60.0
+        # Undelivered events queued per WebSocket listener, and what to drop when
+        # a slow listener's queue is full ("coalesce" progress, or "drop_oldest")
+        listener_queue_size: int = 256
+        listener_overflow: str = "coalesce"
+        # Admission control (opt-in): prompts queued or running per backend
+        # before queue_prompt waits (0 = no limit), how long it waits for room before
+        # raising BackendOverloadedError (0 = reject at once), and how often
+        # the count is reconciled against /queue while full
+        max_queued_prompts: int = 0
+        admission_timeout: float = 300.0
+        admission_reconcile_interval: float = 1.0
 
     class OllamaConfig(BaseSettings):
         """Ollama AI configuration."""
@@ -162,6 +184,19 @@ if PYDANTIC_SETTINGS_AVAILABLE:
         max_steps: int = 100
         generation_timeout: float = 300.0
         video_timeout: float = 600.0
+        # Opt-in cache of finished generations keyed by workflow hash
+        result_cache: bool = False
+        result_cache_max_mb: int = 2048
+        # JobScheduler: prompts released to each backend at a time, and how
+        # often /queue is polled to find finished ones
+        scheduler_queue_depth: int = 2
+        scheduler_poll_interval: float = 0.5
+        # Durable job store: SQLite file ("" = <cache dir>/jobs.sqlite3),
+        # seconds a worker's claim lasts without renewal, and submit
+        # attempts before a job fails
+        job_store_path: str = ""
+        job_lease: float = 60.0
+        job_max_attempts: int = 3
 
     class HttpConfig(BaseSettings):
         """HTTP client configuration (NEW: for httpx support)."""
@@ -176,9 +211,25 @@ if PYDANTIC_SETTINGS_AVAILABLE:
         max_keepalive_connections: int = 20
         keepalive_expiry: float = 5.0
 
-        # HTTP/2 support
+        # HTTP/2 support (only used when h2 is installed: httpx[http2])
         http2: bool = True
 
+        # ComfyClient transport: "requests", "httpx" (HTTP/2 when negotiated) or
+        # "uds" (httpx over the Unix domain socket at uds_path)
+        transport: str = "requests"
+        uds_path: str = ""
+
+        # JSON codec: "auto" (orjson, then msgspec, then stdlib), or one of them
+        json_backend: str = "auto"
+
+        # Concurrent output downloads per ComfyUI backend
+        max_downloads_per_host: int = 4
+
+        # Share one request between a client's concurrent identical JSON GETs,
+        # optionally reusing it for coalesce_ttl seconds (0 = in-flight only)
+        coalesce_gets: bool = True
+        coalesce_ttl: float = 0.0
+
         # Timeouts (httpx-style)
         connect_timeout: float = 5.0
         read_timeout: float = 30.0
@@ -309,6 +360,39 @@ else:
         timeout_video: float = field(
             default_factory=lambda: _get_env_float("COMFYUI__TIMEOUT_VIDEO", 120.0)
         )
+        use_websocket: bool = field(
+            default_factory=lambda: _get_env_bool("COMFYUI__USE_WEBSOCKET", True)
+        )
+        object_info_ttl: float = field(
+            default_factory=lambda: _get_env_float("COMFYUI__OBJECT_INFO_TTL", 300.0)
+        )
+        object_info_persist: bool = field(
+            default_factory=lambda: _get_env_bool("COMFYUI__OBJECT_INFO_PERSIST", True)
+        )
+        liveness_ttl: float = field(
+            default_factory=lambda: _get_env_float("COMFYUI__LIVENESS_TTL", 10.0)
+        )
+        preview_max_fps: float = field(
+            default_factory=lambda: _get_env_float("COMFYUI__PREVIEW_MAX_FPS", 4.0)
+        )
+        ws_reconnect_timeout: float = field(
+            default_factory=lambda: _get_env_float("COMFYUI__WS_RECONNECT_TIMEOUT", 60.0)
+        )
+        listener_queue_size: int = field(
+            default_factory=lambda: _get_env_int("COMFYUI__LISTENER_QUEUE_SIZE", 256)
+        )
+        listener_overflow: str = field(
+            default_factory=lambda: _get_env("COMFYUI__LISTENER_OVERFLOW", "coalesce")
+        )
+        max_queued_prompts: int = field(
+            default_factory=lambda: _get_env_int("COMFYUI__MAX_QUEUED_PROMPTS", 0)
+        )
+        admission_timeout: float = field(
+            default_factory=lambda: _get_env_float("COMFYUI__ADMISSION_TIMEOUT", 300.0)
+        )
+        admission_reconcile_interval: float = field(
+            default_factory=lambda: _get_env_float("COMFYUI__ADMISSION_RECONCILE_INTERVAL", 1.0)
+        )
 
     @dataclass
     class OllamaConfig:
@@ -378,6 +462,13 @@ else:
         max_steps: int = 100
         generation_timeout: float = 300.0
         video_timeout: float = 600.0
+        result_cache: bool = False
+        result_cache_max_mb: int = 2048
+        scheduler_queue_depth: int = 2
+        scheduler_poll_interval: float = 0.5
+        job_store_path: str = ""
+        job_lease: float = 60.0
+        job_max_attempts: int = 3
 
     @dataclass
     class HttpConfig:
@@ -385,6 +476,12 @@ else:
         max_keepalive_connections: int = 20
         keepalive_expiry: float = 5.0
         http2: bool = True
+        transport: str = "requests"
+        uds_path: str = ""
+        json_backend: str = "auto"
+        max_downloads_per_host: int = 4
+        coalesce_gets: bool = True
+        coalesce_ttl: float = 0.0
         connect_timeout: float = 5.0
         read_timeout: float = 30.0
         write_timeout: float = 30.0
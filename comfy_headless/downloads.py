@@ -0,0 +1,266 @@
+"""
+Comfy Headless - Streaming Downloads
+=====================================
+
+Helpers for streaming ComfyUI outputs (/view) to disk with bounded memory.
+
+- Chunked writes to a path or a binary file object
+- Path downloads go to "<name>.part" and are renamed when complete; a
+  connection dropped mid-call resumes via HTTP Range (with If-Range and a
+  check of the file size), a failed download removes its ".part" and one
+  left by an earlier call is discarded
+- Progress reported as (bytes_done, total_bytes or None)
+
+Also provides per-backend limits on concurrent downloads, shared by the
+thread pool in ComfyClient.download_outputs and the tasks in
+AsyncComfyClient.download_outputs.
+
+Used by ComfyClient.download_output and AsyncComfyClient.download_output.
+"""
+
+import asyncio
+import os
+import re
+import threading
+import weakref
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from .config import settings
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "DownloadProgressCallback",
+    "DownloadTarget",
+    "content_total",
+    "output_files",
+    "output_path",
+    "download_slot",
+    "async_download_slot",
+]
+
+# 1 MiB: large enough for throughput, small enough to keep memory flat
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Called with (bytes_done, total_bytes or None)
+DownloadProgressCallback = Callable[[int, int | None], None]
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+# Content-Range of a 416 reply: the full size
+_UNSATISFIED_RANGE_RE = re.compile(r"bytes\s+\*/(\d+)")
+
+
+def content_total(status_code: int, headers: Any, offset: int = 0) -> int | None:
+    """
+    Work out the full size of a (possibly partial) /view response.
+
+    Args:
+        status_code: HTTP status (206 for a Range response)
+        headers: Response headers (case-insensitive mapping)
+        offset: Bytes already written before this response
+
+    Returns:
+        Total file size in bytes, or None if the server didn't say
+    """
+    if status_code == 206:
+        match = _CONTENT_RANGE_RE.match(headers.get("Content-Range", ""))
+        if match and match.group(3) != "*":
+            return int(match.group(3))
+
+    length = headers.get("Content-Length")
+    if length is None or not str(length).isdigit():
+        return None
+    return int(length) + (offset if status_code == 206 else 0)
+
+
+def output_files(
+    history: dict, keys: tuple[str, ...] = ("images", "gifs", "videos")
+) -> list[dict[str, str]]:
+    """
+    List the output file references of a history entry, in output order.
+
+    Args:
+        history: History entry for one prompt
+        keys: Output kinds to collect ("images"; "gifs"/"videos" for video nodes)
+
+    Returns:
+        List of {"filename", "subfolder", "type"} dicts (plus "cache" for
+        outputs of a cached result)
+    """
+    files: list[dict[str, str]] = []
+    outputs = history.get("outputs", {}) if isinstance(history, dict) else {}
+    if not isinstance(outputs, dict):
+        return files
+
+    for node_output in outputs.values():
+        if not isinstance(node_output, dict):
+            continue
+        for key in keys:
+            items = node_output.get(key)
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                if isinstance(item, dict):
+                    ref = {
+                        "filename": item.get("filename"),
+                        "subfolder": item.get("subfolder", ""),
+                        "type": item.get("type", "output"),
+                    }
+                    if "cache" in item:
+                        # Served from the ResultCache (see ResultCache.tagged_history)
+                        ref["cache"] = item["cache"]
+                    files.append(ref)
+    return files
+
+
+def output_path(dest_dir: str | os.PathLike, filename: str) -> Path:
+    """Local path for an output file; server-supplied directories are dropped."""
+    return Path(dest_dir) / Path(filename).name
+
+
+_sync_slots: dict[str, threading.BoundedSemaphore] = {}
+_async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+_slots_lock = threading.Lock()
+
+
+def download_slot(base_url: str) -> threading.BoundedSemaphore:
+    """Semaphore capping concurrent downloads from one backend (threads)."""
+    with _slots_lock:
+        slot = _sync_slots.get(base_url)
+        if slot is None:
+            slot = threading.BoundedSemaphore(max(1, settings.http.max_downloads_per_host))
+            _sync_slots[base_url] = slot
+        return slot
+
+
+def async_download_slot(base_url: str) -> asyncio.Semaphore:
+    """Semaphore capping concurrent downloads from one backend (current event loop)."""
+    loop = asyncio.get_running_loop()
+    with _slots_lock:
+        slots = _async_slots.setdefault(loop, {})
+        slot = slots.get(base_url)
+        if slot is None:
+            slot = asyncio.Semaphore(max(1, settings.http.max_downloads_per_host))
+            slots[base_url] = slot
+        return slot
+
+
+class DownloadTarget:
+    """
+    Write side of a streamed download.
+
+    Only bytes written during this download are ever resumed: ComfyUI reuses
+    output names, so a leftover partial file may belong to another output.
+
+    Args:
+        dest: File path (written via a ".part" file, replacing any leftover
+            one) or a writable binary file object
+    """
+
+    def __init__(self, dest: str | os.PathLike | BinaryIO):
+        if isinstance(dest, (str, os.PathLike)):
+            self.path: Path | None = Path(dest)
+            self.part_path: Path | None = self.path.with_name(self.path.name + ".part")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file: BinaryIO = open(self.part_path, "wb")  # noqa: SIM115
+            self._base = 0
+        else:
+            self.path = None
+            self.part_path = None
+            self._file = dest
+            self._base = dest.tell() if dest.seekable() else 0
+        self.written = 0
+        self.total: int | None = None  # Size of the file being downloaded, if known
+        self._validator: str | None = None  # ETag or Last-Modified of the first response
+
+    def request_headers(self) -> dict[str, str]:
+        """Headers for the next request: a Range resume once bytes were written."""
+        if not self.written:
+            return {}
+        headers = {"Range": f"bytes={self.written}-"}
+        if self._validator:
+            # The server sends the whole (new) file if it changed meanwhile
+            headers["If-Range"] = self._validator
+        return headers
+
+    def start_response(self, status_code: int, headers: Any) -> bool:
+        """
+        Check a successful /view response before its body is written.
+
+        A full (200) response restarts the file. A partial (206) response
+        for a file of another size or version is rejected.
+
+        Returns:
+            True to write the body, False to discard it and request again
+            (the target has been restarted)
+        """
+        total = content_total(status_code, headers, self.written)
+        validator = headers.get("ETag") or headers.get("Last-Modified")
+        if self.written:
+            if status_code != 206:
+                self.restart()
+            elif total != self.total or (
+                self._validator and validator and validator != self._validator
+            ):
+                self.restart()
+                return False
+        if not self.written:
+            self.total, self._validator = total, validator
+        return True
+
+    def complete_on_416(self, headers: Any) -> bool:
+        """
+        Handle a 416 reply to a resume.
+
+        Returns:
+            True if the bytes written already are the whole file (the size
+            the server reports); otherwise the target is restarted
+        """
+        match = _UNSATISFIED_RANGE_RE.match(headers.get("Content-Range", ""))
+        size = int(match.group(1)) if match else None
+        if self.written and size == self.written and self.total in (None, size):
+            return True
+        self.restart()
+        return False
+
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk."""
+        self._file.write(chunk)
+        self.written += len(chunk)
+
+    def restart(self) -> None:
+        """
+        Discard written bytes (the server ignored the Range request).
+
+        Raises:
+            OSError: If the destination is a non-seekable file object
+        """
+        if self.path is None and not self._file.seekable():
+            raise OSError("Server does not support resume and destination is not seekable")
+        self._file.seek(self._base)
+        self._file.truncate()
+        self.written = 0
+        self.total = self._validator = None
+
+    def finish(self) -> None:
+        """Flush, and move a completed path download into place."""
+        self._file.flush()
+        if self.path is not None and self.part_path is not None:
+            self._file.close()
+            os.replace(self.part_path, self.path)
+
+    def close(self) -> None:
+        """
+        Close an unfinished path download and remove its partial file.
+
+        The next download of the path starts over (see above), so a partial
+        file left behind could never be resumed.
+        """
+        if self.part_path is None or self._file.closed:
+            return
+        self._file.close()
+        self.part_path.unlink(missing_ok=True)
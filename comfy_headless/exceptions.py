@@ -61,6 +61,7 @@ __all__ = [
     # Retry/circuit errors
     "RetryExhaustedError",
     "CircuitOpenError",
+    "BackendOverloadedError",
     # Validation errors
     "ValidationError",
     "InvalidPromptError",
@@ -762,6 +763,24 @@ class CircuitOpenError(ResilienceError):
         super().__init__(msg, code="CIRCUIT_OPEN", details=details, **kwargs)
 
 
+class BackendOverloadedError(ResilienceError):
+    """Backend has too many prompts queued to admit another."""
+
+    _default_user_message = "The server is busy with other jobs"
+    _default_eli5_message = "The image maker has too much to do right now"
+    _default_suggestions = [
+        "Wait for queued jobs to finish and try again",
+        "Raise COMFY_HEADLESS_COMFYUI__MAX_QUEUED_PROMPTS",
+    ]
+
+    def __init__(self, url: str, limit: int, message: str | None = None, **kwargs):
+        msg = message or f"ComfyUI at {url} has {limit} or more prompts queued"
+        details = kwargs.pop("details", {})
+        details["url"] = url
+        details["limit"] = limit
+        super().__init__(msg, code="BACKEND_OVERLOADED", details=details, **kwargs)
+
+
 # =============================================================================
 # EXCEPTION GROUPS (PEP 654 - Python 3.11+)
 # =============================================================================
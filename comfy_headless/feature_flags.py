@@ -25,6 +25,7 @@ Installation commands for each feature:
     pip install comfy-headless[ui]          # + Gradio web UI
     pip install comfy-headless[validation]  # + Pydantic config validation
     pip install comfy-headless[observability] # + OpenTelemetry tracing
+    pip install comfy-headless[fastjson]    # + orjson for large payloads
     pip install comfy-headless[standard]    # ai + websocket (recommended)
     pip install comfy-headless[full]        # Everything
 """
@@ -54,6 +55,7 @@ FEATURES: dict[str, bool] = {
     "ui": False,
     "validation": False,
     "observability": False,
+    "fastjson": False,
 }
 
 # Installation hints for each feature
@@ -64,6 +66,7 @@ INSTALL_HINTS: dict[str, str] = {
     "ui": "pip install comfy-headless[ui]",
     "validation": "pip install comfy-headless[validation]",
     "observability": "pip install comfy-headless[observability]",
+    "fastjson": "pip install comfy-headless[fastjson]",
 }
 
 # Feature descriptions
@@ -74,6 +77,7 @@ FEATURE_DESCRIPTIONS: dict[str, str] = {
     "ui": "Gradio web interface",
     "validation": "Pydantic configuration validation",
     "observability": "OpenTelemetry distributed tracing",
+    "fastjson": "Fast JSON parsing of large ComfyUI payloads (orjson or msgspec)",
 }
 
 
@@ -141,6 +145,18 @@ def _detect_features() -> None:
     except ImportError:
         logger.debug("Feature 'observability' unavailable: opentelemetry not installed")
 
+    # Fast JSON feature (orjson, or msgspec)
+    for module in ("orjson", "msgspec"):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        FEATURES["fastjson"] = True
+        logger.debug(f"Feature 'fastjson' available: {module} installed")
+        break
+    else:
+        logger.debug("Feature 'fastjson' unavailable: orjson/msgspec not installed")
+
     # Log summary of detected features
     available = [name for name, enabled in FEATURES.items() if enabled]
     missing = [name for name, enabled in FEATURES.items() if not enabled]
@@ -161,7 +177,7 @@ def check_feature(feature: str) -> bool:
     Check if a feature is available.
 
     Args:
-        feature: Feature name (ai, websocket, health, ui, validation, observability)
+        feature: Feature name (ai, websocket, health, ui, validation, observability, fastjson)
 
     Returns:
         True if the feature is installed
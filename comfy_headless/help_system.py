@@ -277,7 +277,7 @@ VRAM usage scales with resolution:
 - 1024x1024: ~8GB
 - 2048x2048: ~16GB+ (uses tiled VAE)""",
         examples=[
-            'from comfy_headless import ComfyClient\nclient = ComfyClient()\nresult = client.generate_image("a sunset over mountains")',
+            'from comfy_headless import ComfyClient\nwith ComfyClient() as client:\n    result = client.generate_image("a sunset over mountains")',
             'result = client.generate_image(\n    "cyberpunk city at night",\n    steps=30,\n    cfg_scale=7.5,\n    width=1280,\n    height=720\n)',
             'from comfy_headless import compile_workflow, GENERATION_PRESETS\nworkflow = compile_workflow("portrait of a woman", preset="cinematic")',
         ],
@@ -699,7 +699,8 @@ Environment variable: COMFY_HEADLESS_COMFYUI__URL
 Circuit breaker behavior:
 - After 3 consecutive failures, circuit opens
 - 30 second cooldown before retry
-- Use circuit_registry.get("comfyui").reset() to force reset
+- Each backend has its own circuit, named "comfyui:<url>"
+- Use circuit_registry.get(f"comfyui:{settings.comfyui.url}").reset() to force reset
 
 Common causes:
 - ComfyUI crashed (check for CUDA OOM errors)
@@ -708,7 +709,7 @@ Common causes:
         examples=[
             'from comfy_headless import check_health\nreport = check_health()\nprint(f"ComfyUI: {report.components["comfyui"]}")',
             'from comfy_headless import settings\nprint(f"ComfyUI URL: {settings.comfyui.url}")',
-            'from comfy_headless import circuit_registry\ncircuit = circuit_registry.get("comfyui")\nprint(f"Circuit state: {circuit.state}")',
+            'from comfy_headless import circuit_registry, settings\ncircuit = circuit_registry.get(f"comfyui:{settings.comfyui.url}")\nprint(f"Circuit state: {circuit.state}")',
         ],
         related=["health", "error:timeout"],
         keywords={"offline", "connection", "comfyui", "unreachable", "refused"},
@@ -946,9 +947,9 @@ ComfyClient is your remote control for making images.""",
 Basic usage:
   from comfy_headless import ComfyClient
 
-  client = ComfyClient()
-  result = client.generate_image("a sunset")
-  print(f"Image saved to: {result.path}")
+  with ComfyClient() as client:
+      result = client.generate_image("a sunset")
+      print(f"Image saved to: {result.path}")
 
 Methods:
 - generate_image(prompt, **kwargs): Generate one image
@@ -968,10 +969,13 @@ ComfyClient(
 Methods:
 - generate_image(prompt, steps, cfg_scale, width, height, seed, preset)
 - generate_batch(prompts, **shared_kwargs)
+- generate_batch_iter(prompts, **shared_kwargs) -> (index, result) as each finishes
 - queue_workflow(workflow: dict) -> str (prompt_id)
 - get_status() -> dict
 - get_history(prompt_id) -> dict
 - interrupt() -> None
+- cancel(prompt_id) -> bool (deletes if pending, interrupts only if running)
+- batch() -> PromptBatch (batch.cancel() removes all its prompts at once)
 
 Error handling:
 - ComfyUIConnectionError: Can't reach server
@@ -986,7 +990,7 @@ with ComfyClient() as client:
 ```""",
         examples=[
             'from comfy_headless import ComfyClient\nwith ComfyClient() as client:\n    result = client.generate_image(\n        "cyberpunk city",\n        steps=30,\n        cfg_scale=7.5,\n        preset="cinematic"\n    )\n    print(f"Generated: {result.path}")',
-            'client = ComfyClient(url="http://192.168.1.100:8188")\nfor prompt in ["cat", "dog", "bird"]:\n    result = client.generate_image(prompt)\n    print(f"{prompt}: {result.path}")',
+            'with ComfyClient(url="http://192.168.1.100:8188") as client:\n    for prompt in ["cat", "dog", "bird"]:\n        result = client.generate_image(prompt)\n        print(f"{prompt}: {result.path}")',
         ],
         related=["generation", "api:websocket"],
         keywords={"client", "api", "generate", "comfyclient"},
@@ -1039,22 +1043,24 @@ async with ComfyWSClient() as ws:
 
 Methods:
 - queue_workflow(workflow) -> str (prompt_id)
-- track_progress(prompt_id) -> AsyncGenerator[WSProgress]
-- wait_for_completion(prompt_id) -> dict (outputs)
-- cancel(prompt_id) -> None
+- track_progress(prompt_id, timeout=None, previews=False) -> AsyncIterator[WSProgress]
+  (ends with the terminal event; "completed" carries the outputs)
+- wait_for_completion(prompt_id, on_progress=None) -> WSProgress (final event)
+- submit_and_track(workflow) -> WSProgress (queue + wait, listening first)
 
 WSProgress dataclass:
-- node: str (current node ID)
-- value: int (current step)
-- max: int (total steps)
+- status: str ("progress", "node_complete", "preview", "completed", ...)
+- node_id: str (current node ID)
+- progress / max_progress: float (current / total steps)
 - percent: float (0-100)
+- outputs: dict (node outputs on "node_complete", all outputs on "completed")
 
 WSMessageType enum:
 - EXECUTION_START, EXECUTION_CACHED, EXECUTING
 - PROGRESS, EXECUTION_COMPLETE, EXECUTION_ERROR""",
         examples=[
             'import asyncio\nfrom comfy_headless import ComfyWSClient, compile_workflow\n\nasync def generate():\n    workflow = compile_workflow("sunset", preset="quality")\n    async with ComfyWSClient() as ws:\n        pid = await ws.queue_workflow(workflow)\n        async for p in ws.track_progress(pid):\n            print(f"\\r[{"=" * int(p.percent/5)}] {p.percent:.0f}%", end="")\n\nasyncio.run(generate())',
-            'async with ComfyWSClient() as ws:\n    pid = await ws.queue_workflow(workflow)\n    outputs = await ws.wait_for_completion(pid)\n    print(f"Images: {outputs["images"]}")',
+            'async with ComfyWSClient() as ws:\n    pid = await ws.queue_workflow(workflow)\n    async for event in ws.track_progress(pid):\n        pass\n    print(f"Outputs: {event.outputs}")',
         ],
         related=["api:client", "generation"],
         keywords={"websocket", "async", "progress", "realtime"},
@@ -26,10 +26,12 @@ Usage:
     from comfy_headless.http_client import get_http_client, get_async_http_client
 """
 
+import contextlib
+from collections.abc import AsyncIterator
 from typing import Any
 
 from .config import settings
-from .exceptions import ComfyUIConnectionError
+from .exceptions import CircuitOpenError, ComfyUIConnectionError
 from .logging_config import get_logger
 from .retry import get_circuit_breaker
 
@@ -46,7 +48,9 @@ __all__ = [
     "close_all_clients",
     # Constants
     "HTTPX_AVAILABLE",
+    "H2_AVAILABLE",
     "REQUESTS_AVAILABLE",
+    "http2_enabled",
 ]
 
 # Try to import httpx, fall back to requests
@@ -58,6 +62,14 @@ except ImportError:
     HTTPX_AVAILABLE = False
     httpx = None
 
+# httpx only speaks HTTP/2 with the optional h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
 # Fallback to requests if httpx unavailable
 try:
     import requests
@@ -68,6 +80,11 @@ except ImportError:
     requests = None
 
 
+def http2_enabled() -> bool:
+    """Whether to negotiate HTTP/2: on in settings.http.http2 and h2 installed."""
+    return bool(settings.http.http2) and H2_AVAILABLE
+
+
 # =============================================================================
 # SYNC HTTP CLIENT
 # =============================================================================
@@ -125,7 +142,7 @@ class HttpClient:
                         write=settings.http.write_timeout,
                         pool=settings.http.pool_timeout,
                     ),
-                    http2=settings.http.http2,
+                    http2=http2_enabled(),
                     limits=httpx.Limits(
                         max_connections=settings.http.max_connections,
                         max_keepalive_connections=settings.http.max_keepalive_connections,
@@ -138,7 +155,7 @@ class HttpClient:
                 raise ImportError("Neither httpx nor requests is installed")
         return self._client
 
-    def _request(self, method: str, endpoint: str, timeout: float | None = None, **kwargs) -> Any:
+    def request(self, method: str, endpoint: str, timeout: float | None = None, **kwargs) -> Any:
         """
         Make an HTTP request with circuit breaker protection.
 
@@ -182,26 +199,26 @@ class HttpClient:
 
     def get(self, endpoint: str, **kwargs) -> Any:
         """Make a GET request."""
-        return self._request("GET", endpoint, **kwargs)
+        return self.request("GET", endpoint, **kwargs)
 
     def post(self, endpoint: str, **kwargs) -> Any:
         """Make a POST request."""
-        return self._request("POST", endpoint, **kwargs)
+        return self.request("POST", endpoint, **kwargs)
 
     def put(self, endpoint: str, **kwargs) -> Any:
         """Make a PUT request."""
-        return self._request("PUT", endpoint, **kwargs)
+        return self.request("PUT", endpoint, **kwargs)
 
     def delete(self, endpoint: str, **kwargs) -> Any:
         """Make a DELETE request."""
-        return self._request("DELETE", endpoint, **kwargs)
+        return self.request("DELETE", endpoint, **kwargs)
 
     def post_json(self, endpoint: str, data: dict, **kwargs) -> Any:
         """Make a POST request with JSON body."""
         if HTTPX_AVAILABLE:
-            return self._request("POST", endpoint, json=data, **kwargs)
+            return self.request("POST", endpoint, json=data, **kwargs)
         else:
-            return self._request("POST", endpoint, json=data, **kwargs)
+            return self.request("POST", endpoint, json=data, **kwargs)
 
     def close(self):
         """Close the underlying client."""
@@ -243,6 +260,7 @@ class AsyncHttpClient:
         base_url: str,
         timeout: float | None = None,
         circuit_name: str | None = None,
+        uds_path: str | None = None,
     ):
         """
         Initialize async HTTP client.
@@ -251,6 +269,9 @@ class AsyncHttpClient:
             base_url: Base URL for all requests
             timeout: Default timeout in seconds
             circuit_name: Name for circuit breaker (None to disable)
+            uds_path: Connect through this Unix domain socket instead of TCP.
+                HTTP/1.1 only: HTTP/2 is negotiated through TLS, which a
+                local socket doesn't use
         """
         if not HTTPX_AVAILABLE:
             raise ImportError(
@@ -260,6 +281,7 @@ class AsyncHttpClient:
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout or settings.http.read_timeout
         self._circuit = get_circuit_breaker(circuit_name) if circuit_name else None
+        self.uds_path = uds_path
         self._client: httpx.AsyncClient | None = None
 
         logger.debug("AsyncHttpClient initialized", extra={"base_url": self.base_url})
@@ -268,6 +290,11 @@ class AsyncHttpClient:
     def client(self) -> "httpx.AsyncClient":
         """Lazy-initialize the underlying async client."""
         if self._client is None:
+            limits = httpx.Limits(
+                max_connections=settings.http.max_connections,
+                max_keepalive_connections=settings.http.max_keepalive_connections,
+                keepalive_expiry=settings.http.keepalive_expiry,
+            )
             self._client = httpx.AsyncClient(
                 base_url=self.base_url,
                 timeout=httpx.Timeout(
@@ -276,16 +303,15 @@ class AsyncHttpClient:
                     write=settings.http.write_timeout,
                     pool=settings.http.pool_timeout,
                 ),
-                http2=settings.http.http2,
-                limits=httpx.Limits(
-                    max_connections=settings.http.max_connections,
-                    max_keepalive_connections=settings.http.max_keepalive_connections,
-                    keepalive_expiry=settings.http.keepalive_expiry,
-                ),
+                http2=http2_enabled(),
+                limits=limits,
+                transport=httpx.AsyncHTTPTransport(uds=self.uds_path, limits=limits)
+                if self.uds_path
+                else None,
             )
         return self._client
 
-    async def _request(
+    async def request(
         self, method: str, endpoint: str, timeout: float | None = None, **kwargs
     ) -> httpx.Response:
         """Make an async HTTP request with circuit breaker protection."""
@@ -309,23 +335,62 @@ class AsyncHttpClient:
 
     async def get(self, endpoint: str, **kwargs) -> httpx.Response:
         """Make a GET request."""
-        return await self._request("GET", endpoint, **kwargs)
+        return await self.request("GET", endpoint, **kwargs)
 
     async def post(self, endpoint: str, **kwargs) -> httpx.Response:
         """Make a POST request."""
-        return await self._request("POST", endpoint, **kwargs)
+        return await self.request("POST", endpoint, **kwargs)
 
     async def put(self, endpoint: str, **kwargs) -> httpx.Response:
         """Make a PUT request."""
-        return await self._request("PUT", endpoint, **kwargs)
+        return await self.request("PUT", endpoint, **kwargs)
 
     async def delete(self, endpoint: str, **kwargs) -> httpx.Response:
         """Make a DELETE request."""
-        return await self._request("DELETE", endpoint, **kwargs)
+        return await self.request("DELETE", endpoint, **kwargs)
 
     async def post_json(self, endpoint: str, data: dict, **kwargs) -> httpx.Response:
         """Make a POST request with JSON body."""
-        return await self._request("POST", endpoint, json=data, **kwargs)
+        return await self.request("POST", endpoint, json=data, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def stream(
+        self, method: str, endpoint: str, timeout: float | None = None, **kwargs
+    ) -> AsyncIterator["httpx.Response"]:
+        """
+        Make a streaming request with circuit breaker protection.
+
+        Only transport errors while opening the request or reading the body
+        count as circuit failures; errors in the caller's own code and
+        cancellation don't.
+
+        Usage:
+            async with client.stream("GET", "/view", params=params) as response:
+                async for chunk in response.aiter_bytes():
+                    ...
+        """
+        _timeout = timeout or self.timeout
+        circuit = self._circuit
+        if circuit is not None and not circuit.allow_request():
+            raise CircuitOpenError(
+                service=circuit.name, message=f"Circuit breaker {circuit.name} is open"
+            )
+
+        try:
+            async with self.client.stream(method, endpoint, timeout=_timeout, **kwargs) as response:
+                yield response
+        except httpx.TransportError as e:
+            if circuit is not None:
+                circuit.record_failure()
+            if isinstance(e, httpx.ConnectError):
+                raise ComfyUIConnectionError(
+                    f"Failed to connect to {self.base_url}: {e}",
+                    url=self.base_url,
+                ) from e
+            raise
+        else:
+            if circuit is not None:
+                circuit.record_success()
 
     async def close(self):
         """Close the underlying client."""
@@ -424,7 +489,7 @@ if HTTPX_AVAILABLE:
 
         Args:
             base_url: Base URL for requests
-            http2: Enable HTTP/2 (default True)
+            http2: Enable HTTP/2 if h2 is installed (default True)
             **kwargs: Additional httpx.Client arguments
 
         Returns:
@@ -432,7 +497,7 @@ if HTTPX_AVAILABLE:
         """
         return httpx.Client(
             base_url=base_url,
-            http2=http2,
+            http2=http2 and H2_AVAILABLE,
             timeout=httpx.Timeout(
                 connect=settings.http.connect_timeout,
                 read=settings.http.read_timeout,
@@ -452,7 +517,7 @@ if HTTPX_AVAILABLE:
 
         Args:
             base_url: Base URL for requests
-            http2: Enable HTTP/2 (default True)
+            http2: Enable HTTP/2 if h2 is installed (default True)
             **kwargs: Additional httpx.AsyncClient arguments
 
         Returns:
@@ -460,7 +525,7 @@ if HTTPX_AVAILABLE:
         """
         return httpx.AsyncClient(
             base_url=base_url,
-            http2=http2,
+            http2=http2 and H2_AVAILABLE,
             timeout=httpx.Timeout(
                 connect=settings.http.connect_timeout,
                 read=settings.http.read_timeout,
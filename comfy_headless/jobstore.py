@@ -0,0 +1,575 @@
+"""
+Comfy Headless - Durable Job Store
+==================================
+
+SQLite-backed job queue that survives crashes of the process running it.
+
+- Each job's state (pending, submitted, running, done or failed), prompt_id
+  and result are persisted in a WAL-mode SQLite file
+- Several JobWorker processes on a host claim jobs from the same file; a
+  claim is a lease the worker renews while it waits, so a job is worked on
+  by one worker at a time
+- A job's prompt_id is chosen when it is first claimed and sent with
+  /prompt, along with an extra_data job_id tag, so a worker that takes over
+  after a crash finds the prompt in /history or /queue and reattaches
+  instead of running it again (by tag on backends that assign their own
+  prompt IDs)
+- Failed submissions are retried up to settings.generation.job_max_attempts
+
+Usage:
+    from comfy_headless import ComfyClient, JobStore, JobWorker
+
+    store = JobStore("jobs.sqlite3")
+    batch = store.add_batch(workflows)
+
+    # In each worker process:
+    with JobWorker(JobStore("jobs.sqlite3")) as worker:
+        worker.run(idle_timeout=30)
+
+    results = store.results(batch)
+"""
+
+import contextlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .client import ComfyClient
+from .config import get_cache_dir, settings
+from .exceptions import GenerationTimeoutError, QueueError
+from .jsoncodec import dumps, loads
+from .logging_config import get_logger
+from .protocol import queue_prompt_ids
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "JOB_STATES",
+    "StoredJob",
+    "JobStore",
+    "JobWorker",
+]
+
+JOB_STATES = ("pending", "submitted", "running", "done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    batch TEXT NOT NULL DEFAULT '',
+    idx INTEGER NOT NULL DEFAULT 0,
+    workflow TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    prompt_id TEXT,
+    backend TEXT,
+    worker TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    claims INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, idx);
+"""
+
+# Claimable: unfinished jobs whose lease ran out. Jobs already on a backend
+# stay with that backend.
+_CLAIM = """
+SELECT * FROM jobs
+WHERE lease_until < :now
+  AND (state = 'pending' OR (state IN ('submitted', 'running') AND backend = :backend))
+ORDER BY state = 'pending', created_at, idx
+LIMIT 1
+"""
+
+# extra_data key tagging a job's prompt, so it can be found in /queue and
+# /history even on a backend that ignores the requested prompt_id
+_JOB_TAG = "job_id"
+
+
+def _job_tag(item: Any) -> Any:
+    """Job tag of a /queue item or history "prompt" ([number, id, prompt, extra_data, ...])."""
+    if isinstance(item, list | tuple) and len(item) > 3 and isinstance(item[3], dict):
+        return item[3].get(_JOB_TAG)
+    return None
+
+
+@dataclass
+class StoredJob:
+    """One job of a JobStore."""
+
+    id: str
+    batch: str
+    index: int
+    workflow: dict[str, Any] = field(repr=False)
+    state: str = "pending"
+    prompt_id: str | None = None
+    backend: str | None = None
+    worker: str | None = None
+    claims: int = 0  # Times the job was claimed; >1 means it may be on ComfyUI already
+    attempts: int = 0  # Failed attempts so far
+    result: dict[str, Any] | None = field(default=None, repr=False)  # History entry
+    error: str | None = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    @classmethod
+    def _from_row(cls, row: sqlite3.Row) -> "StoredJob":
+        return cls(
+            id=row["id"],
+            batch=row["batch"],
+            index=row["idx"],
+            workflow=loads(row["workflow"]),
+            state=row["state"],
+            prompt_id=row["prompt_id"],
+            backend=row["backend"],
+            worker=row["worker"],
+            claims=row["claims"],
+            attempts=row["attempts"],
+            result=loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+
+class JobStore:
+    """
+    Persistent job queue in a SQLite file, shared by worker processes.
+
+    Thread-safe; every process should open its own JobStore on the file.
+
+    Args:
+        path: Database file (default: settings.generation.job_store_path,
+            else "<cache dir>/jobs.sqlite3")
+    """
+
+    def __init__(self, path: str | os.PathLike | None = None):
+        path = path or settings.generation.job_store_path or get_cache_dir() / "jobs.sqlite3"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "JobStore":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction that locks the database up front."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # =========================================================================
+    # ADDING AND READING
+    # =========================================================================
+
+    def add(self, workflow: dict[str, Any], batch: str = "", index: int = 0) -> str:
+        """Add a pending job and return its ID."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, batch, idx, workflow, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, batch, index, dumps(workflow).decode(), now, now),
+            )
+        return job_id
+
+    def add_batch(self, workflows: Iterable[dict[str, Any]], batch: str | None = None) -> str:
+        """
+        Add workflows as one batch, indexed in order.
+
+        Returns:
+            The batch ID (generated if not given)
+        """
+        batch = batch or uuid.uuid4().hex
+        now = time.time()
+        rows = [
+            (uuid.uuid4().hex, batch, index, dumps(workflow).decode(), now, now)
+            for index, workflow in enumerate(workflows)
+        ]
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO jobs (id, batch, idx, workflow, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        logger.debug("Added batch", extra={"batch": batch[:8], "jobs": len(rows)})
+        return batch
+
+    def get(self, job_id: str) -> StoredJob | None:
+        """Current state of a job."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return StoredJob._from_row(row) if row else None
+
+    def jobs(self, batch: str | None = None, state: str | None = None) -> list[StoredJob]:
+        """Jobs in creation order, optionally of one batch and/or state."""
+        query, params = "SELECT * FROM jobs WHERE 1 = 1", []
+        if batch is not None:
+            query += " AND batch = ?"
+            params.append(batch)
+        if state is not None:
+            query += " AND state = ?"
+            params.append(state)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at, idx", params).fetchall()
+        return [StoredJob._from_row(row) for row in rows]
+
+    def counts(self, batch: str | None = None) -> dict[str, int]:
+        """Number of jobs in each state."""
+        query = "SELECT state, COUNT(*) FROM jobs"
+        params: tuple = ()
+        if batch is not None:
+            query += " WHERE batch = ?"
+            params = (batch,)
+        with self._lock:
+            rows = self._conn.execute(query + " GROUP BY state", params).fetchall()
+        counts = dict.fromkeys(JOB_STATES, 0)
+        counts.update(dict(rows))
+        return counts
+
+    def results(self, batch: str) -> list[dict[str, Any] | None]:
+        """History entries of a batch in input order; None for unfinished or failed jobs."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, result FROM jobs WHERE batch = ? ORDER BY idx", (batch,)
+            ).fetchall()
+        return [loads(row["result"]) if row["state"] == "done" else None for row in rows]
+
+    def purge(self, batch: str | None = None) -> int:
+        """Delete finished (done or failed) jobs; returns how many."""
+        query = "DELETE FROM jobs WHERE state IN ('done', 'failed')"
+        params: tuple = ()
+        if batch is not None:
+            query += " AND batch = ?"
+            params = (batch,)
+        with self._transaction() as conn:
+            return conn.execute(query, params).rowcount
+
+    # =========================================================================
+    # CLAIMS
+    # =========================================================================
+
+    def claim(self, worker: str, backend: str, lease: float | None = None) -> StoredJob | None:
+        """
+        Claim the next job for a worker on a backend.
+
+        Jobs the worker's backend was already running (after a crash or an
+        expired lease) come first, then pending jobs in creation order. The
+        claim gives the job a prompt_id if it has none.
+
+        Args:
+            worker: Worker ID
+            backend: URL of the backend the worker submits to
+            lease: Seconds the claim lasts unless renewed
+                (default settings.generation.job_lease)
+
+        Returns:
+            The claimed job, or None if nothing is claimable
+        """
+        lease = settings.generation.job_lease if lease is None else lease
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(_CLAIM, {"now": now, "backend": backend}).fetchone()
+            if row is None:
+                return None
+            prompt_id = row["prompt_id"]
+            if not prompt_id or row["backend"] != backend:
+                prompt_id = str(uuid.uuid4())
+            conn.execute(
+                "UPDATE jobs SET worker = ?, backend = ?, prompt_id = ?, lease_until = ?,"
+                " claims = claims + 1, updated_at = ? WHERE id = ?",
+                (worker, backend, prompt_id, now + lease, now, row["id"]),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return StoredJob._from_row(row)
+
+    def expire(self, worker: str) -> int:
+        """
+        End every claim a worker ID holds, making its jobs claimable now.
+
+        A worker restarted under the same ID calls this to take its jobs
+        back without waiting for their leases to run out.
+
+        Returns:
+            Number of claims ended
+        """
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET lease_until = 0 WHERE worker = ?"
+                " AND state IN ('pending', 'submitted', 'running')",
+                (worker,),
+            ).rowcount
+
+    def _update(self, job: StoredJob, **fields: Any) -> bool:
+        """Update a job the worker still holds; False if its claim was lost."""
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._transaction() as conn:
+            updated = conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ?",
+                (*fields.values(), job.id, job.worker),
+            ).rowcount
+        if not updated:
+            logger.warning("Job claim lost", extra={"job": job.id[:8], "worker": job.worker})
+            return False
+        for name, value in fields.items():
+            if hasattr(job, name) and name != "result":
+                setattr(job, name, value)
+        return True
+
+    def renew(self, job: StoredJob, lease: float | None = None) -> bool:
+        """Extend a claim; False if it was lost."""
+        lease = settings.generation.job_lease if lease is None else lease
+        return self._update(job, lease_until=time.time() + lease)
+
+    def mark_submitted(self, job: StoredJob, prompt_id: str) -> bool:
+        """Record that a job's prompt is queued on its backend."""
+        return self._update(job, state="submitted", prompt_id=prompt_id)
+
+    def mark_running(self, job: StoredJob) -> bool:
+        """Record that a job's prompt started executing."""
+        return self._update(job, state="running")
+
+    def mark_done(self, job: StoredJob, result: dict[str, Any]) -> bool:
+        """Store a job's history entry and end its claim."""
+        if self._update(
+            job, state="done", result=dumps(result).decode(), error=None, lease_until=0.0
+        ):
+            job.result = result
+            return True
+        return False
+
+    def mark_failed(self, job: StoredJob, error: str) -> bool:
+        """Fail a job for good."""
+        return self._update(job, state="failed", error=error, lease_until=0.0)
+
+    def release(self, job: StoredJob, error: str, max_attempts: int | None = None) -> bool:
+        """
+        Give a job back after a failed attempt, or fail it once attempts run out.
+
+        The job keeps its state and prompt_id, so whoever claims it next
+        reattaches to a prompt that did reach ComfyUI.
+        """
+        if max_attempts is None:
+            max_attempts = settings.generation.job_max_attempts
+        if job.attempts + 1 >= max_attempts:
+            return self._update(
+                job, state="failed", error=error, attempts=job.attempts + 1, lease_until=0.0
+            )
+        return self._update(
+            job, error=error, attempts=job.attempts + 1, lease_until=0.0, worker=None
+        )
+
+
+class JobWorker:
+    """
+    Runs jobs of a JobStore on one backend, one at a time.
+
+    Start one per process (or thread) and backend; workers coordinate only
+    through the store.
+
+    Args:
+        store: Job store to claim from
+        client: Backend to run jobs on (default: a ComfyClient the worker
+            closes in close())
+        worker_id: Stable ID; a worker restarted under the same ID takes its
+            jobs back at once instead of after their lease runs out
+            (default: host, process and a random suffix)
+        lease: Claim lease in seconds (default settings.generation.job_lease)
+        poll_interval: Seconds between claim attempts while the store is empty
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        client: ComfyClient | None = None,
+        worker_id: str | None = None,
+        lease: float | None = None,
+        poll_interval: float = 1.0,
+    ):
+        self.store = store
+        self._owns_client = client is None
+        self.client = client or ComfyClient()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease = settings.generation.job_lease if lease is None else lease
+        self.poll_interval = poll_interval
+
+    def close(self) -> None:
+        """Close the client if the worker created it (the store stays open)."""
+        if self._owns_client:
+            self.client.close()
+
+    def __enter__(self) -> "JobWorker":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    def run(
+        self,
+        max_jobs: int | None = None,
+        idle_timeout: float | None = None,
+        stop: threading.Event | None = None,
+    ) -> int:
+        """
+        Claim and run jobs until stopped.
+
+        Args:
+            max_jobs: Stop after this many jobs
+            idle_timeout: Stop after this many seconds without a claimable job
+            stop: Stop when this event is set (checked between jobs)
+
+        Returns:
+            Number of jobs processed
+        """
+        stop = stop or threading.Event()
+        # Jobs this worker ID held when it last stopped (e.g. crashed)
+        if recovered := self.store.expire(self.worker_id):
+            logger.info("Recovering jobs", extra={"worker": self.worker_id, "jobs": recovered})
+        processed = 0
+        idle_since = time.monotonic()
+        while not stop.is_set():
+            job = self.store.claim(self.worker_id, self.client.base_url, self.lease)
+            if job is None:
+                if idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                    break
+                stop.wait(self.poll_interval)
+                continue
+
+            self.process(job)
+            processed += 1
+            idle_since = time.monotonic()
+            if max_jobs is not None and processed >= max_jobs:
+                break
+        return processed
+
+    def process(self, job: StoredJob) -> StoredJob:
+        """Run one claimed job to completion, failure or release."""
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job, stop), name="comfy-headless-job-lease", daemon=True
+        )
+        heartbeat.start()
+        try:
+            entry = self._execute(job)
+        except Exception as e:
+            logger.warning(f"Job attempt failed: {e}", extra={"job": job.id[:8]})
+            self.store.release(job, str(e))
+            return job
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        status = entry.get("status", {})
+        if status.get("status_str") == "error":
+            error_msgs = status.get("messages", [["Unknown error"]])
+            self.store.mark_failed(job, str(error_msgs[0] if error_msgs else "Unknown error"))
+        else:
+            self.store.mark_done(job, {k: v for k, v in entry.items() if k != "prompt"})
+        logger.info("Job finished", extra={"job": job.id[:8], "state": job.state})
+        return job
+
+    def _heartbeat(self, job: StoredJob, stop: threading.Event) -> None:
+        """Renew the job's lease until stopped or the claim is lost."""
+        while not stop.wait(self.lease / 3):
+            if not self.store.renew(job, self.lease):
+                return
+
+    def _execute(self, job: StoredJob) -> dict[str, Any]:
+        """Submit or reattach to the job's prompt and wait for its history entry."""
+        client = self.client
+        if job.claims > 1 or job.state != "pending":
+            # Claimed before: the prompt may be on ComfyUI already
+            # ComfyUI adds a prompt to /history when it finishes
+            entry: dict[str, Any] | None = client.get_history(job.prompt_id).get(job.prompt_id)
+            if entry:
+                logger.info("Reattached to finished prompt", extra={"job": job.id[:8]})
+                return entry
+            prompt_id = self._find_queued(job)
+            if prompt_id:
+                logger.info("Reattached to queued prompt", extra={"job": job.id[:8]})
+                if job.state == "pending" or prompt_id != job.prompt_id:
+                    self.store.mark_submitted(job, prompt_id)
+                return self._wait(job, prompt_id)
+            # A backend that assigned its own prompt ID: find the job's tag
+            entry = self._find_finished(job)
+            if entry:
+                logger.info("Reattached to finished prompt", extra={"job": job.id[:8]})
+                return entry
+
+        prompt_id = client.queue_prompt(
+            job.workflow, prompt_id=job.prompt_id, extra_data={_JOB_TAG: job.id}
+        )
+        if not prompt_id:
+            raise QueueError(f"Backend {client.base_url} did not accept job {job.id[:8]}")
+        if prompt_id != job.prompt_id:
+            logger.warning(
+                "Backend ignored the job's prompt_id; reattaching relies on its extra_data tag",
+                extra={"job": job.id[:8], "backend": client.base_url},
+            )
+        self.store.mark_submitted(job, prompt_id)
+        return self._wait(job, prompt_id)
+
+    def _find_queued(self, job: StoredJob) -> str | None:
+        """Prompt ID of the job's prompt in /queue, by prompt_id or job tag."""
+        queue = self.client.get_queue()
+        items = [*queue.get("queue_running", []), *queue.get("queue_pending", [])]
+        if job.prompt_id in queue_prompt_ids(items):
+            return job.prompt_id
+        for item in items:
+            if _job_tag(item) == job.id:
+                return str(item[1])
+        return None
+
+    def _find_finished(self, job: StoredJob) -> dict[str, Any] | None:
+        """History entry tagged with the job's ID (scans all of /history)."""
+        for entry in self.client.get_history().values():
+            if isinstance(entry, dict) and _job_tag(entry.get("prompt")) == job.id:
+                return entry
+        return None
+
+    def _wait(self, job: StoredJob, prompt_id: str) -> dict[str, Any]:
+        def on_progress(progress: float, _status: str) -> None:
+            # Queue positions report below 0.1; execution starts at 0.1
+            if progress >= 0.1 and job.state == "submitted":
+                self.store.mark_running(job)
+
+        entry = self.client.wait_for_completion(prompt_id, on_progress=on_progress)
+        if entry is None:
+            raise GenerationTimeoutError(
+                message=f"Prompt {prompt_id} did not finish", prompt_id=prompt_id
+            )
+        return entry
@@ -0,0 +1,173 @@
+"""
+Comfy Headless - JSON Codec
+===========================
+
+Fast JSON for ComfyUI payloads: /object_info is several MB, a full /history
+can be tens of MB, and every WebSocket event is a JSON frame.
+
+- Uses orjson when installed, else msgspec, else the stdlib json module
+  (http.json_backend picks one explicitly; use_backend() switches at runtime)
+- loads() takes str, bytes, bytearray or memoryview; every backend raises
+  json.JSONDecodeError on invalid input
+- dumps() returns compact UTF-8 bytes, ready to send as a request body
+- message_type() reads just the "type" of a WebSocket message, so frames
+  nobody handles are skipped without being decoded
+
+Install the fast path with: pip install comfy-headless[fastjson]
+
+Usage:
+    from comfy_headless.jsoncodec import JSON_HEADERS, dumps, loads
+
+    response = session.post(url, data=dumps(payload), headers=JSON_HEADERS)
+    data = loads(response.content)
+"""
+
+import json
+import re
+from collections.abc import Callable
+from typing import Any
+
+from .config import settings
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "BACKENDS",
+    "JSON_HEADERS",
+    "JSONDecodeError",
+    "get_backend",
+    "use_backend",
+    "loads",
+    "dumps",
+    "response_json",
+    "message_type",
+]
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BACKENDS = ("orjson", "msgspec", "json")
+JSON_HEADERS = {"Content-Type": "application/json"}
+JSONDecodeError = json.JSONDecodeError
+
+# ComfyUI serializes {"type": ..., "data": ...} with "type" first
+_TYPE_HEAD = re.compile(rb'\s*\{\s*"type"\s*:\s*"([^"\\]*)"')
+
+
+def _stdlib_loads(data: str | bytes | bytearray | memoryview) -> Any:
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _orjson_loads(data: str | bytes | bytearray | memoryview) -> Any:
+    return orjson.loads(data)  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+
+
+def _msgspec_loads(data: str | bytes | bytearray | memoryview) -> Any:
+    try:
+        return msgspec.json.decode(data)
+    except msgspec.DecodeError as e:
+        raise JSONDecodeError(str(e), "", 0) from e
+
+
+_CODECS: dict[str, tuple[Callable[[Any], Any], Callable[[Any], bytes]]] = {
+    "json": (_stdlib_loads, _stdlib_dumps),
+}
+if orjson is not None:
+    _CODECS["orjson"] = (
+        _orjson_loads,
+        lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),  # Keys like stdlib
+    )
+if msgspec is not None:
+    _CODECS["msgspec"] = (_msgspec_loads, msgspec.json.encode)
+
+_backend = "json"
+_loads, _dumps = _CODECS["json"]
+
+
+def get_backend() -> str:
+    """Name of the backend in use."""
+    return _backend
+
+
+def use_backend(name: str = "auto") -> str:
+    """
+    Switch the JSON backend.
+
+    Args:
+        name: One of BACKENDS, or "auto" for the fastest installed one
+
+    Returns:
+        The backend now in use
+
+    Raises:
+        ValueError: If the backend is unknown or not installed
+    """
+    global _backend, _loads, _dumps
+    if name == "auto":
+        name = next(backend for backend in BACKENDS if backend in _CODECS)
+    if name not in _CODECS:
+        raise ValueError(f"JSON backend {name!r} is not available (installed: {sorted(_CODECS)})")
+    _backend = name
+    _loads, _dumps = _CODECS[name]
+    logger.debug(f"JSON backend: {name}")
+    return name
+
+
+def loads(data: str | bytes | bytearray | memoryview) -> Any:
+    """
+    Decode JSON.
+
+    Raises:
+        json.JSONDecodeError: If data is not valid JSON
+    """
+    return _loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode obj as compact UTF-8 JSON."""
+    return _dumps(obj)
+
+
+def response_json(response: Any) -> Any:
+    """
+    Decode a requests or httpx response body with the selected backend.
+
+    Raises:
+        json.JSONDecodeError: If the body is not valid JSON
+    """
+    return _loads(response.content)
+
+
+def message_type(message: str | bytes) -> str | None:
+    """
+    Type of a ComfyUI WebSocket message, read without decoding the rest.
+
+    Returns None if the message doesn't start with its "type" field; decode
+    it in full to find out.
+    """
+    head = message[:256]
+    if isinstance(head, str):
+        head = head.encode()
+    match = _TYPE_HEAD.match(head)
+    return match.group(1).decode() if match else None
+
+
+try:
+    use_backend(settings.http.json_backend)
+except ValueError as e:
+    logger.warning(f"{e}; using the fastest installed one")
+    use_backend("auto")
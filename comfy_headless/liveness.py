@@ -0,0 +1,183 @@
+"""
+Comfy Headless - Backend Liveness Tracking
+===========================================
+
+Last known reachability of each ComfyUI backend, shared by all clients.
+
+The state is kept current passively: every request that gets a response
+marks the backend up, connection failures mark it down, and so do
+transitions of a circuit breaker that serves only this backend (open =
+down). Clients default to one circuit per backend ("comfyui:<url>"); a
+circuit shared by clients of several backends can't tell which backend
+failed and is not followed once a second backend watches it. is_online() /
+ensure_online() answer from this state while it is fresher than
+settings.comfyui.liveness_ttl and only probe /system_stats when it is stale,
+which saves a round trip per generation and keeps status checks off a slow
+backend.
+
+Usage:
+    from comfy_headless.liveness import get_liveness
+
+    liveness = get_liveness("http://localhost:8188")
+    online = liveness.check(probe)  # probe() -> bool, only called when stale
+"""
+
+import threading
+import time
+import weakref
+from collections.abc import Awaitable, Callable
+
+from .config import settings
+from .logging_config import get_logger
+from .retry import CircuitBreaker, CircuitState
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "LivenessTracker",
+    "get_liveness",
+    "clear_liveness",
+]
+
+
+class LivenessTracker:
+    """
+    Reachability state of one backend.
+
+    Args:
+        url: ComfyUI server URL
+        ttl: Seconds an observation stays valid (default from settings)
+    """
+
+    def __init__(self, url: str, ttl: float | None = None):
+        self.url = url
+        self.ttl = settings.comfyui.liveness_ttl if ttl is None else ttl
+        self._online: bool | None = None
+        self._updated_at = 0.0  # Monotonic
+        self._lock = threading.Lock()
+        # circuit -> listener registered on it
+        self._watched: dict[CircuitBreaker, Callable[[CircuitState, CircuitState], None]] = {}
+
+    def _record(self, online: bool, reason: str) -> None:
+        with self._lock:
+            changed = self._online is not None and self._online != online
+            self._online = online
+            self._updated_at = time.monotonic()
+        if changed:
+            logger.info(
+                f"ComfyUI {'up' if online else 'down'}: {self.url}",
+                extra={"url": self.url, "reason": reason},
+            )
+
+    def mark_up(self, reason: str = "response") -> None:
+        """Record that the backend answered."""
+        self._record(True, reason)
+
+    def mark_down(self, reason: str = "connection failed") -> None:
+        """Record that the backend could not be reached."""
+        self._record(False, reason)
+
+    def invalidate(self) -> None:
+        """Forget the state; the next check() probes."""
+        with self._lock:
+            self._online = None
+            self._updated_at = 0.0
+
+    @property
+    def state(self) -> bool | None:
+        """Fresh reachability, or None if unknown or stale."""
+        with self._lock:
+            if self._online is None or time.monotonic() - self._updated_at >= self.ttl:
+                return None
+            return self._online
+
+    def check(self, probe: Callable[[], bool]) -> bool:
+        """
+        Reachability, probing only if the state is unknown or stale.
+
+        Args:
+            probe: Returns True if the backend responds
+        """
+        state = self.state
+        if state is not None:
+            return state
+        online = bool(probe())
+        self._record(online, "probe")
+        return online
+
+    async def acheck(self, probe: Callable[[], Awaitable[bool]]) -> bool:
+        """Async check()."""
+        state = self.state
+        if state is not None:
+            return state
+        online = bool(await probe())
+        self._record(online, "probe")
+        return online
+
+    def watch(self, circuit: CircuitBreaker) -> None:
+        """
+        Follow a circuit breaker: opening marks the backend down, closing marks it up.
+
+        Transitions are ignored while the circuit is also watched for
+        another backend.
+        """
+
+        def listener(old: CircuitState, new: CircuitState) -> None:
+            self._on_circuit_change(circuit, old, new)
+
+        with self._lock:
+            if circuit in self._watched:
+                return
+            self._watched[circuit] = listener
+        with _trackers_lock:
+            _circuit_urls.setdefault(circuit, set()).add(self.url)
+        circuit.add_listener(listener)
+
+    def unwatch(self) -> None:
+        """Stop following every circuit breaker watched so far."""
+        with self._lock:
+            watched, self._watched = list(self._watched.items()), {}
+        for circuit, listener in watched:
+            circuit.remove_listener(listener)
+
+    def _on_circuit_change(
+        self, circuit: CircuitBreaker, old: CircuitState, new: CircuitState
+    ) -> None:
+        with _trackers_lock:
+            if _circuit_urls.get(circuit, {self.url}) != {self.url}:
+                return
+        if new == CircuitState.OPEN:
+            self.mark_down("circuit open")
+        elif new == CircuitState.CLOSED and old == CircuitState.HALF_OPEN:
+            self.mark_up("circuit closed")
+        elif new == CircuitState.HALF_OPEN:
+            # Recovery is being tested - let the next check probe
+            self.invalidate()
+
+
+_trackers: dict[str, LivenessTracker] = {}
+_trackers_lock = threading.Lock()
+# Circuit -> URLs of the trackers following it; entries go with the circuit
+_circuit_urls: weakref.WeakKeyDictionary[CircuitBreaker, set[str]] = weakref.WeakKeyDictionary()
+
+
+def get_liveness(base_url: str | None = None) -> LivenessTracker:
+    """Get the process-wide liveness tracker of a backend."""
+    url = (base_url or settings.comfyui.url).rstrip("/")
+    with _trackers_lock:
+        tracker = _trackers.get(url)
+        if tracker is None:
+            tracker = LivenessTracker(url)
+            _trackers[url] = tracker
+        return tracker
+
+
+def clear_liveness() -> None:
+    """Forget all trackers (e.g. between tests), detaching them from their circuits."""
+    with _trackers_lock:
+        trackers = list(_trackers.values())
+        _trackers.clear()
+        _circuit_urls.clear()
+    # Outside the registry lock: listeners take it while holding a breaker's lock
+    for tracker in trackers:
+        tracker.unwatch()
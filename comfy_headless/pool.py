@@ -0,0 +1,320 @@
+"""
+Comfy Headless - Multi-Backend Pool
+====================================
+
+Spread jobs over several ComfyUI servers. Each backend gets its own
+ComfyClient and circuit breaker; jobs are routed using /queue and
+/system_stats:
+
+- Backends that are offline or whose circuit is open are skipped
+- Backends without enough free VRAM for the job are skipped
+- A backend that last ran the job's checkpoint is preferred (the model is
+  already loaded) unless its queue is much longer than the shortest one
+- Otherwise the backend with the shortest queue wins, most free VRAM breaking ties
+
+Usage:
+    from comfy_headless import ComfyPool
+
+    with ComfyPool(["http://gpu1:8188", "http://gpu2:8188"]) as pool:
+        result = pool.generate_image("a beautiful sunset", checkpoint="sdxl.safetensors")
+        print(result["backend"])
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from .client import ComfyClient
+from .config import settings
+from .exceptions import ComfyUIOfflineError, InsufficientVRAMError
+from .logging_config import get_logger
+from .protocol import device_vram_bytes, queue_prompt_ids
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "BackendStatus",
+    "ComfyPool",
+]
+
+# Node inputs that name the checkpoint a workflow loads
+_CHECKPOINT_INPUTS = ("ckpt_name", "unet_name")
+# Prompts remembered for wait_for_completion(); the oldest are forgotten
+# first, so prompts nobody waits for don't accumulate
+_MAX_TRACKED_PROMPTS = 10_000
+
+
+def _workflow_checkpoint(workflow: dict) -> str:
+    """First checkpoint loaded by a workflow, or "" if none is found."""
+    for node in workflow.values():
+        inputs = node.get("inputs", {}) if isinstance(node, dict) else {}
+        if not isinstance(inputs, dict):
+            continue
+        for key in _CHECKPOINT_INPUTS:
+            value = inputs.get(key)
+            if isinstance(value, str) and value:
+                return value
+    return ""
+
+
+@dataclass
+class BackendStatus:
+    """Routing state of one backend."""
+
+    url: str
+    online: bool = False
+    queue_depth: int = 0  # Running + pending prompts
+    vram_free_gb: float = 0.0  # 0 when unknown
+    vram_total_gb: float = 0.0
+    checkpoint: str = ""  # Checkpoint of the last job routed here
+    updated_at: float = field(default=0.0, repr=False)  # Monotonic
+
+
+class ComfyPool:
+    """
+    Pool of ComfyUI backends with queue-depth and VRAM-aware routing.
+
+    Args:
+        backends: ComfyUI server URLs (default: settings.comfyui.url)
+        status_ttl: Seconds a backend's /queue and /system_stats stay valid
+        sticky_slack: Extra queued prompts tolerated to keep a job on the
+            backend that already has its checkpoint loaded
+        **client_kwargs: Passed to every ComfyClient (rate_limit, use_websocket, ...)
+    """
+
+    def __init__(
+        self,
+        backends: list[str] | None = None,
+        status_ttl: float = 2.0,
+        sticky_slack: int = 2,
+        **client_kwargs: Any,
+    ):
+        urls = [url.rstrip("/") for url in (backends or [settings.comfyui.url])]
+        # Keep order, drop duplicates
+        urls = list(dict.fromkeys(urls))
+
+        self.status_ttl = status_ttl
+        self.sticky_slack = sticky_slack
+        self._clients = {
+            url: ComfyClient(base_url=url, circuit_name=f"comfyui:{url}", **client_kwargs)
+            for url in urls
+        }
+        self._status = {url: BackendStatus(url=url) for url in urls}
+        self._prompts: OrderedDict[str, str] = OrderedDict()  # prompt_id -> backend URL
+        self._lock = threading.Lock()
+
+        logger.info("ComfyPool initialized", extra={"backends": len(urls)})
+
+    @property
+    def backends(self) -> list[str]:
+        """Backend URLs in configuration order."""
+        return list(self._clients)
+
+    def client(self, url: str) -> ComfyClient:
+        """Client of one backend."""
+        return self._clients[url.rstrip("/")]
+
+    def close(self) -> None:
+        """Close every backend client."""
+        for client in self._clients.values():
+            client.close()
+
+    def __enter__(self) -> "ComfyPool":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    # =========================================================================
+    # STATUS
+    # =========================================================================
+
+    def _probe(self, url: str) -> BackendStatus:
+        """Fetch /system_stats and /queue of one backend."""
+        client = self._clients[url]
+        status = BackendStatus(url=url, updated_at=time.monotonic())
+
+        if client.circuit_open:
+            return status
+        stats = client.get_system_stats()
+        if stats is None:
+            return status
+
+        queue = client.get_queue()
+        status.online = True
+        status.queue_depth = len(queue_prompt_ids(queue.get("queue_running", []))) + len(
+            queue_prompt_ids(queue.get("queue_pending", []))
+        )
+        status.vram_free_gb = device_vram_bytes(stats, "vram_free") / (1024**3)
+        status.vram_total_gb = device_vram_bytes(stats, "vram_total") / (1024**3)
+        return status
+
+    def refresh(self, force: bool = False) -> list[BackendStatus]:
+        """
+        Refresh backend status, probing all stale backends concurrently.
+
+        Args:
+            force: Probe every backend even if its status is still fresh
+
+        Returns:
+            Status of every backend
+        """
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                url
+                for url, status in self._status.items()
+                if force or now - status.updated_at >= self.status_ttl
+            ]
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=len(stale)) as executor:
+                probed = list(executor.map(self._probe, stale))
+            with self._lock:
+                for status in probed:
+                    # The checkpoint is our own bookkeeping, not reported by ComfyUI
+                    status.checkpoint = self._status[status.url].checkpoint
+                    self._status[status.url] = status
+
+        return self.status()
+
+    def status(self) -> list[BackendStatus]:
+        """Last known status of every backend (no requests)."""
+        with self._lock:
+            return [BackendStatus(**vars(status)) for status in self._status.values()]
+
+    # =========================================================================
+    # ROUTING
+    # =========================================================================
+
+    def select(self, checkpoint: str = "", vram_gb: float = 0.0) -> ComfyClient:
+        """
+        Pick the backend for a job and reserve a queue slot on it.
+
+        Args:
+            checkpoint: Checkpoint the job loads ("" if unknown)
+            vram_gb: Estimated VRAM the job needs
+
+        Returns:
+            Client of the chosen backend
+
+        Raises:
+            ComfyUIOfflineError: If no backend is reachable
+            InsufficientVRAMError: If no reachable backend has enough free VRAM
+        """
+        self.refresh()
+
+        with self._lock:
+            online = [
+                status
+                for status in self._status.values()
+                if status.online and not self._clients[status.url].circuit_open
+            ]
+            if not online:
+                raise ComfyUIOfflineError(
+                    message=f"No ComfyUI backend reachable ({len(self._status)} configured)"
+                )
+
+            def fits(status: BackendStatus) -> bool:
+                # Free VRAM is unknown (0) on some devices; a loaded
+                # checkpoint shows up as used VRAM, so sticky backends fit
+                return (
+                    vram_gb <= 0
+                    or status.vram_free_gb <= 0
+                    or status.vram_free_gb >= vram_gb
+                    or (bool(checkpoint) and status.checkpoint == checkpoint)
+                )
+
+            candidates = [status for status in online if fits(status)]
+            if not candidates:
+                raise InsufficientVRAMError(
+                    required_gb=vram_gb,
+                    available_gb=max(status.vram_free_gb for status in online),
+                )
+
+            best = min(candidates, key=lambda s: (s.queue_depth, -s.vram_free_gb))
+            if checkpoint:
+                sticky = [s for s in candidates if s.checkpoint == checkpoint]
+                if sticky:
+                    nearest = min(sticky, key=lambda s: (s.queue_depth, -s.vram_free_gb))
+                    if nearest.queue_depth <= best.queue_depth + self.sticky_slack:
+                        best = nearest
+
+            # Count the job now so a burst spreads before the next refresh
+            best.queue_depth += 1
+            if checkpoint:
+                best.checkpoint = checkpoint
+
+        logger.debug(
+            "Routed job",
+            extra={"backend": best.url, "queue_depth": best.queue_depth, "checkpoint": checkpoint},
+        )
+        return self._clients[best.url]
+
+    # =========================================================================
+    # JOBS
+    # =========================================================================
+
+    def queue_prompt(self, workflow: dict) -> tuple[ComfyClient, str] | None:
+        """
+        Queue a workflow on the best backend.
+
+        Returns:
+            (client, prompt_id), or None if queueing failed
+        """
+        client = self.select(checkpoint=_workflow_checkpoint(workflow))
+        prompt_id = client.queue_prompt(workflow)
+        if not prompt_id:
+            return None
+        with self._lock:
+            self._prompts[prompt_id] = client.base_url
+            while len(self._prompts) > _MAX_TRACKED_PROMPTS:
+                self._prompts.popitem(last=False)
+        return client, prompt_id
+
+    def wait_for_completion(self, prompt_id: str, **kwargs: Any) -> dict | None:
+        """Wait for a prompt queued through the pool (see ComfyClient.wait_for_completion)."""
+        with self._lock:
+            url = self._prompts.get(prompt_id)
+        if url is None:
+            raise KeyError(f"Prompt {prompt_id} was not queued through this pool")
+        try:
+            return self._clients[url].wait_for_completion(prompt_id, **kwargs)
+        finally:
+            with self._lock:
+                self._prompts.pop(prompt_id, None)
+
+    def generate_image(self, prompt: str, **kwargs: Any) -> dict[str, Any]:
+        """
+        Generate an image on the best backend (see ComfyClient.generate_image).
+
+        Returns:
+            ComfyClient.generate_image result plus "backend" (URL)
+        """
+        probe = next(iter(self._clients.values()))
+        vram_gb = probe.estimate_vram_for_image(
+            kwargs.get("width", 1024), kwargs.get("height", 1024)
+        )
+        client = self.select(checkpoint=kwargs.get("checkpoint", ""), vram_gb=vram_gb)
+        result = client.generate_image(prompt, **kwargs)
+        result["backend"] = client.base_url
+        return result
+
+    def generate_video(self, prompt: str, **kwargs: Any) -> dict[str, Any]:
+        """
+        Generate a video on the best backend (see ComfyClient.generate_video).
+
+        Returns:
+            ComfyClient.generate_video result plus "backend" (URL)
+        """
+        probe = next(iter(self._clients.values()))
+        vram_gb = probe.estimate_vram_for_video(
+            kwargs.get("width") or 512, kwargs.get("height") or 512, kwargs.get("frames") or 16
+        )
+        client = self.select(checkpoint=kwargs.get("checkpoint", ""), vram_gb=vram_gb)
+        result = client.generate_video(prompt, **kwargs)
+        result["backend"] = client.base_url
+        return result
@@ -0,0 +1,571 @@
+"""
+Comfy Headless - ComfyUI Protocol Helpers
+=========================================
+
+Parsing of ComfyUI responses, progress mapping and workflow builders shared
+by ComfyClient and AsyncComfyClient (and, for /queue and /system_stats, by
+admission control, ComfyPool, JobScheduler and JobStore). Everything here is
+I/O-free; the clients do the requests.
+
+Usage:
+    from comfy_headless.protocol import queue_prompt_ids
+
+    queue = client.get_queue()
+    active = queue_prompt_ids(queue["queue_running"]) | queue_prompt_ids(queue["queue_pending"])
+"""
+
+import json
+import time
+from typing import TYPE_CHECKING, Any
+
+from .downloads import output_files
+from .exceptions import ComfyUIConnectionError
+from .jsoncodec import response_json
+from .logging_config import get_logger
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+    from .websocket_client import WSProgress
+
+logger = get_logger(__name__)
+
+__all__ = [
+    # Tuning
+    "WS_RETRY_COOLDOWN",
+    "WS_LIVENESS_INTERVAL",
+    "MAX_POLL_INTERVAL",
+    # Responses
+    "safe_json_parse",
+    "safe_get_nested",
+    "queue_prompt_ids",
+    "device_vram_bytes",
+    "extract_input_options",
+    "dependency_report",
+    # Progress
+    "history_progress",
+    "queue_progress",
+    "ws_event_progress",
+    # Presets
+    "image_preset_for_vram",
+    "video_preset_for_vram",
+    # Workflows
+    "txt2img_workflow",
+    "animatediff_workflow",
+    "compile_preset_workflow",
+    "preset_video_workflow",
+    # Results
+    "finalize_image_result",
+    "finalize_video_result",
+]
+
+# Don't retry a failed WebSocket connect for this long (seconds)
+WS_RETRY_COOLDOWN = 30.0
+# While waiting on WebSocket events, check the socket is still up this often
+WS_LIVENESS_INTERVAL = 5.0
+# Upper bound for the adaptive /history polling interval; low enough that
+# clients without WebSocket events still see completion promptly
+MAX_POLL_INTERVAL = 1.0
+
+# =============================================================================
+# RESPONSES
+# =============================================================================
+
+
+def safe_json_parse(response: "requests.Response | httpx.Response", context: str = "") -> dict:
+    """
+    Safely parse JSON from a response with proper error handling.
+
+    Args:
+        response: The requests or httpx Response object
+        context: Description of what we were trying to do (for error messages)
+
+    Returns:
+        Parsed JSON as dict
+
+    Raises:
+        ComfyUIConnectionError: If JSON parsing fails
+    """
+    try:
+        data: dict = response_json(response)
+    except json.JSONDecodeError as e:
+        logger.error(
+            f"Invalid JSON response{f' ({context})' if context else ''}",
+            extra={"error": str(e), "response_text": response.text[:200] if response.text else ""},
+        )
+        raise ComfyUIConnectionError(
+            message=f"Invalid JSON response from ComfyUI{f' while {context}' if context else ''}",
+            url=str(response.url),
+            cause=e,
+        ) from e
+    return data
+
+
+def safe_get_nested(data: Any, *keys: str, default: Any = None) -> Any:
+    """
+    Safely navigate nested dictionaries without raising KeyError or TypeError.
+
+    Args:
+        data: The root dictionary to navigate
+        *keys: Sequence of keys to traverse
+        default: Value to return if path doesn't exist or has wrong type
+
+    Returns:
+        The value at the nested path, or default if not found
+
+    Example:
+        safe_get_nested(workflow, "3", "inputs", "seed", default=-1)
+    """
+    current = data
+    for key in keys:
+        if not isinstance(current, dict):
+            return default
+        current = current.get(key)
+        if current is None:
+            return default
+    return current
+
+
+def queue_prompt_ids(items: Any) -> set[str]:
+    """Extract prompt IDs from a /queue running or pending list."""
+    if not isinstance(items, list):
+        return set()
+    return {
+        item[1]
+        for item in items
+        if isinstance(item, list) and len(item) > 1 and isinstance(item[1], str)
+    }
+
+
+def device_vram_bytes(stats: dict | None, key: str) -> float:
+    """Read a VRAM figure (vram_total / vram_free) for the first device in /system_stats."""
+    if not stats:
+        return 0
+    # ComfyUI returns devices array with vram_total in bytes
+    devices = stats.get("devices", [])
+    if devices:
+        return float(devices[0].get(key, 0))
+    return 0
+
+
+def extract_input_options(data: Any, node_type: str, input_name: str) -> list[str]:
+    """
+    Extract the option list for a required input from /object_info data.
+
+    Args:
+        data: Parsed /object_info or /object_info/<node_type> response
+        node_type: Node class_type to look up
+        input_name: Required input whose options should be returned
+
+    Returns:
+        List of options, or an empty list if the path is missing or malformed
+    """
+    # Safe dictionary navigation with bounds checking
+    options = safe_get_nested(data, node_type, "input", "required", input_name, default=[])
+    # Options should be a list with at least one element (the options list)
+    if isinstance(options, list) and len(options) > 0:
+        first_element = options[0]
+        if isinstance(first_element, list):
+            return first_element
+    return []
+
+
+def dependency_report(
+    workflow: dict, installed_nodes: "set[str] | frozenset[str]"
+) -> dict[str, Any]:
+    """Compare the class_types used by a workflow against the installed node set."""
+    # Extract all class_types from the workflow
+    workflow_nodes: dict[str, list[str]] = {}
+    for node_id, node in workflow.items():
+        if isinstance(node, dict) and "class_type" in node:
+            workflow_nodes.setdefault(node["class_type"], []).append(node_id)
+
+    installed = [class_type for class_type in workflow_nodes if class_type in installed_nodes]
+    missing = [class_type for class_type in workflow_nodes if class_type not in installed_nodes]
+
+    return {
+        "installed": sorted(installed),
+        "missing": sorted(missing),
+        "all_installed": len(missing) == 0,
+        "details": workflow_nodes,
+        "total_nodes": sum(len(ids) for ids in workflow_nodes.values()),
+        "unique_types": len(workflow_nodes),
+    }
+
+
+# =============================================================================
+# PROGRESS
+# =============================================================================
+
+
+def history_progress(status: dict, elapsed: float, timeout: float) -> tuple[float, str]:
+    """Estimate (progress, status message) for a prompt that is in /history."""
+    if status.get("status_str", "processing") == "queued":
+        return 0.05, "Queued"
+    # Estimate progress based on elapsed time
+    time_progress = min(0.95, elapsed / timeout)
+    return max(0.1, time_progress), f"Processing ({elapsed:.0f}s)"
+
+
+def queue_progress(queue: dict, prompt_id: str) -> tuple[float, str]:
+    """Estimate (progress, status message) for a prompt that is not in /history yet."""
+    pending = queue.get("queue_pending", [])
+    running = queue.get("queue_running", [])
+
+    if prompt_id in queue_prompt_ids(running):
+        return 0.1, "Starting"
+
+    # Find position in queue
+    for i, item in enumerate(pending if isinstance(pending, list) else []):
+        if isinstance(item, list) and len(item) > 1 and item[1] == prompt_id:
+            return 0.02, f"Queue position {i + 1}"
+
+    return 0.05, "Waiting"
+
+
+def ws_event_progress(event: "WSProgress") -> tuple[float, str] | None:
+    """Map a WebSocket progress event to (progress, status message), if reportable."""
+    if event.status == "started":
+        return 0.1, "Starting"
+    if event.status == "progress":
+        return 0.1 + 0.85 * min(event.normalized, 1.0), (
+            f"Step {int(event.progress)}/{int(event.max_progress)}"
+        )
+    return None
+
+
+# =============================================================================
+# PRESETS
+# =============================================================================
+
+
+def image_preset_for_vram(vram: float, intent: str = "general") -> str:
+    """Pick an image preset for the given VRAM (GB) and intent."""
+    if vram < 6:
+        return "draft"
+    elif vram < 8:
+        return "fast"
+    elif vram < 12:
+        if intent == "portrait":
+            return "portrait"
+        elif intent == "landscape":
+            return "landscape"
+        return "quality"
+    else:  # 12GB+
+        if intent in ("cinematic", "film"):
+            return "cinematic"
+        return "hd"
+
+
+def video_preset_for_vram(vram: float, intent: str = "general") -> str:
+    """Pick a video preset for the given VRAM (GB) and intent."""
+    try:
+        from .video import get_recommended_preset
+
+        return get_recommended_preset(intent=intent, vram_gb=vram)
+    except ImportError:
+        # Fallback if video module unavailable
+        # v2.5.0: Updated recommendations with new models
+        if vram < 8:
+            return "quick"  # AnimateDiff Lightning
+        elif vram < 12:
+            return "wan_1.3b"  # Wan 1.3B is efficient
+        elif vram < 16:
+            return "ltx_standard"  # LTX-Video is great at 16GB
+        elif vram < 24:
+            return "hunyuan15_720p"  # Hunyuan 1.5 at 720p
+        else:
+            return "hunyuan15_quality"  # Full quality Hunyuan 1.5
+
+
+# =============================================================================
+# WORKFLOWS
+# =============================================================================
+
+
+def txt2img_workflow(
+    prompt: str,
+    negative_prompt: str,
+    checkpoint: str,
+    width: int = 1024,
+    height: int = 1024,
+    steps: int = 20,
+    cfg: float = 7.0,
+    sampler: str = "euler",
+    scheduler: str = "normal",
+    seed: int = -1,
+    batch_size: int = 1,
+) -> dict:
+    """Build a basic txt2img workflow for an already-resolved checkpoint."""
+    if seed == -1:
+        seed = int(time.time() * 1000) % (2**32)
+
+    return {
+        "3": {
+            "class_type": "KSampler",
+            "inputs": {
+                "cfg": cfg,
+                "denoise": 1.0,
+                "latent_image": ["5", 0],
+                "model": ["4", 0],
+                "negative": ["7", 0],
+                "positive": ["6", 0],
+                "sampler_name": sampler,
+                "scheduler": scheduler,
+                "seed": seed,
+                "steps": steps,
+            },
+        },
+        "4": {
+            "class_type": "CheckpointLoaderSimple",
+            "inputs": {"ckpt_name": checkpoint},
+        },
+        "5": {
+            "class_type": "EmptyLatentImage",
+            "inputs": {"batch_size": batch_size, "height": height, "width": width},
+        },
+        "6": {
+            "class_type": "CLIPTextEncode",
+            "inputs": {"clip": ["4", 1], "text": prompt},
+        },
+        "7": {
+            "class_type": "CLIPTextEncode",
+            "inputs": {
+                "clip": ["4", 1],
+                "text": negative_prompt or "bad quality, blurry, distorted",
+            },
+        },
+        "8": {
+            "class_type": "VAEDecode",
+            "inputs": {"samples": ["3", 0], "vae": ["4", 2]},
+        },
+        "9": {
+            "class_type": "SaveImage",
+            "inputs": {"filename_prefix": "comfy_headless", "images": ["8", 0]},
+        },
+    }
+
+
+def animatediff_workflow(
+    prompt: str,
+    negative_prompt: str,
+    checkpoint: str,
+    motion_model: str,
+    width: int = 512,
+    height: int = 512,
+    frames: int = 16,
+    fps: int = 8,
+    steps: int = 20,
+    cfg: float = 7.0,
+    seed: int = -1,
+    motion_scale: float = 1.0,
+) -> dict:
+    """Build an AnimateDiff workflow for an already-resolved checkpoint and motion model."""
+    if seed == -1:
+        seed = int(time.time() * 1000) % (2**32)
+
+    return {
+        "1": {
+            "class_type": "CheckpointLoaderSimple",
+            "inputs": {"ckpt_name": checkpoint},
+        },
+        "2": {
+            "class_type": "ADE_LoadAnimateDiffModel",
+            "inputs": {"model_name": motion_model},
+        },
+        "3": {
+            "class_type": "ADE_ApplyAnimateDiffModel",
+            "inputs": {
+                "model": ["1", 0],
+                "motion_model": ["2", 0],
+                "scale_multival": motion_scale,
+            },
+        },
+        "4": {
+            "class_type": "ADE_EmptyLatentImageLarge",
+            "inputs": {"width": width, "height": height, "batch_size": frames},
+        },
+        "5": {
+            "class_type": "CLIPTextEncode",
+            "inputs": {"text": prompt, "clip": ["1", 1]},
+        },
+        "6": {
+            "class_type": "CLIPTextEncode",
+            "inputs": {
+                "text": negative_prompt or "bad quality, blurry, distorted",
+                "clip": ["1", 1],
+            },
+        },
+        "7": {
+            "class_type": "KSampler",
+            "inputs": {
+                "model": ["3", 0],
+                "positive": ["5", 0],
+                "negative": ["6", 0],
+                "latent_image": ["4", 0],
+                "seed": seed,
+                "steps": steps,
+                "cfg": cfg,
+                "sampler_name": "euler",
+                "scheduler": "normal",
+                "denoise": 1.0,
+            },
+        },
+        "8": {
+            "class_type": "VAEDecode",
+            "inputs": {"samples": ["7", 0], "vae": ["1", 2]},
+        },
+        "9": {
+            "class_type": "VHS_VideoCombine",
+            "inputs": {
+                "images": ["8", 0],
+                "frame_rate": fps,
+                "loop_count": 0,
+                "filename_prefix": "comfy_headless_video",
+                "format": "video/h264-mp4",
+                "save_output": True,
+            },
+        },
+    }
+
+
+def compile_preset_workflow(
+    prompt: str,
+    negative_prompt: str,
+    preset: str,
+    checkpoint: str,
+    sampler: str,
+    scheduler: str,
+    seed: int,
+) -> dict | None:
+    """
+    Compile an image workflow from a generation preset.
+
+    Returns:
+        The compiled workflow, or None when the caller should fall back to
+        the legacy txt2img builder.
+    """
+    try:
+        from .workflows import GENERATION_PRESETS, compile_workflow
+
+        if preset not in GENERATION_PRESETS:
+            logger.warning(f"Unknown preset '{preset}', falling back to legacy")
+            return None
+
+        compiled = compile_workflow(
+            prompt=prompt,
+            negative=negative_prompt,
+            preset=preset,
+            checkpoint=checkpoint or "auto",
+            sampler=sampler,
+            scheduler=scheduler,
+            seed=seed,
+        )
+        if compiled.is_valid:
+            logger.debug(f"Using WorkflowCompiler with preset '{preset}'")
+            return compiled.workflow
+        logger.warning(f"Workflow compilation errors: {compiled.errors}")
+    except Exception as e:
+        logger.warning(f"WorkflowCompiler failed: {e}, using legacy builder")
+    return None
+
+
+def preset_video_workflow(
+    prompt: str,
+    negative_prompt: str,
+    preset: str,
+    init_image: str | None = None,
+    checkpoint: str = "",
+    width: int | None = None,
+    height: int | None = None,
+    frames: int | None = None,
+    fps: int | None = None,
+    steps: int | None = None,
+    cfg: float | None = None,
+    seed: int = -1,
+    motion_scale: float | None = None,
+) -> tuple[dict, int]:
+    """
+    Build a video workflow from a preset using VideoWorkflowBuilder.
+
+    Returns:
+        Tuple of (workflow, actual seed used)
+
+    Raises:
+        Exception: Any builder error, so the caller can fall back to AnimateDiff
+    """
+    from .video import build_video_workflow
+
+    # Build overrides dict from non-None parameters
+    overrides: dict[str, Any] = {}
+    if checkpoint:
+        overrides["checkpoint"] = checkpoint
+    if width is not None:
+        overrides["width"] = width
+    if height is not None:
+        overrides["height"] = height
+    if frames is not None:
+        overrides["frames"] = frames
+    if fps is not None:
+        overrides["fps"] = fps
+    if steps is not None:
+        overrides["steps"] = steps
+    if cfg is not None:
+        overrides["cfg"] = cfg
+    if seed != -1:
+        overrides["seed"] = seed
+    if motion_scale is not None:
+        overrides["motion_scale"] = motion_scale
+
+    workflow = build_video_workflow(
+        prompt=prompt,
+        negative=negative_prompt or "ugly, blurry, low quality, distorted",
+        preset=preset,
+        init_image=init_image,
+        **overrides,
+    )
+
+    # Extract actual seed from workflow (video.py generates random if -1)
+    # Find KSampler node and extract seed (safe access)
+    if isinstance(workflow, dict):
+        for node in workflow.values():
+            if isinstance(node, dict) and node.get("class_type") in (
+                "KSampler",
+                "HunyuanVideoSampler",
+            ):
+                return workflow, safe_get_nested(node, "inputs", "seed", default=seed)
+    return workflow, seed
+
+
+# =============================================================================
+# RESULTS
+# =============================================================================
+
+
+def finalize_image_result(result: dict[str, Any], history: dict) -> dict[str, Any]:
+    """Fill a generation result dict from a completed history entry."""
+    status = history.get("status", {})
+    if status.get("status_str") == "error":
+        error_msgs = status.get("messages", [["Unknown error"]])
+        result["error"] = str(error_msgs[0] if error_msgs else "Unknown error")
+        return result
+
+    # Extract images (with type validation)
+    result["images"].extend(output_files(history, ("images",)))
+    result["success"] = len(result["images"]) > 0
+    return result
+
+
+def finalize_video_result(result: dict[str, Any], history: dict) -> dict[str, Any]:
+    """Fill a video generation result dict from a completed history entry."""
+    status = history.get("status", {})
+    if status.get("status_str") == "error":
+        error_msgs = status.get("messages", [["Unknown error"]])
+        result["error"] = str(error_msgs[0] if error_msgs else "Unknown error")
+        return result
+
+    # Extract videos (check both 'gifs' and 'videos' keys, with type validation)
+    result["videos"].extend(output_files(history, ("gifs", "videos")))
+    result["success"] = len(result["videos"]) > 0
+    return result
@@ -0,0 +1,400 @@
+"""
+Comfy Headless - Generation Result Cache
+=========================================
+
+Opt-in, content-addressed cache of finished generations.
+
+A workflow with a fixed seed always produces the same outputs, so its
+canonical hash (compute_workflow_hash) identifies the result:
+
+- Outputs are stored as files in a size-bounded disk store (least recently
+  used entries are evicted first)
+- A cache hit returns the stored history with every output ref tagged
+  with the entry's backend URL and workflow key; download_outputs reads
+  tagged refs from the store instead of ComfyUI. Untagged refs (e.g. a
+  plain get_image(filename)) are never served from the cache, since other
+  generations reuse the same output file names
+- Outputs are streamed into a staging dir inside the store and moved into
+  place, so caching never holds a result in memory
+- Concurrent identical submissions are merged into one ComfyUI job whose
+  result fans out to every caller (per event loop for async clients)
+
+Enable per client (ComfyClient(result_cache=True)) or globally with
+COMFY_HEADLESS_GENERATION__RESULT_CACHE=true.
+
+Usage:
+    from comfy_headless.result_cache import get_result_cache
+
+    cache = get_result_cache()
+    entry = cache.get(cache.key(workflow))
+    if entry:
+        history = cache.tagged_history(entry)
+        data = cache.read(output_files(history)[0])
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TypeVar
+
+from .config import get_cache_dir, settings
+from .logging_config import get_logger
+from .retry import SingleFlight
+from .workflows import compute_workflow_hash
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "CachedResult",
+    "ResultCache",
+    "get_result_cache",
+]
+
+T = TypeVar("T")
+
+_ENTRY_FILE = "entry.json"
+# Temp dirs of unfinished stores older than this are removed when scanning
+_STALE_TMP_SECONDS = 3600
+
+
+def _ref_key(url: str, key: str, ref: dict[str, Any]) -> tuple[str, str, str, str, str]:
+    return (
+        url,
+        key,
+        ref.get("filename") or "",
+        ref.get("subfolder", ""),
+        ref.get("type", "output"),
+    )
+
+
+@dataclass
+class CachedResult:
+    """One cached generation."""
+
+    key: str
+    prompt_id: str
+    history: dict[str, Any] = field(repr=False)
+    files: list[dict[str, Any]] = field(default_factory=list)  # Output refs + "path"
+    created_at: float = 0.0
+    size: int = 0  # Bytes of stored outputs
+    url: str = ""  # Backend the outputs were downloaded from
+
+
+@dataclass
+class _AsyncRun:
+    """A shared async run and the number of callers awaiting it."""
+
+    task: "asyncio.Task[Any]"
+    waiters: int = 0
+
+
+class ResultCache:
+    """
+    Size-bounded disk store of generation results keyed by workflow hash.
+
+    Thread-safe. Entries live in "<directory>/<key>/" as the output files
+    plus an entry.json with the prompt's history.
+
+    Args:
+        directory: Store location (default: "<cache dir>/results")
+        max_bytes: Size bound for stored outputs
+            (default: settings.generation.result_cache_max_mb)
+    """
+
+    def __init__(self, directory: str | os.PathLike | None = None, max_bytes: int | None = None):
+        self.directory = Path(directory) if directory else get_cache_dir() / "results"
+        if max_bytes is None:
+            max_bytes = settings.generation.result_cache_max_mb * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, CachedResult] | None = None  # LRU order
+        self._refs: dict[tuple[str, str, str, str, str], Path] = {}
+        self._flights = SingleFlight()
+        # (event loop id, key) -> shared run and its number of waiters
+        self._async_runs: dict[tuple[int, str], _AsyncRun] = {}
+
+    @staticmethod
+    def key(workflow: dict[str, Any]) -> str:
+        """Cache key of a workflow (its canonical hash)."""
+        return compute_workflow_hash(workflow)
+
+    # =========================================================================
+    # LOOKUP
+    # =========================================================================
+
+    def get(self, key: str) -> CachedResult | None:
+        """Get a cached result, marking it recently used."""
+        with self._lock:
+            entries = self._index()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            if not all(Path(ref["path"]).exists() for ref in entry.files):
+                self._drop(key)
+                return None
+            entries.move_to_end(key)
+        with contextlib.suppress(OSError):
+            os.utime(self.directory / key)
+        return entry
+
+    def tagged_history(self, entry: CachedResult) -> dict[str, Any]:
+        """Copy of an entry's history whose output refs carry its cache tag."""
+        tag = {"url": entry.url, "key": entry.key}
+        history = dict(entry.history)
+        outputs = history.get("outputs")
+        if isinstance(outputs, dict):
+            history["outputs"] = {
+                node_id: {
+                    kind: [
+                        {**item, "cache": tag} if isinstance(item, dict) else item for item in items
+                    ]
+                    if isinstance(items, list)
+                    else items
+                    for kind, items in node_output.items()
+                }
+                if isinstance(node_output, dict)
+                else node_output
+                for node_id, node_output in outputs.items()
+            }
+        return history
+
+    def path_for(self, ref: dict[str, Any]) -> Path | None:
+        """Local copy of an output ref from tagged_history(), if still cached."""
+        tag = ref.get("cache")
+        if not isinstance(tag, dict):
+            return None
+        with self._lock:
+            self._index()
+            path = self._refs.get(_ref_key(tag.get("url", ""), tag.get("key", ""), ref))
+        return path if path is not None and path.exists() else None
+
+    def read(self, ref: dict[str, Any]) -> bytes | None:
+        """Bytes of a cached output ref, or None if not cached."""
+        path = self.path_for(ref)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index())
+
+    @property
+    def size(self) -> int:
+        """Bytes of stored outputs."""
+        with self._lock:
+            return sum(entry.size for entry in self._index().values())
+
+    # =========================================================================
+    # STORE
+    # =========================================================================
+
+    def staging_dir(self, key: str) -> Path:
+        """
+        New temp dir in the store to download a result's outputs into.
+
+        put() moves the files out of it; the caller removes the dir
+        afterwards (leftovers are cleaned up by a later scan).
+        """
+        with self._lock:
+            self._index()  # Scan before creating the temp dir
+        path = self._tmp_dir(key)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def put(
+        self,
+        key: str,
+        prompt_id: str,
+        history: dict[str, Any],
+        outputs: list[tuple[dict[str, Any], Path]],
+        url: str = "",
+    ) -> CachedResult | None:
+        """
+        Store a finished generation, moving its output files into the store.
+
+        Args:
+            key: Workflow hash
+            prompt_id: ComfyUI prompt ID of the run
+            history: History entry of the run
+            outputs: (output ref, local file) for every output file, ideally
+                downloaded into staging_dir(key) so the move is a rename
+            url: Backend the run and its outputs came from
+
+        Returns:
+            The stored entry, or None if it is larger than the whole cache
+            or can't be stored
+        """
+        try:
+            size = sum(path.stat().st_size for _, path in outputs)
+        except OSError as e:
+            logger.warning(f"Failed to cache result: {e}", extra={"key": key})
+            return None
+        if size > self.max_bytes:
+            logger.debug("Result too large to cache", extra={"key": key, "size": size})
+            return None
+
+        with self._lock:
+            self._index()  # Scan before creating the temp dir
+
+        entry_dir = self.directory / key
+        tmp_dir = self._tmp_dir(key)
+        files = []
+        try:
+            tmp_dir.mkdir(parents=True, exist_ok=True)
+            for index, (ref, path) in enumerate(outputs):
+                name = f"{index}_{Path(ref.get('filename') or 'output').name}"
+                shutil.move(path, tmp_dir / name)
+                files.append({**ref, "path": str(entry_dir / name)})
+            entry = CachedResult(
+                key=key,
+                prompt_id=prompt_id,
+                history=history,
+                files=files,
+                created_at=time.time(),
+                size=size,
+                url=url,
+            )
+            with open(tmp_dir / _ENTRY_FILE, "w", encoding="utf-8") as f:
+                json.dump(vars(entry), f)
+
+            with self._lock:
+                entries = self._index()
+                if key in entries:
+                    self._drop(key)
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir)
+                self._add(entry)
+                self._evict()
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Failed to cache result: {e}", extra={"key": key})
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return None
+
+        logger.debug("Cached result", extra={"key": key, "files": len(files), "size": size})
+        return entry
+
+    def run(self, key: str, fn: Callable[[], T]) -> T:
+        """Run fn, merging concurrent calls for the same key into one."""
+        return self._flights.do(key, fn)
+
+    async def arun(self, key: str, fn: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        """
+        Async run(): merge concurrent calls for the same key on this event loop.
+
+        Every caller awaits the shared run through a shield, so cancelling one
+        caller (e.g. a wait_for timeout) doesn't cancel the others; the run
+        itself is cancelled once no caller is waiting for it.
+        """
+        loop = asyncio.get_running_loop()
+        run_key = (id(loop), key)
+        with self._lock:
+            run = self._async_runs.get(run_key)
+            if run is None or run.task.done() or run.task.get_loop() is not loop:
+                run = _AsyncRun(loop.create_task(fn()))
+                self._async_runs[run_key] = run
+                run.task.add_done_callback(lambda _: self._forget_run(run_key, run))
+            run.waiters += 1
+        try:
+            result: T = await asyncio.shield(run.task)
+            return result
+        finally:
+            with self._lock:
+                run.waiters -= 1
+                abandoned = run.waiters == 0 and not run.task.done()
+                if abandoned and self._async_runs.get(run_key) is run:
+                    # Later callers start afresh instead of joining a cancelled run
+                    del self._async_runs[run_key]
+            if abandoned:
+                run.task.cancel()
+
+    def clear(self) -> None:
+        """Remove every cached result."""
+        with self._lock:
+            for key in list(self._index()):
+                self._drop(key)
+
+    def _tmp_dir(self, key: str) -> Path:
+        return self.directory / f".{key}.{os.getpid()}.{uuid.uuid4().hex[:12]}.tmp"
+
+    def _forget_run(self, run_key: tuple[int, str], run: "_AsyncRun") -> None:
+        with self._lock:
+            if self._async_runs.get(run_key) is run:
+                del self._async_runs[run_key]
+
+    # =========================================================================
+    # INDEX (call with self._lock held)
+    # =========================================================================
+
+    def _index(self) -> "OrderedDict[str, CachedResult]":
+        """Entries in LRU order, scanning the store on first use."""
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = OrderedDict()
+        found = []
+        if self.directory.is_dir():
+            for entry_dir in self.directory.iterdir():
+                if entry_dir.name.startswith("."):
+                    # Left by an interrupted put() (possibly another process's in-flight one)
+                    with contextlib.suppress(OSError):
+                        if time.time() - entry_dir.stat().st_mtime > _STALE_TMP_SECONDS:
+                            shutil.rmtree(entry_dir, ignore_errors=True)
+                    continue
+                try:
+                    with open(entry_dir / _ENTRY_FILE, encoding="utf-8") as f:
+                        entry = CachedResult(**json.load(f))
+                    found.append((entry_dir.stat().st_mtime, entry))
+                except (OSError, TypeError, ValueError):
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._add(entry)
+        self._evict()
+        return self._entries
+
+    def _add(self, entry: CachedResult) -> None:
+        self._index()[entry.key] = entry
+        for ref in entry.files:
+            self._refs[_ref_key(entry.url, entry.key, ref)] = Path(ref["path"])
+
+    def _drop(self, key: str) -> None:
+        entry = self._index().pop(key, None)
+        if entry is not None:
+            for ref in entry.files:
+                self._refs.pop(_ref_key(entry.url, entry.key, ref), None)
+        shutil.rmtree(self.directory / key, ignore_errors=True)
+
+    def _evict(self) -> None:
+        entries = self._index()
+        total = sum(entry.size for entry in entries.values())
+        while total > self.max_bytes and entries:
+            key, entry = next(iter(entries.items()))
+            total -= entry.size
+            self._drop(key)
+            logger.debug("Evicted cached result", extra={"key": key})
+
+
+_cache: ResultCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Get the process-wide result cache."""
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
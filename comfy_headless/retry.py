@@ -28,11 +28,11 @@ import functools
 import random
 import threading
 import time
-from collections.abc import Callable
+from collections.abc import Callable, Hashable
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import TypeVar
+from typing import Any, TypeVar
 
 from .config import settings
 from .exceptions import CircuitOpenError, RetryExhaustedError
@@ -53,6 +53,8 @@ __all__ = [
     "get_circuit_breaker",
     # Rate limiter
     "RateLimiter",
+    # Request coalescing
+    "SingleFlight",
     # Timeout
     "OperationTimeoutError",
     "with_timeout",
@@ -370,7 +372,7 @@ class CircuitState(Enum):
     HALF_OPEN = "half_open"  # Testing if recovered
 
 
-@dataclass
+@dataclass(eq=False)
 class CircuitBreaker:
     """
     Circuit breaker pattern implementation.
@@ -410,6 +412,36 @@ class CircuitBreaker:
     _last_failure_time: datetime | None = field(default=None, init=False)
     _success_count_half_open: int = field(default=0, init=False)
     _lock: threading.RLock = field(default_factory=threading.RLock, init=False)
+    _listeners: list[Callable[[CircuitState, CircuitState], None]] = field(
+        default_factory=list, init=False, repr=False
+    )
+
+    def add_listener(self, callback: Callable[[CircuitState, CircuitState], None]) -> None:
+        """
+        Call callback(old_state, new_state) on every state change.
+
+        Callbacks run with the breaker's lock held and must not block.
+        """
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[CircuitState, CircuitState], None]) -> None:
+        """Stop calling a state change callback."""
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _transition(self, new_state: CircuitState) -> None:
+        """Change state (lock held) and notify listeners."""
+        old_state, self._state = self._state, new_state
+        if old_state == new_state:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(old_state, new_state)
+            except Exception as e:
+                logger.debug(f"Circuit {self.name} listener error: {e}")
 
     @property
     def state(self) -> CircuitState:
@@ -435,7 +467,7 @@ class CircuitBreaker:
                     f"Circuit {self.name}: OPEN -> HALF_OPEN after {elapsed:.1f}s",
                     extra={"circuit": self.name, "transition": "open_to_half_open"},
                 )
-                self._state = CircuitState.HALF_OPEN
+                self._transition(CircuitState.HALF_OPEN)
                 self._success_count_half_open = 0
 
     def allow_request(self) -> bool:
@@ -456,7 +488,7 @@ class CircuitBreaker:
                         f"Circuit {self.name}: HALF_OPEN -> CLOSED after {self._success_count_half_open} successes",
                         extra={"circuit": self.name, "transition": "half_open_to_closed"},
                     )
-                    self._state = CircuitState.CLOSED
+                    self._transition(CircuitState.CLOSED)
                     self._failure_count = 0
 
             elif self._state == CircuitState.CLOSED:
@@ -476,7 +508,7 @@ class CircuitBreaker:
                     f"Circuit {self.name}: HALF_OPEN -> OPEN after failure",
                     extra={"circuit": self.name, "transition": "half_open_to_open"},
                 )
-                self._state = CircuitState.OPEN
+                self._transition(CircuitState.OPEN)
 
             elif self._state == CircuitState.CLOSED:
                 if self._failure_count >= self.failure_threshold:
@@ -488,12 +520,12 @@ class CircuitBreaker:
                             "failures": self._failure_count,
                         },
                     )
-                    self._state = CircuitState.OPEN
+                    self._transition(CircuitState.OPEN)
 
     def reset(self):
         """Reset the circuit breaker to closed state."""
         with self._lock:
-            self._state = CircuitState.CLOSED
+            self._transition(CircuitState.CLOSED)
             self._failure_count = 0
             self._last_failure_time = None
             self._success_count_half_open = 0
@@ -653,6 +685,95 @@ class RateLimiter:
             time.sleep(self.per_seconds / self.rate)
 
 
+# =============================================================================
+# REQUEST COALESCING
+# =============================================================================
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one.
+
+    While a call for a key is in flight, other callers with the same key
+    wait for it and share its result (or exception) instead of repeating it.
+    With ttl > 0 a finished result is also reused for ttl seconds, which
+    absorbs bursts of sequential calls.
+
+    Usage:
+        flights = SingleFlight()
+
+        # Ten threads calling this at once make one request
+        response = flights.do(("GET", url), lambda: session.get(url))
+    """
+
+    # Expired micro-TTL results are pruned once this many are stored
+    _PRUNE_AT = 256
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, concurrent.futures.Future[Any]] = {}
+        self._results: dict[Hashable, tuple[float, Any]] = {}
+        self.calls = 0  # Calls that actually ran
+        self.shared = 0  # Calls answered by another caller's result
+
+    def do(self, key: Hashable, fn: Callable[[], T], ttl: float = 0.0) -> T:
+        """
+        Run fn, or share the result of an identical in-flight call.
+
+        Args:
+            key: Identity of the call
+            fn: The call itself
+            ttl: Seconds a finished result keeps being reused (0 = in-flight only)
+
+        Returns:
+            The result of fn (possibly from another caller)
+        """
+        with self._lock:
+            if ttl > 0:
+                cached = self._results.get(key)
+                if cached is not None and time.monotonic() - cached[0] < ttl:
+                    self.shared += 1
+                    shared: T = cached[1]
+                    return shared
+            pending = self._calls.get(key)
+            if pending is None:
+                future: concurrent.futures.Future[Any] = concurrent.futures.Future()
+                self._calls[key] = future
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if pending is not None:
+            shared = pending.result()
+            return shared
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._calls[key]
+            if ttl > 0:
+                now = time.monotonic()
+                if len(self._results) >= self._PRUNE_AT:
+                    self._results = {k: v for k, v in self._results.items() if now - v[0] < ttl}
+                self._results[key] = (now, result)
+        future.set_result(result)
+        return result
+
+    def forget(self, key: Hashable | None = None) -> None:
+        """Drop cached results (all of them if key is None)."""
+        with self._lock:
+            if key is None:
+                self._results.clear()
+            else:
+                self._results.pop(key, None)
+
+
 # =============================================================================
 # TIMEOUT UTILITIES
 # =============================================================================
@@ -0,0 +1,445 @@
+"""
+Comfy Headless - Job Scheduler
+==============================
+
+Priority and per-tenant fair scheduling in front of ComfyUI's FIFO /prompt
+queue. Jobs wait locally and are released to a backend only while fewer
+than queue_depth of the scheduler's prompts are queued or running on it, so
+a bulk batch never builds a long ComfyUI queue for interactive work to wait
+behind:
+
+- Priority classes are served strictly in order, URGENT first
+- Within a class, tenants share releases in proportion to their weight
+  (weighted fair queueing); each tenant's jobs stay in submission order
+- URGENT jobs ignore the depth limit and are queued with ComfyUI's "front"
+  flag, so they run next
+- A slot frees up when its job is waited on through ScheduledJob.wait(), or
+  when a /queue poll no longer lists the prompt
+
+Usage:
+    from comfy_headless import ComfyClient, JobScheduler, Priority
+
+    with ComfyClient() as client, JobScheduler(client, queue_depth=2) as scheduler:
+        job = scheduler.submit(workflow, tenant="alice", priority=Priority.INTERACTIVE)
+        history = job.wait(timeout=120)
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections.abc import Iterable
+from enum import IntEnum
+from typing import Any
+
+from .client import ComfyClient
+from .config import settings
+from .exceptions import QueueError
+from .logging_config import get_logger
+from .pool import ComfyPool
+from .protocol import queue_prompt_ids
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "Priority",
+    "ScheduledJob",
+    "JobScheduler",
+]
+
+
+class Priority(IntEnum):
+    """Scheduling class of a job; lower values are released first."""
+
+    URGENT = 0
+    INTERACTIVE = 1
+    NORMAL = 2
+    BULK = 3
+
+
+class ScheduledJob:
+    """
+    A workflow held by a JobScheduler until it is released to a backend.
+
+    state is "pending" while held locally, then "queued" once on ComfyUI,
+    and finally "done", "failed" or "cancelled".
+    """
+
+    def __init__(self, scheduler: "JobScheduler", workflow: dict, tenant: str, priority: Priority):
+        self.id = uuid.uuid4().hex
+        self.workflow = workflow
+        self.tenant = tenant
+        self.priority = priority
+        self.client: ComfyClient | None = None
+        self.prompt_id: str | None = None
+        self.error: BaseException | None = None
+        self.submitted_at = time.monotonic()
+        self.released_at: float | None = None
+        self.state = "pending"
+        self._scheduler = scheduler
+        self._released = threading.Event()
+
+    def __repr__(self) -> str:
+        return (
+            f"ScheduledJob(tenant={self.tenant!r}, priority={self.priority.name}, "
+            f"state={self.state!r}, prompt_id={self.prompt_id!r})"
+        )
+
+    def result(self, timeout: float | None = None) -> str:
+        """
+        Wait until the job is queued on a backend.
+
+        Returns:
+            The ComfyUI prompt_id
+
+        Raises:
+            TimeoutError: If the job is still held after timeout seconds
+            QueueError: If the job was cancelled or couldn't be queued
+        """
+        if not self._released.wait(timeout):
+            raise TimeoutError(f"Job {self.id[:8]} not released within {timeout}s")
+        if self.state == "cancelled":
+            raise QueueError(f"Job {self.id[:8]} was cancelled")
+        if self.error is not None:
+            raise self.error
+        if self.prompt_id is None:
+            raise QueueError(f"Job {self.id[:8]} was not queued")
+        return self.prompt_id
+
+    def wait(self, timeout: float | None = None, **kwargs: Any) -> dict | None:
+        """
+        Wait for the job to be released and then to finish.
+
+        Args:
+            timeout: Seconds for both phases together (default: held until
+                released, then settings.generation.generation_timeout)
+            **kwargs: Passed to ComfyClient.wait_for_completion
+
+        Returns:
+            History entry, or None if the prompt didn't finish in time
+
+        Raises:
+            TimeoutError: If the job is still held when timeout runs out
+            QueueError: If the job was cancelled or couldn't be queued
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        prompt_id = self.result(timeout)
+        client = self.client
+        if client is None:
+            raise QueueError(f"Job {self.id[:8]} was not queued")
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0.001)
+        entry = client.wait_for_completion(prompt_id, timeout=remaining, **kwargs)
+        if entry is not None:
+            self._scheduler._finish(self)
+        return entry
+
+    def cancel(self) -> bool:
+        """Drop the job if it is still held (see JobScheduler.cancel)."""
+        return self._scheduler.cancel(self)
+
+
+class JobScheduler:
+    """
+    Local priority and weighted-fair queue in front of one or more backends.
+
+    A background thread releases held jobs with ComfyClient.queue_prompt as
+    backend slots free up. Jobs go to the backend with the fewest of the
+    scheduler's prompts in flight whose circuit breaker is closed.
+
+    Args:
+        clients: A ComfyClient, several, or a ComfyPool (default: one
+            ComfyClient for settings.comfyui.url, closed in close())
+        queue_depth: Prompts released per backend at a time (default
+            settings.generation.scheduler_queue_depth)
+        weights: Share of each tenant within a priority class (default 1.0)
+        poll_interval: Seconds between /queue polls while jobs wait for a
+            slot (default settings.generation.scheduler_poll_interval)
+    """
+
+    def __init__(
+        self,
+        clients: ComfyClient | ComfyPool | Iterable[ComfyClient] | None = None,
+        queue_depth: int | None = None,
+        weights: dict[str, float] | None = None,
+        poll_interval: float | None = None,
+    ):
+        # Clients the scheduler created itself and closes in close()
+        self._owned: list[ComfyClient] = []
+        if clients is None:
+            clients = self._owned = [ComfyClient()]
+        elif isinstance(clients, ComfyClient):
+            clients = [clients]
+        elif isinstance(clients, ComfyPool):
+            clients = [clients.client(url) for url in clients.backends]
+        self._clients = {client.base_url: client for client in clients}
+        if not self._clients:
+            raise ValueError("JobScheduler needs at least one backend")
+
+        self.queue_depth = max(
+            1, queue_depth if queue_depth is not None else settings.generation.scheduler_queue_depth
+        )
+        self.poll_interval = (
+            poll_interval
+            if poll_interval is not None
+            else settings.generation.scheduler_poll_interval
+        )
+        self._weights = dict(weights or {})
+
+        # Per priority class: heap of (finish tag, seq, job), the class's
+        # virtual time and each tenant's last finish tag
+        self._heaps: dict[Priority, list[tuple[float, int, ScheduledJob]]] = {
+            priority: [] for priority in Priority
+        }
+        self._vtime = dict.fromkeys(Priority, 0.0)
+        self._tags: dict[Priority, dict[str, float]] = {priority: {} for priority in Priority}
+        self._held = 0
+        self._seq = itertools.count()
+        # backend URL -> job ID -> job released there and not yet finished
+        self._inflight: dict[str, dict[str, ScheduledJob]] = {url: {} for url in self._clients}
+
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+        logger.info(
+            "JobScheduler initialized",
+            extra={"backends": len(self._clients), "queue_depth": self.queue_depth},
+        )
+
+    def close(self) -> None:
+        """Stop releasing jobs; held jobs are cancelled and a default client closed."""
+        with self._cond:
+            self._closed = True
+            held = [job for heap in self._heaps.values() for _, _, job in heap]
+            for heap in self._heaps.values():
+                heap.clear()
+            self._held = 0
+            self._cond.notify_all()
+        for job in held:
+            if job.state == "pending":
+                job.state = "cancelled"
+                job._released.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        for client in self._owned:
+            client.close()
+
+    def __enter__(self) -> "JobScheduler":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    # =========================================================================
+    # JOBS
+    # =========================================================================
+
+    def set_weight(self, tenant: str, weight: float) -> None:
+        """Set a tenant's share within its priority class (applies to new jobs)."""
+        if weight <= 0:
+            raise ValueError("Tenant weight must be positive")
+        with self._cond:
+            self._weights[tenant] = weight
+
+    def submit(
+        self, workflow: dict, tenant: str = "default", priority: Priority = Priority.NORMAL
+    ) -> ScheduledJob:
+        """
+        Hold a workflow until a backend has a free slot.
+
+        Args:
+            workflow: ComfyUI workflow dict
+            tenant: Who the job belongs to, for fair sharing
+            priority: Scheduling class
+
+        Returns:
+            The job; job.wait() blocks until its prompt finishes
+
+        Raises:
+            RuntimeError: If the scheduler is closed
+        """
+        priority = Priority(priority)
+        job = ScheduledJob(self, workflow, tenant, priority)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("JobScheduler is closed")
+            # Start-time fair queueing: a tenant's jobs are spaced 1/weight
+            # apart in virtual time, so a backlog of one tenant interleaves
+            # with new arrivals of others instead of running first
+            tags = self._tags[priority]
+            start = max(self._vtime[priority], tags.get(tenant, 0.0))
+            tag = start + 1.0 / self._weights.get(tenant, 1.0)
+            tags[tenant] = tag
+            heapq.heappush(self._heaps[priority], (tag, next(self._seq), job))
+            self._held += 1
+            self._ensure_thread()
+            self._cond.notify_all()
+        return job
+
+    def generate(
+        self,
+        workflow: dict,
+        tenant: str = "default",
+        priority: Priority = Priority.NORMAL,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> dict | None:
+        """Submit a workflow and wait for it to finish (see ScheduledJob.wait)."""
+        return self.submit(workflow, tenant, priority).wait(timeout=timeout, **kwargs)
+
+    def cancel(self, job: ScheduledJob) -> bool:
+        """
+        Drop a job that hasn't been released yet.
+
+        Returns:
+            True if the job was still held and is now cancelled
+        """
+        with self._cond:
+            if job.state != "pending" or job._released.is_set():
+                return False
+            job.state = "cancelled"
+            self._held -= 1  # Its heap entry is skipped when reached
+            self._cond.notify_all()
+        job._released.set()
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        """Held jobs per priority class and in-flight prompts per backend."""
+        with self._cond:
+            held = {
+                priority.name.lower(): sum(1 for _, _, job in heap if job.state == "pending")
+                for priority, heap in self._heaps.items()
+            }
+            inflight = {url: len(jobs) for url, jobs in self._inflight.items()}
+        return {"held": held, "inflight": inflight}
+
+    # =========================================================================
+    # DISPATCH
+    # =========================================================================
+
+    def _ensure_thread(self) -> None:
+        """Start the dispatch thread on first use (caller holds the lock)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="comfy-headless-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def _pick_backend(self, urgent: bool) -> str | None:
+        """Backend with the fewest jobs in flight and a free slot (caller holds the lock)."""
+        candidates = [
+            url
+            for url, client in self._clients.items()
+            if not client.circuit_open and (urgent or len(self._inflight[url]) < self.queue_depth)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda url: len(self._inflight[url]))
+
+    def _take_ready(self) -> list[tuple[ScheduledJob, str]]:
+        """Pop every job that can be released now (caller holds the lock)."""
+        ready: list[tuple[ScheduledJob, str]] = []
+        for priority, heap in self._heaps.items():
+            while heap:
+                tag, _, job = heap[0]
+                if job.state != "pending":
+                    heapq.heappop(heap)
+                    continue
+                url = self._pick_backend(priority is Priority.URGENT)
+                if url is None:
+                    return ready
+                heapq.heappop(heap)
+                self._held -= 1
+                self._vtime[priority] = tag
+                if self._tags[priority].get(job.tenant) == tag:
+                    del self._tags[priority][job.tenant]  # Tenant has nothing else held here
+                job.state = "releasing"
+                self._inflight[url][job.id] = job
+                ready.append((job, url))
+        return ready
+
+    def _release(self, job: ScheduledJob, url: str) -> None:
+        """Queue a job on its backend."""
+        client = self._clients[url]
+        try:
+            prompt_id = client.queue_prompt(job.workflow, front=job.priority is Priority.URGENT)
+            if not prompt_id:
+                raise QueueError(f"Backend {url} did not accept job {job.id[:8]}")
+        except Exception as e:
+            logger.warning(f"Releasing job failed: {e}", extra={"tenant": job.tenant})
+            job.error = e
+            job.state = "failed"
+            with self._cond:
+                self._inflight[url].pop(job.id, None)
+                self._cond.notify_all()
+            job._released.set()
+            return
+
+        job.client = client
+        job.prompt_id = prompt_id
+        job.released_at = time.monotonic()
+        job.state = "queued"
+        job._released.set()
+        logger.debug(
+            "Released job",
+            extra={
+                "tenant": job.tenant,
+                "priority": job.priority.name,
+                "backend": url,
+                "held_ms": round((job.released_at - job.submitted_at) * 1000),
+            },
+        )
+
+    def _finish(self, job: ScheduledJob) -> None:
+        """Free a finished job's slot."""
+        with self._cond:
+            for jobs in self._inflight.values():
+                if jobs.pop(job.id, None) is not None:
+                    job.state = "done"
+                    self._cond.notify_all()
+                    return
+
+    def _reconcile(self) -> None:
+        """Free the slots of released prompts that /queue no longer lists."""
+        for url, client in self._clients.items():
+            with self._cond:
+                tracked = [job for job in self._inflight[url].values() if job.state == "queued"]
+            if not tracked:
+                continue
+            queue = client.fetch_queue()
+            if queue is None:
+                continue
+            active = queue_prompt_ids(queue.get("queue_running", [])) | queue_prompt_ids(
+                queue.get("queue_pending", [])
+            )
+            for job in tracked:
+                if job.prompt_id not in active:
+                    self._finish(job)
+
+    def _run(self) -> None:
+        """Dispatch loop: release what fits, poll /queue while jobs wait for a slot."""
+        last_poll = 0.0
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                ready = self._take_ready()
+                if not ready:
+                    if not self._held:
+                        self._cond.wait()
+                        continue
+                    # Held jobs but no free slot: wait for a finish or the next poll
+                    self._cond.wait(max(last_poll + self.poll_interval - time.monotonic(), 0))
+                    if self._closed:
+                        return
+
+            for job, url in ready:
+                self._release(job, url)
+
+            if not ready and time.monotonic() - last_poll >= self.poll_interval:
+                last_poll = time.monotonic()
+                try:
+                    self._reconcile()
+                except Exception as e:
+                    logger.debug(f"Scheduler /queue poll failed: {e}")
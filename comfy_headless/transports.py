@@ -0,0 +1,243 @@
+"""
+Comfy Headless - HTTP Transports
+================================
+
+Selectable HTTP transports behind ComfyClient.session:
+
+- "requests": requests.Session over a urllib3 pool, retrying transient
+  errors and 429/5xx responses (default)
+- "httpx": httpx.Client, negotiating HTTP/2 when settings.http.http2 is set,
+  h2 is installed and the server offers it (https)
+- "uds": httpx over a Unix domain socket, for a ComfyUI behind a local
+  socket on the same host; URLs keep their host for the Host header only.
+  HTTP/1.1 only: HTTP/2 is negotiated through TLS, which a local socket
+  doesn't use
+
+Pool sizes come from settings.http. httpx sessions expose the part of the
+requests API ComfyClient uses - request() with stream/params/json/data,
+responses with ok/json()/iter_content(), and requests' exception types -
+so the client code is the same for every transport.
+
+Usage:
+    from comfy_headless.transports import create_session
+
+    session = create_session("uds", uds_path="/run/comfyui.sock")
+    response = session.request("GET", "http://localhost/system_stats", timeout=5)
+"""
+
+from collections.abc import Iterator
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .config import settings
+from .http_client import HTTPX_AVAILABLE, http2_enabled, httpx
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "TRANSPORTS",
+    "HttpxSession",
+    "HttpxResponse",
+    "create_session",
+]
+
+TRANSPORTS = ("requests", "httpx", "uds")
+
+
+def create_session(
+    transport: str = "requests", uds_path: str | None = None
+) -> "requests.Session | HttpxSession":
+    """
+    Create a pooled session for one of TRANSPORTS.
+
+    Args:
+        transport: "requests", "httpx" or "uds"
+        uds_path: Socket path for "uds" (default settings.http.uds_path)
+
+    Raises:
+        ValueError: If the transport is unknown or "uds" has no socket path
+        ImportError: If an httpx transport is chosen without httpx installed
+    """
+    if transport == "requests":
+        return _requests_session()
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown HTTP transport {transport!r}; expected one of {TRANSPORTS}")
+    if not HTTPX_AVAILABLE:
+        raise ImportError(
+            f"httpx is required for the {transport} transport. Install with: pip install httpx"
+        )
+    if transport == "uds":
+        uds_path = uds_path or settings.http.uds_path
+        if not uds_path:
+            raise ValueError("The uds transport needs a socket path (http.uds_path)")
+        return HttpxSession(uds_path=uds_path)
+    return HttpxSession(http2=http2_enabled())
+
+
+def _requests_session() -> requests.Session:
+    session = requests.Session()
+
+    # Configure retry for transient errors
+    retry_strategy = Retry(
+        total=settings.retry.max_retries,
+        backoff_factor=settings.retry.backoff_base,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET", "OPTIONS", "POST"],
+    )
+
+    # urllib3 keeps pool_maxsize connections per host alive; more are opened
+    # under load but discarded afterwards
+    adapter = HTTPAdapter(
+        max_retries=retry_strategy,
+        pool_connections=10,
+        pool_maxsize=settings.http.max_keepalive_connections,
+    )
+
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+class HttpxResponse:
+    """requests.Response look-alike over an httpx response."""
+
+    def __init__(self, response: "httpx.Response"):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def content(self) -> bytes:
+        try:
+            return self._response.read()
+        except httpx.TransportError as e:
+            raise requests.exceptions.ChunkedEncodingError(str(e)) from e
+
+    @property
+    def text(self) -> str:
+        self.content  # noqa: B018 - make sure a streamed body is read
+        return self._response.text
+
+    def json(self, **kwargs: Any) -> Any:
+        self.content  # noqa: B018
+        return self._response.json(**kwargs)
+
+    def iter_content(self, chunk_size: int | None = 1) -> Iterator[bytes]:
+        """Yield the body in chunks; a dropped connection raises ChunkedEncodingError."""
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ChunkedEncodingError(str(e)) from e
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error for url: {self.url}", response=self
+            )
+
+    def close(self) -> None:
+        self._response.close()
+
+    def __enter__(self) -> "HttpxResponse":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+
+class HttpxSession:
+    """
+    requests.Session look-alike over a pooled httpx.Client.
+
+    Connect failures are retried settings.retry.max_retries times by the
+    transport; unlike the requests transport, 5xx responses are not.
+
+    Args:
+        http2: Negotiate HTTP/2 where the server supports it (needs h2)
+        uds_path: Connect through this Unix domain socket instead of TCP
+            (HTTP/1.1 only)
+    """
+
+    def __init__(self, http2: bool = False, uds_path: str | None = None):
+        self.uds_path = uds_path
+        limits = httpx.Limits(
+            max_connections=settings.http.max_connections,
+            max_keepalive_connections=settings.http.max_keepalive_connections,
+            keepalive_expiry=settings.http.keepalive_expiry,
+        )
+        self._client = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=http2,
+                uds=uds_path,
+                limits=limits,
+                retries=settings.retry.max_retries,
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.http.connect_timeout,
+                read=settings.http.read_timeout,
+                write=settings.http.write_timeout,
+                pool=settings.http.pool_timeout,
+            ),
+        )
+        logger.debug("HttpxSession created", extra={"http2": http2, "uds": uds_path})
+
+    @property
+    def headers(self) -> "httpx.Headers":
+        """Headers sent with every request."""
+        return self._client.headers
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        timeout: float | tuple[float, float] | None = None,
+        stream: bool = False,
+        data: Any = None,
+        **kwargs: Any,
+    ) -> HttpxResponse:
+        """
+        Send a request with requests' calling convention.
+
+        timeout may be a (connect, read) tuple; data that isn't a form dict
+        (bytes, str, or an iterable of bytes such as MultipartBody) is sent
+        as the raw body.
+
+        Raises:
+            requests.exceptions.Timeout: If the request timed out
+            requests.exceptions.ConnectionError: On any other transport error
+        """
+        if isinstance(timeout, tuple):
+            kwargs["timeout"] = httpx.Timeout(timeout[1], connect=timeout[0])
+        elif timeout is not None:
+            kwargs["timeout"] = timeout
+        if isinstance(data, dict):
+            kwargs["data"] = data
+        elif data is not None:
+            kwargs["content"] = data
+
+        try:
+            request = self._client.build_request(method, url, **kwargs)
+            return HttpxResponse(self._client.send(request, stream=stream))
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    def get(self, url: str, **kwargs: Any) -> HttpxResponse:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> HttpxResponse:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        self._client.close()
@@ -8,9 +8,11 @@ Features:
 - 2026 Design Best Practices (Warm Neutral + Emerald themes)
 """
 
+import atexit
 import random
 import tempfile
 import time
+from pathlib import Path
 
 import gradio as gr
 
@@ -30,8 +32,9 @@ from .workflows import (
     get_library,
 )
 
-# Initialize client
+# Initialize client (its HTTP session and WebSocket are released at exit)
 client = ComfyClient()
+atexit.register(client.close)
 
 # ============================================================================
 # PROMPT STUDIO - LLM Enhancement
@@ -521,31 +524,26 @@ def generate_image(
             if status.get("completed", False):
                 # Extract images
                 outputs = entry.get("outputs", {})
-                for _node_id, node_output in outputs.items():
-                    if "images" in node_output:
-                        for img in node_output["images"]:
-                            filename = img.get("filename")
-                            subfolder = img.get("subfolder", "")
-
-                            progress(0.9, desc="Downloading image...")
-                            image_bytes = client.get_image(filename, subfolder)
-
-                            if image_bytes:
-                                # Save to temp file for Gradio
-                                with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
-                                    f.write(image_bytes)
-                                    temp_path = f.name
-
-                                elapsed = time.time() - start_time
-                                metadata = f"""**Generation Complete** ({elapsed:.1f}s)
+                images = [
+                    img for node_output in outputs.values() for img in node_output.get("images", [])
+                ]
+                if images:
+                    progress(0.9, desc="Downloading image...")
+                    # Concurrent, streamed straight to temp files for Gradio
+                    paths = client.download_outputs(images, dest_dir=tempfile.mkdtemp())
+                    temp_path = next((path for path in paths if path is not None), None)
+
+                    if temp_path is not None:
+                        elapsed = time.time() - start_time
+                        metadata = f"""**Generation Complete** ({elapsed:.1f}s)
 - Seed: `{actual_seed}`
 - Model: `{checkpoint}`
 - Size: {width}x{height}
 - Steps: {steps} | CFG: {cfg}
 - Sampler: {sampler} ({scheduler})"""
 
-                                progress(1.0, desc="Done!")
-                                return temp_path, metadata
+                        progress(1.0, desc="Done!")
+                        return str(temp_path), metadata
 
                 return None, format_error_with_suggestions("No images in output", "NO_OUTPUT")
 
@@ -643,15 +641,13 @@ def generate_video(
                             subfolder = vid.get("subfolder", "")
 
                             progress(0.9, desc="Downloading video...")
-                            video_bytes = client.get_video(filename, subfolder)
-
-                            if video_bytes:
-                                # Save to temp file for Gradio
-                                suffix = ".mp4" if filename.endswith(".mp4") else ".webm"
-                                with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
-                                    f.write(video_bytes)
-                                    temp_path = f.name
+                            # Stream straight to a temp file for Gradio
+                            suffix = ".mp4" if filename.endswith(".mp4") else ".webm"
+                            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+                                temp_path = f.name
+                                video_size = client.download_output(filename, f, subfolder)
 
+                            if video_size:
                                 elapsed = time.time() - start_time
                                 metadata = f"""**Video Complete** ({elapsed:.1f}s)
 - Seed: `{actual_seed}`
@@ -663,6 +659,8 @@ def generate_video(
                                 progress(1.0, desc="Done!")
                                 return temp_path, metadata
 
+                            Path(temp_path).unlink(missing_ok=True)
+
                 return None, format_error_with_suggestions("No video in output", "NO_OUTPUT")
 
         # Update progress based on elapsed time
@@ -2135,6 +2133,8 @@ def create_ui():
 
                 def refresh_all_models():
                     """Refresh all model lists."""
+                    if _is_online_cached():
+                        client.get_capabilities(force=True)
                     return (
                         get_checkpoints_data(),
                         get_loras_data(),
@@ -0,0 +1,377 @@
+"""
+Comfy Headless - Input Uploads
+===============================
+
+Helpers for uploading input images and masks (/upload/image, /upload/mask)
+so workflows can reference them with LoadImage instead of embedding base64.
+
+- Sources can be bytes, a path, a binary file object or base64 (data URIs too)
+- Files are hashed in chunks and uploaded under a content-addressed name
+  ("<sha256[:16]><ext>"), so the same image always maps to the same input file
+- Multipart bodies are streamed in chunks with a known Content-Length
+- A per-backend record of uploaded hashes skips repeat uploads
+
+Used by ComfyClient.upload_image/upload_mask and the AsyncComfyClient
+equivalents.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+import uuid
+from collections.abc import AsyncIterator, Callable, Hashable, Iterator
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, BinaryIO, TypeVar
+
+from .config import settings
+from .downloads import DEFAULT_CHUNK_SIZE
+from .retry import SingleFlight
+
+__all__ = [
+    "UploadSource",
+    "PreparedUpload",
+    "MultipartBody",
+    "UploadCache",
+    "prepare_upload",
+    "is_base64_image",
+    "is_input_name",
+    "check_input_path",
+    "input_name",
+    "input_ref",
+    "get_upload_cache",
+    "clear_upload_caches",
+]
+
+T = TypeVar("T")
+
+# Image bytes, a path, a binary file object, or a base64 string
+UploadSource = bytes | str | os.PathLike | BinaryIO
+
+_MAGIC_SUFFIXES = (
+    (b"\x89PNG", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF8", ".gif"),
+    (b"BM", ".bmp"),
+)
+
+
+def is_base64_image(value: str) -> bool:
+    """
+    Tell base64 image data from an input filename.
+
+    The base64 alphabet (and a data URI prefix) has no ".", while every
+    uploaded input name has an extension.
+    """
+    return "." not in value
+
+
+def is_input_name(value: Any, cache: "UploadCache | None" = None) -> bool:
+    """
+    True if value already names an input file (rather than a path or base64 data).
+
+    Only bare filenames count, plus the "subfolder/filename" names cache
+    recorded from upload_image; any other string with a path separator is
+    a local path, even one that doesn't exist.
+    """
+    if not isinstance(value, str) or is_base64_image(value) or os.path.isfile(value):
+        return False
+    if cache is not None and cache.has_name(value):
+        return True
+    return "/" not in value and os.sep not in value
+
+
+def check_input_path(value: Any) -> None:
+    """
+    Raise FileNotFoundError if value is a local path that doesn't exist.
+
+    Call after is_input_name, so a typo like "./init.png" fails here
+    instead of reaching ComfyUI as an input name.
+    """
+    if isinstance(value, str) and is_base64_image(value):
+        return
+    if isinstance(value, (str, os.PathLike)) and not os.path.isfile(value):
+        raise FileNotFoundError(f"Input image not found: {os.fspath(value)}")
+
+
+def input_name(ref: dict[str, Any]) -> str:
+    """LoadImage value of an uploaded file ref ("subfolder/filename")."""
+    subfolder = ref.get("subfolder") or ""
+    filename = ref.get("filename") or ref.get("name") or ""
+    return f"{subfolder}/{filename}" if subfolder else filename
+
+
+def input_ref(name: str, folder_type: str = "input") -> dict[str, str]:
+    """File ref of a LoadImage value (inverse of input_name)."""
+    subfolder, _, filename = name.rpartition("/")
+    return {"filename": filename, "subfolder": subfolder, "type": folder_type}
+
+
+def _sniff_suffix(head: bytes) -> str:
+    for magic, suffix in _MAGIC_SUFFIXES:
+        if head.startswith(magic):
+            return suffix
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return ".png"
+
+
+@dataclass(frozen=True)
+class PreparedUpload:
+    """
+    A hashed upload source, readable any number of times (for retries).
+
+    Exactly one of data, path and file is set; a file object is read
+    from its position at preparation time.
+    """
+
+    digest: str  # sha256 hex
+    size: int
+    suffix: str
+    data: bytes | None = None
+    path: Path | None = None
+    file: BinaryIO | None = None
+    offset: int = 0
+
+    @property
+    def name(self) -> str:
+        """Content-addressed filename."""
+        return f"{self.digest[:16]}{self.suffix}"
+
+    def keyed(self, extra: str, suffix: str | None = None) -> "PreparedUpload":
+        """Copy whose name also depends on extra (e.g. the image a mask applies to)."""
+        digest = hashlib.sha256(f"{self.digest}:{extra}".encode()).hexdigest()
+        return replace(self, digest=digest, suffix=suffix or self.suffix)
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield the content from the start."""
+        if self.data is not None:
+            for start in range(0, self.size, chunk_size):
+                yield self.data[start : start + chunk_size]
+            return
+        with self._open() as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    async def achunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Async chunks(); file reads run in a worker thread."""
+        if self.data is not None:
+            for chunk in self.chunks(chunk_size):
+                yield chunk
+            return
+        f = await asyncio.to_thread(self._open)
+        try:
+            while chunk := await asyncio.to_thread(f.read, chunk_size):
+                yield chunk
+        finally:
+            f.close()
+
+    def _open(self) -> BinaryIO | io.BufferedIOBase:
+        if self.path is not None:
+            return open(self.path, "rb")
+        if self.file is None:
+            raise ValueError("Upload has no file to read")
+        self.file.seek(self.offset)
+        return _Unclosable(self.file)
+
+
+class _Unclosable(io.BufferedIOBase):
+    """Caller's file object, which reading an upload must not close."""
+
+    def __init__(self, f: BinaryIO):
+        self._f = f
+
+    def read(self, size: int | None = -1) -> bytes:
+        return self._f.read(-1 if size is None else size)
+
+
+def prepare_upload(source: UploadSource, chunk_size: int = DEFAULT_CHUNK_SIZE) -> PreparedUpload:
+    """
+    Hash an upload source without loading files into memory.
+
+    Args:
+        source: Image bytes, a path, a binary file object or a base64 string
+        chunk_size: Bytes read per chunk while hashing
+
+    Raises:
+        ValueError: If a string is neither an existing file nor base64
+        OSError: If a file can't be read
+    """
+    if isinstance(source, str) and not os.path.isfile(source):
+        encoded = source.partition(",")[2] if source.startswith("data:") else source
+        try:
+            source = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError("Image is neither an existing file nor base64 data") from e
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+        return PreparedUpload(
+            digest=hashlib.sha256(data).hexdigest(),
+            size=len(data),
+            suffix=_sniff_suffix(data[:16]),
+            data=data,
+        )
+
+    if isinstance(source, (str, os.PathLike)):
+        path = Path(source)
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            head = f.read(16)
+            f.seek(0)
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+                size += len(chunk)
+        mime = mimetypes.guess_type(path.name)[0] or ""
+        suffix = path.suffix.lower() if mime.startswith("image/") else ""
+        return PreparedUpload(
+            digest=digest.hexdigest(),
+            size=size,
+            suffix=suffix or _sniff_suffix(head),
+            path=path,
+        )
+
+    # Binary file object
+    if not source.seekable():
+        return prepare_upload(source.read(), chunk_size)
+    offset = source.tell()
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    while chunk := source.read(chunk_size):
+        head = head or chunk[:16]
+        digest.update(chunk)
+        size += len(chunk)
+    source.seek(offset)
+    return PreparedUpload(
+        digest=digest.hexdigest(),
+        size=size,
+        suffix=_sniff_suffix(head),
+        file=source,
+        offset=offset,
+    )
+
+
+class MultipartBody:
+    """
+    Streamed multipart/form-data body with one file part.
+
+    Iterable for requests (which sends its len() as Content-Length) and
+    async-iterable via aiter() for httpx. Each iteration starts over, so
+    transport retries resend the whole body.
+    """
+
+    def __init__(
+        self,
+        fields: dict[str, str],
+        file_field: str,
+        upload: PreparedUpload,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.upload = upload
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+        parts = [
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'
+            for key, value in fields.items()
+        ]
+        mime = mimetypes.guess_type(upload.name)[0] or "application/octet-stream"
+        parts.append(
+            f"--{self.boundary}\r\nContent-Disposition: form-data; "
+            f'name="{file_field}"; filename="{upload.name}"\r\n'
+            f"Content-Type: {mime}\r\n\r\n"
+        )
+        self._head = "".join(parts).encode()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(len(self)),
+        }
+
+    def __len__(self) -> int:
+        return len(self._head) + self.upload.size + len(self._tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+        yield from self.upload.chunks(self.chunk_size)
+        yield self._tail
+
+    async def aiter(self) -> AsyncIterator[bytes]:
+        yield self._head
+        async for chunk in self.upload.achunks(self.chunk_size):
+            yield chunk
+        yield self._tail
+
+
+class UploadCache:
+    """
+    Input names already uploaded to one backend, keyed by content hash.
+
+    Entries can go stale if ComfyUI's input directory is cleaned; forget()
+    drops them so the next upload goes through.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._names: dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def get(self, key: Hashable) -> str | None:
+        with self._lock:
+            return self._names.get(key)
+
+    def add(self, key: Hashable, name: str) -> None:
+        with self._lock:
+            self._names[key] = name
+
+    def has_name(self, name: str) -> bool:
+        """True if name was returned by an upload to this backend."""
+        with self._lock:
+            return name in self._names.values()
+
+    def forget(self, key: Hashable | None = None) -> None:
+        """Drop one entry, or all of them."""
+        with self._lock:
+            if key is None:
+                self._names.clear()
+            else:
+                self._names.pop(key, None)
+
+    def run(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Run fn, merging concurrent uploads of the same content into one."""
+        return self._flights.do(key, fn)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._names)
+
+
+_caches: dict[str, UploadCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_upload_cache(base_url: str | None = None) -> UploadCache:
+    """Get the process-wide upload record of a backend."""
+    url = (base_url or settings.comfyui.url).rstrip("/")
+    with _caches_lock:
+        cache = _caches.get(url)
+        if cache is None:
+            cache = UploadCache(url)
+            _caches[url] = cache
+        return cache
+
+
+def clear_upload_caches() -> None:
+    """Forget every backend's uploads (e.g. between tests)."""
+    with _caches_lock:
+        _caches.clear()
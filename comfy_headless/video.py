@@ -21,6 +21,8 @@ from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any
 
+from .uploads import is_base64_image
+
 __all__ = [
     # Enums
     "VideoModel",
@@ -630,7 +632,8 @@ class VideoWorkflowBuilder:
             prompt: Positive prompt
             negative: Negative prompt
             settings: Video settings
-            init_image: Base64 image for img2vid (SVD)
+            init_image: Input name from ComfyClient.upload_image (or base64 image)
+                for img2vid models
 
         Returns:
             ComfyUI workflow JSON
@@ -645,6 +648,13 @@ class VideoWorkflowBuilder:
 
         return builder(prompt, negative, settings, seed, init_image)
 
+    @staticmethod
+    def _load_image_node(init_image: str) -> dict[str, Any]:
+        """Node loading an init image: an uploaded input by name, or inline base64."""
+        if is_base64_image(init_image):
+            return {"class_type": "LoadImageFromBase64", "inputs": {"base64_data": init_image}}
+        return {"class_type": "LoadImage", "inputs": {"image": init_image}}
+
     def _get_motion_scale(self, settings: VideoSettings) -> float:
         """Calculate motion scale from style and multiplier."""
         style_scales = {
@@ -822,7 +832,7 @@ class VideoWorkflowBuilder:
         num_frames = 25 if settings.model == VideoModel.SVD_XT else 14
 
         return {
-            "1": {"class_type": "LoadImageFromBase64", "inputs": {"base64_data": init_image}},
+            "1": self._load_image_node(init_image),
             "2": {"class_type": "ImageOnlyCheckpointLoader", "inputs": {"ckpt_name": model_name}},
             "3": {
                 "class_type": "SVD_img2vid_Conditioning",
@@ -1223,10 +1233,7 @@ class VideoWorkflowBuilder:
 
         # Image-to-video variant
         if init_image:
-            workflow["2.5"] = {
-                "class_type": "LoadImageFromBase64",
-                "inputs": {"base64_data": init_image},
-            }
+            workflow["2.5"] = self._load_image_node(init_image)
             workflow["3"] = {
                 "class_type": "LTXVImgToVideo",
                 "inputs": {
@@ -1338,10 +1345,7 @@ class VideoWorkflowBuilder:
 
         # Image-to-video extension
         if init_image:
-            workflow["11"] = {
-                "class_type": "LoadImageFromBase64",
-                "inputs": {"base64_data": init_image},
-            }
+            workflow["11"] = self._load_image_node(init_image)
             workflow["12"] = {
                 "class_type": "CLIPVisionLoader",
                 "inputs": {"clip_name": "clip_vision_h.safetensors"},
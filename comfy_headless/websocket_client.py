@@ -18,20 +18,32 @@ Usage:
             on_progress=progress_handler
         )
 
+    # Or iterate over the events instead of passing callbacks
+    async with ComfyWSClient() as client:
+        prompt_id = await client.queue_workflow(workflow)
+        async for event in client.track_progress(prompt_id):
+            print(event.status, f"{event.percent:.0f}%")
+        outputs = event.outputs  # Last event: completed, with the outputs
+
 Features:
 - Real-time progress via WebSocket
-- Automatic reconnection with backoff
+- Automatic reconnection with backoff; prompts that finished while the
+  socket was down are resolved from /history afterwards
 - Node-level progress tracking
-- Preview image support
-- Async-native design
+- Live previews decoded from binary frames, linked to the running prompt and
+  throttled per subscriber (latest frame wins)
+- Async-native design, with async-iterator progress (track_progress)
 """
 
 import asyncio
 import json
+import threading
+import time
 import uuid
-from collections.abc import Awaitable, Callable
-from dataclasses import dataclass
-from enum import Enum
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from dataclasses import dataclass, replace
+from enum import Enum, IntEnum
 from typing import Any
 
 try:
@@ -41,12 +53,16 @@ try:
     WEBSOCKETS_AVAILABLE = True
 except ImportError:
     WEBSOCKETS_AVAILABLE = False
-    ClientConnection = None
+    ClientConnection = None  # type: ignore[assignment,misc]
 
 import contextlib
 
+from .admission import get_admission
 from .config import settings
+from .downloads import DEFAULT_CHUNK_SIZE, async_download_slot
 from .exceptions import ComfyUIConnectionError
+from .http_client import AsyncHttpClient
+from .jsoncodec import JSON_HEADERS, dumps, loads, message_type, response_json
 from .logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -55,6 +71,7 @@ __all__ = [
     "ComfyWSClient",
     "WSProgress",
     "WSMessageType",
+    "BinaryEventType",
     "WEBSOCKETS_AVAILABLE",
 ]
 
@@ -73,6 +90,19 @@ class WSMessageType(str, Enum):
     PREVIEW = "b]"  # Binary preview image
 
 
+class BinaryEventType(IntEnum):
+    """Event types of ComfyUI's binary frames (first 4 bytes, big-endian)."""
+
+    PREVIEW_IMAGE = 1  # 4-byte image format, then the image
+    UNENCODED_PREVIEW_IMAGE = 2  # Server-side only, never sent
+    TEXT = 3  # 4-byte node id length, node id, then UTF-8 text
+    PREVIEW_IMAGE_WITH_METADATA = 4  # 4-byte JSON length, JSON metadata, then the image
+
+
+# Image format codes of PREVIEW_IMAGE frames
+_PREVIEW_FORMATS = {1: "image/jpeg", 2: "image/png"}
+
+
 @dataclass
 class WSProgress:
     """Progress information from WebSocket."""
@@ -85,7 +115,12 @@ class WSProgress:
     step: int = 0
     total_steps: int = 0
     status: str = "queued"
-    preview_data: bytes | None = None
+    # Live preview image: a zero-copy view into the received frame
+    preview_data: bytes | memoryview | None = None
+    preview_format: str | None = None  # MIME type of preview_data
+    text: str | None = None  # Progress text sent by a node
+    # "node_complete": {node_id: node output}; "completed": all outputs (track_progress)
+    outputs: dict[str, Any] | None = None
 
     @property
     def percent(self) -> float:
@@ -105,6 +140,176 @@ class WSProgress:
 # Type alias for progress callback
 ProgressCallback = Callable[[WSProgress], Awaitable[None]]
 
+# Terminal statuses - no further events follow for the prompt
+TERMINAL_STATUSES = frozenset({"completed", "error", "interrupted"})
+
+# JSON message types _handle_message acts on; others are dropped undecoded
+_HANDLED_MESSAGE_TYPES = frozenset(t.value for t in WSMessageType if t != WSMessageType.PREVIEW)
+
+# Upper bound of the delay between background reconnect attempts
+_MAX_RECONNECT_DELAY = 10.0
+
+# ws:// URLs already warned about (once per URL, not per client)
+_warned_insecure_urls: set[str] = set()
+
+
+def _history_event(prompt_id: str, entry: Any) -> WSProgress | None:
+    """Terminal event equivalent to a /history entry, or None if it isn't finished."""
+    if not isinstance(entry, dict):
+        return None
+    status = entry.get("status") or {}
+    if status.get("status_str") == "error":
+        messages = status.get("messages") or []
+        interrupted = any(
+            isinstance(m, (list, tuple)) and m and m[0] == "execution_interrupted" for m in messages
+        )
+        return WSProgress(prompt_id=prompt_id, status="interrupted" if interrupted else "error")
+    if status.get("completed", False):
+        return WSProgress(prompt_id=prompt_id, status="completed", progress=1.0)
+    return None
+
+
+class _PreviewSubscriber:
+    """
+    Rate-limited preview delivery to one callback.
+
+    Frames that arrive while the callback is waiting for its next slot (or
+    still handling the previous frame) replace each other, so a slow
+    consumer only ever gets the newest preview and never holds up the
+    message loop.
+    """
+
+    def __init__(self, callback: ProgressCallback, max_fps: float):
+        self.callback = callback
+        self.interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.dropped = 0  # Frames replaced before delivery
+        self._latest: WSProgress | None = None
+        self._last_sent = float("-inf")
+        self._task: asyncio.Task | None = None
+
+    def offer(self, frame: WSProgress) -> None:
+        if self._latest is not None:
+            self.dropped += 1
+        self._latest = frame
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._deliver())
+
+    async def _deliver(self) -> None:
+        while self._latest is not None:
+            delay = self._last_sent + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            frame, self._latest = self._latest, None
+            self._last_sent = time.monotonic()
+            try:
+                await self.callback(frame)
+            except Exception as e:
+                logger.warning(f"Preview listener error: {e}")
+
+    def cancel(self) -> None:
+        self._latest = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+LISTENER_OVERFLOW_POLICIES = ("coalesce", "drop_oldest")
+
+
+def _is_final(event: WSProgress) -> bool:
+    return event.status in TERMINAL_STATUSES or event.status == "disconnected"
+
+
+class _Subscriber:
+    """
+    Queued event delivery to one listener.
+
+    The message loop only appends to the bounded queue; a task of the
+    subscriber's own awaits the callback, so a slow listener never holds up
+    the socket or other listeners. When the queue is full, "coalesce"
+    replaces the prompt's queued progress update for the same node with the
+    new one, and otherwise (or with "drop_oldest") the oldest queued event
+    is dropped. Terminal events are never dropped.
+    """
+
+    def __init__(self, callback: ProgressCallback, max_queue: int, overflow: str):
+        if overflow not in LISTENER_OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown listener overflow policy: {overflow!r}")
+        self.callback = callback
+        self.max_queue = max(1, max_queue)
+        self.overflow = overflow
+        self.dropped = 0  # Events discarded or coalesced before delivery
+        self._queue: deque[WSProgress] = deque()
+        self._task: asyncio.Task | None = None
+
+    def offer(self, event: WSProgress) -> None:
+        if len(self._queue) >= self.max_queue and not self._make_room(event):
+            return
+        self._queue.append(event)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._deliver())
+
+    def _make_room(self, event: WSProgress) -> bool:
+        """Shrink a full queue; False if event was merged into it instead."""
+        self.dropped += 1
+        if self.overflow == "coalesce" and event.status == "progress":
+            # Only the prompt's latest queued event, so ordering is kept
+            for i in range(len(self._queue) - 1, -1, -1):
+                queued = self._queue[i]
+                if queued.prompt_id != event.prompt_id:
+                    continue
+                if queued.status == "progress" and queued.node_id == event.node_id:
+                    self._queue[i] = event
+                    return False
+                break
+        for i, queued in enumerate(self._queue):
+            if not _is_final(queued):
+                del self._queue[i]
+                return True
+        return True  # Only terminal events queued - keep them all
+
+    async def _deliver(self) -> None:
+        while self._queue:
+            event = self._queue.popleft()
+            try:
+                await self.callback(event)
+            except Exception as e:
+                logger.warning(f"Listener error: {e}")
+
+    async def join(self) -> None:
+        """Wait until every queued event has been delivered."""
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    def close(self) -> None:
+        """Drop undelivered events; a callback already running finishes."""
+        self._queue.clear()
+
+
+# Shared event loop for synchronous callers (ComfyClient)
+_background_loop: asyncio.AbstractEventLoop | None = None
+_background_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide event loop used to drive WebSockets from sync code.
+
+    The loop runs forever in a daemon thread, started on first use. Submit
+    work with asyncio.run_coroutine_threadsafe().
+    """
+    global _background_loop
+
+    with _background_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="comfy-headless-ws", daemon=True
+            )
+            thread.start()
+            _background_loop = loop
+        return _background_loop
+
 
 class ComfyWSClient:
     """
@@ -115,9 +320,12 @@ class ComfyWSClient:
     Args:
         base_url: ComfyUI server URL (ws:// or http://)
         client_id: Unique client identifier
-        reconnect_attempts: Max reconnection attempts
-        reconnect_delay: Base delay between reconnects
+        reconnect_attempts: Max attempts of connect()
+        reconnect_delay: Base delay between (re)connect attempts
         max_message_size: Maximum WebSocket message size (security limit)
+        http_client: Pooled AsyncHttpClient for the REST calls (queue_prompt,
+            get_history, get_queue, get_image); by default one is created on
+            first use and closed by disconnect()
 
     Security Notes:
         - Use wss:// (HTTPS) in production to encrypt WebSocket traffic
@@ -129,6 +337,11 @@ class ComfyWSClient:
     MAX_LISTENERS_PER_PROMPT = 100
     # Security: Default maximum message size (1MB) to prevent DoS
     DEFAULT_MAX_MESSAGE_SIZE = 1_048_576
+    # Early-event buffer: events of prompts nobody listens to yet, replayed
+    # to late subscribers (bounded in prompts, events per prompt and age)
+    EARLY_EVENT_PROMPTS = 64
+    EARLY_EVENTS_PER_PROMPT = 32
+    EARLY_EVENT_TTL = 60.0
 
     def __init__(
         self,
@@ -138,6 +351,7 @@ class ComfyWSClient:
         reconnect_delay: float = 1.0,
         *,
         max_message_size: int | None = None,
+        http_client: AsyncHttpClient | None = None,
     ):
         if not WEBSOCKETS_AVAILABLE:
             raise ImportError("websockets package required. Install with: pip install websockets")
@@ -153,9 +367,12 @@ class ComfyWSClient:
             uses_encryption = True
         else:
             self.ws_url = f"ws://{http_url}/ws"
+            http_url = f"http://{http_url}"
+        self.http_url = http_url
 
         # Security: Warn about unencrypted connections
-        if not uses_encryption:
+        if not uses_encryption and self.ws_url not in _warned_insecure_urls:
+            _warned_insecure_urls.add(self.ws_url)
             logger.warning(
                 "WebSocket using unencrypted ws:// protocol. "
                 "Consider using wss:// (HTTPS) for production environments "
@@ -170,15 +387,51 @@ class ComfyWSClient:
 
         self._ws: ClientConnection | None = None
         self._connected = False
-        self._listeners: dict[str, list[ProgressCallback]] = {}
+        self._http = http_client
+        self._owns_http = http_client is None
+        # prompt_id -> {callback: its queued delivery}
+        self._listeners: dict[str, dict[ProgressCallback, _Subscriber]] = {}
+        self._preview_listeners: dict[str, list[_PreviewSubscriber]] = {}
         self._message_task: asyncio.Task | None = None
+        # Prompt and node executing now - binary previews don't name them
+        self._running_prompt: str | None = None
+        self._running_node: str | None = None
+        self._reconnecting = False
+        self._prompt_sources: list[Callable[[], Iterable[str]]] = []
+        self._routers: list[Callable[[WSProgress], None]] = []
+        # prompt_id -> recent (monotonic time, event) pairs
+        self._early_events: OrderedDict[str, deque[tuple[float, WSProgress]]] = OrderedDict()
 
         logger.debug("ComfyWSClient initialized", extra={"ws_url": self.ws_url})
 
+    @property
+    def http(self) -> AsyncHttpClient:
+        """
+        Pooled HTTP client for ComfyUI's REST endpoints.
+
+        Keeps connections (HTTP/2 where enabled) alive across calls, uses
+        the settings.http limits and the backend's "comfyui:<url>" circuit
+        breaker (shared with ComfyClient).
+        """
+        if self._http is None:
+            self._http = AsyncHttpClient(self.http_url, circuit_name=f"comfyui:{self.http_url}")
+        return self._http
+
     @property
     def connected(self) -> bool:
         """Check if WebSocket is connected."""
-        return self._connected and self._ws is not None and not self._ws.closed
+        if not self._connected or self._ws is None:
+            return False
+        # Legacy connections expose .closed; websockets >= 14 only close_code
+        closed = getattr(self._ws, "closed", None)
+        if isinstance(closed, bool):
+            return not closed
+        return self._ws.close_code is None
+
+    @property
+    def reconnecting(self) -> bool:
+        """True while a dropped connection is being re-established in the background."""
+        return self._reconnecting
 
     async def connect(self) -> bool:
         """
@@ -187,18 +440,9 @@ class ComfyWSClient:
         Returns:
             True if connected successfully
         """
-        url = f"{self.ws_url}?clientId={self.client_id}"
-
         for attempt in range(self.reconnect_attempts):
             try:
-                self._ws = await websockets.connect(
-                    url,
-                    ping_interval=30,
-                    ping_timeout=10,
-                    close_timeout=5,
-                    max_size=self.max_message_size,  # Security: Prevent DoS via large messages
-                )
-                self._connected = True
+                await self._open()
 
                 # Start message handler
                 self._message_task = asyncio.create_task(self._message_loop())
@@ -219,7 +463,18 @@ class ComfyWSClient:
             message="Failed to connect to ComfyUI WebSocket", url=self.ws_url
         )
 
-    async def disconnect(self):
+    async def _open(self) -> None:
+        """Open the socket under this client's clientId."""
+        self._ws = await websockets.connect(
+            f"{self.ws_url}?clientId={self.client_id}",
+            ping_interval=30,
+            ping_timeout=10,
+            close_timeout=5,
+            max_size=self.max_message_size,  # Security: Prevent DoS via large messages
+        )
+        self._connected = True
+
+    async def disconnect(self) -> None:
         """Disconnect from WebSocket."""
         if self._message_task:
             self._message_task.cancel()
@@ -227,55 +482,158 @@ class ComfyWSClient:
                 await self._message_task
             self._message_task = None
 
+        for subscribers in self._preview_listeners.values():
+            for subscriber in subscribers:
+                subscriber.cancel()
+
         if self._ws:
             await self._ws.close()
             self._ws = None
 
+        if self._owns_http and self._http is not None:
+            await self._http.close()
+            self._http = None
+
         self._connected = False
         logger.debug("WebSocket disconnected")
 
-    async def __aenter__(self):
+    async def __aenter__(self) -> "ComfyWSClient":
         """Async context manager entry."""
         await self.connect()
         return self
 
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
         """Async context manager exit."""
         await self.disconnect()
 
-    async def _message_loop(self):
-        """Background task to process incoming messages."""
-        try:
-            async for message in self._ws:
-                await self._handle_message(message)
-        except websockets.ConnectionClosed:
-            logger.warning("WebSocket connection closed")
+    async def _message_loop(self) -> None:
+        """Background task to process incoming messages, reconnecting when dropped."""
+        while True:
+            ws = self._ws
+            if ws is None:  # Disconnected
+                return
+            try:
+                async for message in ws:
+                    await self._handle_message(message)
+                logger.warning("WebSocket connection closed")
+            except websockets.ConnectionClosed:
+                logger.warning("WebSocket connection closed")
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                logger.error(f"WebSocket error: {e}")
             self._connected = False
-        except asyncio.CancelledError:
-            pass
+
+            if not await self._reconnect():
+                return
+
+    async def _reconnect(self) -> bool:
+        """
+        Re-open a dropped connection with backoff, then recover missed events.
+
+        Keeps the clientId, so ComfyUI routes later events of running prompts
+        to the new socket. Gives up after settings.comfyui.ws_reconnect_timeout
+        and tells listeners with a "disconnected" event.
+
+        Returns:
+            True if reconnected
+        """
+        deadline = time.monotonic() + settings.comfyui.ws_reconnect_timeout
+        delay = self.reconnect_delay
+        attempt = 0
+        self._reconnecting = True
+        try:
+            while time.monotonic() + delay <= deadline:
+                await asyncio.sleep(delay)
+                attempt += 1
+                try:
+                    await self._open()
+                    break
+                except Exception as e:
+                    delay = min(delay * 2, _MAX_RECONNECT_DELAY)
+                    logger.warning(
+                        f"WebSocket reconnect failed (attempt {attempt})",
+                        extra={"error": str(e), "retry_in": delay},
+                    )
+            else:
+                logger.error("WebSocket reconnect gave up", extra={"client_id": self.client_id[:8]})
+                for prompt_id in self._watched_prompts():
+                    await self._notify_listeners(
+                        prompt_id, WSProgress(prompt_id=prompt_id, status="disconnected")
+                    )
+                return False
+        finally:
+            self._reconnecting = False
+
+        logger.info(
+            "WebSocket reconnected", extra={"client_id": self.client_id[:8], "attempts": attempt}
+        )
+        await self._recover_missed_events()
+        return True
+
+    def add_prompt_source(self, source: Callable[[], Iterable[str]]) -> None:
+        """
+        Register a provider of prompt IDs watched through global listeners.
+
+        Missed events are recovered after a reconnect for these prompts as
+        well as for prompts with their own listeners.
+        """
+        self._prompt_sources.append(source)
+
+    def _watched_prompts(self) -> set[str]:
+        prompt_ids = {prompt_id for prompt_id, callbacks in self._listeners.items() if callbacks}
+        for source in self._prompt_sources:
+            prompt_ids.update(source())
+        prompt_ids.discard("")
+        return prompt_ids
+
+    async def _recover_missed_events(self) -> None:
+        """Resolve watched prompts that finished while the socket was down."""
+        prompt_ids = self._watched_prompts()
+        if not prompt_ids:
+            return
+        try:
+            queue = await self.get_queue()
         except Exception as e:
-            logger.error(f"WebSocket error: {e}")
-            self._connected = False
+            logger.warning(f"Missed-event recovery failed: {e}")
+            return
+        queued = {
+            item[1]
+            for key in ("queue_running", "queue_pending")
+            for item in queue.get(key, [])
+            if isinstance(item, list) and len(item) > 1
+        }
+
+        for prompt_id in prompt_ids - queued:
+            # Not queued any more: finished, or lost if ComfyUI restarted
+            try:
+                history = await self.get_history(prompt_id)
+            except Exception as e:
+                logger.warning(f"Missed-event recovery failed: {e}", extra={"prompt_id": prompt_id})
+                continue
+            event = _history_event(prompt_id, history.get(prompt_id))
+            if event is None:
+                logger.warning(
+                    "Watched prompt no longer known to ComfyUI",
+                    extra={"prompt_id": prompt_id[:8]},
+                )
+                event = WSProgress(prompt_id=prompt_id, status="error")
+            self._finish_running(prompt_id)
+            await self._notify_listeners(prompt_id, event)
 
-    async def _handle_message(self, message: bytes | str):
+    async def _handle_message(self, message: bytes | str) -> None:
         """Process a WebSocket message."""
-        # Handle binary preview images
         if isinstance(message, bytes):
-            # Binary data is preview image
-            # First 4 bytes might be message type, rest is image
-            if len(message) > 8:
-                await self._notify_listeners(
-                    "preview",
-                    WSProgress(
-                        prompt_id="",
-                        status="preview",
-                        preview_data=message[8:],  # Skip header
-                    ),
-                )
+            await self._handle_binary(message)
+            return
+
+        # Skip events nobody handles (e.g. custom nodes' monitor spam) undecoded
+        msg_type = message_type(message)
+        if msg_type is not None and msg_type not in _HANDLED_MESSAGE_TYPES:
             return
 
         try:
-            data = json.loads(message)
+            data = loads(message)
         except json.JSONDecodeError as e:
             # Log with more context for debugging malformed messages
             truncated_msg = message[:200] if len(message) > 200 else message
@@ -302,6 +660,7 @@ class ComfyWSClient:
             logger.debug(f"Queue status: {queue_remaining} remaining")
 
         elif msg_type == WSMessageType.EXECUTION_START:
+            self._running_prompt, self._running_node = prompt_id, None
             progress = WSProgress(
                 prompt_id=prompt_id,
                 status="started",
@@ -313,6 +672,7 @@ class ComfyWSClient:
             node_id = msg_data.get("node")
             if node_id is None:
                 # None node means execution complete
+                self._finish_running(prompt_id)
                 progress = WSProgress(
                     prompt_id=prompt_id,
                     status="completed",
@@ -320,6 +680,7 @@ class ComfyWSClient:
                     max_progress=1.0,
                 )
             else:
+                self._running_prompt, self._running_node = prompt_id, node_id
                 progress = WSProgress(
                     prompt_id=prompt_id,
                     node_id=node_id,
@@ -328,6 +689,7 @@ class ComfyWSClient:
             await self._notify_listeners(prompt_id, progress)
 
         elif msg_type == WSMessageType.PROGRESS:
+            self._running_node = msg_data.get("node") or self._running_node
             progress = WSProgress(
                 prompt_id=prompt_id,
                 node_id=msg_data.get("node"),
@@ -339,10 +701,12 @@ class ComfyWSClient:
 
         elif msg_type == WSMessageType.EXECUTED:
             node_id = msg_data.get("node")
+            output = msg_data.get("output")
             progress = WSProgress(
                 prompt_id=prompt_id,
                 node_id=node_id,
                 status="node_complete",
+                outputs={node_id: output} if output else None,
             )
             await self._notify_listeners(prompt_id, progress)
 
@@ -355,6 +719,7 @@ class ComfyWSClient:
             await self._notify_listeners(prompt_id, progress)
 
         elif msg_type == WSMessageType.EXECUTION_ERROR:
+            self._finish_running(prompt_id)
             progress = WSProgress(
                 prompt_id=prompt_id,
                 status="error",
@@ -362,115 +727,480 @@ class ComfyWSClient:
             await self._notify_listeners(prompt_id, progress)
 
         elif msg_type == WSMessageType.EXECUTION_INTERRUPTED:
+            self._finish_running(prompt_id)
             progress = WSProgress(
                 prompt_id=prompt_id,
                 status="interrupted",
             )
             await self._notify_listeners(prompt_id, progress)
 
-    def add_listener(self, prompt_id: str, callback: ProgressCallback):
+    def _finish_running(self, prompt_id: str) -> None:
+        if prompt_id == self._running_prompt:
+            self._running_prompt = self._running_node = None
+
+    async def _handle_binary(self, message: bytes) -> None:
+        """Decode a binary frame: a live preview image or node progress text."""
+        view = memoryview(message)
+        if len(view) < 8:
+            return
+        event_type = int.from_bytes(view[:4], "big")
+        header = int.from_bytes(view[4:8], "big")
+        prompt_id = self._running_prompt or ""
+        node_id = self._running_node
+
+        if event_type == BinaryEventType.PREVIEW_IMAGE:
+            image_format = _PREVIEW_FORMATS.get(header)
+            image = view[8:]
+
+        elif event_type == BinaryEventType.PREVIEW_IMAGE_WITH_METADATA:
+            try:
+                metadata = loads(view[8 : 8 + header])
+            except ValueError:
+                metadata = None
+            if not isinstance(metadata, dict):
+                logger.warning("Malformed preview metadata received")
+                return
+            prompt_id = metadata.get("prompt_id") or prompt_id
+            node_id = metadata.get("node_id") or node_id
+            image_format = metadata.get("image_type")
+            image = view[8 + header :]
+
+        elif event_type == BinaryEventType.TEXT:
+            node_id = bytes(view[8 : 8 + header]).decode("utf-8", "replace")
+            text = bytes(view[8 + header :]).decode("utf-8", "replace")
+            await self._notify_listeners(
+                prompt_id,
+                WSProgress(prompt_id=prompt_id, node_id=node_id, status="text", text=text),
+            )
+            return
+
+        else:
+            logger.debug("Ignoring binary frame", extra={"event_type": event_type})
+            return
+
+        frame = WSProgress(
+            prompt_id=prompt_id,
+            node_id=node_id,
+            status="preview",
+            preview_data=image,
+            preview_format=image_format,
+        )
+        for key in {prompt_id, ""}:
+            for subscriber in self._preview_listeners.get(key, ()):
+                subscriber.offer(frame)
+
+    def add_listener(
+        self,
+        prompt_id: str,
+        callback: ProgressCallback,
+        max_queue: int | None = None,
+        overflow: str | None = None,
+    ) -> None:
         """
-        Add a progress listener for a prompt.
+        Add a progress listener for a prompt ("" for every prompt).
+
+        Events are queued per listener and the callback runs in a task of its
+        own, so it may be slow without stalling the socket or other listeners.
 
         Security: Limited to MAX_LISTENERS_PER_PROMPT to prevent memory exhaustion.
+
+        Args:
+            prompt_id: Prompt to follow, or "" for all
+            callback: Async callback receiving events in order
+            max_queue: Undelivered events kept before overflow (default
+                settings.comfyui.listener_queue_size)
+            overflow: "coalesce" (merge progress updates) or "drop_oldest"
+                (default settings.comfyui.listener_overflow)
         """
-        if prompt_id not in self._listeners:
-            self._listeners[prompt_id] = []
+        self._add_subscriber(prompt_id, callback, max_queue, overflow)
+
+    def _add_subscriber(
+        self,
+        prompt_id: str,
+        callback: ProgressCallback,
+        max_queue: int | None = None,
+        overflow: str | None = None,
+    ) -> _Subscriber | None:
+        subscribers = self._listeners.setdefault(prompt_id, {})
 
         # Security: Prevent memory exhaustion from too many listeners
-        if len(self._listeners[prompt_id]) >= self.MAX_LISTENERS_PER_PROMPT:
+        if len(subscribers) >= self.MAX_LISTENERS_PER_PROMPT:
             logger.warning(
                 f"Maximum listeners ({self.MAX_LISTENERS_PER_PROMPT}) reached for prompt",
                 extra={"prompt_id": prompt_id[:8] if prompt_id else "global"},
             )
+            return None
+
+        if max_queue is None:
+            max_queue = settings.comfyui.listener_queue_size
+        subscriber = _Subscriber(
+            callback, max_queue, overflow or settings.comfyui.listener_overflow
+        )
+        subscribers[callback] = subscriber
+        return subscriber
+
+    def remove_listener(self, prompt_id: str, callback: ProgressCallback) -> None:
+        """Remove a progress listener, dropping events it has not received yet."""
+        subscribers = self._listeners.get(prompt_id)
+        if subscribers is None:
             return
+        subscriber = subscribers.pop(callback, None)
+        if subscriber is not None:
+            subscriber.close()
+        if not subscribers:
+            del self._listeners[prompt_id]
 
-        self._listeners[prompt_id].append(callback)
+    def add_router(self, router: Callable[[WSProgress], None]) -> None:
+        """
+        Register a synchronous sink called inline with every event.
 
-    def remove_listener(self, prompt_id: str, callback: ProgressCallback):
-        """Remove a progress listener."""
-        if prompt_id in self._listeners:
-            self._listeners[prompt_id] = [cb for cb in self._listeners[prompt_id] if cb != callback]
+        Meant for internal dispatchers (such as WSSession) that only hand
+        events on to bounded queues and never block; user callbacks belong
+        in add_listener().
+        """
+        self._routers.append(router)
 
-    async def _notify_listeners(self, prompt_id: str, progress: WSProgress):
-        """Notify all listeners for a prompt."""
-        if prompt_id in self._listeners:
-            for callback in self._listeners[prompt_id]:
-                try:
-                    await callback(progress)
-                except Exception as e:
-                    logger.warning(f"Listener error: {e}")
+    def remove_router(self, router: Callable[[WSProgress], None]) -> None:
+        """Remove an event router."""
+        with contextlib.suppress(ValueError):
+            self._routers.remove(router)
 
-        # Also notify global listeners (empty prompt_id)
-        if "" in self._listeners:
-            for callback in self._listeners[""]:
-                try:
-                    await callback(progress)
-                except Exception as e:
-                    logger.warning(f"Global listener error: {e}")
+    async def flush_listeners(self, prompt_id: str | None = None) -> None:
+        """Wait until listeners (of one prompt, or all) have received their queued events."""
+        if prompt_id is None:
+            groups = list(self._listeners.values())
+        else:
+            groups = [self._listeners.get(prompt_id, {})]
+        for subscribers in groups:
+            for subscriber in list(subscribers.values()):
+                await subscriber.join()
+
+    def add_preview_listener(
+        self, prompt_id: str, callback: ProgressCallback, max_fps: float | None = None
+    ) -> None:
+        """
+        Receive live preview images of a prompt ("" for every prompt).
+
+        Previews are delivered as "preview" WSProgress events at most max_fps
+        times per second; frames arriving faster are skipped in favour of the
+        newest one. preview_data is a memoryview of the received frame -
+        copy it with bytes() to keep it independently.
+
+        Args:
+            prompt_id: Prompt to follow, or "" for all
+            callback: Async callback receiving preview events
+            max_fps: Delivery rate limit (default settings.comfyui.preview_max_fps,
+                0 = every frame)
+        """
+        subscribers = self._preview_listeners.setdefault(prompt_id, [])
+        if len(subscribers) >= self.MAX_LISTENERS_PER_PROMPT:
+            logger.warning(
+                f"Maximum preview listeners ({self.MAX_LISTENERS_PER_PROMPT}) reached for prompt",
+                extra={"prompt_id": prompt_id[:8] if prompt_id else "global"},
+            )
+            return
+        if max_fps is None:
+            max_fps = settings.comfyui.preview_max_fps
+        subscribers.append(_PreviewSubscriber(callback, max_fps))
+
+    def remove_preview_listener(self, prompt_id: str, callback: ProgressCallback) -> None:
+        """Remove a preview listener, dropping any frame it has not received yet."""
+        subscribers = self._preview_listeners.get(prompt_id, [])
+        keep = []
+        for subscriber in subscribers:
+            if subscriber.callback == callback:
+                subscriber.cancel()
+            else:
+                keep.append(subscriber)
+        if keep:
+            self._preview_listeners[prompt_id] = keep
+        else:
+            self._preview_listeners.pop(prompt_id, None)
+
+    def _is_watched(self, prompt_id: str) -> bool:
+        if self._listeners.get(prompt_id):
+            return True
+        return any(prompt_id in source() for source in self._prompt_sources)
+
+    def _buffer_early(self, prompt_id: str, progress: WSProgress) -> None:
+        events = self._early_events.get(prompt_id)
+        if events is None:
+            events = deque(maxlen=self.EARLY_EVENTS_PER_PROMPT)
+            self._early_events[prompt_id] = events
+            while len(self._early_events) > self.EARLY_EVENT_PROMPTS:
+                self._early_events.popitem(last=False)
+        events.append((time.monotonic(), progress))
+
+    def pop_early_events(self, prompt_id: str) -> list[WSProgress]:
+        """
+        Take the events a prompt emitted before anyone listened to it.
+
+        Returns the buffered events oldest first, leaving out those older
+        than EARLY_EVENT_TTL. Call right after registering a listener,
+        without awaiting in between, to see every event exactly once.
+        """
+        events = self._early_events.pop(prompt_id, ())
+        cutoff = time.monotonic() - self.EARLY_EVENT_TTL
+        return [progress for at, progress in events if at >= cutoff]
+
+    async def subscribe(self, prompt_id: str, callback: ProgressCallback) -> None:
+        """
+        add_listener() that first replays the prompt's buffered early events.
+
+        Use instead of add_listener when the prompt may already be running.
+        """
+        subscriber = self._add_subscriber(prompt_id, callback)
+        early = self.pop_early_events(prompt_id)
+        if subscriber is not None:
+            for progress in early:
+                subscriber.offer(progress)
+
+    async def _notify_listeners(self, prompt_id: str, progress: WSProgress) -> None:
+        """
+        Queue an event for the prompt's and the global listeners.
 
-    async def queue_prompt(self, workflow: dict[str, Any]) -> str:
+        Never awaits listener code; events of prompts nobody watches yet are
+        buffered for late subscribers.
+        """
+        if prompt_id and not self._is_watched(prompt_id):
+            self._buffer_early(prompt_id, progress)
+        if prompt_id and progress.status in TERMINAL_STATUSES:
+            get_admission(self.http_url).release(prompt_id)
+
+        for router in self._routers:
+            try:
+                router(progress)
+            except Exception as e:
+                logger.warning(f"Event router error: {e}")
+
+        for key in (prompt_id, "") if prompt_id else ("",):
+            for subscriber in list(self._listeners.get(key, {}).values()):
+                subscriber.offer(progress)
+
+    async def queue_prompt(self, workflow: dict[str, Any], prompt_id: str | None = None) -> str:
         """
         Queue a workflow for execution.
 
         Args:
             workflow: ComfyUI workflow dict
+            prompt_id: ID to queue the prompt under (honoured by newer
+                ComfyUI versions; older ones assign their own)
 
         Returns:
             prompt_id
-        """
-        import httpx
 
-        http_url = self.ws_url.replace("ws://", "http://").replace("wss://", "https://")
-        http_url = http_url.replace("/ws", "")
+        Raises:
+            BackendOverloadedError: If the backend stays full (see the
+                admission module)
+        """
+        payload: dict[str, Any] = {"prompt": workflow, "client_id": self.client_id}
+        if prompt_id:
+            payload["prompt_id"] = prompt_id
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{http_url}/prompt",
-                json={"prompt": workflow, "client_id": self.client_id},
+        admission = get_admission(self.http_url)
+        await admission.aacquire(self.get_queue)
+        try:
+            response = await self.http.post(
+                "/prompt",
+                content=dumps(payload),
+                headers=JSON_HEADERS,
                 timeout=settings.comfyui.timeout_queue,
             )
             response.raise_for_status()
-            data = response.json()
+            prompt_id = response_json(response).get("prompt_id")
+        except BaseException:
+            admission.cancel_reservation()
+            raise
+        admission.admitted(prompt_id)
 
-        prompt_id = data.get("prompt_id")
         logger.info("Queued prompt", extra={"prompt_id": prompt_id[:8]})
         return prompt_id
 
+    async def queue_workflow(self, workflow: dict[str, Any]) -> str:
+        """
+        Queue a workflow under a client-chosen prompt ID, ready for track_progress().
+
+        Events emitted before tracking starts are kept in the early-event
+        buffer, so a fast prompt's completion is not missed.
+
+        Returns:
+            prompt_id
+        """
+        return await self.queue_prompt(workflow, prompt_id=str(uuid.uuid4()))
+
+    async def track_progress(
+        self,
+        prompt_id: str,
+        timeout: float | None = None,
+        previews: bool = False,
+        max_pending: int = 64,
+    ) -> AsyncIterator[WSProgress]:
+        """
+        Iterate over a prompt's events until it finishes.
+
+        Yields WSProgress events in order - "started", "executing",
+        "progress", "cached", "node_complete" (outputs of that node),
+        "preview" (if previews, throttled like add_preview_listener) - and
+        ends with the terminal event. A "completed" event carries the
+        prompt's outputs from /history. If the prompt doesn't finish within
+        timeout the last event is "timeout"; "disconnected" if the socket
+        could not be re-established.
+
+        Breaking out of the loop, or cancelling the consuming task, stops
+        tracking and releases the listeners (right away when iterated inside
+        contextlib.aclosing(), otherwise once the generator is collected);
+        the prompt itself keeps running.
+
+        Args:
+            prompt_id: Prompt to follow
+            timeout: Maximum time until the terminal event, in seconds
+            previews: Include live preview events
+            max_pending: Events held for a slow consumer before the
+                listener's overflow policy applies
+        """
+        timeout = timeout or settings.generation.generation_timeout
+        deadline = time.monotonic() + timeout
+        pending: asyncio.Queue[WSProgress] = asyncio.Queue(maxsize=max(1, max_pending))
+        closed = False
+
+        async def enqueue(event: WSProgress) -> None:
+            if not closed:
+                await pending.put(event)
+
+        await self.subscribe(prompt_id, enqueue)
+        if previews:
+            self.add_preview_listener(prompt_id, enqueue)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        pending.get(), timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except asyncio.TimeoutError:
+                    yield WSProgress(prompt_id=prompt_id, status="timeout")
+                    return
+                if event.status == "completed" and event.outputs is None:
+                    event = await self._with_outputs(event)
+                yield event
+                if _is_final(event):
+                    return
+        finally:
+            closed = True
+            self.remove_listener(prompt_id, enqueue)
+            if previews:
+                self.remove_preview_listener(prompt_id, enqueue)
+            while not pending.empty():  # Unblock a delivery waiting for room
+                pending.get_nowait()
+
+    async def _with_outputs(self, event: WSProgress) -> WSProgress:
+        """Completed event with the prompt's outputs from /history attached."""
+        try:
+            history = await self.get_history(event.prompt_id)
+        except Exception as e:
+            logger.warning(
+                f"Could not fetch outputs: {e}", extra={"prompt_id": event.prompt_id[:8]}
+            )
+            return event
+        entry = history.get(event.prompt_id) or {}
+        return replace(event, outputs=entry.get("outputs") or {})
+
     async def wait_for_completion(
         self,
         prompt_id: str,
         timeout: float | None = None,
         on_progress: ProgressCallback | None = None,
+        on_preview: ProgressCallback | None = None,
     ) -> WSProgress:
         """
         Wait for a prompt to complete using WebSocket updates.
 
+        Events the prompt emitted before this call (a cached or very fast
+        prompt can finish before the caller gets here) are replayed from
+        the early-event buffer.
+
         Args:
             prompt_id: The prompt ID to wait for
             timeout: Maximum wait time in seconds
             on_progress: Callback for progress updates
+            on_preview: Callback for throttled live previews (see add_preview_listener)
+
+        Returns:
+            Final progress state ("timeout", or "disconnected" if the socket
+            could not be re-established)
+        """
+        return await self._track(prompt_id, None, timeout, on_progress, on_preview)
+
+    async def submit_and_track(
+        self,
+        workflow: dict[str, Any],
+        timeout: float | None = None,
+        on_progress: ProgressCallback | None = None,
+        on_preview: ProgressCallback | None = None,
+    ) -> WSProgress:
+        """
+        Queue a workflow and wait for it, listening before it is sent.
+
+        The prompt ID is chosen here and subscribed to before /prompt is
+        posted, so no event can be missed. If the server assigns its own ID
+        (older ComfyUI), the events it emitted meanwhile are replayed from
+        the early-event buffer.
+
+        Args:
+            workflow: ComfyUI workflow dict
+            timeout: Maximum wait time in seconds
+            on_progress: Callback for progress updates
+            on_preview: Callback for throttled live previews
 
         Returns:
-            Final progress state
+            Final progress state; its prompt_id is the queued prompt's
+
+        Raises:
+            httpx.HTTPStatusError: If ComfyUI rejects the workflow
         """
+        return await self._track(str(uuid.uuid4()), workflow, timeout, on_progress, on_preview)
+
+    async def _track(
+        self,
+        prompt_id: str,
+        workflow: dict[str, Any] | None,
+        timeout: float | None,
+        on_progress: ProgressCallback | None,
+        on_preview: ProgressCallback | None,
+    ) -> WSProgress:
+        """Listen to a prompt (queueing workflow first, if given) until it ends."""
         timeout = timeout or settings.generation.generation_timeout
         completed = asyncio.Event()
         final_progress: WSProgress = WSProgress(prompt_id=prompt_id)
 
-        async def handler(progress: WSProgress):
+        async def handler(progress: WSProgress) -> None:
             nonlocal final_progress
             final_progress = progress
-
-            if on_progress:
-                await on_progress(progress)
-
-            if progress.status in ("completed", "error", "interrupted"):
-                completed.set()
-
-        self.add_listener(prompt_id, handler)
-
+            try:
+                if on_progress:
+                    await on_progress(progress)
+            finally:
+                if _is_final(progress):
+                    completed.set()
+
+        async def listen(pid: str) -> None:
+            await self.subscribe(pid, handler)
+            if on_preview:
+                self.add_preview_listener(pid, on_preview)
+
+        def unlisten(pid: str) -> None:
+            self.remove_listener(pid, handler)
+            if on_preview:
+                self.remove_preview_listener(pid, on_preview)
+
+        await listen(prompt_id)
         try:
+            if workflow is not None:
+                queued_id = await self.queue_prompt(workflow, prompt_id=prompt_id)
+                if queued_id and queued_id != prompt_id:
+                    unlisten(prompt_id)
+                    prompt_id = queued_id
+                    final_progress = WSProgress(prompt_id=prompt_id)
+                    await listen(prompt_id)
             await asyncio.wait_for(completed.wait(), timeout=timeout)
         except asyncio.TimeoutError:
             final_progress = WSProgress(
@@ -478,24 +1208,25 @@ class ComfyWSClient:
                 status="timeout",
             )
         finally:
-            self.remove_listener(prompt_id, handler)
+            unlisten(prompt_id)
 
         return final_progress
 
     async def get_history(self, prompt_id: str) -> dict[str, Any]:
         """Get execution history for a prompt."""
-        import httpx
+        response = await self.http.get(
+            f"/history/{prompt_id}", timeout=settings.comfyui.timeout_read
+        )
+        response.raise_for_status()
+        history: dict[str, Any] = response_json(response)
+        return history
 
-        http_url = self.ws_url.replace("ws://", "http://").replace("wss://", "https://")
-        http_url = http_url.replace("/ws", "")
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{http_url}/history/{prompt_id}",
-                timeout=settings.comfyui.timeout_read,
-            )
-            response.raise_for_status()
-            return response.json()
+    async def get_queue(self) -> dict[str, Any]:
+        """Get ComfyUI's running and pending prompts."""
+        response = await self.http.get("/queue", timeout=settings.comfyui.timeout_read)
+        response.raise_for_status()
+        queue: dict[str, Any] = response_json(response)
+        return queue
 
     async def get_image(
         self,
@@ -503,18 +1234,22 @@ class ComfyWSClient:
         subfolder: str = "",
         folder_type: str = "output",
     ) -> bytes | None:
-        """Download a generated image."""
-        import httpx
-
-        http_url = self.ws_url.replace("ws://", "http://").replace("wss://", "https://")
-        http_url = http_url.replace("/ws", "")
+        """
+        Download a generated image.
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{http_url}/view",
-                params={"filename": filename, "subfolder": subfolder, "type": folder_type},
-                timeout=settings.comfyui.timeout_image,
-            )
-            if response.status_code == 200:
-                return response.content
-        return None
+        Streamed over the pooled connections; concurrent downloads from one
+        backend are capped by settings.http.max_downloads_per_host.
+        """
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+        async with (
+            async_download_slot(self.http_url),
+            self.http.stream(
+                "GET", "/view", params=params, timeout=settings.comfyui.timeout_image
+            ) as response,
+        ):
+            if response.status_code != 200:
+                return None
+            data = bytearray()
+            async for chunk in response.aiter_bytes(DEFAULT_CHUNK_SIZE):
+                data += chunk
+        return bytes(data)
@@ -766,10 +766,8 @@ class DAGValidator:
         # Add more as needed
     }
 
-    # Cache for dynamically fetched node info
+    # Output types from the backend's capability snapshot (see fetch_node_info)
     _dynamic_node_cache: dict[str, list[str]] | None = None
-    _cache_timestamp: float = 0.0
-    _cache_ttl: float = 300.0  # 5 minutes
 
     def __init__(self, comfyui_url: str | None = None):
         """
@@ -785,56 +783,35 @@ class DAGValidator:
         """
         Fetch node type information from ComfyUI.
 
-        Caches results for 5 minutes to avoid repeated requests.
+        Uses the backend's shared /object_info capability snapshot, so this
+        only hits the network when the snapshot is missing or stale.
 
         Args:
-            force: Force refresh even if cache is valid
+            force: Force refresh even if the snapshot is fresh
 
         Returns:
             Dict mapping node class types to their output types
         """
-        import time
-
-        # Check cache
-        if (
-            not force
-            and self._dynamic_node_cache is not None
-            and time.time() - self._cache_timestamp < self._cache_ttl
-        ):
-            return self._dynamic_node_cache
-
         if not self.comfyui_url:
             return self.NODE_OUTPUTS.copy()
 
         try:
-            import requests
-
-            from .config import settings
-
-            response = requests.get(
-                f"{self.comfyui_url}/object_info", timeout=settings.comfyui.timeout_connect
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                node_outputs: dict[str, list[str]] = {}
-
-                for node_type, info in data.items():
-                    # Extract output types from the node info
-                    output_info = info.get("output", [])
-                    if isinstance(output_info, list):
-                        node_outputs[node_type] = output_info
-                    else:
-                        node_outputs[node_type] = []
-
-                self._dynamic_node_cache = node_outputs
-                self._cache_timestamp = time.time()
-
+            from .capabilities import get_capability_cache
+
+            cache = get_capability_cache(self.comfyui_url)
+            snapshot = cache.snapshot
+            if force or not cache.is_fresh(snapshot):
+                # Only build a client when the shared snapshot needs a refresh
+                from .client import ComfyClient
+
+                with ComfyClient(base_url=self.comfyui_url, use_websocket=False) as client:
+                    snapshot = client.get_capabilities(force=force)
+            if snapshot is not None:
+                self._dynamic_node_cache = snapshot.outputs
                 logger.debug(
-                    "Fetched node info from ComfyUI", extra={"node_count": len(node_outputs)}
+                    "Loaded node info from ComfyUI", extra={"node_count": len(snapshot.outputs)}
                 )
-                return node_outputs
-
+                return snapshot.outputs
         except Exception as e:
             logger.debug(f"Failed to fetch node info: {e}")
 
@@ -0,0 +1,306 @@
+"""
+Comfy Headless - Shared WebSocket Sessions
+===========================================
+
+Process-wide, reference-counted WebSocket sessions. Every waiter talking to
+the same ComfyUI backend with the same client_id shares one connection;
+events are routed to per-prompt watches with a single dict lookup, so the
+cost per message does not grow with the number of outstanding prompts.
+
+ComfyUI sends execution events only to the socket whose clientId queued the
+prompt, so clients that should share a connection must queue with the
+session's client_id.
+
+Usage:
+    from comfy_headless.ws_session import get_ws_session_manager
+
+    manager = get_ws_session_manager()
+    session = await manager.acquire("http://localhost:8188", client_id)
+    try:
+        watch = session.watch(prompt_id)
+        final = await watch.wait(timeout=300)
+        watch.close()
+    finally:
+        await manager.release(session)
+"""
+
+import asyncio
+import contextlib
+import threading
+import uuid
+
+from .config import settings
+from .logging_config import get_logger
+from .websocket_client import TERMINAL_STATUSES, ComfyWSClient, WSProgress
+
+logger = get_logger(__name__)
+
+__all__ = [
+    "PromptWatch",
+    "WSSession",
+    "WSSessionManager",
+    "get_ws_session_manager",
+]
+
+
+class PromptWatch:
+    """
+    Subscription to the events of one prompt.
+
+    Events are kept in a bounded queue (oldest dropped when full); the
+    terminal event (completed, error, interrupted) also resolves `result`.
+    """
+
+    # Events buffered per watch before the oldest are dropped
+    DEFAULT_MAX_EVENTS = 256
+
+    def __init__(self, session: "WSSession", prompt_id: str, max_events: int = DEFAULT_MAX_EVENTS):
+        self.session = session
+        self.prompt_id = prompt_id
+        self.events: asyncio.Queue[WSProgress] = asyncio.Queue(maxsize=max(1, max_events))
+        self.result: asyncio.Future[WSProgress] = asyncio.get_running_loop().create_future()
+        self.dropped = 0
+
+    def _push(self, event: WSProgress) -> None:
+        """Deliver an event (called on the session's loop)."""
+        if self.events.full():
+            self.events.get_nowait()
+            self.dropped += 1
+        self.events.put_nowait(event)
+        if event.status in TERMINAL_STATUSES and not self.result.done():
+            self.result.set_result(event)
+
+    def _abort(self, exc: BaseException) -> None:
+        """Fail the watch, e.g. when the session closes."""
+        if not self.result.done():
+            self.result.set_exception(exc)
+            # Mark retrieved so an unawaited abort doesn't warn at shutdown
+            self.result.exception()
+
+    @property
+    def done(self) -> bool:
+        """True once a terminal event arrived or the watch was aborted."""
+        return self.result.done()
+
+    async def get(self, timeout: float | None = None) -> WSProgress | None:
+        """
+        Get the next event.
+
+        Returns:
+            The next event, or None if none arrived within timeout
+        """
+        try:
+            return await asyncio.wait_for(self.events.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def wait(self, timeout: float | None = None) -> WSProgress:
+        """
+        Wait for the terminal event.
+
+        Returns:
+            The terminal event, or a "timeout" event if none arrived in time
+        """
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.result), timeout=timeout)
+        except asyncio.TimeoutError:
+            return WSProgress(prompt_id=self.prompt_id, status="timeout")
+
+    def close(self) -> None:
+        """Stop receiving events."""
+        self.session._unwatch(self)
+        if not self.result.done():
+            self.result.cancel()
+
+
+class WSSession:
+    """
+    One shared WebSocket connection with per-prompt event routing.
+
+    Obtain sessions from WSSessionManager.acquire(); they are bound to the
+    event loop they were acquired on.
+    """
+
+    def __init__(self, ws: ComfyWSClient, key: tuple):
+        self.ws = ws
+        self.key = key
+        self.refcount = 0
+        self._watches: dict[str, list[PromptWatch]] = {}
+        ws.add_router(self._route)
+        ws.add_prompt_source(self._watches.keys)
+
+    @property
+    def client_id(self) -> str:
+        """clientId prompts must be queued with to be routed here."""
+        return self.ws.client_id
+
+    @property
+    def connected(self) -> bool:
+        """Check if the underlying WebSocket is connected."""
+        return self.ws.connected
+
+    @property
+    def reconnecting(self) -> bool:
+        """True while the WebSocket is re-establishing a dropped connection."""
+        return self.ws.reconnecting
+
+    @property
+    def watch_count(self) -> int:
+        """Number of prompts currently watched."""
+        return len(self._watches)
+
+    def watch(
+        self, prompt_id: str, max_events: int = PromptWatch.DEFAULT_MAX_EVENTS
+    ) -> PromptWatch:
+        """
+        Start watching a prompt's events.
+
+        Events the prompt emitted before the watch started are replayed from
+        the socket's early-event buffer; that buffer is bounded, so register
+        before queueing the prompt (or check /history afterwards) when the
+        prompt may have run long unobserved.
+        """
+        watch = PromptWatch(self, prompt_id, max_events)
+        self._watches.setdefault(prompt_id, []).append(watch)
+        for event in self.ws.pop_early_events(prompt_id):
+            watch._push(event)
+        return watch
+
+    def _unwatch(self, watch: PromptWatch) -> None:
+        watches = self._watches.get(watch.prompt_id)
+        if watches is None:
+            return
+        with contextlib.suppress(ValueError):
+            watches.remove(watch)
+        if not watches:
+            del self._watches[watch.prompt_id]
+
+    def _route(self, event: WSProgress) -> None:
+        """Route an event to the watches of its prompt (inline, never blocks)."""
+        watches = self._watches.get(event.prompt_id)
+        if not watches:
+            return
+        for watch in watches:
+            watch._push(event)
+
+    async def close(self) -> None:
+        """Disconnect and fail all outstanding watches."""
+        from .exceptions import ComfyUIConnectionError
+
+        error = ComfyUIConnectionError(message="WebSocket session closed", url=self.ws.ws_url)
+        for watches in list(self._watches.values()):
+            for watch in watches:
+                watch._abort(error)
+        self._watches.clear()
+        self.ws.remove_router(self._route)
+        await self.ws.disconnect()
+
+
+class WSSessionManager:
+    """
+    Registry of shared WebSocket sessions.
+
+    Sessions are keyed by (ComfyUI URL, client_id, event loop) and
+    reference counted: acquire() connects on first use, release() closes
+    the connection when the last user is gone.
+    """
+
+    def __init__(self) -> None:
+        self._sessions: dict[tuple, WSSession] = {}
+        self._connecting: dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    async def acquire(
+        self,
+        base_url: str | None = None,
+        client_id: str | None = None,
+        reconnect_attempts: int = 1,
+    ) -> WSSession:
+        """
+        Get a connected session, creating or reconnecting it if needed.
+
+        Args:
+            base_url: ComfyUI server URL (default from settings)
+            client_id: clientId for the socket (default: new UUID)
+            reconnect_attempts: Connection attempts for a new connection
+
+        Raises:
+            ComfyUIConnectionError: If the WebSocket cannot connect
+        """
+        base_url = (base_url or settings.comfyui.url).rstrip("/")
+        client_id = client_id or str(uuid.uuid4())
+        loop = asyncio.get_running_loop()
+        key = (base_url, client_id, id(loop))
+
+        while True:
+            with self._lock:
+                session = self._sessions.get(key)
+                pending = self._connecting.get(key)
+                if pending is None:
+                    if session is not None and (session.connected or session.reconnecting):
+                        session.refcount += 1
+                        return session
+                    # This caller connects; concurrent callers wait on it
+                    pending = loop.create_future()
+                    self._connecting[key] = pending
+                    break
+            with contextlib.suppress(Exception):
+                await asyncio.shield(pending)
+
+        try:
+            if session is None:
+                ws = ComfyWSClient(
+                    base_url, client_id=client_id, reconnect_attempts=reconnect_attempts
+                )
+                session = WSSession(ws, key)
+            await session.ws.connect()
+        except BaseException as e:
+            with self._lock:
+                del self._connecting[key]
+            pending.set_exception(e)
+            pending.exception()
+            raise
+
+        with self._lock:
+            session.refcount += 1
+            self._sessions[key] = session
+            del self._connecting[key]
+        pending.set_result(session)
+
+        logger.debug(
+            "WebSocket session acquired",
+            extra={"ws_url": session.ws.ws_url, "refcount": session.refcount},
+        )
+        return session
+
+    async def release(self, session: WSSession) -> None:
+        """Drop a reference; the last release closes the connection."""
+        with self._lock:
+            session.refcount -= 1
+            if session.refcount > 0:
+                return
+            if self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+
+        await session.close()
+        logger.debug("WebSocket session closed", extra={"ws_url": session.ws.ws_url})
+
+    @property
+    def sessions(self) -> list[WSSession]:
+        """Currently open sessions."""
+        with self._lock:
+            return list(self._sessions.values())
+
+
+_manager: WSSessionManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_ws_session_manager() -> WSSessionManager:
+    """Get the process-wide WebSocket session manager."""
+    global _manager
+
+    with _manager_lock:
+        if _manager is None:
+            _manager = WSSessionManager()
+        return _manager
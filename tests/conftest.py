@@ -1,10 +1,84 @@
 """Pytest configuration and fixtures."""
 
-from unittest.mock import MagicMock
+import json
+from unittest.mock import MagicMock, Mock
 
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def isolated_capability_cache(tmp_path, monkeypatch):
+    """Keep /object_info snapshots per test and out of the real cache dir."""
+    from comfy_headless import capabilities
+
+    capabilities.clear_capability_caches()
+    monkeypatch.setattr(capabilities, "get_cache_dir", lambda: tmp_path)
+    yield
+    capabilities.clear_capability_caches()
+
+
+@pytest.fixture(autouse=True)
+def isolated_liveness():
+    """Don't let one test's cached backend reachability answer the next one's is_online()."""
+    from comfy_headless import liveness
+
+    liveness.clear_liveness()
+    yield
+    liveness.clear_liveness()
+
+
+@pytest.fixture(autouse=True)
+def isolated_admission():
+    """Start every test with no prompts counted against any backend's queue limit."""
+    from comfy_headless import admission
+
+    admission.clear_admission()
+    yield
+    admission.clear_admission()
+
+
+@pytest.fixture
+def comfy_queue():
+    """
+    Build a ComfyUI /queue response.
+
+    comfy_queue(running=(...), pending=(...)) takes prompt IDs, or
+    (prompt ID, extra_data) pairs for prompts carrying extra_data.
+    """
+
+    def build(running=(), pending=()) -> dict:
+        def item(number, prompt):
+            prompt_id, extra_data = prompt if isinstance(prompt, tuple) else (prompt, {})
+            return [number, prompt_id, {}, extra_data, []]
+
+        return {
+            "queue_running": [item(i, prompt) for i, prompt in enumerate(running)],
+            "queue_pending": [item(i, prompt) for i, prompt in enumerate(pending, len(running))],
+        }
+
+    return build
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """
+    Replace client methods with mocks for the rest of the test.
+
+    fake_backend(client, name=value, ...) installs each Mock as is, a
+    callable as the mock's side_effect and anything else as its
+    return_value; the mocks are removed when the test ends.
+    """
+
+    def install(client, **methods):
+        for name, value in methods.items():
+            if not isinstance(value, Mock):
+                value = Mock(side_effect=value) if callable(value) else Mock(return_value=value)
+            monkeypatch.setattr(client, name, value)
+        return client
+
+    return install
+
+
 @pytest.fixture
 def mock_settings():
     """Provide mock settings for tests."""
@@ -30,7 +104,7 @@ def mock_session():
     response = MagicMock()
     response.ok = True
     response.status_code = 200
-    response.json.return_value = {"prompt_id": "test-123"}
+    response.content = json.dumps({"prompt_id": "test-123"}).encode()
     session.request.return_value = response
     session.get.return_value = response
     session.post.return_value = response
@@ -0,0 +1,236 @@
+"""Tests for per-backend admission control."""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+class TestAdmissionController:
+    """Test the counter and its reconciliation."""
+
+    def test_waits_until_release(self, comfy_queue):
+        """Test a full backend blocks acquire until a prompt is released."""
+        from comfy_headless.admission import AdmissionController
+
+        controller = AdmissionController("http://a:8188", limit=2, reconcile_interval=60)
+        for prompt_id in ("p1", "p2"):
+            controller.acquire(lambda: comfy_queue(pending=("p1", "p2")))
+            controller.admitted(prompt_id)
+        assert not controller.try_acquire()
+
+        threading.Timer(0.1, controller.release, args=("p1",)).start()
+        start = time.monotonic()
+        controller.acquire(lambda: comfy_queue(pending=("p1", "p2")), timeout=5)
+
+        assert 0.05 < time.monotonic() - start < 2
+        assert controller.load == 2
+
+    def test_overloaded_after_timeout(self, comfy_queue):
+        """Test timeout 0 rejects at once when /queue confirms the backend is full."""
+        from comfy_headless.admission import AdmissionController
+        from comfy_headless.exceptions import BackendOverloadedError
+
+        controller = AdmissionController("http://a:8188", limit=1, reconcile_interval=0)
+        controller.acquire(dict)
+        controller.admitted("p1")
+
+        with pytest.raises(BackendOverloadedError) as exc:
+            controller.acquire(lambda: comfy_queue(pending=("p1",)), timeout=0)
+        assert exc.value.code == "BACKEND_OVERLOADED"
+        assert exc.value.details == {"url": "http://a:8188", "limit": 1}
+
+    def test_reconcile_frees_finished_and_counts_others(self, comfy_queue):
+        """Test prompts gone from /queue free their slot and foreign prompts count."""
+        from comfy_headless.admission import AdmissionController
+
+        controller = AdmissionController("http://a:8188", limit=3)
+        for prompt_id in ("mine1", "mine2"):
+            controller.try_acquire()
+            controller.admitted(prompt_id)
+
+        controller.reconcile(lambda: comfy_queue(pending=("mine2", "theirs1", "theirs2")))
+
+        assert controller.load == 3
+        assert not controller.try_acquire()
+
+    def test_reconcile_keeps_prompts_admitted_during_fetch(self, comfy_queue):
+        """Test a prompt queued while /queue was in flight isn't released."""
+        from comfy_headless.admission import AdmissionController
+
+        controller = AdmissionController("http://a:8188", limit=5)
+
+        def fetch():
+            controller.try_acquire()
+            controller.admitted("racing")
+            return comfy_queue()
+
+        controller.reconcile(fetch)
+        assert controller.load == 1
+
+    def test_unreadable_queue_changes_nothing(self):
+        """Test a failed /queue read doesn't release anything."""
+        from comfy_headless.admission import AdmissionController
+
+        controller = AdmissionController("http://a:8188", limit=5)
+        controller.try_acquire()
+        controller.admitted("p1")
+
+        controller.reconcile(lambda: None)
+        controller.reconcile(MagicMock(side_effect=OSError("down")))
+
+        assert controller.load == 1
+
+    def test_no_limit(self):
+        """Test limit 0 never blocks."""
+        from comfy_headless.admission import AdmissionController
+
+        controller = AdmissionController("http://a:8188", limit=0)
+        assert all(controller.try_acquire() for _ in range(1000))
+        for i in range(1000):
+            controller.admitted(f"p{i}")
+        assert controller.load == 0
+
+    def test_disabled_by_default(self):
+        """Test admission control is opt-in."""
+        from comfy_headless.admission import get_admission
+
+        assert get_admission("http://default:8188").limit == 0
+
+    async def test_async_acquire_reconciles(self, comfy_queue):
+        """Test aacquire waits without blocking the loop and gets in once /queue drains."""
+        from comfy_headless.admission import AdmissionController
+
+        controller = AdmissionController("http://a:8188", limit=1, reconcile_interval=0.05)
+        controller.try_acquire()
+        controller.admitted("p1")
+        queue = comfy_queue(pending=("p1",))
+
+        async def fetch():
+            return queue
+
+        async def drain():
+            await asyncio.sleep(0.1)
+            queue["queue_pending"].clear()
+
+        await asyncio.gather(controller.aacquire(fetch, timeout=5), drain())
+        assert controller.load == 1  # p1 released, new reservation held
+
+
+class TestClientAdmission:
+    """Test queue_prompt goes through admission."""
+
+    def _client(self):
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(use_websocket=False)
+        client._admission.limit = 1
+        client._admission.reconcile_interval = 0
+        return client
+
+    def test_block_false_rejects(self, comfy_queue):
+        """Test block=False raises BackendOverloadedError on a full backend."""
+        from comfy_headless.exceptions import BackendOverloadedError
+
+        client = self._client()
+        response = MagicMock(ok=True, content=b'{"prompt_id": "p1"}')
+        with (
+            patch.object(client, "_post", return_value=response) as post,
+            patch.object(client, "fetch_queue", return_value=comfy_queue(pending=("p1",))),
+        ):
+            assert client.queue_prompt({"1": {}}) == "p1"
+            with pytest.raises(BackendOverloadedError):
+                client.queue_prompt({"1": {}}, block=False)
+        assert post.call_count == 1
+
+    def test_failed_post_returns_slot(self):
+        """Test a prompt ComfyUI rejects doesn't keep its reservation."""
+        client = self._client()
+        with patch.object(client, "_post", return_value=MagicMock(ok=False, status_code=400)):
+            assert client.queue_prompt({"1": {}}) is None
+        assert client._admission.load == 0
+
+    def test_wait_releases_slot(self):
+        """Test a prompt seen finishing frees its slot for the next one."""
+        client = self._client()
+        response = MagicMock(ok=True, content=b'{"prompt_id": "p1"}')
+        with (
+            patch.object(client, "_post", return_value=response),
+            patch.object(client, "_poll_for_completion", return_value={"outputs": {}}),
+        ):
+            client.queue_prompt({"1": {}})
+            assert client._admission.load == 1
+            client.wait_for_completion("p1")
+        assert client._admission.load == 0
+
+    def test_timed_out_wait_settles_slot(self, comfy_queue):
+        """Test a wait that times out or fails keeps the slot only while /queue lists the prompt."""
+        from comfy_headless.exceptions import ComfyUIConnectionError
+
+        client = self._client()
+        client._admission.try_acquire()
+        client._admission.admitted("p1")
+        with (
+            patch.object(client, "_poll_for_completion", return_value=None),
+            patch.object(client, "fetch_queue", return_value=comfy_queue(pending=("p1",))),
+        ):
+            assert client.wait_for_completion("p1") is None
+        assert client._admission.load == 1
+
+        with (
+            patch.object(client, "_poll_for_completion", side_effect=ComfyUIConnectionError()),
+            patch.object(client, "fetch_queue", return_value=comfy_queue()),
+            pytest.raises(ComfyUIConnectionError),
+        ):
+            client.wait_for_completion("p1")
+        assert client._admission.load == 0
+
+    async def test_async_timed_out_wait_settles_slot(self, comfy_queue):
+        """Test AsyncComfyClient frees the slot of a timed-out prompt ComfyUI no longer has."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient(use_websocket=False)
+        client._admission.limit = 1
+        client._admission.try_acquire()
+        client._admission.admitted("p1")
+
+        async def fetch_queue():
+            return comfy_queue()
+
+        with (
+            patch.object(client, "_poll_for_completion", return_value=None),
+            patch.object(client, "fetch_queue", side_effect=fetch_queue),
+        ):
+            assert await client.wait_for_completion("p1") is None
+        assert client._admission.load == 0
+
+    def test_shared_between_clients(self):
+        """Test clients of one backend share its controller."""
+        from comfy_headless.async_client import AsyncComfyClient
+        from comfy_headless.client import ComfyClient
+
+        assert ComfyClient(use_websocket=False)._admission is self._client()._admission
+        assert AsyncComfyClient()._admission is ComfyClient(use_websocket=False)._admission
+
+    async def test_async_client_rejects(self, comfy_queue):
+        """Test AsyncComfyClient.queue_prompt(block=False) on a full backend."""
+        from comfy_headless.async_client import AsyncComfyClient
+        from comfy_headless.exceptions import BackendOverloadedError
+
+        client = AsyncComfyClient()
+        client._admission.limit = 1
+        client._admission.try_acquire()
+        client._admission.admitted("p1")
+
+        async def fetch_queue():
+            return comfy_queue(pending=("p1",))
+
+        with (
+            patch.object(client, "fetch_queue", side_effect=fetch_queue),
+            patch.object(client, "_post") as post,
+            pytest.raises(BackendOverloadedError),
+        ):
+            await client.queue_prompt({"1": {}}, block=False)
+        post.assert_not_called()
@@ -0,0 +1,310 @@
+"""Tests for async_client module."""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+
+def _make_client(handler):
+    """Build an AsyncComfyClient whose HTTP calls go to an httpx MockTransport."""
+    from comfy_headless.async_client import AsyncComfyClient
+    from comfy_headless.http_client import AsyncHttpClient
+
+    client = AsyncComfyClient(base_url="http://localhost:8188")
+    client._http = AsyncHttpClient(base_url=client.base_url, circuit_name=None)
+    client._http._client = httpx.AsyncClient(
+        base_url=client.base_url, transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+class TestAsyncComfyClientInit:
+    """Test AsyncComfyClient construction."""
+
+    def test_exported_from_package(self):
+        """Test AsyncComfyClient is exported when httpx is installed."""
+        from comfy_headless import AsyncComfyClient
+
+        assert AsyncComfyClient is not None
+
+    def test_base_url_trailing_slash(self):
+        """Test trailing slash is stripped from base URL."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient(base_url="http://localhost:8188/")
+        assert client.base_url == "http://localhost:8188"
+        assert client.client_id
+
+    def test_rate_limiter_optional(self):
+        """Test rate limiter is only created when requested."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        assert AsyncComfyClient()._rate_limiter is None
+        assert AsyncComfyClient(rate_limit=5)._rate_limiter is not None
+
+    def test_backend_options(self):
+        """Test client_id, circuit_name and transport are configurable like ComfyClient."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient(
+            client_id="fixed",
+            circuit_name="comfyui:http://b:8188",
+            transport="uds",
+            uds_path="/tmp/comfy.sock",
+            use_websocket=False,
+        )
+        assert client.client_id == "fixed"
+        assert client.http._circuit.name == "comfyui:http://b:8188"
+        assert client.http.uds_path == "/tmp/comfy.sock"
+        assert client._ws_session is None and not client._use_websocket
+
+        with pytest.raises(ValueError):
+            AsyncComfyClient(transport="carrier-pigeon")
+
+    def test_vram_estimates_match_sync_client(self):
+        """Test VRAM estimates are shared with ComfyClient."""
+        from comfy_headless.async_client import AsyncComfyClient
+        from comfy_headless.client import ComfyClient
+
+        assert AsyncComfyClient().estimate_vram_for_image(
+            1024, 1024, 2
+        ) == ComfyClient().estimate_vram_for_image(1024, 1024, 2)
+
+
+class TestAsyncComfyClientRequests:
+    """Test async API calls against a mock transport."""
+
+    async def test_is_online(self):
+        """Test is_online returns True on 200."""
+        client = _make_client(lambda request: httpx.Response(200, json={}))
+        async with client:
+            assert await client.is_online() is True
+
+    async def test_is_online_offline(self):
+        """Test is_online returns False on connection failure."""
+
+        def handler(request):
+            raise httpx.ConnectError("refused")
+
+        client = _make_client(handler)
+        async with client:
+            assert await client.is_online() is False
+
+    async def test_queue_prompt_sends_client_id(self):
+        """Test queue_prompt posts the workflow with client_id."""
+        seen = {}
+
+        def handler(request):
+            seen["path"] = request.url.path
+            seen["body"] = json.loads(request.content)
+            return httpx.Response(200, json={"prompt_id": "abc123"})
+
+        client = _make_client(handler)
+        async with client:
+            prompt_id = await client.queue_prompt({"1": {"class_type": "X"}})
+
+        assert prompt_id == "abc123"
+        assert seen["path"] == "/prompt"
+        assert seen["body"]["client_id"] == client.client_id
+
+    async def test_queue_prompt_invalid_workflow(self):
+        """Test queue_prompt rejects non-dict workflows."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient()
+        assert await client.queue_prompt("not a dict") is None
+
+    async def test_get_checkpoints(self):
+        """Test object_info parsing for checkpoints."""
+        payload = {
+            "CheckpointLoaderSimple": {
+                "input": {"required": {"ckpt_name": [["a.safetensors", "b.safetensors"]]}}
+            }
+        }
+        client = _make_client(lambda request: httpx.Response(200, json=payload))
+        async with client:
+            assert await client.get_checkpoints() == ["a.safetensors", "b.safetensors"]
+
+    async def test_get_queue_error_returns_empty(self):
+        """Test get_queue falls back to an empty queue on errors."""
+        from comfy_headless.async_client import AsyncComfyClient
+        from comfy_headless.exceptions import ComfyUIConnectionError
+
+        client = AsyncComfyClient()
+        with patch.object(
+            client, "_request", AsyncMock(side_effect=ComfyUIConnectionError(message="down"))
+        ):
+            assert await client.get_queue() == {"queue_running": [], "queue_pending": []}
+
+
+class TestAsyncComfyClientGeneration:
+    """Test high-level async generation."""
+
+    async def test_wait_for_completion_async_callback(self):
+        """Test wait_for_completion awaits coroutine progress callbacks."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient()
+        entry = {"status": {"completed": True}, "outputs": {}}
+        updates = []
+
+        async def on_progress(progress, status):
+            updates.append((progress, status))
+
+        with patch.object(client, "get_history", AsyncMock(return_value={"p1": entry})):
+            result = await client.wait_for_completion("p1", timeout=5, on_progress=on_progress)
+
+        assert result is entry
+        assert updates == [(1.0, "Completed")]
+
+    @staticmethod
+    def _fake_ws(events, connected=True):
+        """WSSession over a fake socket that replays events to new watches."""
+        from unittest.mock import Mock
+
+        from comfy_headless.ws_session import WSSession
+
+        ws = Mock()
+        ws.connected = connected
+        ws.reconnecting = False
+        ws.pop_early_events.return_value = []
+        session = WSSession(ws, key=("test",))
+
+        def watch(prompt_id):
+            prompt_watch = WSSession.watch(session, prompt_id)
+            for event in events:
+                prompt_watch._push(event)
+            return prompt_watch
+
+        session.watch = watch
+        return session
+
+    async def test_wait_uses_websocket_events(self):
+        """Test completion is detected from WebSocket events without polling."""
+        from comfy_headless.async_client import AsyncComfyClient
+        from comfy_headless.websocket_client import WSProgress
+
+        events = [
+            WSProgress(prompt_id="p1", status="progress", progress=10, max_progress=20),
+            WSProgress(prompt_id="p1", status="completed"),
+        ]
+        entry = {"status": {"completed": True}, "outputs": {}}
+        updates = []
+
+        client = AsyncComfyClient()
+        with (
+            patch.object(
+                client, "_ensure_websocket", AsyncMock(return_value=self._fake_ws(events))
+            ),
+            patch.object(
+                client, "get_history", AsyncMock(side_effect=[{}, {"p1": entry}])
+            ) as get_history,
+        ):
+            result = await client.wait_for_completion(
+                "p1", timeout=5, on_progress=lambda p, s: updates.append((p, s))
+            )
+
+        assert result is entry
+        assert get_history.await_count == 2
+        assert any(s == "Step 10/20" for _, s in updates)
+        assert updates[-1] == (1.0, "Completed")
+
+    async def test_wait_falls_back_to_polling_when_socket_drops(self):
+        """Test polling takes over when the WebSocket disconnects mid-wait."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        entry = {"status": {"completed": True}, "outputs": {}}
+        client = AsyncComfyClient()
+        with (
+            patch("comfy_headless.async_client.WS_LIVENESS_INTERVAL", 0.05),
+            patch.object(
+                client, "_ensure_websocket", AsyncMock(return_value=self._fake_ws([], False))
+            ),
+            patch.object(client, "get_history", AsyncMock(side_effect=[{}, {}, {"p1": entry}])),
+        ):
+            result = await client.wait_for_completion("p1", timeout=5, poll_interval=0.01)
+
+        assert result is entry
+
+    async def test_websocket_connect_failure_is_cached(self):
+        """Test a failed WebSocket connect is not retried on every wait."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient(base_url="http://127.0.0.1:9", use_websocket=True)
+        with patch("comfy_headless.ws_session.ComfyWSClient") as mock_ws_cls:
+            mock_ws_cls.return_value.connect = AsyncMock(side_effect=ConnectionRefusedError())
+            assert await client._ensure_websocket() is None
+            assert await client._ensure_websocket() is None
+
+        assert mock_ws_cls.call_count == 1
+
+    async def test_generate_image_offline(self):
+        """Test generate_image reports offline ComfyUI."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient()
+        with patch.object(client, "is_online", AsyncMock(return_value=False)):
+            result = await client.generate_image("a cat")
+
+        assert result["success"] is False
+        assert result["error"]
+
+    async def test_generate_image_success(self):
+        """Test generate_image collects output images."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient()
+        history = {
+            "status": {"completed": True},
+            "outputs": {"9": {"images": [{"filename": "out.png", "subfolder": ""}]}},
+        }
+        with (
+            patch.object(client, "is_online", AsyncMock(return_value=True)),
+            patch.object(client, "get_checkpoints", AsyncMock(return_value=["m.safetensors"])),
+            patch.object(client, "queue_prompt", AsyncMock(return_value="p1")),
+            patch.object(client, "wait_for_completion", AsyncMock(return_value=history)),
+        ):
+            result = await client.generate_image("a cat", seed=42)
+
+        assert result["success"] is True
+        assert result["prompt_id"] == "p1"
+        assert result["seed"] == 42
+        assert result["images"][0]["filename"] == "out.png"
+
+    @pytest.mark.parametrize("max_concurrent", [1, 3])
+    async def test_generate_batch_preserves_order(self, max_concurrent):
+        """Test generate_batch returns results in input order."""
+        import asyncio
+
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient()
+        in_flight = 0
+        peak = 0
+
+        async def fake_generate(result, prompt, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01 * (3 - int(prompt[-1])))
+            in_flight -= 1
+            result.update(success=True, prompt_id=prompt)
+
+        with patch.object(client, "_generate_image_into", side_effect=fake_generate):
+            result = await client.generate_batch(
+                ["p0", "p1", "p2"], max_concurrent=max_concurrent, check_vram=False
+            )
+
+        assert result["success"] is True
+        assert [r["prompt_id"] for r in result["results"]] == ["p0", "p1", "p2"]
+        assert peak == max_concurrent
+
+    async def test_generate_batch_empty(self):
+        """Test generate_batch with no prompts."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        result = await AsyncComfyClient().generate_batch([])
+        assert result["success"] is False
+        assert result["errors"]
@@ -0,0 +1,299 @@
+"""Tests for per-prompt cancellation, batch handles and streaming batch results."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+
+import pytest
+
+
+@pytest.fixture
+def make_client(fake_backend):
+    """ComfyClient whose /queue reads return queues in turn (the last one repeats)."""
+    from comfy_headless.client import ComfyClient
+
+    def make(*queues: dict):
+        reads = list(queues)
+        return fake_backend(
+            ComfyClient(use_websocket=False),
+            fetch_queue=lambda: reads.pop(0) if len(reads) > 1 else reads[0],
+            _post=Mock(return_value=MagicMock(ok=True)),
+        )
+
+    return make
+
+
+def _posts(client) -> list[tuple[str, dict]]:
+    return [(call.args[0], call.kwargs.get("json")) for call in client._post.call_args_list]
+
+
+class TestCancel:
+    """Test cancelling individual prompts."""
+
+    def test_pending_prompt_is_deleted(self, comfy_queue, make_client):
+        """Test a pending prompt is deleted from the queue and the running one left alone."""
+        client = make_client(comfy_queue(running=("theirs",), pending=("mine", "other")))
+        client._admission.try_acquire()
+        client._admission.admitted("mine")
+
+        assert client.cancel("mine")
+        assert _posts(client) == [("/queue", {"delete": ["mine"]})]
+        assert client._admission.load == 0
+
+    def test_running_prompt_is_interrupted(self, comfy_queue, make_client):
+        """Test only the running prompt itself is interrupted."""
+        client = make_client(comfy_queue(running=("mine",), pending=("other",)))
+
+        assert client.cancel("mine")
+        assert _posts(client) == [("/interrupt", {"prompt_id": "mine"})]
+
+    def test_finished_prompt(self, comfy_queue, make_client):
+        """Test a prompt no longer in /queue is not cancelled and nothing is interrupted."""
+        client = make_client(comfy_queue(running=("theirs",)))
+
+        assert not client.cancel("mine")
+        client._post.assert_not_called()
+
+    def test_unreadable_queue(self, make_client):
+        """Test nothing is sent when /queue can't be read."""
+        client = make_client(None)
+
+        assert client.cancel_prompts(["a", "b"]) == []
+        client._post.assert_not_called()
+
+    def test_prompt_starting_during_delete(self, comfy_queue, make_client):
+        """Test a prompt that leaves the pending queue before the delete lands is interrupted."""
+        client = make_client(
+            comfy_queue(running=("x",), pending=("a", "b")),
+            comfy_queue(running=("a",), pending=()),
+        )
+
+        assert client.cancel_prompts(["b", "a"]) == ["b", "a"]
+        assert _posts(client) == [
+            ("/queue", {"delete": ["a", "b"]}),
+            ("/interrupt", {"prompt_id": "a"}),
+        ]
+
+
+class TestPromptBatch:
+    """Test cancelling a batch as a unit."""
+
+    def test_cancel_is_one_bulk_delete(self, comfy_queue, make_client):
+        """Test cancel() deletes all outstanding prompts at once and skips finished ones."""
+        client = make_client(
+            comfy_queue(running=("theirs",), pending=("p2", "p3", "p4", "theirs2"))
+        )
+        batch = client.batch(["p1", "p2", "p3", "p4"])
+        batch.mark_finished("p1")
+
+        assert batch.cancel() == ["p2", "p3", "p4"]
+        assert _posts(client) == [("/queue", {"delete": ["p2", "p3", "p4"]})]
+        assert batch.cancelled and batch.was_cancelled("p3") and not batch.was_cancelled("p1")
+        assert batch.outstanding == []
+
+    def test_cancelled_batch_queues_nothing(self, comfy_queue, make_client):
+        """Test queue() on a cancelled batch doesn't reach ComfyUI."""
+        client = make_client(comfy_queue())
+        batch = client.batch()
+        batch.cancel()
+
+        with patch.object(client, "queue_prompt") as queue_prompt:
+            assert batch.queue({"1": {}}) is None
+        queue_prompt.assert_not_called()
+
+    def test_generate_batch_stops_when_cancelled(self, comfy_queue, make_client):
+        """Test generate_batch(batch=) stops submitting and reports removed items."""
+        client = make_client(comfy_queue(pending=("p1",)))
+        batch = client.batch()
+        history = {
+            "p0": {
+                "status": {"completed": True, "status_str": "success"},
+                "outputs": {"9": {"images": [{"filename": "a.png", "type": "output"}]}},
+            }
+        }
+        with (
+            patch.object(client, "ensure_online"),
+            patch.object(client, "_build_image_workflow", return_value=({"1": {}}, 1)),
+            patch.object(client, "queue_prompt", side_effect=["p0", "p1", "p2"]) as queue_prompt,
+            patch.object(client, "get_queue", return_value=comfy_queue(pending=("p1",))),
+            patch.object(client, "get_history", side_effect=lambda pid: {pid: history[pid]}),
+        ):
+            result = client.generate_batch(
+                ["a", "b", "c"],
+                max_concurrent=2,
+                check_vram=False,
+                batch=batch,
+                on_progress=lambda *args: batch.cancel(),
+            )
+
+        assert [r["error"] for r in result["results"]] == [None, "Cancelled", "Cancelled"]
+        assert result["success_count"] == 1
+        assert queue_prompt.call_count == 2
+        assert batch.prompt_ids == ["p0", "p1"]
+
+
+class TestAsyncPromptBatch:
+    """Test the asyncio batch handle."""
+
+    async def test_cancel_ends_waits(self, comfy_queue):
+        """Test cancelling a batch deletes its prompts and ends waits on them."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient()
+        never = asyncio.Event()
+
+        async def wait_for_completion(prompt_id, **kwargs):
+            await never.wait()
+
+        with (
+            patch.object(
+                client, "fetch_queue", AsyncMock(return_value=comfy_queue(pending=("p1",)))
+            ),
+            patch.object(
+                client, "_post", AsyncMock(return_value=MagicMock(is_success=True))
+            ) as post,
+            patch.object(client, "wait_for_completion", side_effect=wait_for_completion),
+        ):
+            batch = client.batch(["p1"])
+            waiter = asyncio.create_task(batch.wait_for_completion("p1"))
+            await asyncio.sleep(0)
+
+            assert await batch.cancel() == ["p1"]
+            assert await asyncio.wait_for(waiter, 1) is None
+        post.assert_any_call("/queue", json={"delete": ["p1"]})
+
+
+def _done(image: str) -> dict:
+    return {
+        "status": {"completed": True, "status_str": "success"},
+        "outputs": {"9": {"images": [{"filename": image, "type": "output"}]}},
+    }
+
+
+@pytest.fixture
+def fake_generation(fake_backend, comfy_queue):
+    """Fake what generate_batch_iter calls on a client; each prompt is its own prompt ID."""
+
+    def install(client, history: dict):
+        fake_backend(
+            client,
+            ensure_online=None,
+            _build_image_workflow=lambda prompt, seed, **kw: (prompt, seed),
+            queue_prompt=lambda workflow: workflow,
+            get_queue=comfy_queue(),
+            get_history=lambda pid: {pid: history[pid]} if pid in history else {},
+        )
+
+    return install
+
+
+class TestGenerateBatchIter:
+    """Test streaming batch results."""
+
+    def test_yields_in_completion_order(self, comfy_queue, make_client, fake_generation):
+        """Test results come out as they finish, tagged with their index, reading prompts lazily."""
+        client = make_client(comfy_queue())
+        history = {"b": _done("b.png")}
+        read = []
+
+        def prompts():
+            for prompt in "abc":
+                read.append(prompt)
+                yield prompt
+
+        fake_generation(client, history)
+        results = client.generate_batch_iter(
+            prompts(), seeds=[7], max_concurrent=2, check_vram=False
+        )
+
+        idx, result = next(results)
+        assert (idx, result["images"][0]["filename"]) == (1, "b.png")
+        assert read == ["a", "b"]
+
+        history.update(a=_done("a.png"), c=_done("c.png"))
+        rest = list(results)
+        assert sorted(idx for idx, _ in rest) == [0, 2]
+        assert {idx: r["seed"] for idx, r in rest} == {0: 7, 2: -1}
+        assert all(r["success"] for _, r in rest)
+
+    def test_close_cancels_outstanding(self, comfy_queue, make_client, fake_generation):
+        """Test leaving the iterator early withdraws the prompts still on ComfyUI."""
+        client = make_client(comfy_queue(pending=("a", "c")))
+        fake_generation(client, {"b": _done("b.png")})
+
+        results = client.generate_batch_iter("abc", max_concurrent=3, check_vram=False)
+        assert next(results)[0] == 1
+        results.close()
+
+        assert _posts(client) == [("/queue", {"delete": ["a", "c"]})]
+
+    def test_close_leaves_caller_batch_prompts(self, comfy_queue, make_client, fake_generation):
+        """Test closing the iterator keeps prompts the caller added to its batch."""
+        client = make_client(comfy_queue(pending=("caller", "a", "c")))
+        fake_generation(client, {"b": _done("b.png")})
+        batch = client.batch(["caller"])
+
+        results = client.generate_batch_iter("abc", max_concurrent=3, check_vram=False, batch=batch)
+        assert next(results)[0] == 1
+        results.close()
+
+        assert _posts(client) == [("/queue", {"delete": ["a", "c"]})]
+        assert not batch.cancelled
+        assert batch.outstanding == ["caller"]
+
+    async def test_async_yields_as_completed(self):
+        """Test the async iterator yields in completion order within max_concurrent."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient()
+        delays = {"a": 0.06, "b": 0.01, "c": 0.02}
+        in_flight = peak = 0
+
+        async def fake_generate(result, prompt, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(delays[prompt])
+            in_flight -= 1
+            result.update(success=True, prompt_id=prompt)
+
+        with patch.object(client, "_generate_image_into", side_effect=fake_generate):
+            results = [
+                (idx, result["prompt_id"])
+                async for idx, result in client.generate_batch_iter(
+                    iter("abc"), max_concurrent=2, check_vram=False
+                )
+            ]
+
+        assert results == [(1, "b"), (2, "c"), (0, "a")]
+        assert peak == 2
+
+    async def test_async_close_cancels(self):
+        """Test closing the async iterator cancels only the prompts it queued."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient()
+        started = []
+
+        async def fake_generate(result, prompt, batch, **kwargs):
+            started.append(prompt)
+            if prompt != "a":
+                result["prompt_id"] = f"id-{prompt}"
+                batch.add(result["prompt_id"])
+                await asyncio.Event().wait()
+            result.update(success=True, prompt_id=prompt)
+
+        with (
+            patch.object(client, "_generate_image_into", side_effect=fake_generate),
+            patch.object(client, "cancel_prompts", AsyncMock(return_value=[])) as cancel_prompts,
+        ):
+            batch = client.batch(["caller"])
+            results = client.generate_batch_iter(
+                "abcd", max_concurrent=2, check_vram=False, batch=batch
+            )
+            assert (await results.__anext__())[0] == 0
+            await results.aclose()
+
+        cancel_prompts.assert_awaited_once_with(["id-b"])
+        assert not batch.cancelled
+        assert batch.outstanding == ["caller"]
+        assert "d" not in started
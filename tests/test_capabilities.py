@@ -0,0 +1,231 @@
+"""Tests for the shared /object_info capability cache."""
+
+import json
+import threading
+import time
+from unittest.mock import Mock, patch
+
+OBJECT_INFO = {
+    "CheckpointLoaderSimple": {
+        "input": {"required": {"ckpt_name": [["a.safetensors", "b.safetensors"]]}},
+        "output": ["MODEL", "CLIP", "VAE"],
+    },
+    "KSampler": {
+        "input": {"required": {"sampler_name": [["euler"]], "scheduler": [["karras"]]}},
+        "output": ["LATENT"],
+    },
+    "LoraLoader": {"input": {"required": {"lora_name": [["l.safetensors"]]}}},
+}
+
+
+def _response(data):
+    response = Mock()
+    response.ok = True
+    response.content = json.dumps(data).encode()
+    return response
+
+
+class TestCapabilityCache:
+    """Test snapshot freshness, sharing and persistence."""
+
+    def test_fetches_once_within_ttl(self):
+        """Test a fresh snapshot is reused without fetching."""
+        from comfy_headless.capabilities import CapabilityCache
+
+        fetch = Mock(return_value=OBJECT_INFO)
+        cache = CapabilityCache("http://localhost:8188", ttl=60, persist=False)
+
+        first = cache.get(fetch)
+        second = cache.get(fetch)
+
+        assert first is second
+        assert fetch.call_count == 1
+        assert first.has_node("KSampler")
+        assert first.outputs["CheckpointLoaderSimple"] == ["MODEL", "CLIP", "VAE"]
+        assert first.outputs["LoraLoader"] == []
+
+    def test_refreshes_when_stale_and_on_force(self):
+        """Test stale snapshots and force=True trigger a refetch."""
+        from comfy_headless.capabilities import CapabilityCache
+
+        fetch = Mock(return_value=OBJECT_INFO)
+        cache = CapabilityCache("http://localhost:8188", ttl=0, persist=False)
+        cache.get(fetch)
+        cache.get(fetch)
+        assert fetch.call_count == 2
+
+        cache.ttl = 60
+        cache.get(fetch, force=True)
+        assert fetch.call_count == 3
+
+    def test_stale_snapshot_served_when_refresh_fails(self):
+        """Test a failed refresh keeps the previous snapshot."""
+        from comfy_headless.capabilities import CapabilityCache
+
+        cache = CapabilityCache("http://localhost:8188", ttl=0, persist=False)
+        first = cache.get(lambda: OBJECT_INFO)
+
+        assert cache.get(Mock(return_value=None)) is first
+        assert cache.get(Mock(side_effect=OSError("down"))) is first
+
+    def test_concurrent_refreshes_share_one_fetch(self):
+        """Test threads that miss together trigger a single fetch."""
+        from comfy_headless.capabilities import CapabilityCache
+
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return OBJECT_INFO
+
+        cache = CapabilityCache("http://localhost:8188", ttl=60, persist=False)
+        threads = [threading.Thread(target=cache.get, args=(slow_fetch,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+
+    def test_persisted_snapshot_warms_new_cache(self, tmp_path):
+        """Test a new cache (e.g. after restart) loads the snapshot from disk."""
+        from comfy_headless.capabilities import CapabilityCache
+
+        CapabilityCache("http://localhost:8188", ttl=60).get(lambda: OBJECT_INFO)
+        assert list((tmp_path / "object_info").glob("*.json"))
+
+        fetch = Mock(return_value={})
+        warm = CapabilityCache("http://localhost:8188/", ttl=60).get(fetch)
+
+        fetch.assert_not_called()
+        assert warm.node_types == frozenset(OBJECT_INFO)
+
+    def test_persisted_snapshot_is_per_url(self):
+        """Test snapshots of other backends are not loaded."""
+        from comfy_headless.capabilities import CapabilityCache
+
+        CapabilityCache("http://a:8188", ttl=60).get(lambda: OBJECT_INFO)
+        assert CapabilityCache("http://b:8188", ttl=60).snapshot is None
+
+    def test_corrupt_cache_file_ignored(self):
+        """Test an unreadable cache file is treated as a miss."""
+        from comfy_headless.capabilities import CapabilityCache
+
+        cache = CapabilityCache("http://localhost:8188", ttl=60)
+        cache.path.parent.mkdir(parents=True, exist_ok=True)
+        cache.path.write_text("{not json")
+
+        assert cache.snapshot is None
+        assert cache.get(lambda: OBJECT_INFO).has_node("KSampler")
+
+    def test_invalidate_removes_file(self):
+        """Test invalidate forgets the snapshot on disk too."""
+        from comfy_headless.capabilities import CapabilityCache
+
+        cache = CapabilityCache("http://localhost:8188", ttl=60)
+        cache.get(lambda: OBJECT_INFO)
+        cache.invalidate()
+
+        assert cache.snapshot is None
+        assert not cache.path.exists()
+
+    async def test_async_refreshes_share_one_fetch(self):
+        """Test concurrent aget calls on one loop share a fetch."""
+        import asyncio
+
+        from comfy_headless.capabilities import CapabilityCache
+
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return OBJECT_INFO
+
+        cache = CapabilityCache("http://localhost:8188", ttl=60, persist=False)
+        snapshots = await asyncio.gather(*(cache.aget(fetch) for _ in range(5)))
+
+        assert len(calls) == 1
+        assert all(s is snapshots[0] for s in snapshots)
+
+
+class TestClientCapabilities:
+    """Test the client, validator and dependency checks share one snapshot."""
+
+    def test_model_lists_share_one_request(self):
+        """Test the model getters and dependency check make one /object_info request."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(use_websocket=False)
+        with patch.object(client, "_get", return_value=_response(OBJECT_INFO)) as mock_get:
+            assert client.get_checkpoints() == ["a.safetensors", "b.safetensors"]
+            assert client.get_samplers() == ["euler"]
+            assert client.get_schedulers() == ["karras"]
+            assert client.get_loras() == ["l.safetensors"]
+            assert client.get_motion_models() == []
+            report = client.check_workflow_dependencies(
+                {"1": {"class_type": "KSampler"}, "2": {"class_type": "Missing"}}
+            )
+
+        mock_get.assert_called_once_with("/object_info")
+        assert report["installed"] == ["KSampler"]
+        assert report["missing"] == ["Missing"]
+
+    def test_clients_share_snapshot_per_url(self):
+        """Test a second client for the same backend reuses the snapshot."""
+        from comfy_headless.client import ComfyClient
+
+        first = ComfyClient(base_url="http://shared:8188", use_websocket=False)
+        second = ComfyClient(base_url="http://shared:8188/", use_websocket=False)
+        with patch.object(first, "_get", return_value=_response(OBJECT_INFO)):
+            first.get_capabilities()
+        with patch.object(second, "_get") as second_get:
+            assert "KSampler" in second.get_all_installed_nodes()
+
+        second_get.assert_not_called()
+
+    def test_validator_uses_snapshot(self):
+        """Test DAGValidator reads output types from the shared snapshot."""
+        from comfy_headless.capabilities import get_capability_cache
+        from comfy_headless.workflows import DAGValidator
+
+        get_capability_cache("http://validator:8188").update(OBJECT_INFO)
+        validator = DAGValidator(comfyui_url="http://validator:8188")
+
+        with patch("comfy_headless.client.ComfyClient._get") as mock_get:
+            outputs = validator.fetch_node_info()
+
+        mock_get.assert_not_called()
+        assert outputs["KSampler"] == ["LATENT"]
+        assert validator.get_node_outputs("CheckpointLoaderSimple") == ["MODEL", "CLIP", "VAE"]
+
+    def test_validator_closes_its_fetch_client(self):
+        """Test DAGValidator only builds a client to refresh the snapshot, and closes it."""
+        from comfy_headless.client import ComfyClient
+        from comfy_headless.workflows import DAGValidator
+
+        validator = DAGValidator(comfyui_url="http://fresh-validator:8188")
+        with (
+            patch.object(ComfyClient, "_fetch_object_info", return_value=OBJECT_INFO) as fetch,
+            patch.object(ComfyClient, "close") as close,
+        ):
+            assert validator.fetch_node_info()["KSampler"] == ["LATENT"]
+            validator.fetch_node_info()
+
+        fetch.assert_called_once()
+        close.assert_called_once()
+
+    async def test_async_client_shares_snapshot(self):
+        """Test AsyncComfyClient reads the snapshot filled by ComfyClient."""
+        from comfy_headless.async_client import AsyncComfyClient
+        from comfy_headless.client import ComfyClient
+
+        sync_client = ComfyClient(base_url="http://both:8188", use_websocket=False)
+        with patch.object(sync_client, "_get", return_value=_response(OBJECT_INFO)):
+            sync_client.get_capabilities()
+
+        client = AsyncComfyClient(base_url="http://both:8188")
+        with patch.object(client, "_get") as mock_get:
+            assert await client.get_loras() == ["l.safetensors"]
+        mock_get.assert_not_called()
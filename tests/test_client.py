@@ -1,6 +1,7 @@
 """Comprehensive tests for ComfyClient module."""
 
-from unittest.mock import Mock, patch
+import json
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
@@ -153,9 +154,9 @@ class TestConnectionMethods:
 
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {
-            "devices": [{"vram_total": 16 * 1024**3, "vram_free": 8 * 1024**3}]
-        }
+        mock_response.content = json.dumps(
+            {"devices": [{"vram_total": 16 * 1024**3, "vram_free": 8 * 1024**3}]}
+        ).encode()
         mock_get.return_value = mock_response
 
         client = ComfyClient()
@@ -415,11 +416,15 @@ class TestObjectInfo:
 
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {
-            "CheckpointLoaderSimple": {
-                "input": {"required": {"ckpt_name": [["model1.safetensors", "model2.safetensors"]]}}
+        mock_response.content = json.dumps(
+            {
+                "CheckpointLoaderSimple": {
+                    "input": {
+                        "required": {"ckpt_name": [["model1.safetensors", "model2.safetensors"]]}
+                    }
+                }
             }
-        }
+        ).encode()
         mock_get.return_value = mock_response
 
         client = ComfyClient()
@@ -433,11 +438,15 @@ class TestObjectInfo:
 
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {
-            "KSampler": {
-                "input": {"required": {"sampler_name": [["euler", "euler_ancestral", "dpmpp_2m"]]}}
+        mock_response.content = json.dumps(
+            {
+                "KSampler": {
+                    "input": {
+                        "required": {"sampler_name": [["euler", "euler_ancestral", "dpmpp_2m"]]}
+                    }
+                }
             }
-        }
+        ).encode()
         mock_get.return_value = mock_response
 
         client = ComfyClient()
@@ -463,9 +472,9 @@ class TestObjectInfo:
 
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {
-            "KSampler": {"input": {"required": {"scheduler": [["normal", "karras"]]}}}
-        }
+        mock_response.content = json.dumps(
+            {"KSampler": {"input": {"required": {"scheduler": [["normal", "karras"]]}}}}
+        ).encode()
         mock_get.return_value = mock_response
 
         client = ComfyClient()
@@ -479,9 +488,9 @@ class TestObjectInfo:
 
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {
-            "LoraLoader": {"input": {"required": {"lora_name": [["lora1.safetensors"]]}}}
-        }
+        mock_response.content = json.dumps(
+            {"LoraLoader": {"input": {"required": {"lora_name": [["lora1.safetensors"]]}}}}
+        ).encode()
         mock_get.return_value = mock_response
 
         client = ComfyClient()
@@ -495,11 +504,13 @@ class TestObjectInfo:
 
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {
-            "ADE_LoadAnimateDiffModel": {
-                "input": {"required": {"model_name": [["v3_sd15_mm.ckpt"]]}}
+        mock_response.content = json.dumps(
+            {
+                "ADE_LoadAnimateDiffModel": {
+                    "input": {"required": {"model_name": [["v3_sd15_mm.ckpt"]]}}
+                }
             }
-        }
+        ).encode()
         mock_get.return_value = mock_response
 
         client = ComfyClient()
@@ -522,10 +533,12 @@ class TestQueueManagement:
 
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {
-            "queue_running": [["id1", "prompt1"]],
-            "queue_pending": [],
-        }
+        mock_response.content = json.dumps(
+            {
+                "queue_running": [["id1", "prompt1"]],
+                "queue_pending": [],
+            }
+        ).encode()
         mock_get.return_value = mock_response
 
         client = ComfyClient()
@@ -550,7 +563,7 @@ class TestQueueManagement:
 
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {"prompt123": {"status": {"completed": True}}}
+        mock_response.content = json.dumps({"prompt123": {"status": {"completed": True}}}).encode()
         mock_get.return_value = mock_response
 
         client = ComfyClient()
@@ -611,7 +624,7 @@ class TestPromptQueueing:
 
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {"prompt_id": "abc123"}
+        mock_response.content = json.dumps({"prompt_id": "abc123"}).encode()
         mock_post.return_value = mock_response
 
         client = ComfyClient()
@@ -840,6 +853,122 @@ class TestBatchGeneration:
         assert result["success_count"] == 2
         assert len(result["results"]) == 2
 
+    def test_generate_batch_pipelined_keeps_queue_full(self):
+        """Pipelined batch keeps max_concurrent prompts queued and preserves order."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient()
+        queued = []
+        max_inflight = [0]
+        finished = set()
+
+        def fake_queue(workflow):
+            prompt_id = f"pid-{len(queued)}"
+            queued.append(prompt_id)
+            max_inflight[0] = max(max_inflight[0], len(queued) - len(finished))
+            return prompt_id
+
+        def fake_queue_status():
+            # Everything not yet finished is pending except the oldest, which runs
+            active = [pid for pid in queued if pid not in finished]
+            return {
+                "queue_running": [[0, active[0]]] if active else [],
+                "queue_pending": [[i, pid] for i, pid in enumerate(active[1:])],
+            }
+
+        def fake_history(prompt_id):
+            return {
+                prompt_id: {
+                    "status": {"completed": True, "status_str": "success"},
+                    "outputs": {"9": {"images": [{"filename": f"{prompt_id}.png"}]}},
+                }
+            }
+
+        def finish_oldest(*args):
+            active = [pid for pid in queued if pid not in finished]
+            if active:
+                finished.add(active[0])
+
+        with (
+            patch.object(client, "ensure_online"),
+            patch.object(client, "build_txt2img_workflow", return_value={}),
+            patch.object(client, "queue_prompt", side_effect=fake_queue),
+            patch.object(client, "get_queue", side_effect=fake_queue_status),
+            patch.object(client, "get_history", side_effect=fake_history),
+            patch("comfy_headless.client.time.sleep", side_effect=finish_oldest),
+        ):
+            result = client.generate_batch(
+                prompts=[f"p{i}" for i in range(5)],
+                preset="",
+                max_concurrent=3,
+                check_vram=False,
+            )
+
+        assert result["success"] is True
+        assert max_inflight[0] == 3
+        filenames = [r["images"][0]["filename"] for r in result["results"]]
+        assert filenames == [f"pid-{i}.png" for i in range(5)]
+
+    def test_generate_batch_pipelined_queue_failure(self):
+        """Pipelined batch records per-item queue failures in order."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient()
+
+        with (
+            patch.object(client, "ensure_online"),
+            patch.object(client, "build_txt2img_workflow", return_value={}),
+            patch.object(client, "queue_prompt", side_effect=[None, "pid-1"]),
+            patch.object(client, "get_queue", return_value={}),
+            patch.object(
+                client,
+                "get_history",
+                return_value={"pid-1": {"status": {"completed": True}, "outputs": {}}},
+            ),
+        ):
+            result = client.generate_batch(
+                prompts=["a", "b"], preset="", max_concurrent=2, check_vram=False
+            )
+
+        assert result["success"] is False
+        assert result["results"][0]["error"] == "Failed to queue prompt"
+        assert result["results"][1]["prompt_id"] == "pid-1"
+        assert result["errors"][0].startswith("Prompt 0:")
+
+    def test_generate_batch_pipelined_timeout_cancels(self):
+        """Pipelined batch cancels timed-out prompts in one call and frees their slots."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(use_websocket=False)
+        client._admission.try_acquire()
+        client._admission.admitted("pid-0")
+        client._admission.try_acquire()
+        client._admission.admitted("pid-1")
+
+        with (
+            patch.object(client, "ensure_online"),
+            patch.object(client, "build_txt2img_workflow", return_value={}),
+            patch.object(client, "queue_prompt", side_effect=["pid-0", "pid-1"]),
+            patch.object(
+                client,
+                "get_queue",
+                return_value={"queue_running": [[0, "pid-0"]], "queue_pending": []},
+            ),
+            patch.object(client, "get_history", return_value={}),
+            patch.object(client, "cancel_prompts", return_value=["pid-0"]) as cancel_prompts,
+        ):
+            result = client.generate_batch(
+                prompts=["a", "b"], preset="", max_concurrent=2, check_vram=False, timeout=-1
+            )
+
+        assert [r["error"] for r in result["results"]] == [
+            "Generation timed out after -1s",
+            "Generation timed out after -1s",
+        ]
+        cancel_prompts.assert_called_once()
+        assert sorted(cancel_prompts.call_args.args[0]) == ["pid-0", "pid-1"]
+        assert client._admission.load == 0
+
 
 # ============================================================================
 # WAIT FOR COMPLETION TESTS
@@ -876,6 +1005,159 @@ class TestWaitForCompletion:
 
         assert result is None
 
+    @staticmethod
+    def _fake_ws(events, connected=True):
+        """WSSession over a fake socket that replays events to new watches."""
+        from comfy_headless.ws_session import WSSession
+
+        ws = Mock()
+        ws.connected = connected
+        ws.reconnecting = False
+        ws.pop_early_events.return_value = []
+        session = WSSession(ws, key=("test",))
+
+        def watch(prompt_id):
+            prompt_watch = WSSession.watch(session, prompt_id)
+            for event in events:
+                prompt_watch._push(event)
+            return prompt_watch
+
+        session.watch = watch
+        return session
+
+    def test_wait_uses_websocket_events(self):
+        """Test completion is detected from WebSocket events without polling."""
+        from comfy_headless.client import ComfyClient
+        from comfy_headless.websocket_client import WSProgress
+
+        events = [
+            WSProgress(prompt_id="p1", status="progress", progress=10, max_progress=20),
+            WSProgress(prompt_id="p1", status="completed"),
+        ]
+        entry = {"status": {"completed": True}, "outputs": {}}
+        progress_calls = []
+
+        client = ComfyClient()
+        with (
+            patch.object(client, "_ensure_websocket", return_value=self._fake_ws(events)),
+            patch.object(client, "get_history", side_effect=[{}, {"p1": entry}]) as mock_history,
+        ):
+            result = client.wait_for_completion(
+                "p1", timeout=5, on_progress=lambda p, s: progress_calls.append((p, s))
+            )
+
+        assert result is entry
+        assert mock_history.call_count == 2
+        assert any(s == "Step 10/20" for _, s in progress_calls)
+        assert progress_calls[-1] == (1.0, "Completed")
+
+    def test_wait_falls_back_to_polling_when_socket_drops(self):
+        """Test polling takes over when the WebSocket disconnects mid-wait."""
+        from comfy_headless.client import ComfyClient
+
+        entry = {"status": {"completed": True}, "outputs": {}}
+        client = ComfyClient()
+        with (
+            patch("comfy_headless.client.WS_LIVENESS_INTERVAL", 0.05),
+            patch.object(
+                client, "_ensure_websocket", return_value=self._fake_ws([], connected=False)
+            ),
+            patch.object(client, "get_history", side_effect=[{}, {}, {"p1": entry}]),
+        ):
+            result = client.wait_for_completion("p1", timeout=5, poll_interval=0.01)
+
+        assert result is entry
+
+    def test_poll_backoff_is_capped(self):
+        """Test polling without events never waits much more than a second between checks."""
+        from comfy_headless.client import ComfyClient
+
+        running = {"p1": {"status": {"status_str": "running"}}}
+        done = {"p1": {"status": {"completed": True}, "outputs": {}}}
+        client = ComfyClient(use_websocket=False)
+        with (
+            patch.object(client, "get_history", side_effect=[running] * 12 + [done]),
+            patch("comfy_headless.client.time.sleep") as sleep,
+        ):
+            assert client.wait_for_completion("p1", timeout=60, poll_interval=0.5) is not None
+
+        intervals = [call.args[0] for call in sleep.call_args_list]
+        assert intervals[0] == 0.5
+        assert max(intervals) == 1.0
+
+    def test_busy_event_loop_falls_back_to_polling(self):
+        """Test a stalled background loop makes the wait poll instead of raising."""
+        import asyncio
+        import time
+
+        from comfy_headless.client import ComfyClient
+
+        class StalledWatch:
+            closed = False
+
+            async def get(self, timeout):
+                await asyncio.sleep(10)
+
+            def close(self):
+                StalledWatch.closed = True
+
+        session = Mock(connected=True, reconnecting=False)
+        session.watch.return_value = StalledWatch()
+        entry = {"status": {"completed": True}, "outputs": {}}
+        client = ComfyClient()
+        with (
+            patch("comfy_headless.client.WS_LIVENESS_INTERVAL", 0.01),
+            patch("comfy_headless.client.settings.comfyui.timeout_connect", 0.05),
+            patch.object(client, "_ensure_websocket", return_value=session),
+            patch.object(client, "get_history", side_effect=[{}, {"p1": entry}]),
+        ):
+            assert client.wait_for_completion("p1", timeout=5, poll_interval=0.01) is entry
+
+        deadline = time.monotonic() + 1
+        while not StalledWatch.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert StalledWatch.closed
+
+    def test_slow_subscribe_falls_back_and_closes_watch(self):
+        """Test a subscribe that times out polls and closes the watch registered late."""
+        import time
+
+        from comfy_headless.client import ComfyClient
+
+        watch = Mock()
+
+        def slow_watch(prompt_id):
+            time.sleep(0.1)
+            return watch
+
+        session = Mock(connected=True, reconnecting=False)
+        session.watch.side_effect = slow_watch
+        entry = {"status": {"completed": True}, "outputs": {}}
+        client = ComfyClient()
+        with (
+            patch("comfy_headless.client.settings.comfyui.timeout_connect", 0.02),
+            patch.object(client, "_ensure_websocket", return_value=session),
+            patch.object(client, "get_history", return_value={"p1": entry}),
+        ):
+            assert client.wait_for_completion("p1", timeout=5, poll_interval=0.01) is entry
+
+        deadline = time.monotonic() + 1
+        while not watch.close.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        watch.close.assert_called_once()
+
+    def test_websocket_connect_failure_is_cached(self):
+        """Test a failed WebSocket connect is not retried on every wait."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url="http://127.0.0.1:9", use_websocket=True)
+        with patch("comfy_headless.ws_session.ComfyWSClient") as mock_ws_cls:
+            mock_ws_cls.return_value.connect = AsyncMock(side_effect=ConnectionRefusedError())
+            assert client._ensure_websocket() is None
+            assert client._ensure_websocket() is None
+
+        assert mock_ws_cls.call_count == 1
+
 
 # ============================================================================
 # REQUEST METHOD TESTS
@@ -914,6 +1196,176 @@ class TestRequestMethods:
             client._request("GET", "/test", timeout=1)
 
 
+class TestRequestCoalescing:
+    """Test single-flight GETs."""
+
+    def _slow_session(self, client, delay=0.05):
+        """Replace the client's session with one that counts slow requests."""
+        import time
+
+        session = Mock()
+        response = Mock(ok=True, status_code=200, content=b'{"queue_running": []}')
+
+        def request(*args, **kwargs):
+            time.sleep(delay)
+            return response
+
+        session.request.side_effect = request
+        client._session = session
+        return session, response
+
+    def _concurrently(self, fn, n=8):
+        import threading
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(fn())) for _ in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_gets_share_one_request(self):
+        """Test identical concurrent GETs make one HTTP request."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url="http://coalesce-get:8188", use_websocket=False)
+        session, _ = self._slow_session(client)
+
+        results = self._concurrently(client.get_queue)
+
+        assert session.request.call_count == 1
+        assert all(r == {"queue_running": []} for r in results)
+        # Every caller gets its own parsed result
+        assert len({id(r) for r in results}) == len(results)
+
+    def test_clients_do_not_share_requests(self):
+        """Test two clients of one backend never coalesce with each other."""
+        from comfy_headless.client import ComfyClient
+
+        clients = [
+            ComfyClient(base_url="http://coalesce-shared:8188", use_websocket=False)
+            for _ in range(2)
+        ]
+        sessions = [self._slow_session(client)[0] for client in clients]
+
+        self._concurrently(lambda: [client.get_queue() for client in clients], n=4)
+
+        assert [session.request.call_count for session in sessions] == [1, 1]
+
+    def test_posts_and_streams_not_coalesced(self):
+        """Test POSTs and raw GETs (downloads) always go out individually."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url="http://coalesce-post:8188", use_websocket=False)
+        session, _ = self._slow_session(client)
+
+        self._concurrently(lambda: client._post("/prompt", json={}), n=4)
+        self._concurrently(lambda: client._get("/view", stream=True), n=4)
+        self._concurrently(lambda: client._get("/view"), n=4)
+
+        assert session.request.call_count == 12
+
+    def test_coalescing_can_be_disabled(self):
+        """Test http.coalesce_gets=False sends every GET."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url="http://coalesce-off:8188", use_websocket=False)
+        session, _ = self._slow_session(client)
+
+        with patch("comfy_headless.client.settings.http.coalesce_gets", False):
+            self._concurrently(client.get_queue, n=4)
+
+        assert session.request.call_count == 4
+
+    def test_micro_ttl_absorbs_sequential_burst(self):
+        """Test coalesce_ttl reuses a response for back-to-back calls."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url="http://coalesce-ttl:8188", use_websocket=False)
+        session, _ = self._slow_session(client, delay=0)
+
+        with patch("comfy_headless.client.settings.http.coalesce_ttl", 10.0):
+            client.get_queue()
+            client.get_queue()
+            client.get_history("abc")
+
+        assert session.request.call_count == 2
+
+    @patch("comfy_headless.client.requests.get")
+    def test_is_online_probes_once(self, mock_get):
+        """Test concurrent is_online calls share one probe."""
+        import time
+
+        from comfy_headless.client import ComfyClient
+
+        def probe(*args, **kwargs):
+            time.sleep(0.05)
+            return Mock(status_code=200)
+
+        mock_get.side_effect = probe
+        client = ComfyClient(base_url="http://coalesce-online:8188", use_websocket=False)
+
+        assert self._concurrently(client.is_online) == [True] * 8
+        assert mock_get.call_count == 1
+
+
+class TestLiveness:
+    """Test is_online/ensure_online answering from cached liveness."""
+
+    @patch("comfy_headless.client.requests.get")
+    def test_response_marks_online_without_probe(self, mock_get):
+        """Test a successful request lets ensure_online skip the probe."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url="http://live-up:8188", use_websocket=False)
+        client._session = Mock()
+        client._session.request.return_value = Mock(ok=True, status_code=200)
+
+        client._post("/prompt", json={})
+        client.ensure_online()
+
+        mock_get.assert_not_called()
+
+    @patch("comfy_headless.client.requests.get")
+    def test_connection_error_marks_offline(self, mock_get):
+        """Test a refused connection makes is_online False without probing."""
+        import requests
+
+        from comfy_headless.client import ComfyClient
+        from comfy_headless.exceptions import ComfyUIConnectionError
+        from comfy_headless.retry import get_circuit_breaker
+
+        client = ComfyClient(
+            base_url="http://live-down:8188", use_websocket=False, circuit_name="live-down"
+        )
+        client._session = Mock()
+        client._session.request.side_effect = requests.exceptions.ConnectionError("refused")
+
+        try:
+            with pytest.raises(ComfyUIConnectionError):
+                client._post("/prompt", json={})
+            assert client.is_online() is False
+            mock_get.assert_not_called()
+        finally:
+            get_circuit_breaker("live-down").reset()
+
+    @patch("comfy_headless.client.requests.get")
+    def test_zero_ttl_always_probes(self, mock_get):
+        """Test liveness_ttl=0 restores a probe per check."""
+        from comfy_headless.client import ComfyClient
+
+        mock_get.return_value = Mock(status_code=200)
+        with (
+            patch("comfy_headless.liveness.settings.comfyui.liveness_ttl", 0.0),
+            patch("comfy_headless.client.settings.http.coalesce_gets", False),
+        ):
+            client = ComfyClient(base_url="http://live-ttl:8188", use_websocket=False)
+            assert client.is_online() and client.is_online()
+
+        assert mock_get.call_count == 2
+
+
 # ============================================================================
 # RATE LIMITING TESTS
 # ============================================================================
@@ -9,6 +9,7 @@ Covers:
 - Workflow building
 """
 
+import json
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -148,7 +149,7 @@ class TestQueuePrompt:
         with patch.object(client, "_post") as mock_post:
             mock_response = MagicMock()
             mock_response.ok = True
-            mock_response.json.return_value = {"prompt_id": "test-123"}
+            mock_response.content = json.dumps({"prompt_id": "test-123"}).encode()
             mock_post.return_value = mock_response
 
             result = client.queue_prompt({"test": "workflow"})
@@ -436,7 +437,7 @@ class TestCircuitBreakerIntegration:
 
         # Verify circuit breaker is initialized
         assert client._circuit is not None
-        assert client._circuit.name == "comfyui"
+        assert client._circuit.name == f"comfyui:{client.base_url}"
 
     def test_request_fails_when_circuit_open(self):
         """Requests fail fast when circuit is open."""
@@ -486,9 +487,9 @@ class TestGetSystemStats:
         with patch.object(client, "_get") as mock_get:
             mock_response = MagicMock()
             mock_response.ok = True
-            mock_response.json.return_value = {
-                "system": {"devices": [{"name": "cuda:0", "vram_total": 16000000000}]}
-            }
+            mock_response.content = json.dumps(
+                {"system": {"devices": [{"name": "cuda:0", "vram_total": 16000000000}]}}
+            ).encode()
             mock_get.return_value = mock_response
 
             result = client.get_system_stats()
@@ -507,7 +508,7 @@ class TestGetQueue:
         with patch.object(client, "_get") as mock_get:
             mock_response = MagicMock()
             mock_response.ok = True
-            mock_response.json.return_value = {"queue_pending": [], "queue_running": []}
+            mock_response.content = json.dumps({"queue_pending": [], "queue_running": []}).encode()
             mock_get.return_value = mock_response
 
             result = client.get_queue()
@@ -527,7 +528,7 @@ class TestGetHistory:
         with patch.object(client, "_get") as mock_get:
             mock_response = MagicMock()
             mock_response.ok = True
-            mock_response.json.return_value = {}
+            mock_response.content = json.dumps({}).encode()
             mock_get.return_value = mock_response
 
             result = client.get_history("test-123")
@@ -542,7 +543,9 @@ class TestGetHistory:
         with patch.object(client, "_get") as mock_get:
             mock_response = MagicMock()
             mock_response.ok = True
-            mock_response.json.return_value = {"test-123": {"status": {"completed": True}}}
+            mock_response.content = json.dumps(
+                {"test-123": {"status": {"completed": True}}}
+            ).encode()
             mock_get.return_value = mock_response
 
             result = client.get_history("test-123")
@@ -0,0 +1,356 @@
+"""Tests for streaming output downloads."""
+
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB
+
+
+class _ViewHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD on /view, dropping the first response halfway through."""
+
+    drops_remaining = 0
+    honor_range = True
+    requests_seen: list = []
+    payload = PAYLOAD
+    etag = '"v1"'
+    # Replaces (payload, etag) after the first dropped response
+    replacement = None
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests_seen.append(self.headers.get("Range"))
+        payload = cls.payload
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and cls.honor_range and if_range in (None, cls.etag):
+            start = int(range_header.split("=")[1].rstrip("-"))
+            if start >= len(payload):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(payload)}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+        else:
+            self.send_response(200)
+
+        body = payload[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", cls.etag)
+        self.end_headers()
+
+        if cls.drops_remaining > 0:
+            cls.drops_remaining -= 1
+            if cls.replacement is not None:
+                cls.payload, cls.etag = cls.replacement
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def view_server():
+    """Local HTTP server implementing /view with Range support."""
+    from comfy_headless.retry import get_circuit_breaker
+
+    get_circuit_breaker("comfyui").reset()  # Earlier failure tests may have opened it
+    _ViewHandler.drops_remaining = 0
+    _ViewHandler.honor_range = True
+    _ViewHandler.requests_seen = []
+    _ViewHandler.payload = PAYLOAD
+    _ViewHandler.etag = '"v1"'
+    _ViewHandler.replacement = None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ViewHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestContentTotal:
+    """Test total size detection."""
+
+    def test_full_response(self):
+        from comfy_headless.downloads import content_total
+
+        assert content_total(200, {"Content-Length": "100"}) == 100
+
+    def test_range_response(self):
+        from comfy_headless.downloads import content_total
+
+        headers = {"Content-Range": "bytes 40-99/100", "Content-Length": "60"}
+        assert content_total(206, headers, offset=40) == 100
+
+    def test_unknown_size(self):
+        from comfy_headless.downloads import content_total
+
+        assert content_total(200, {}) is None
+
+
+class TestSyncDownload:
+    """Test ComfyClient.download_output."""
+
+    def test_download_to_path(self, view_server, tmp_path):
+        """Test streaming to a path reports progress and leaves no .part file."""
+        from comfy_headless.client import ComfyClient
+
+        dest = tmp_path / "out" / "video.mp4"
+        progress = []
+        client = ComfyClient(base_url=view_server, use_websocket=False)
+
+        written = client.download_output(
+            "video.mp4", dest, on_progress=lambda done, total: progress.append((done, total))
+        )
+
+        assert written == len(PAYLOAD)
+        assert dest.read_bytes() == PAYLOAD
+        assert not (tmp_path / "out" / "video.mp4.part").exists()
+        assert progress[-1] == (len(PAYLOAD), len(PAYLOAD))
+
+    def test_resume_after_dropped_connection(self, view_server, tmp_path):
+        """Test a dropped connection is resumed with a Range request."""
+        from comfy_headless.client import ComfyClient
+
+        _ViewHandler.drops_remaining = 1
+        dest = tmp_path / "video.mp4"
+        client = ComfyClient(base_url=view_server, use_websocket=False)
+
+        assert client.download_output("video.mp4", dest, chunk_size=64 * 1024) == len(PAYLOAD)
+        assert dest.read_bytes() == PAYLOAD
+        assert _ViewHandler.requests_seen[0] is None
+        assert _ViewHandler.requests_seen[-1].startswith("bytes=")
+
+    def test_leftover_part_file_replaced(self, view_server, tmp_path):
+        """Test a .part file from an earlier call (maybe another output) is not resumed."""
+        from comfy_headless.client import ComfyClient
+
+        (tmp_path / "video.mp4.part").write_bytes(b"x" * 1000)
+        client = ComfyClient(base_url=view_server, use_websocket=False)
+
+        assert client.download_output("video.mp4", tmp_path / "video.mp4") == len(PAYLOAD)
+        assert (tmp_path / "video.mp4").read_bytes() == PAYLOAD
+        assert _ViewHandler.requests_seen == [None]
+
+    def test_restart_when_file_changes_mid_download(self, view_server, tmp_path):
+        """Test a resume doesn't join two versions of a file (If-Range)."""
+        from comfy_headless.client import ComfyClient
+
+        new_payload = bytes(reversed(PAYLOAD[: len(PAYLOAD) // 2]))
+        _ViewHandler.drops_remaining = 1
+        _ViewHandler.replacement = (new_payload, '"v2"')
+        client = ComfyClient(base_url=view_server, use_websocket=False)
+
+        dest = tmp_path / "video.mp4"
+        assert client.download_output("video.mp4", dest, chunk_size=64 * 1024) == len(new_payload)
+        assert dest.read_bytes() == new_payload
+
+    def test_restart_when_range_ignored(self, view_server):
+        """Test the download restarts if the server ignores Range."""
+        from comfy_headless.client import ComfyClient
+
+        _ViewHandler.drops_remaining = 1
+        _ViewHandler.honor_range = False
+        buffer = io.BytesIO()
+        client = ComfyClient(base_url=view_server, use_websocket=False)
+
+        assert client.download_output("video.mp4", buffer) == len(PAYLOAD)
+        assert buffer.getvalue() == PAYLOAD
+
+    def test_gives_up_after_max_resumes(self, view_server, tmp_path):
+        """Test repeated drops eventually fail and remove the partial file."""
+        from comfy_headless.client import ComfyClient
+
+        _ViewHandler.drops_remaining = 10
+        client = ComfyClient(base_url=view_server, use_websocket=False)
+
+        written = client.download_output(
+            "video.mp4", tmp_path / "v.mp4", chunk_size=64 * 1024, max_resumes=1
+        )
+        assert written is None
+        assert not (tmp_path / "v.mp4.part").exists()
+        assert not (tmp_path / "v.mp4").exists()
+
+
+class TestAsyncDownload:
+    """Test AsyncComfyClient.download_output."""
+
+    async def test_resume_after_dropped_connection(self, view_server, tmp_path):
+        """Test the async client resumes with a Range request."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        _ViewHandler.drops_remaining = 1
+        dest = tmp_path / "video.mp4"
+        progress = []
+
+        async with AsyncComfyClient(base_url=view_server) as client:
+            written = await client.download_output(
+                "video.mp4",
+                dest,
+                chunk_size=64 * 1024,
+                on_progress=lambda done, total: progress.append(done),
+            )
+
+        assert written == len(PAYLOAD)
+        assert dest.read_bytes() == PAYLOAD
+        assert progress[-1] == len(PAYLOAD)
+        assert _ViewHandler.requests_seen[-1].startswith("bytes=")
+
+    async def test_longer_leftover_part_file(self, view_server, tmp_path):
+        """Test a leftover .part longer than the output isn't taken as complete."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        (tmp_path / "x.part").write_bytes(PAYLOAD + b"tail")
+
+        async with AsyncComfyClient(base_url=view_server) as client:
+            assert await client.download_output("x", tmp_path / "x") == len(PAYLOAD)
+        assert (tmp_path / "x").read_bytes() == PAYLOAD
+
+
+class TestDownloadTarget:
+    """Test resume checks of DownloadTarget."""
+
+    def test_partial_response_for_other_file_rejected(self):
+        """Test a 206 whose total differs from the first response restarts the target."""
+        from comfy_headless.downloads import DownloadTarget
+
+        target = DownloadTarget(io.BytesIO())
+        assert target.start_response(200, {"Content-Length": "100"})
+        target.write(b"a" * 40)
+        assert target.request_headers() == {"Range": "bytes=40-"}
+
+        assert not target.start_response(206, {"Content-Range": "bytes 40-89/90"})
+        assert target.written == 0 and target.request_headers() == {}
+
+    def test_416_needs_matching_size(self):
+        """Test a 416 only completes the download when the sizes match."""
+        from comfy_headless.downloads import DownloadTarget
+
+        target = DownloadTarget(io.BytesIO())
+        target.start_response(200, {"Content-Length": "100", "ETag": '"e"'})
+        target.write(b"a" * 100)
+        assert target.request_headers() == {"Range": "bytes=100-", "If-Range": '"e"'}
+        assert target.complete_on_416({"Content-Range": "bytes */100"})
+
+        assert not target.complete_on_416({"Content-Range": "bytes */80"})
+        assert target.written == 0
+
+
+class TestOutputFiles:
+    """Test output reference extraction."""
+
+    def test_collects_in_output_order(self):
+        from comfy_headless.downloads import output_files
+
+        history = {
+            "outputs": {
+                "9": {"images": [{"filename": "a.png"}, {"filename": "b.png", "subfolder": "s"}]},
+                "12": {"gifs": [{"filename": "c.mp4", "type": "temp"}]},
+                "13": "not a dict",
+            }
+        }
+
+        assert output_files(history) == [
+            {"filename": "a.png", "subfolder": "", "type": "output"},
+            {"filename": "b.png", "subfolder": "s", "type": "output"},
+            {"filename": "c.mp4", "subfolder": "", "type": "temp"},
+        ]
+        assert [f["filename"] for f in output_files(history, ("images",))] == ["a.png", "b.png"]
+
+    def test_output_path_drops_directories(self, tmp_path):
+        from comfy_headless.downloads import output_path
+
+        assert output_path(tmp_path, "../../etc/passwd") == tmp_path / "passwd"
+
+
+class TestDownloadPool:
+    """Test concurrent multi-output downloads."""
+
+    def test_sync_pool_caps_concurrency_and_keeps_order(self):
+        """Test the thread pool respects the per-backend cap and output order."""
+        import time
+        from unittest.mock import patch
+
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url="http://pool-sync-test:8188", use_websocket=False)
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def fake_fetch(ref, dest_dir):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.02 * (8 - int(ref["filename"])))
+            with lock:
+                state["active"] -= 1
+            return ref["filename"].encode()
+
+        files = [{"filename": str(i)} for i in range(8)]
+        with (
+            patch("comfy_headless.downloads.settings.http.max_downloads_per_host", 3),
+            patch.object(client, "_fetch_output", side_effect=fake_fetch),
+        ):
+            results = client.download_outputs(files)
+
+        assert results == [str(i).encode() for i in range(8)]
+        assert state["peak"] == 3
+
+    def test_sync_pool_to_directory(self, view_server, tmp_path):
+        """Test files stream into dest_dir and paths come back in order."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url=view_server, use_websocket=False)
+        entry = {"outputs": {"9": {"images": [{"filename": "a.png"}, {"filename": "b.png"}]}}}
+
+        paths = client.download_outputs(entry, dest_dir=tmp_path)
+
+        assert paths == [tmp_path / "a.png", tmp_path / "b.png"]
+        assert all(p.read_bytes() == PAYLOAD for p in paths)
+
+    async def test_async_pool_caps_concurrency_and_keeps_order(self):
+        """Test the async pool respects the per-backend cap and output order."""
+        import asyncio
+        from unittest.mock import patch
+
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient(base_url="http://pool-async-test:8188")
+        state = {"active": 0, "peak": 0}
+
+        async def fake_fetch(ref, dest_dir):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01 * (6 - int(ref["filename"])))
+            state["active"] -= 1
+            return ref["filename"].encode()
+
+        files = [{"filename": str(i)} for i in range(6)]
+        with (
+            patch("comfy_headless.downloads.settings.http.max_downloads_per_host", 2),
+            patch.object(client, "_fetch_output", side_effect=fake_fetch),
+        ):
+            results = await client.download_outputs(files)
+
+        assert results == [str(i).encode() for i in range(6)]
+        assert state["peak"] == 2
+
+    async def test_async_pool_bytes(self, view_server):
+        """Test the async pool returns bytes without dest_dir."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        async with AsyncComfyClient(base_url=view_server) as client:
+            data = await client.download_outputs([{"filename": "a.png"}, {"filename": None}])
+
+        assert data == [PAYLOAD, None]
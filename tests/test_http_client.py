@@ -53,3 +53,59 @@ class TestAsyncHttpClient:
 
         # Just verify the class exists
         assert AsyncHttpClient is not None
+
+    @staticmethod
+    def _streaming_client(handler, circuit_name):
+        import httpx
+
+        from comfy_headless.http_client import AsyncHttpClient
+        from comfy_headless.retry import get_circuit_breaker
+
+        client = AsyncHttpClient(base_url="http://stream:8188", circuit_name=circuit_name)
+        client._client = httpx.AsyncClient(
+            base_url=client.base_url, transport=httpx.MockTransport(handler)
+        )
+        circuit = get_circuit_breaker(circuit_name)
+        circuit.reset()
+        circuit.failure_threshold = 1
+        return client, circuit
+
+    async def test_stream_caller_errors_do_not_trip_circuit(self):
+        """Test errors and cancellation in the caller's stream body aren't circuit failures."""
+        import asyncio
+
+        import httpx
+        import pytest
+
+        client, circuit = self._streaming_client(
+            lambda request: httpx.Response(200, content=b"data"), "stream-caller"
+        )
+
+        for exc in (OSError("disk full"), asyncio.CancelledError()):
+            with pytest.raises(type(exc)):
+                async with client.stream("GET", "/view") as response:
+                    await response.aread()
+                    raise exc
+
+        assert circuit.is_closed and circuit._failure_count == 0
+        await client.close()
+
+    async def test_stream_transport_errors_trip_circuit(self):
+        """Test a failure to reach the backend is a circuit failure."""
+        import httpx
+        import pytest
+
+        from comfy_headless.exceptions import ComfyUIConnectionError
+
+        def refuse(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        client, circuit = self._streaming_client(refuse, "stream-transport")
+
+        with pytest.raises(ComfyUIConnectionError):
+            async with client.stream("GET", "/view"):
+                pass
+
+        assert circuit.is_open
+        circuit.reset()
+        await client.close()
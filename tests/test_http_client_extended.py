@@ -423,6 +423,17 @@ class TestHttpxUtilities:
         assert client is not None
         client.close()
 
+    def test_http2_needs_h2(self):
+        """HTTP/2 stays off without h2 so clients still work on a plain httpx install."""
+        from comfy_headless import http_client
+
+        with patch.object(http_client, "H2_AVAILABLE", False):
+            assert http_client.http2_enabled() is False
+            client = http_client.AsyncHttpClient(base_url="http://localhost:8188")
+            assert client.client is not None
+        with patch.object(http_client, "H2_AVAILABLE", True):
+            assert http_client.http2_enabled() is http_client.settings.http.http2
+
 
 class TestModuleExports:
     """Test module exports."""
@@ -0,0 +1,346 @@
+"""Tests for the durable SQLite job store and its workers."""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+
+BACKEND = "http://a:8188"
+
+
+def _entry(status: str = "success", extra_data: dict | None = None, **outputs) -> dict:
+    return {
+        "prompt": [0, "x", {}, extra_data or {}, []],
+        "outputs": outputs,
+        "status": {"status_str": status, "completed": status == "success", "messages": []},
+    }
+
+
+@pytest.fixture
+def make_client(fake_backend, comfy_queue):
+    """
+    Client faking a ComfyUI backend.
+
+    queue_prompt records (workflow id, prompt_id) and finishes the prompt at
+    once; history and queued (comfy_queue items) pre-seed /history and
+    /queue. With assigns_ids the backend ignores the requested prompt_id
+    like older ComfyUI versions.
+    """
+    from comfy_headless.client import ComfyClient
+
+    def make(history: dict | None = None, queued: tuple = (), assigns_ids: bool = False):
+        client = ComfyClient(base_url=BACKEND, use_websocket=False, circuit_name="jobstore-test")
+        client.history = dict(history or {})
+        client.submitted = []
+
+        def queue_prompt(workflow, front=False, prompt_id=None, extra_data=None):
+            client.submitted.append((workflow["id"], prompt_id))
+            if assigns_ids:
+                prompt_id = f"server-{len(client.submitted)}"
+            client.history[prompt_id] = _entry(extra_data=extra_data, image=workflow["id"])
+            return prompt_id
+
+        def wait_for_completion(prompt_id, on_progress=None, **kwargs):
+            if on_progress:
+                on_progress(0.5, "Sampling")
+            return client.history.get(prompt_id)
+
+        def get_history(prompt_id=None):
+            if prompt_id is None:
+                return client.history
+            return {prompt_id: client.history[prompt_id]} if prompt_id in client.history else {}
+
+        return fake_backend(
+            client,
+            queue_prompt=queue_prompt,
+            wait_for_completion=wait_for_completion,
+            get_history=get_history,
+            get_queue=comfy_queue(running=queued),
+        )
+
+    return make
+
+
+@pytest.fixture
+def store(tmp_path):
+    from comfy_headless.jobstore import JobStore
+
+    with JobStore(tmp_path / "jobs.sqlite3") as store:
+        yield store
+
+
+class TestJobStore:
+    """Test persistence and claims."""
+
+    def test_batch_round_trip(self, store, tmp_path):
+        """Test jobs persist across store instances in input order."""
+        from comfy_headless.jobstore import JobStore
+
+        batch = store.add_batch([{"id": f"w{i}"} for i in range(3)])
+
+        with JobStore(tmp_path / "jobs.sqlite3") as other:
+            jobs = other.jobs(batch=batch)
+            assert [job.workflow["id"] for job in jobs] == ["w0", "w1", "w2"]
+            assert [job.index for job in jobs] == [0, 1, 2]
+            assert other.counts(batch) == {
+                "pending": 3,
+                "submitted": 0,
+                "running": 0,
+                "done": 0,
+                "failed": 0,
+            }
+        assert store.path.exists()
+
+    def test_claims_are_exclusive(self, store, tmp_path):
+        """Test concurrent claimers on separate connections never get the same job."""
+        from comfy_headless.jobstore import JobStore
+
+        store.add_batch([{"id": f"w{i}"} for i in range(40)])
+        claimed: list[str] = []
+        lock = threading.Lock()
+
+        def claimer(n: int):
+            with JobStore(tmp_path / "jobs.sqlite3") as own:
+                while (job := own.claim(f"worker{n}", BACKEND)) is not None:
+                    with lock:
+                        claimed.append(job.id)
+
+        threads = [threading.Thread(target=claimer, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(claimed) == len(set(claimed)) == 40
+
+    def test_claim_assigns_prompt_id_and_lease(self, store):
+        """Test a claimed job has a prompt_id and is not claimable again until its lease ends."""
+        store.add({"id": "w"})
+
+        job = store.claim("one", BACKEND, lease=60)
+
+        assert job.prompt_id and job.worker == "one" and job.claims == 1
+        assert store.claim("one", BACKEND) is None
+        assert store.claim("two", BACKEND) is None
+        # A worker restarted under the same ID ends its old claims
+        assert store.expire("one") == 1
+        assert store.claim("two", BACKEND).id == job.id
+
+    def test_submitted_jobs_stay_on_their_backend(self, store):
+        """Test an expired job already queued on a backend is only reclaimed for that backend."""
+        store.add({"id": "w"})
+        job = store.claim("one", BACKEND, lease=0)
+        store.mark_submitted(job, job.prompt_id)
+
+        assert store.claim("two", "http://b:8188") is None
+        again = store.claim("two", BACKEND)
+        assert again.prompt_id == job.prompt_id and again.claims == 2
+
+    def test_lost_claim_cannot_write(self, store):
+        """Test a worker whose lease was taken over can't overwrite the job."""
+        store.add({"id": "w"})
+        stale = store.claim("one", BACKEND, lease=0)
+        store.claim("two", BACKEND)
+
+        assert not store.mark_done(stale, {"outputs": {}})
+        assert store.get(stale.id).worker == "two"
+
+    def test_release_and_attempts(self, store):
+        """Test released jobs are reclaimable until max attempts, then fail."""
+        store.add({"id": "w"})
+
+        job = store.claim("one", BACKEND)
+        assert store.release(job, "boom", max_attempts=2)
+        job = store.claim("one", BACKEND)
+        assert job.attempts == 1 and job.error == "boom"
+        store.release(job, "boom again", max_attempts=2)
+
+        assert store.get(job.id).state == "failed"
+        assert store.claim("one", BACKEND) is None
+
+
+class TestJobWorker:
+    """Test running, reattaching and failing jobs."""
+
+    def test_runs_batch(self, store, make_client):
+        """Test a worker runs every job and results come back in input order."""
+        from comfy_headless.jobstore import JobWorker
+
+        batch = store.add_batch([{"id": f"w{i}"} for i in range(3)])
+        client = make_client()
+
+        assert JobWorker(store, client).run(idle_timeout=0) == 3
+
+        results = store.results(batch)
+        assert [r["outputs"]["image"] for r in results] == ["w0", "w1", "w2"]
+        assert "prompt" not in results[0]
+        assert store.counts(batch)["done"] == 3
+        # Prompt IDs are chosen by the store and sent with /prompt
+        jobs = store.jobs(batch)
+        assert [pid for _, pid in client.submitted] == [job.prompt_id for job in jobs]
+
+    def test_reattaches_to_finished_prompt(self, store, make_client):
+        """Test a job whose worker died after submitting is finished from /history."""
+        from comfy_headless.jobstore import JobWorker
+
+        store.add({"id": "w"})
+        crashed = store.claim("crashed", BACKEND, lease=0)
+        store.mark_submitted(crashed, crashed.prompt_id)
+        client = make_client(history={crashed.prompt_id: _entry(image="done-before")})
+
+        JobWorker(store, client).run(idle_timeout=0)
+
+        assert client.submitted == []
+        assert store.get(crashed.id).result["outputs"] == {"image": "done-before"}
+
+    def test_reattaches_to_queued_prompt(self, store, make_client):
+        """Test a job claimed before a crash whose prompt is still queued is waited on, not resent."""
+        from comfy_headless.jobstore import JobWorker
+
+        store.add({"id": "w"})
+        crashed = store.claim("crashed", BACKEND, lease=0)  # Died before recording the submit
+        client = make_client(queued=(crashed.prompt_id,))
+        client.wait_for_completion.side_effect = lambda pid, **kw: _entry(image="late")
+
+        JobWorker(store, client).run(idle_timeout=0)
+
+        job = store.get(crashed.id)
+        assert client.submitted == []
+        assert job.state == "done" and job.result["outputs"] == {"image": "late"}
+
+    def test_tags_prompt_with_job_id(self, store, make_client):
+        """Test each prompt carries its job's ID in extra_data."""
+        from comfy_headless.jobstore import JobWorker
+
+        job_id = store.add({"id": "w"})
+        client = make_client()
+
+        JobWorker(store, client).run(idle_timeout=0)
+
+        job = store.get(job_id)
+        assert client.history[job.prompt_id]["prompt"][3] == {"job_id": job_id}
+
+    def test_backend_assigned_prompt_id_is_recorded(self, store, make_client):
+        """Test a backend that ignores prompt_id has its own ID stored for the job."""
+        from comfy_headless.jobstore import JobWorker
+
+        job_id = store.add({"id": "w"})
+
+        JobWorker(store, make_client(assigns_ids=True)).run(idle_timeout=0)
+
+        job = store.get(job_id)
+        assert job.state == "done" and job.prompt_id == "server-1"
+
+    def test_reattaches_by_tag_to_finished_prompt(self, store, make_client):
+        """Test a finished prompt queued under a backend-assigned ID is found by its job tag."""
+        from comfy_headless.jobstore import JobWorker
+
+        store.add({"id": "w"})
+        crashed = store.claim("crashed", BACKEND, lease=0)  # Died before recording the submit
+        entry = _entry(extra_data={"job_id": crashed.id}, image="done-before")
+        client = make_client(history={"server-1": entry})
+
+        JobWorker(store, client).run(idle_timeout=0)
+
+        assert client.submitted == []
+        assert store.get(crashed.id).result["outputs"] == {"image": "done-before"}
+
+    def test_reattaches_by_tag_to_queued_prompt(self, store, make_client):
+        """Test a queued prompt under a backend-assigned ID is found by its job tag and waited on."""
+        from comfy_headless.jobstore import JobWorker
+
+        store.add({"id": "w"})
+        crashed = store.claim("crashed", BACKEND, lease=0)
+        client = make_client(queued=(("server-1", {"job_id": crashed.id}),))
+        client.wait_for_completion.side_effect = lambda pid, **kw: _entry(image=pid)
+
+        JobWorker(store, client).run(idle_timeout=0)
+
+        job = store.get(crashed.id)
+        assert client.submitted == []
+        assert job.prompt_id == "server-1" and job.result["outputs"] == {"image": "server-1"}
+
+    def test_resubmits_lost_prompt(self, store, make_client):
+        """Test a prompt ComfyUI lost (in neither /history nor /queue) is sent again."""
+        from comfy_headless.jobstore import JobWorker
+
+        store.add({"id": "w"})
+        crashed = store.claim("crashed", BACKEND, lease=0)
+        store.mark_submitted(crashed, crashed.prompt_id)
+        client = make_client()
+
+        JobWorker(store, client).run(idle_timeout=0)
+
+        assert client.submitted == [("w", crashed.prompt_id)]
+        assert store.get(crashed.id).state == "done"
+
+    def test_execution_error_fails_job(self, store, make_client):
+        """Test a prompt that errors on ComfyUI fails its job."""
+        from comfy_headless.jobstore import JobWorker
+
+        job_id = store.add({"id": "w"})
+        client = make_client()
+        client.wait_for_completion.side_effect = lambda pid, **kw: _entry("error")
+
+        JobWorker(store, client).run(idle_timeout=0)
+
+        assert store.get(job_id).state == "failed"
+
+    def test_queue_failure_retries_then_fails(self, store, make_client):
+        """Test a rejected submission is retried up to job_max_attempts."""
+        from comfy_headless.jobstore import JobWorker
+
+        job_id = store.add({"id": "w"})
+        client = make_client()
+        client.queue_prompt.side_effect = lambda *a, **kw: None
+
+        with patch("comfy_headless.jobstore.settings.generation.job_max_attempts", 2):
+            assert JobWorker(store, client).run(idle_timeout=0) == 2
+
+        job = store.get(job_id)
+        assert job.state == "failed" and job.attempts == 2
+
+    def test_marks_running(self, store, make_client):
+        """Test a job moves to running once its prompt starts executing."""
+        from comfy_headless.jobstore import JobWorker
+
+        job_id = store.add({"id": "w"})
+        client = make_client()
+        states = []
+
+        def wait(pid, on_progress=None, **kwargs):
+            on_progress(0.02, "Queue position 1")
+            states.append(store.get(job_id).state)
+            on_progress(0.5, "Sampling")
+            states.append(store.get(job_id).state)
+            return _entry()
+
+        client.wait_for_completion.side_effect = wait
+        JobWorker(store, client).run(idle_timeout=0)
+
+        assert states == ["submitted", "running"]
+
+    def test_restarted_worker_recovers_own_jobs(self, store, make_client):
+        """Test a worker restarted under its ID takes its jobs back before their lease ends."""
+        from comfy_headless.jobstore import JobWorker
+
+        store.add({"id": "w"})
+        crashed = store.claim("gpu-1", BACKEND, lease=3600)
+        store.mark_submitted(crashed, crashed.prompt_id)
+        client = make_client(history={crashed.prompt_id: _entry(image="w")})
+
+        assert JobWorker(store, make_client(), worker_id="other").run(idle_timeout=0) == 0
+        assert JobWorker(store, client, worker_id="gpu-1").run(idle_timeout=0) == 1
+        assert store.get(crashed.id).state == "done"
+
+    def test_close_closes_default_client_only(self, store, make_client):
+        """Test close() closes the client the worker created but not one passed in."""
+        from comfy_headless.client import ComfyClient
+        from comfy_headless.jobstore import JobWorker
+
+        with patch.object(ComfyClient, "close") as close:
+            JobWorker(store, make_client()).close()
+            close.assert_not_called()
+            with JobWorker(store):
+                pass
+            close.assert_called_once()
@@ -0,0 +1,96 @@
+"""Tests for the JSON codec layer."""
+
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+
+@pytest.fixture
+def backend():
+    """Restore the configured JSON backend after a test switches it."""
+    from comfy_headless import jsoncodec
+
+    original = jsoncodec.get_backend()
+    yield jsoncodec
+    jsoncodec.use_backend(original)
+
+
+def _installed():
+    from comfy_headless import jsoncodec
+
+    return [name for name in jsoncodec.BACKENDS if name in jsoncodec._CODECS]
+
+
+class TestCodec:
+    """Test loads/dumps across backends."""
+
+    @pytest.mark.parametrize("name", _installed())
+    def test_round_trip(self, backend, name):
+        """Test every installed backend encodes and decodes alike."""
+        backend.use_backend(name)
+        payload = {"prompt": {"3": {"inputs": {"seed": 1, "text": "café"}}}, "n": [1.5, None]}
+
+        encoded = backend.dumps(payload)
+
+        assert isinstance(encoded, bytes)
+        assert json.loads(encoded) == payload
+        assert backend.loads(encoded) == payload
+        assert backend.loads(encoded.decode()) == payload
+        assert backend.loads(memoryview(b"xx" + encoded)[2:]) == payload
+
+    @pytest.mark.parametrize("name", _installed())
+    def test_invalid_json_raises_stdlib_error(self, backend, name):
+        """Test decode errors are json.JSONDecodeError whatever the backend."""
+        backend.use_backend(name)
+        with pytest.raises(json.JSONDecodeError):
+            backend.loads(b"{not json")
+
+    def test_auto_prefers_fast_backend(self, backend):
+        """Test auto picks the first installed backend in preference order."""
+        assert backend.use_backend("auto") == _installed()[0]
+
+    def test_unavailable_backend(self, backend):
+        """Test an unknown backend is refused and the current one kept."""
+        current = backend.get_backend()
+        with pytest.raises(ValueError):
+            backend.use_backend("yaml")
+        assert backend.get_backend() == current
+
+    def test_response_json(self):
+        """Test bodies are decoded from their bytes with the selected backend."""
+        from comfy_headless.jsoncodec import response_json
+
+        assert response_json(Mock(content=b'{"a": 1}')) == {"a": 1}
+        with pytest.raises(json.JSONDecodeError):
+            response_json(Mock(content=b"<html>"))
+
+
+class TestMessageType:
+    """Test the WebSocket type fast path."""
+
+    def test_reads_leading_type(self):
+        """Test the type is read from the head of str and bytes messages."""
+        from comfy_headless.jsoncodec import message_type
+
+        assert message_type('{"type": "progress", "data": {"value": 1}}') == "progress"
+        assert message_type(b' {"type":"crystools.monitor","data":{}}') == "crystools.monitor"
+        assert message_type('{"data": {}, "type": "progress"}') is None
+
+    async def test_unhandled_messages_not_decoded(self):
+        """Test ComfyWSClient drops unhandled event types without decoding them."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        with patch("comfy_headless.websocket_client.loads", side_effect=json.loads) as loads:
+            await client._handle_message(
+                json.dumps({"type": "crystools.monitor", "data": {"cpu": 3}})
+            )
+            assert loads.call_count == 0
+
+            await client._handle_message(
+                json.dumps({"data": {"node": None, "prompt_id": "p1"}, "type": "executing"})
+            )
+            assert loads.call_count == 1
+
+        assert [e.status for e in client.pop_early_events("p1")] == ["completed"]
@@ -0,0 +1,169 @@
+"""Tests for backend liveness tracking."""
+
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+
+class TestLivenessTracker:
+    """Test the cached reachability state."""
+
+    def test_check_probes_only_when_stale(self):
+        """Test a fresh state answers without probing."""
+        from comfy_headless.liveness import LivenessTracker
+
+        tracker = LivenessTracker("http://a:8188", ttl=0.05)
+        probe = Mock(return_value=True)
+
+        assert tracker.check(probe) is True
+        assert tracker.check(probe) is True
+        assert probe.call_count == 1
+
+        time.sleep(0.06)
+        assert tracker.state is None
+        tracker.check(probe)
+        assert probe.call_count == 2
+
+    def test_passive_marks(self):
+        """Test mark_up/mark_down set the state and invalidate clears it."""
+        from comfy_headless.liveness import LivenessTracker
+
+        tracker = LivenessTracker("http://a:8188", ttl=60)
+        assert tracker.state is None
+
+        tracker.mark_down()
+        assert tracker.check(Mock()) is False
+        tracker.mark_up()
+        assert tracker.state is True
+        tracker.invalidate()
+        assert tracker.state is None
+
+    async def test_acheck(self):
+        """Test the async check probes once while fresh."""
+        from comfy_headless.liveness import LivenessTracker
+
+        tracker = LivenessTracker("http://a:8188", ttl=60)
+        probe = AsyncMock(return_value=False)
+
+        assert await tracker.acheck(probe) is False
+        assert await tracker.acheck(probe) is False
+        probe.assert_awaited_once()
+
+    def test_follows_circuit_breaker(self):
+        """Test circuit open marks down, half-open invalidates, recovery marks up."""
+        from comfy_headless.liveness import LivenessTracker
+        from comfy_headless.retry import CircuitBreaker
+
+        tracker = LivenessTracker("http://a:8188", ttl=60)
+        breaker = CircuitBreaker(
+            name="liveness", failure_threshold=1, reset_timeout=0.01, success_threshold=1
+        )
+        tracker.watch(breaker)
+        tracker.watch(breaker)  # Registers once
+        tracker.mark_up()
+
+        breaker.record_failure()
+        assert tracker.state is False
+
+        time.sleep(0.02)
+        _ = breaker.state  # Moves to half-open
+        assert tracker.state is None
+
+        breaker.record_success()
+        assert tracker.state is True
+        assert len(breaker._listeners) == 1
+
+    def test_trackers_shared_per_url(self):
+        """Test clients of one backend share a tracker."""
+        from comfy_headless.liveness import get_liveness
+
+        assert get_liveness("http://a:8188/") is get_liveness("http://a:8188")
+        assert get_liveness("http://a:8188") is not get_liveness("http://b:8188")
+
+    def test_shared_circuit_not_followed(self):
+        """Test one backend opening a circuit shared with another doesn't mark both down."""
+        from comfy_headless.liveness import get_liveness
+        from comfy_headless.retry import CircuitBreaker
+
+        breaker = CircuitBreaker(name="comfyui-shared", failure_threshold=1)
+        first, second = get_liveness("http://a:8188"), get_liveness("http://b:8188")
+        first.watch(breaker)
+        second.watch(breaker)
+        first.mark_up()
+        second.mark_up()
+
+        breaker.record_failure()
+
+        assert first.state is True
+        assert second.state is True
+
+    def test_clear_detaches_from_circuits(self):
+        """Test clear_liveness removes the trackers' circuit listeners."""
+        from comfy_headless.liveness import clear_liveness, get_liveness
+        from comfy_headless.retry import CircuitBreaker
+
+        breaker = CircuitBreaker(name="liveness-clear", failure_threshold=1)
+        get_liveness("http://a:8188").watch(breaker)
+        assert len(breaker._listeners) == 1
+
+        clear_liveness()
+
+        assert breaker._listeners == []
+
+    def test_server_error_does_not_mark_up(self):
+        """Test a 5xx response leaves the backend's state alone while a 4xx marks it up."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url="http://a:8188", use_websocket=False)
+        with patch.object(client.session, "request", return_value=Mock(status_code=503)):
+            client._request("GET", "/queue")
+        assert client._liveness.state is None
+
+        with patch.object(client.session, "request", return_value=Mock(status_code=404)):
+            client._request("GET", "/queue")
+        assert client._liveness.state is True
+
+    async def test_async_server_error_does_not_mark_up(self):
+        """Test AsyncComfyClient doesn't mark a backend up on a 5xx response."""
+        from comfy_headless.async_client import AsyncComfyClient
+
+        client = AsyncComfyClient(base_url="http://a:8188")
+        with patch.object(client.http, "request", AsyncMock(return_value=Mock(status_code=500))):
+            await client._request("GET", "/queue")
+        assert client._liveness.state is None
+
+    def test_client_circuits(self):
+        """Test clients of two backends get their own default circuits and stay followed."""
+        from comfy_headless.client import ComfyClient
+
+        a = ComfyClient(base_url="http://a:8188", use_websocket=False)
+        b = ComfyClient(base_url="http://b:8188", use_websocket=False)
+        assert a._circuit is not b._circuit
+        assert a._circuit.name == "comfyui:http://a:8188"
+        a._liveness.mark_up()
+        b._liveness.mark_up()
+        for _ in range(a._circuit.failure_threshold):
+            a._circuit.record_failure()
+
+        try:
+            assert a._liveness.state is False
+            assert b._liveness.state is True
+        finally:
+            a._circuit.reset()
+
+    def test_circuit_registry_is_weak(self):
+        """Test a dropped circuit leaves no entry that a new circuit could inherit."""
+        import gc
+
+        from comfy_headless import liveness
+        from comfy_headless.retry import CircuitBreaker
+
+        breaker = CircuitBreaker(name="liveness-weak", failure_threshold=1)
+        tracker = liveness.get_liveness("http://a:8188")
+        tracker.watch(breaker)
+        assert liveness._circuit_urls[breaker] == {"http://a:8188"}
+
+        tracker.unwatch()
+        del breaker
+        gc.collect()
+
+        assert len(liveness._circuit_urls) == 0
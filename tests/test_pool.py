@@ -0,0 +1,206 @@
+"""Tests for the multi-backend ComfyPool."""
+
+from unittest.mock import patch
+
+import pytest
+
+GB = 1024**3
+
+
+def _stats(free_gb: float, total_gb: float = 24.0) -> dict:
+    return {"devices": [{"vram_free": free_gb * GB, "vram_total": total_gb * GB}]}
+
+
+@pytest.fixture
+def make_pool(fake_backend):
+    """Pool whose backends report the given (stats, queue) pairs; stats None = offline."""
+    from comfy_headless.pool import ComfyPool
+
+    def make(backends: dict, **kwargs):
+        pool = ComfyPool(list(backends), use_websocket=False, **kwargs)
+        for url, (stats, queue) in backends.items():
+            fake_backend(pool.client(url), get_system_stats=stats, get_queue=queue)
+        return pool
+
+    return make
+
+
+class TestComfyPoolRouting:
+    """Test backend selection."""
+
+    def test_backends_get_own_circuit_breakers(self):
+        """Test each backend has an independent circuit breaker."""
+        from comfy_headless.pool import ComfyPool
+
+        pool = ComfyPool(["http://a:8188", "http://b:8188/", "http://a:8188"])
+
+        assert pool.backends == ["http://a:8188", "http://b:8188"]
+        circuit_a = pool.client("http://a:8188")._circuit
+        circuit_b = pool.client("http://b:8188")._circuit
+        assert circuit_a is not circuit_b
+        assert circuit_a.name == "comfyui:http://a:8188"
+
+    def test_shortest_queue_wins(self, comfy_queue, make_pool):
+        """Test jobs go to the backend with the fewest queued prompts."""
+        pool = make_pool(
+            {
+                "http://a:8188": (
+                    _stats(20),
+                    comfy_queue(running=("r0",), pending=("p0", "p1", "p2")),
+                ),
+                "http://b:8188": (_stats(20), comfy_queue(running=("r0",))),
+                "http://c:8188": (_stats(20), comfy_queue(running=("r0",), pending=("p0",))),
+            }
+        )
+
+        assert pool.select().base_url == "http://b:8188"
+
+    def test_burst_spreads_before_refresh(self, comfy_queue, make_pool):
+        """Test routed jobs count toward queue depth until the next refresh."""
+        pool = make_pool(
+            {
+                "http://a:8188": (_stats(20), comfy_queue()),
+                "http://b:8188": (_stats(20), comfy_queue()),
+            },
+            status_ttl=60,
+        )
+
+        picks = [pool.select().base_url for _ in range(4)]
+
+        assert sorted(picks) == ["http://a:8188"] * 2 + ["http://b:8188"] * 2
+
+    def test_skips_offline_and_open_circuit(self, comfy_queue, make_pool):
+        """Test unreachable backends and open circuits are not used."""
+        pool = make_pool(
+            {
+                "http://down:8188": (None, comfy_queue()),
+                "http://open:8188": (_stats(20), comfy_queue()),
+                "http://up:8188": (
+                    _stats(20),
+                    comfy_queue(running=("r0", "r1"), pending=("p0", "p1")),
+                ),
+            }
+        )
+        circuit = pool.client("http://open:8188")._circuit
+        for _ in range(circuit.failure_threshold):
+            circuit.record_failure()
+
+        try:
+            assert pool.select().base_url == "http://up:8188"
+        finally:
+            circuit.reset()
+
+    def test_all_offline_raises(self, comfy_queue, make_pool):
+        """Test a pool with no reachable backend raises ComfyUIOfflineError."""
+        from comfy_headless.exceptions import ComfyUIOfflineError
+
+        pool = make_pool({"http://a:8188": (None, comfy_queue())})
+
+        with pytest.raises(ComfyUIOfflineError):
+            pool.select()
+
+    def test_vram_filter(self, comfy_queue, make_pool):
+        """Test backends without enough free VRAM are skipped."""
+        from comfy_headless.exceptions import InsufficientVRAMError
+
+        pool = make_pool(
+            {
+                "http://small:8188": (_stats(4), comfy_queue()),
+                "http://big:8188": (_stats(16), comfy_queue(pending=("p0", "p1", "p2"))),
+            }
+        )
+
+        assert pool.select(vram_gb=10).base_url == "http://big:8188"
+        with pytest.raises(InsufficientVRAMError):
+            pool.select(vram_gb=40)
+
+    def test_sticky_checkpoint(self, comfy_queue, make_pool):
+        """Test jobs stay on the backend with their checkpoint unless it is far behind."""
+        pool = make_pool(
+            {
+                "http://a:8188": (_stats(20), comfy_queue()),
+                "http://b:8188": (_stats(20), comfy_queue()),
+            },
+            status_ttl=60,
+            sticky_slack=2,
+        )
+
+        first = pool.select(checkpoint="sdxl.safetensors").base_url
+        # Within the slack the checkpoint's backend keeps winning
+        assert pool.select(checkpoint="sdxl.safetensors").base_url == first
+        assert pool.select(checkpoint="sdxl.safetensors").base_url == first
+        # Three ahead of the other backend: worth a model load elsewhere
+        assert pool.select(checkpoint="sdxl.safetensors").base_url != first
+
+    def test_sticky_backend_exempt_from_vram_filter(self, comfy_queue, make_pool):
+        """Test a loaded checkpoint's VRAM use doesn't push its jobs elsewhere."""
+        pool = make_pool({"http://a:8188": (_stats(2), comfy_queue())}, status_ttl=60)
+        with pool._lock:
+            pool._status["http://a:8188"].checkpoint = "sdxl.safetensors"
+        pool.refresh(force=True)
+
+        assert pool.select(checkpoint="sdxl.safetensors", vram_gb=8).base_url == "http://a:8188"
+
+
+class TestComfyPoolJobs:
+    """Test job submission through the pool."""
+
+    def test_queue_prompt_and_wait(self, comfy_queue, make_pool):
+        """Test prompts are routed by workflow checkpoint and waited on their backend."""
+        pool = make_pool({"http://a:8188": (_stats(20), comfy_queue())})
+        client = pool.client("http://a:8188")
+        workflow = {"4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "m"}}}
+
+        with (
+            patch.object(client, "queue_prompt", return_value="pid") as queue_prompt,
+            patch.object(client, "wait_for_completion", return_value={"outputs": {}}) as wait,
+        ):
+            routed, prompt_id = pool.queue_prompt(workflow)
+            assert pool.wait_for_completion(prompt_id, timeout=5) == {"outputs": {}}
+
+        assert routed is client
+        queue_prompt.assert_called_once_with(workflow)
+        wait.assert_called_once_with("pid", timeout=5)
+        assert pool.status()[0].checkpoint == "m"
+
+    def test_wait_for_unknown_prompt(self, comfy_queue, make_pool):
+        """Test waiting on a prompt the pool didn't queue raises KeyError."""
+        pool = make_pool({"http://a:8188": (_stats(20), comfy_queue())})
+
+        with pytest.raises(KeyError):
+            pool.wait_for_completion("nope")
+
+    def test_unwaited_prompts_are_bounded(self, comfy_queue, make_pool):
+        """Test prompts queued without a later wait don't accumulate without bound."""
+        pool = make_pool({"http://a:8188": (_stats(20), comfy_queue())})
+        client = pool.client("http://a:8188")
+        prompt_ids = iter(range(10))
+
+        with (
+            patch("comfy_headless.pool._MAX_TRACKED_PROMPTS", 3),
+            patch.object(client, "queue_prompt", side_effect=lambda wf: f"p{next(prompt_ids)}"),
+            patch.object(client, "wait_for_completion", return_value={"outputs": {}}),
+        ):
+            for _ in range(10):
+                pool.queue_prompt({})
+
+            assert pool.wait_for_completion("p9") == {"outputs": {}}
+            with pytest.raises(KeyError):
+                pool.wait_for_completion("p0")
+        assert len(pool._prompts) == 2
+
+    def test_generate_image_reports_backend(self, comfy_queue, make_pool):
+        """Test generate_image delegates to the chosen backend."""
+        pool = make_pool(
+            {
+                "http://a:8188": (_stats(20), comfy_queue(pending=("p0", "p1", "p2", "p3", "p4"))),
+                "http://b:8188": (_stats(20), comfy_queue()),
+            }
+        )
+        client = pool.client("http://b:8188")
+
+        with patch.object(client, "generate_image", return_value={"success": True}) as gen:
+            result = pool.generate_image("a cat", checkpoint="m", width=512)
+
+        gen.assert_called_once_with("a cat", checkpoint="m", width=512)
+        assert result == {"success": True, "backend": "http://b:8188"}
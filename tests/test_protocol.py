@@ -0,0 +1,35 @@
+"""Tests for the ComfyUI protocol helpers shared by the clients."""
+
+
+class TestResponses:
+    """Test /queue and /system_stats parsing."""
+
+    def test_queue_prompt_ids(self):
+        """Test prompt IDs are read from a /queue list, skipping malformed items."""
+        from comfy_headless.protocol import queue_prompt_ids
+
+        items = [[0, "a", {}, {}, []], [1, "b", {}, {}, []], ["bad"], None, [0, 7]]
+        assert queue_prompt_ids(items) == {"a", "b"}
+        assert queue_prompt_ids(None) == set()
+
+    def test_device_vram_bytes(self):
+        """Test VRAM figures come from the first /system_stats device."""
+        from comfy_headless.protocol import device_vram_bytes
+
+        stats = {"devices": [{"vram_total": 8, "vram_free": 3}, {"vram_total": 24}]}
+        assert device_vram_bytes(stats, "vram_total") == 8
+        assert device_vram_bytes(stats, "vram_free") == 3
+        assert device_vram_bytes(None, "vram_total") == 0
+
+
+class TestProgress:
+    """Test progress estimates."""
+
+    def test_queue_progress(self):
+        """Test a prompt's /queue position is reported."""
+        from comfy_headless.protocol import queue_progress
+
+        queue = {"queue_running": [[0, "r", {}, {}, []]], "queue_pending": [[1, "p", {}, {}, []]]}
+        assert queue_progress(queue, "r") == (0.1, "Starting")
+        assert queue_progress(queue, "p") == (0.02, "Queue position 1")
+        assert queue_progress(queue, "x") == (0.05, "Waiting")
@@ -0,0 +1,404 @@
+"""Tests for the generation result cache."""
+
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+HISTORY = {
+    "status": {"status_str": "success"},
+    "outputs": {"9": {"images": [{"filename": "a.png", "subfolder": "", "type": "output"}]}},
+}
+REF = {"filename": "a.png", "subfolder": "", "type": "output"}
+
+
+def _staged(cache, data: bytes, name: str = "a.png") -> Path:
+    """An output file downloaded into the cache's staging dir."""
+    path = cache.staging_dir("test") / name
+    path.write_bytes(data)
+    return path
+
+
+def _download_into(data: bytes):
+    """download_outputs stand-in that writes data for every ref into dest_dir."""
+
+    def download(refs, dest_dir=None):
+        paths = []
+        for ref in refs:
+            path = Path(dest_dir) / ref["filename"]
+            path.write_bytes(data)
+            paths.append(path)
+        return paths
+
+    return download
+
+
+def _tagged(cache, entry) -> dict:
+    """The output ref a cache hit hands out for entry."""
+    from comfy_headless.downloads import output_files
+
+    return output_files(cache.tagged_history(entry))[0]
+
+
+class TestResultCache:
+    """Test the disk store."""
+
+    def test_put_get_read(self, tmp_path):
+        """Test a stored result can be looked up and its outputs read."""
+        from comfy_headless.result_cache import ResultCache
+
+        cache = ResultCache(tmp_path, max_bytes=1000)
+        cache.put("k1", "pid", HISTORY, [(REF, _staged(cache, b"png"))], url="http://a:8188")
+
+        entry = cache.get("k1")
+        assert entry.prompt_id == "pid"
+        assert entry.history == HISTORY
+        assert cache.read(_tagged(cache, entry)) == b"png"
+        assert cache.get("missing") is None
+
+    def test_only_tagged_refs_are_served(self, tmp_path):
+        """Test outputs are looked up by backend and workflow, never by bare file name."""
+        from comfy_headless.result_cache import ResultCache
+
+        cache = ResultCache(tmp_path, max_bytes=1000)
+        cache.put("k1", "pid", HISTORY, [(REF, _staged(cache, b"png"))], url="http://a:8188")
+
+        assert cache.read(REF) is None
+        assert cache.read({**REF, "cache": {"url": "http://b:8188", "key": "k1"}}) is None
+        assert cache.read({**REF, "cache": {"url": "http://a:8188", "key": "k2"}}) is None
+        assert cache.read({**REF, "cache": {"url": "http://a:8188", "key": "k1"}}) == b"png"
+
+    def test_survives_restart(self, tmp_path):
+        """Test a new cache instance finds stored results on disk."""
+        from comfy_headless.result_cache import ResultCache
+
+        cache = ResultCache(tmp_path, max_bytes=1000)
+        cache.put("k1", "pid", HISTORY, [(REF, _staged(cache, b"png"))])
+        reopened = ResultCache(tmp_path, max_bytes=1000)
+
+        entry = reopened.get("k1")
+        assert entry.prompt_id == "pid"
+        assert reopened.read(_tagged(reopened, entry)) == b"png"
+        assert len(reopened) == 1
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test the size bound evicts the least recently used entry."""
+        from comfy_headless.result_cache import ResultCache
+
+        cache = ResultCache(tmp_path, max_bytes=10)
+        cache.put("a", "pa", HISTORY, [({"filename": "a"}, _staged(cache, b"x" * 4, "a"))])
+        cache.put("b", "pb", HISTORY, [({"filename": "b"}, _staged(cache, b"x" * 4, "b"))])
+        cache.get("a")  # a is now more recent than b
+        cache.put("c", "pc", HISTORY, [({"filename": "c"}, _staged(cache, b"x" * 4, "c"))])
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.size == 8
+        assert not (tmp_path / "b").exists()
+
+    def test_put_moves_staged_files(self, tmp_path):
+        """Test put moves downloaded files into the store instead of copying them."""
+        from comfy_headless.result_cache import ResultCache
+
+        cache = ResultCache(tmp_path, max_bytes=1000)
+        staged = _staged(cache, b"png")
+        entry = cache.put("k", "p", HISTORY, [(REF, staged)])
+
+        assert not staged.exists()
+        assert Path(entry.files[0]["path"]).read_bytes() == b"png"
+        assert entry.size == 3
+
+    def test_oversized_result_not_stored(self, tmp_path):
+        """Test a result larger than the cache is skipped."""
+        from comfy_headless.result_cache import ResultCache
+
+        cache = ResultCache(tmp_path, max_bytes=2)
+        assert cache.put("k", "p", HISTORY, [(REF, _staged(cache, b"xyz"))]) is None
+        assert len(cache) == 0
+
+    def test_missing_output_file_invalidates_entry(self, tmp_path):
+        """Test an entry whose files were deleted is treated as a miss."""
+        from comfy_headless.result_cache import ResultCache
+
+        cache = ResultCache(tmp_path, max_bytes=1000)
+        entry = cache.put("k", "p", HISTORY, [(REF, _staged(cache, b"png"))])
+        import os
+
+        os.remove(entry.files[0]["path"])
+
+        assert cache.get("k") is None
+        assert cache.read(_tagged(cache, entry)) is None
+
+    def test_corrupt_entry_removed_on_scan(self, tmp_path):
+        """Test unreadable entries are cleaned up when the store is scanned."""
+        from comfy_headless.result_cache import ResultCache
+
+        (tmp_path / "bad").mkdir()
+        (tmp_path / "bad" / "entry.json").write_text("{nope")
+
+        assert len(ResultCache(tmp_path)) == 0
+        assert not (tmp_path / "bad").exists()
+
+    def test_key_is_workflow_hash(self):
+        """Test the key is the canonical workflow hash."""
+        from comfy_headless.result_cache import ResultCache
+        from comfy_headless.workflows import compute_workflow_hash
+
+        workflow = {"1": {"class_type": "KSampler", "inputs": {"seed": 1, "steps": 20}}}
+        reordered = {"1": {"inputs": {"steps": 20, "seed": 1}, "class_type": "KSampler"}}
+
+        assert ResultCache.key(workflow) == compute_workflow_hash(workflow)
+        assert ResultCache.key(reordered) == ResultCache.key(workflow)
+
+
+class TestClientResultCache:
+    """Test ComfyClient generation through the result cache."""
+
+    def _client(self, tmp_path):
+        from comfy_headless.client import ComfyClient
+        from comfy_headless.result_cache import ResultCache
+
+        client = ComfyClient(use_websocket=False, result_cache=ResultCache(tmp_path))
+        patch.object(client, "ensure_online").start()
+        return client
+
+    def teardown_method(self):
+        patch.stopall()
+
+    def test_disabled_by_default(self):
+        """Test clients don't cache unless asked to."""
+        from comfy_headless.client import ComfyClient
+
+        assert ComfyClient(use_websocket=False)._result_cache is None
+
+    def test_repeat_generation_served_from_cache(self, tmp_path):
+        """Test an identical fixed-seed generation skips ComfyUI the second time."""
+        client = self._client(tmp_path)
+        progress = []
+
+        with (
+            patch.object(client, "queue_prompt", return_value="pid") as queue_prompt,
+            patch.object(client, "wait_for_completion", return_value=HISTORY),
+            patch.object(client, "download_outputs", side_effect=_download_into(b"png")),
+        ):
+            first = client.generate_image("a cat", checkpoint="m", seed=42)
+            second = client.generate_image(
+                "a cat", checkpoint="m", seed=42, on_progress=lambda p, s: progress.append(p)
+            )
+            other_seed = client.generate_image("a cat", checkpoint="m", seed=43)
+
+        assert queue_prompt.call_count == 2
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert other_seed["cached"] is False
+        assert second["images"] == [{**first["images"][0], "cache": second["images"][0]["cache"]}]
+        assert "cache" not in first["images"][0]
+        assert second["prompt_id"] == "pid"
+        assert progress == [1.0]
+
+        with patch.object(client, "download_output") as download:
+            assert client.download_outputs(second["images"]) == [b"png"]
+        download.assert_not_called()
+        # A bare file name may belong to a newer generation with the same name
+        with patch.object(client, "_get") as mock_get:
+            mock_get.return_value.ok = True
+            mock_get.return_value.content = b"fresh"
+            assert client.get_image("a.png") == b"fresh"
+
+    def test_failed_generation_not_cached(self, tmp_path):
+        """Test error results are not stored."""
+        client = self._client(tmp_path)
+        error_history = {"status": {"status_str": "error", "messages": [["boom"]]}, "outputs": {}}
+
+        with (
+            patch.object(client, "queue_prompt", return_value="pid") as queue_prompt,
+            patch.object(client, "wait_for_completion", return_value=error_history),
+        ):
+            client.generate_image("a cat", checkpoint="m", seed=42)
+            client.generate_image("a cat", checkpoint="m", seed=42)
+
+        assert queue_prompt.call_count == 2
+
+    def test_concurrent_identical_submissions_share_one_job(self, tmp_path):
+        """Test identical in-flight generations are merged into one ComfyUI job."""
+        client = self._client(tmp_path)
+
+        def slow_wait(prompt_id, **kwargs):
+            time.sleep(0.1)
+            return HISTORY
+
+        results = []
+        with (
+            patch.object(client, "queue_prompt", return_value="pid") as queue_prompt,
+            patch.object(client, "wait_for_completion", side_effect=slow_wait),
+            patch.object(client, "download_outputs", side_effect=_download_into(b"png")),
+        ):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(
+                        client.generate_image("a cat", checkpoint="m", seed=7)
+                    )
+                )
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert queue_prompt.call_count == 1
+        assert len(results) == 5
+        assert all(r["success"] and r["prompt_id"] == "pid" for r in results)
+
+    def test_download_outputs_uses_cached_files(self, tmp_path):
+        """Test download_outputs copies cached outputs instead of fetching."""
+        from comfy_headless.downloads import output_files
+
+        client = self._client(tmp_path / "cache")
+        cache = client._result_cache
+        history = cache.tagged_history(
+            cache.put("k", "pid", HISTORY, [(REF, _staged(cache, b"png"))])
+        )
+
+        with patch.object(client, "download_output") as download:
+            paths = client.download_outputs(history, dest_dir=tmp_path / "out")
+            data = client.download_outputs(output_files(history))
+
+        download.assert_not_called()
+        assert paths[0].read_bytes() == b"png"
+        assert data == [b"png"]
+
+
+class TestAsyncClientResultCache:
+    """Test AsyncComfyClient generation through the result cache."""
+
+    def _client(self, tmp_path):
+        from unittest.mock import AsyncMock
+
+        from comfy_headless.async_client import AsyncComfyClient
+        from comfy_headless.result_cache import ResultCache
+
+        client = AsyncComfyClient(use_websocket=False, result_cache=ResultCache(tmp_path))
+        patch.object(client, "ensure_online", AsyncMock()).start()
+        return client
+
+    def teardown_method(self):
+        patch.stopall()
+
+    async def test_repeat_and_concurrent_generations(self, tmp_path):
+        """Test identical generations share one job and later ones are served from the cache."""
+        import asyncio
+        from unittest.mock import AsyncMock
+
+        client = self._client(tmp_path)
+
+        async def slow_wait(prompt_id, **kwargs):
+            await asyncio.sleep(0.05)
+            return HISTORY
+
+        with (
+            patch.object(client, "queue_prompt", AsyncMock(return_value="pid")) as queue_prompt,
+            patch.object(client, "wait_for_completion", side_effect=slow_wait),
+            patch.object(client, "download_outputs", AsyncMock(side_effect=_download_into(b"png"))),
+        ):
+            results = await asyncio.gather(
+                *(client.generate_image("a cat", checkpoint="m", seed=7) for _ in range(3))
+            )
+            repeat = await client.generate_image("a cat", checkpoint="m", seed=7)
+
+        assert queue_prompt.await_count == 1
+        assert all(r["success"] and r["cached"] is False for r in results)
+        assert repeat["cached"] is True
+        assert repeat["images"][0]["cache"]["url"] == client.base_url
+
+        with patch.object(client, "download_output") as download:
+            assert await client.download_outputs(repeat["images"]) == [b"png"]
+        download.assert_not_called()
+
+    async def test_cancelled_caller_does_not_cancel_shared_run(self, tmp_path):
+        """Test a caller timing out leaves the merged run going for the others."""
+        import asyncio
+        from unittest.mock import AsyncMock
+
+        client = self._client(tmp_path)
+
+        async def slow_wait(prompt_id, **kwargs):
+            await asyncio.sleep(0.1)
+            return HISTORY
+
+        with (
+            patch.object(client, "queue_prompt", AsyncMock(return_value="pid")) as queue_prompt,
+            patch.object(client, "wait_for_completion", side_effect=slow_wait),
+            patch.object(client, "download_outputs", AsyncMock(side_effect=_download_into(b"png"))),
+        ):
+            first = asyncio.create_task(client.generate_image("a cat", checkpoint="m", seed=7))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(client.generate_image("a cat", checkpoint="m", seed=7))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            result = await second
+
+        assert first.cancelled()
+        assert queue_prompt.await_count == 1
+        assert result["success"] and result["prompt_id"] == "pid"
+
+    async def test_run_cancelled_when_every_caller_is(self, tmp_path):
+        """Test the shared run stops once nobody waits for it."""
+        import asyncio
+
+        from comfy_headless.result_cache import ResultCache
+
+        cache = ResultCache(tmp_path)
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def run():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.create_task(cache.arun("k", run))
+        await started.wait()
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+        async def fresh():
+            return "fresh"
+
+        # A later caller starts a new run rather than joining the cancelled one
+        assert await cache.arun("k", fresh) == "fresh"
+
+    async def test_clients_of_one_cache_share_runs(self, tmp_path):
+        """Test identical submissions from two clients are merged too."""
+        import asyncio
+        from unittest.mock import AsyncMock
+
+        from comfy_headless.async_client import AsyncComfyClient
+
+        first = self._client(tmp_path)
+        second = AsyncComfyClient(use_websocket=False, result_cache=first._result_cache)
+        patch.object(second, "ensure_online", AsyncMock()).start()
+
+        async def slow_wait(prompt_id, **kwargs):
+            await asyncio.sleep(0.05)
+            return HISTORY
+
+        queue_prompt = AsyncMock(return_value="pid")
+        for client in (first, second):
+            patch.object(client, "queue_prompt", queue_prompt).start()
+            patch.object(client, "wait_for_completion", side_effect=slow_wait).start()
+            patch.object(
+                client, "download_outputs", AsyncMock(side_effect=_download_into(b"png"))
+            ).start()
+
+        results = await asyncio.gather(
+            first.generate_image("a cat", checkpoint="m", seed=7),
+            second.generate_image("a cat", checkpoint="m", seed=7),
+        )
+
+        assert queue_prompt.await_count == 1
+        assert all(r["success"] and r["prompt_id"] == "pid" for r in results)
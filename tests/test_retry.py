@@ -1,6 +1,7 @@
 """Tests for retry module."""
 
 import time
+from unittest.mock import Mock
 
 import pytest
 
@@ -112,6 +113,29 @@ class TestCircuitBreaker:
         breaker.record_success()
         assert breaker.state == CircuitState.CLOSED
 
+    def test_listeners_notified_on_transitions(self):
+        """Test listeners see each state change once and can't break the breaker."""
+        from comfy_headless.retry import CircuitBreaker, CircuitState
+
+        breaker = CircuitBreaker(
+            name="test", failure_threshold=1, reset_timeout=0.01, success_threshold=1
+        )
+        changes = []
+        breaker.add_listener(lambda old, new: changes.append((old, new)))
+        breaker.add_listener(Mock(side_effect=RuntimeError("listener bug")))
+
+        breaker.record_failure()
+        breaker.record_failure()
+        time.sleep(0.02)
+        _ = breaker.state
+        breaker.record_success()
+
+        assert changes == [
+            (CircuitState.CLOSED, CircuitState.OPEN),
+            (CircuitState.OPEN, CircuitState.HALF_OPEN),
+            (CircuitState.HALF_OPEN, CircuitState.CLOSED),
+        ]
+
 
 class TestRateLimiter:
     """Test rate limiter."""
@@ -140,6 +164,79 @@ class TestRateLimiter:
         assert not limiter.acquire(blocking=False)
 
 
+class TestSingleFlight:
+    """Test request coalescing."""
+
+    def test_concurrent_calls_share_one_run(self):
+        """Test callers arriving while a call is in flight share its result."""
+        import threading
+        import time
+
+        from comfy_headless.retry import SingleFlight
+
+        flights = SingleFlight()
+        runs = []
+
+        def slow():
+            runs.append(1)
+            time.sleep(0.05)
+            return "result"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flights.do("k", slow))) for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(runs) == 1
+        assert results == ["result"] * 8
+        assert flights.calls == 1
+        assert flights.shared == 7
+
+    def test_exception_shared_and_not_cached(self):
+        """Test a failure reaches every waiter and the next call retries."""
+        from comfy_headless.retry import SingleFlight
+
+        flights = SingleFlight()
+
+        def boom():
+            raise ValueError("down")
+
+        with pytest.raises(ValueError):
+            flights.do("k", boom, ttl=10)
+        assert flights.do("k", lambda: "ok", ttl=10) == "ok"
+
+    def test_ttl_reuses_finished_result(self):
+        """Test sequential calls within the TTL reuse the result."""
+        from comfy_headless.retry import SingleFlight
+
+        flights = SingleFlight()
+        fn = Mock(return_value=1)
+
+        flights.do("k", fn, ttl=10)
+        flights.do("k", fn, ttl=10)
+        flights.do("other", fn, ttl=10)
+        assert fn.call_count == 2
+
+        flights.forget("k")
+        flights.do("k", fn, ttl=10)
+        assert fn.call_count == 3
+
+    def test_no_ttl_runs_sequential_calls(self):
+        """Test without a TTL only in-flight calls are shared."""
+        from comfy_headless.retry import SingleFlight
+
+        flights = SingleFlight()
+        fn = Mock(return_value=1)
+
+        flights.do("k", fn)
+        flights.do("k", fn)
+        assert fn.call_count == 2
+
+
 class TestOperationTimeoutError:
     """Test timeout error."""
 
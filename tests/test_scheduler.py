@@ -0,0 +1,292 @@
+"""Tests for the priority and tenant-fair JobScheduler."""
+
+import json
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+@pytest.fixture
+def make_backend(fake_backend, comfy_queue):
+    """
+    Client whose queue_prompt records (workflow id, front) in client.released.
+
+    While client.busy is set, every released prompt stays listed in /queue;
+    otherwise /queue is empty, so released prompts count as finished.
+    """
+    from comfy_headless.client import ComfyClient
+
+    def make(url: str = "http://a:8188"):
+        client = ComfyClient(base_url=url, use_websocket=False, circuit_name=f"scheduler:{url}")
+        client.released = []
+        client.busy = threading.Event()
+
+        def queue_prompt(workflow, front=False):
+            client.released.append((workflow["id"], front))
+            return f"{url}#{len(client.released)}"
+
+        def fetch_queue():
+            running = ()
+            if client.busy.is_set():
+                running = [f"{url}#{i + 1}" for i in range(len(client.released))]
+            return comfy_queue(running=running)
+
+        return fake_backend(client, queue_prompt=queue_prompt, fetch_queue=fetch_queue)
+
+    return make
+
+
+def _order(client) -> list[str]:
+    return [job_id for job_id, _ in client.released]
+
+
+class TestJobSchedulerOrdering:
+    """Test which held job is released next."""
+
+    def test_tenants_interleave(self, make_backend):
+        """Test a tenant's backlog doesn't delay another tenant's jobs until it drains."""
+        from comfy_headless.scheduler import JobScheduler
+
+        client = make_backend()
+        client.busy.set()
+        with JobScheduler(client, queue_depth=1, poll_interval=0.01) as scheduler:
+            jobs = [scheduler.submit({"id": f"bulk{i}"}, tenant="bulk") for i in range(6)]
+            jobs[0].result(timeout=2)
+            jobs += [scheduler.submit({"id": f"ui{i}"}, tenant="ui") for i in range(2)]
+            client.busy.clear()
+            for job in jobs:
+                job.result(timeout=2)
+
+        order = _order(client)
+        assert order[0] == "bulk0"
+        assert order.index("ui1") < 5
+        assert [job_id for job_id in order if job_id.startswith("bulk")] == [
+            f"bulk{i}" for i in range(6)
+        ]
+
+    def test_weights(self, make_backend):
+        """Test a heavier tenant gets proportionally more releases."""
+        from comfy_headless.scheduler import JobScheduler
+
+        client = make_backend()
+        client.busy.set()
+        with JobScheduler(
+            client, queue_depth=1, poll_interval=0.01, weights={"gold": 3.0}
+        ) as scheduler:
+            first = scheduler.submit({"id": "warmup"}, tenant="other")
+            first.result(timeout=2)
+            jobs = [scheduler.submit({"id": f"gold{i}"}, tenant="gold") for i in range(6)]
+            jobs += [scheduler.submit({"id": f"free{i}"}, tenant="free") for i in range(6)]
+            client.busy.clear()
+            for job in jobs:
+                job.result(timeout=2)
+
+        first_eight = _order(client)[1:9]
+        assert sum(job_id.startswith("gold") for job_id in first_eight) == 6
+
+    def test_priority_classes(self, make_backend):
+        """Test a higher class is released before held lower-class jobs."""
+        from comfy_headless.scheduler import JobScheduler, Priority
+
+        client = make_backend()
+        client.busy.set()
+        with JobScheduler(client, queue_depth=1, poll_interval=0.01) as scheduler:
+            bulk = [scheduler.submit({"id": "b0"}, priority=Priority.BULK)]
+            bulk[0].result(timeout=2)
+            bulk += [scheduler.submit({"id": f"b{i}"}, priority=Priority.BULK) for i in (1, 2)]
+            interactive = scheduler.submit({"id": "i"}, priority=Priority.INTERACTIVE)
+
+            assert scheduler.stats()["held"] == {
+                "urgent": 0,
+                "interactive": 1,
+                "normal": 0,
+                "bulk": 2,
+            }
+            client.busy.clear()
+            for job in [*bulk, interactive]:
+                job.result(timeout=2)
+
+        assert _order(client) == ["b0", "i", "b1", "b2"]
+
+    def test_urgent_skips_depth_and_goes_to_front(self, make_backend):
+        """Test urgent jobs are released at once with ComfyUI's front flag."""
+        from comfy_headless.scheduler import JobScheduler, Priority
+
+        client = make_backend()
+        client.busy.set()
+        with JobScheduler(client, queue_depth=1, poll_interval=0.01) as scheduler:
+            scheduler.submit({"id": "n0"}).result(timeout=2)
+            held = scheduler.submit({"id": "n1"})
+            urgent = scheduler.submit({"id": "u"}, priority=Priority.URGENT)
+
+            urgent.result(timeout=2)
+            assert client.released == [("n0", False), ("u", True)]
+            assert held.state == "pending"
+
+
+class TestJobSchedulerSlots:
+    """Test per-backend queue depth."""
+
+    def test_depth_per_backend(self, make_backend):
+        """Test jobs spread over backends and wait once every backend is full."""
+        from comfy_headless.scheduler import JobScheduler
+
+        a, b = make_backend("http://a:8188"), make_backend("http://b:8188")
+        a.busy.set()
+        b.busy.set()
+        with JobScheduler([a, b], queue_depth=1, poll_interval=0.01) as scheduler:
+            jobs = [scheduler.submit({"id": f"j{i}"}) for i in range(3)]
+            jobs[0].result(timeout=2)
+            jobs[1].result(timeout=2)
+
+            assert len(a.released) == len(b.released) == 1
+            assert scheduler.stats() == {
+                "held": {"urgent": 0, "interactive": 0, "normal": 1, "bulk": 0},
+                "inflight": {"http://a:8188": 1, "http://b:8188": 1},
+            }
+            with pytest.raises(TimeoutError):
+                jobs[2].result(timeout=0.1)
+
+            a.busy.clear()
+            jobs[2].result(timeout=2)
+            assert jobs[2].client is a
+
+    def test_unreadable_queue_keeps_slots(self, make_backend):
+        """Test a failed /queue read doesn't count released jobs as finished."""
+        from comfy_headless.scheduler import JobScheduler
+
+        client = make_backend()
+        client.fetch_queue.side_effect = lambda: None
+        with JobScheduler(client, queue_depth=1, poll_interval=0.01) as scheduler:
+            scheduler.submit({"id": "a"}).result(timeout=2)
+            held = scheduler.submit({"id": "b"})
+            with pytest.raises(TimeoutError):
+                held.result(timeout=0.1)
+        assert _order(client) == ["a"]
+
+    def test_open_circuit_skips_backend(self, make_backend):
+        """Test jobs aren't released to a backend whose circuit is open."""
+        from comfy_headless.retry import get_circuit_breaker
+        from comfy_headless.scheduler import JobScheduler
+
+        down, up = make_backend("http://down:8188"), make_backend("http://up:8188")
+        circuit = get_circuit_breaker("scheduler:http://down:8188")
+        for _ in range(circuit.failure_threshold):
+            circuit.record_failure()
+        try:
+            assert down.circuit_open and not up.circuit_open
+            with JobScheduler([down, up], queue_depth=1, poll_interval=0.01) as scheduler:
+                assert scheduler.submit({"id": "a"}).result(timeout=2).startswith("http://up")
+        finally:
+            circuit.reset()
+        assert down.released == []
+
+    def test_wait_frees_slot(self, make_backend, fake_backend):
+        """Test a job waited on frees its slot without a /queue poll."""
+        from comfy_headless.scheduler import JobScheduler
+
+        client = make_backend()
+        client.busy.set()
+        fake_backend(client, wait_for_completion={"outputs": {}})
+        with JobScheduler(client, queue_depth=1, poll_interval=60) as scheduler:
+            first = scheduler.submit({"id": "a"})
+            second = scheduler.submit({"id": "b"})
+
+            assert first.wait(timeout=2) == {"outputs": {}}
+            assert first.state == "done"
+            second.result(timeout=2)
+        client.wait_for_completion.assert_called_once()
+        assert client.wait_for_completion.call_args.args == ("http://a:8188#1",)
+
+    def test_failed_release(self, make_backend):
+        """Test a rejected prompt fails its job and frees the slot."""
+        from comfy_headless.exceptions import QueueError
+        from comfy_headless.scheduler import JobScheduler
+
+        client = make_backend()
+        client.queue_prompt.side_effect = [None, "p2"]
+        with JobScheduler(client, queue_depth=1, poll_interval=60) as scheduler:
+            failed = scheduler.submit({"id": "a"})
+            ok = scheduler.submit({"id": "b"})
+
+            with pytest.raises(QueueError):
+                failed.result(timeout=2)
+            assert failed.state == "failed"
+            assert ok.result(timeout=2) == "p2"
+
+    def test_cancel_held_job(self, make_backend):
+        """Test only jobs still held locally can be cancelled."""
+        from comfy_headless.exceptions import QueueError
+        from comfy_headless.scheduler import JobScheduler
+
+        client = make_backend()
+        client.busy.set()
+        with JobScheduler(client, queue_depth=1, poll_interval=0.01) as scheduler:
+            released = scheduler.submit({"id": "a"})
+            released.result(timeout=2)
+            held = scheduler.submit({"id": "b"})
+
+            assert held.cancel()
+            assert not released.cancel()
+            with pytest.raises(QueueError):
+                held.result(timeout=1)
+
+            client.busy.clear()
+            scheduler.submit({"id": "c"}).result(timeout=2)
+        assert _order(client) == ["a", "c"]
+
+    def test_close_cancels_held_jobs(self, make_backend):
+        """Test closing the scheduler cancels what it still holds."""
+        from comfy_headless.scheduler import JobScheduler
+
+        client = make_backend()
+        client.busy.set()
+        scheduler = JobScheduler(client, queue_depth=1, poll_interval=0.01)
+        scheduler.submit({"id": "a"}).result(timeout=2)
+        held = scheduler.submit({"id": "b"})
+        scheduler.close()
+
+        assert held.state == "cancelled"
+        with pytest.raises(RuntimeError):
+            scheduler.submit({"id": "c"})
+
+    def test_close_closes_default_client_only(self, make_backend):
+        """Test close() closes the client the scheduler created but not one passed in."""
+        from comfy_headless.client import ComfyClient
+        from comfy_headless.scheduler import JobScheduler
+
+        with patch.object(ComfyClient, "close") as close:
+            JobScheduler(make_backend()).close()
+            close.assert_not_called()
+            JobScheduler().close()
+            close.assert_called_once()
+
+    def test_pool_backends(self):
+        """Test a ComfyPool's backends are scheduled individually."""
+        from comfy_headless.pool import ComfyPool
+        from comfy_headless.scheduler import JobScheduler
+
+        pool = ComfyPool(["http://a:8188", "http://b:8188"], use_websocket=False)
+        scheduler = JobScheduler(pool)
+
+        assert scheduler.stats()["inflight"] == {"http://a:8188": 0, "http://b:8188": 0}
+        scheduler.close()
+
+
+class TestQueuePromptFront:
+    """Test ComfyUI's front flag on queue_prompt."""
+
+    def test_front_in_payload(self):
+        """Test front=True is sent with the prompt and omitted otherwise."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(use_websocket=False)
+        response = MagicMock(ok=True, content=b'{"prompt_id": "p1"}')
+        with patch.object(client, "_post", return_value=response) as post:
+            client.queue_prompt({"1": {}}, front=True)
+            client.queue_prompt({"1": {}})
+
+        sent = [json.loads(call.kwargs["data"]) for call in post.call_args_list]
+        assert sent[0]["front"] is True
+        assert "front" not in sent[1]
@@ -0,0 +1,198 @@
+"""Tests for selectable HTTP transports."""
+
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import requests
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+
+class _ComfyHandler(BaseHTTPRequestHandler):
+    """Serves /system_stats, /view and /upload/image like ComfyUI."""
+
+    protocol_version = "HTTP/1.1"
+    uploads: list = []
+
+    def _reply(self, status, body=b"", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/system_stats":
+            self._reply(200, json.dumps({"system": {"os": "posix"}}).encode())
+        elif self.path.startswith("/view"):
+            self._reply(200, PNG, "image/png")
+        else:
+            self._reply(404)
+
+    def do_HEAD(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).uploads.append(body)
+        self._reply(200, json.dumps({"name": "up.png", "subfolder": "", "type": "input"}).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class _UnixHandler(_ComfyHandler):
+    def address_string(self):
+        return "uds"
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def tcp_server():
+    from comfy_headless.retry import get_circuit_breaker
+    from comfy_headless.uploads import clear_upload_caches
+
+    get_circuit_breaker("comfyui").reset()
+    clear_upload_caches()
+    _ComfyHandler.uploads = []
+    server = _serve(ThreadingHTTPServer(("127.0.0.1", 0), _ComfyHandler))
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def uds_server(tmp_path):
+    from comfy_headless.retry import get_circuit_breaker
+
+    get_circuit_breaker("comfyui").reset()
+    path = str(tmp_path / "comfy.sock")
+    server = _serve(_UnixHTTPServer(path, _UnixHandler))
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+class TestCreateSession:
+    """Test transport selection."""
+
+    def test_default_is_requests(self):
+        """Test the default session is a pooled requests.Session sized from settings."""
+        from comfy_headless.client import ComfyClient
+
+        with patch("comfy_headless.transports.settings.http.max_keepalive_connections", 7):
+            session = ComfyClient(use_websocket=False).session
+
+        assert isinstance(session, requests.Session)
+        assert session.get_adapter("http://x")._pool_maxsize == 7
+
+    def test_unknown_transport(self):
+        """Test an unknown transport is rejected up front."""
+        from comfy_headless.client import ComfyClient
+
+        with pytest.raises(ValueError):
+            ComfyClient(transport="carrier-pigeon")
+
+    def test_uds_needs_path(self):
+        """Test the uds transport without a socket path is refused."""
+        from comfy_headless.transports import create_session
+
+        with pytest.raises(ValueError):
+            create_session("uds")
+
+
+class TestHttpxTransport:
+    """Test ComfyClient over httpx."""
+
+    def test_requests_and_downloads(self, tcp_server, tmp_path):
+        """Test JSON calls, streamed downloads and streamed uploads work over httpx."""
+        from comfy_headless.client import ComfyClient
+        from comfy_headless.transports import HttpxSession
+
+        client = ComfyClient(base_url=tcp_server, use_websocket=False, transport="httpx")
+
+        assert client.get_system_stats() == {"system": {"os": "posix"}}
+        assert isinstance(client.session, HttpxSession)
+        assert client.download_output("a.png", tmp_path / "a.png") == len(PNG)
+        assert (tmp_path / "a.png").read_bytes() == PNG
+        assert client.upload_image(PNG) == "up.png"
+        assert PNG in _ComfyHandler.uploads[0]
+        assert client.is_online()
+        client.close()
+
+    def test_connection_errors_mapped(self):
+        """Test httpx connection failures surface like requests ones."""
+        from comfy_headless.transports import create_session
+
+        session = create_session("httpx")
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.request("GET", "http://127.0.0.1:1/system_stats", timeout=(1.0, 1.0))
+        session.close()
+
+    def test_http2_without_h2(self):
+        """Test the httpx transport only asks for HTTP/2 when h2 is installed."""
+        from comfy_headless import transports
+
+        with patch.object(transports, "HttpxSession") as session_cls:
+            with patch("comfy_headless.http_client.H2_AVAILABLE", False):
+                transports.create_session("httpx")
+            assert session_cls.call_args.kwargs == {"http2": False}
+            with patch("comfy_headless.http_client.H2_AVAILABLE", True):
+                transports.create_session("httpx")
+            assert session_cls.call_args.kwargs == {"http2": transports.settings.http.http2}
+
+    def test_offline_backend(self):
+        """Test is_online is False when nothing listens."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(
+            base_url="http://127.0.0.1:1",
+            use_websocket=False,
+            transport="httpx",
+            circuit_name="httpx-down",
+        )
+        assert not client.is_online()
+
+
+class TestUdsTransport:
+    """Test ComfyClient over a Unix domain socket."""
+
+    def test_requests_over_socket(self, uds_server, tmp_path):
+        """Test requests reach a server listening only on a Unix socket."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(
+            base_url="http://localhost", use_websocket=False, transport="uds", uds_path=uds_server
+        )
+
+        assert client.is_online()
+        assert client.get_system_stats() == {"system": {"os": "posix"}}
+        assert client.download_output("a.png", tmp_path / "a.png") == len(PNG)
+        client.close()
+
+    def test_path_from_settings(self, uds_server):
+        """Test the socket path defaults to settings.http.uds_path."""
+        from comfy_headless.client import ComfyClient
+
+        with (
+            patch("comfy_headless.transports.settings.http.transport", "uds"),
+            patch("comfy_headless.transports.settings.http.uds_path", uds_server),
+        ):
+            client = ComfyClient(base_url="http://localhost", use_websocket=False)
+            assert client.get_system_stats() == {"system": {"os": "posix"}}
+        client.close()
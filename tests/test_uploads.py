@@ -0,0 +1,274 @@
+"""Tests for input image uploads."""
+
+import base64
+import email
+import email.policy
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+
+class _UploadHandler(BaseHTTPRequestHandler):
+    """Implements /upload/image, /upload/mask and HEAD /view like ComfyUI."""
+
+    stored: dict = {}
+    posts: list = []
+
+    def do_HEAD(self):
+        from urllib.parse import parse_qs, urlparse
+
+        query = parse_qs(urlparse(self.path).query)
+        filename = query.get("filename", [""])[0]
+        self.send_response(200 if filename in type(self).stored else 404)
+        self.end_headers()
+
+    def do_POST(self):
+        cls = type(self)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        message = email.message_from_bytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body,
+            policy=email.policy.HTTP,
+        )
+        fields, filename, data = {}, None, None
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                filename, data = part.get_filename(), part.get_payload(decode=True)
+            else:
+                fields[name] = part.get_content()
+        cls.posts.append({"path": self.path, "fields": fields, "filename": filename})
+        cls.stored[filename] = data
+
+        response = json.dumps(
+            {"name": filename, "subfolder": fields.get("subfolder", ""), "type": "input"}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upload_server():
+    """Local HTTP server accepting uploads."""
+    from comfy_headless.retry import get_circuit_breaker
+    from comfy_headless.uploads import clear_upload_caches
+
+    get_circuit_breaker("comfyui").reset()  # Earlier failure tests may have opened it
+    clear_upload_caches()
+    _UploadHandler.stored = {}
+    _UploadHandler.posts = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _UploadHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    clear_upload_caches()
+
+
+class TestPrepareUpload:
+    """Test hashing of upload sources."""
+
+    def test_sources_hash_alike(self, tmp_path):
+        """Test bytes, path, file object and base64 of one image share a name."""
+        from comfy_headless.uploads import prepare_upload
+
+        path = tmp_path / "cat.png"
+        path.write_bytes(PNG)
+        encoded = base64.b64encode(PNG).decode()
+        sources = [
+            PNG,
+            path,
+            str(path),
+            io.BytesIO(PNG),
+            encoded,
+            f"data:image/png;base64,{encoded}",
+        ]
+
+        uploads = [prepare_upload(source) for source in sources]
+
+        assert len({upload.name for upload in uploads}) == 1
+        assert uploads[0].name.endswith(".png")
+        assert all(b"".join(upload.chunks(100)) == PNG for upload in uploads)
+
+    def test_file_object_read_from_position(self):
+        """Test a file object is hashed and re-read from where it was."""
+        from comfy_headless.uploads import prepare_upload
+
+        f = io.BytesIO(b"junk" + PNG)
+        f.seek(4)
+        upload = prepare_upload(f)
+
+        assert upload.size == len(PNG)
+        assert b"".join(upload.chunks()) == PNG
+        assert b"".join(upload.chunks()) == PNG  # Retries re-read
+        assert not f.closed
+
+    def test_rejects_non_image_string(self):
+        """Test a string that is neither a file nor base64 is refused."""
+        from comfy_headless.uploads import prepare_upload
+
+        with pytest.raises(ValueError):
+            prepare_upload("missing.png")
+
+    def test_input_names(self):
+        """Test input names, refs and base64 detection."""
+        from comfy_headless.uploads import input_name, input_ref, is_base64_image, is_input_name
+
+        assert input_name({"name": "a.png", "subfolder": "x"}) == "x/a.png"
+        assert input_ref("x/a.png") == {"filename": "a.png", "subfolder": "x", "type": "input"}
+        assert is_base64_image(base64.b64encode(PNG).decode())
+        assert is_input_name("a.png")
+        assert not is_input_name(b"a.png")
+
+    def test_paths_are_not_input_names(self):
+        """Test only bare names and uploaded subfolder names count as input names."""
+        from comfy_headless.uploads import UploadCache, check_input_path, is_input_name
+
+        cache = UploadCache("http://x")
+        cache.add("digest", "masks/a.png")
+
+        assert not is_input_name("./init.png")
+        assert not is_input_name("masks/a.png")
+        assert is_input_name("masks/a.png", cache)
+        with pytest.raises(FileNotFoundError):
+            check_input_path("./init.png")
+        check_input_path(base64.b64encode(PNG).decode())
+
+    def test_multipart_length_matches_body(self):
+        """Test the declared Content-Length is the streamed size."""
+        from comfy_headless.uploads import MultipartBody, prepare_upload
+
+        body = MultipartBody({"type": "input"}, "image", prepare_upload(PNG), chunk_size=100)
+
+        assert int(body.headers["Content-Length"]) == len(b"".join(body)) == len(body)
+
+
+class TestClientUploads:
+    """Test ComfyClient.upload_image/upload_mask against a local server."""
+
+    def test_upload_once_per_content(self, upload_server, tmp_path):
+        """Test repeat uploads of the same content don't hit the server."""
+        from comfy_headless.client import ComfyClient
+
+        path = tmp_path / "cat.png"
+        path.write_bytes(PNG)
+        client = ComfyClient(base_url=upload_server, use_websocket=False)
+
+        name = client.upload_image(path)
+        assert client.upload_image(PNG) == name
+        assert client.upload_image(base64.b64encode(PNG).decode()) == name
+
+        assert len(_UploadHandler.posts) == 1
+        assert _UploadHandler.posts[0]["path"] == "/upload/image"
+        assert _UploadHandler.posts[0]["fields"]["overwrite"] == "true"
+        assert _UploadHandler.stored[name] == PNG
+
+    def test_existing_input_not_resent(self, upload_server):
+        """Test content the backend already has (e.g. after a restart) is not re-uploaded."""
+        from comfy_headless.client import ComfyClient
+        from comfy_headless.uploads import clear_upload_caches
+
+        client = ComfyClient(base_url=upload_server, use_websocket=False)
+        name = client.upload_image(PNG)
+        clear_upload_caches()
+
+        assert client.upload_image(PNG) == name
+        assert len(_UploadHandler.posts) == 1
+
+    def test_upload_mask(self, upload_server):
+        """Test a mask is posted with its original's ref."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(base_url=upload_server, use_websocket=False)
+        original = client.upload_image(PNG, subfolder="edits")
+        masked = client.upload_mask(PNG, original)
+
+        post = _UploadHandler.posts[-1]
+        assert post["path"] == "/upload/mask"
+        assert json.loads(post["fields"]["original_ref"]) == {
+            "filename": original.split("/")[1],
+            "subfolder": "edits",
+            "type": "input",
+        }
+        assert masked not in (original, original.split("/")[1])
+
+    def test_failed_upload_returns_none(self):
+        """Test an unreachable backend gives None."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(
+            base_url="http://127.0.0.1:1", use_websocket=False, circuit_name="uploads-down"
+        )
+        with patch("comfy_headless.client.settings.retry.max_retries", 0):
+            assert client.upload_image(PNG) is None
+
+    async def test_async_upload(self, upload_server):
+        """Test AsyncComfyClient uploads stream the same body and share the record."""
+        from comfy_headless.async_client import AsyncComfyClient
+        from comfy_headless.client import ComfyClient
+
+        async with AsyncComfyClient(base_url=upload_server) as client:
+            name = await client.upload_image(PNG)
+            assert await client.upload_image(PNG) == name
+
+        assert len(_UploadHandler.posts) == 1
+        assert _UploadHandler.stored[name] == PNG
+        assert ComfyClient(base_url=upload_server, use_websocket=False).upload_image(PNG) == name
+
+
+class TestInitImages:
+    """Test img2vid workflows reference uploaded inputs."""
+
+    def test_builder_uses_load_image_for_names(self):
+        """Test input names load with LoadImage and base64 stays inline."""
+        from comfy_headless.video import build_video_workflow
+
+        by_name = build_video_workflow("a cat", preset="svd_short", init_image="abc.png")
+        inline = build_video_workflow("a cat", preset="svd_short", init_image="aGVsbG8=")
+
+        assert by_name["1"] == {"class_type": "LoadImage", "inputs": {"image": "abc.png"}}
+        assert inline["1"]["class_type"] == "LoadImageFromBase64"
+
+    def test_generate_video_uploads_init_image(self):
+        """Test generate_video uploads base64 init images and queues their name."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(use_websocket=False)
+        encoded = base64.b64encode(PNG).decode()
+        with (
+            patch.object(client, "ensure_online"),
+            patch.object(client, "upload_image", return_value="abc.png") as upload,
+            patch.object(client, "queue_prompt", return_value=None) as queue_prompt,
+        ):
+            client.generate_video("a cat", preset="svd_short", init_image=encoded)
+            client.generate_video("a cat", preset="svd_short", init_image="abc.png")
+
+        upload.assert_called_once_with(encoded)
+        for call in queue_prompt.call_args_list:
+            workflow = call.args[0]
+            assert workflow["1"] == {"class_type": "LoadImage", "inputs": {"image": "abc.png"}}
+
+    def test_missing_init_image_path_raises(self):
+        """Test a mistyped init image path fails locally instead of being queued."""
+        from comfy_headless.client import ComfyClient
+
+        client = ComfyClient(use_websocket=False)
+        with (
+            patch.object(client, "upload_image") as upload,
+            pytest.raises(FileNotFoundError),
+        ):
+            client._input_image("./init.png")
+
+        upload.assert_not_called()
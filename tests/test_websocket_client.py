@@ -1,5 +1,6 @@
 """Tests for websocket_client module."""
 
+import asyncio
 import json
 from unittest.mock import AsyncMock, patch
 
@@ -132,6 +133,16 @@ class TestComfyWSClientInit:
             except ImportError:
                 pytest.skip("websockets not available")
 
+    def test_insecure_url_warned_once(self, mock_websockets):
+        """Test the ws:// warning is logged once per URL, not per client."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        with patch("comfy_headless.websocket_client.logger") as logger:
+            ComfyWSClient(base_url="http://warn-once:8188")
+            ComfyWSClient(base_url="http://warn-once:8188")
+            ComfyWSClient(base_url="http://warn-twice:8188")
+        assert logger.warning.call_count == 2
+
     def test_init_with_custom_client_id(self, mock_websockets):
         """Test initialization with custom client ID."""
         with patch("comfy_headless.websocket_client.WEBSOCKETS_AVAILABLE", True):
@@ -433,6 +444,7 @@ class TestComfyWSClientNotifyListeners:
 
                 progress = WSProgress(prompt_id="prompt123", status="test")
                 await client._notify_listeners("prompt123", progress)
+                await client.flush_listeners()  # Delivered by the listener's task
 
                 assert len(called) == 1
                 assert called[0].status == "test"
@@ -458,8 +470,669 @@ class TestComfyWSClientNotifyListeners:
 
                 progress = WSProgress(prompt_id="other_prompt", status="test")
                 await client._notify_listeners("other_prompt", progress)
+                await client.flush_listeners()
 
                 # Global listener should be called for any prompt
                 assert len(called) == 1
             except ImportError:
                 pytest.skip("websockets not available")
+
+
+def _preview_frame(image: bytes, image_format: int = 2) -> bytes:
+    return (1).to_bytes(4, "big") + image_format.to_bytes(4, "big") + image
+
+
+class TestComfyWSClientPreviews:
+    """Test binary frame decoding and throttled previews."""
+
+    async def test_preview_linked_to_running_prompt(self):
+        """Test previews carry the executing prompt/node and a zero-copy view."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        frames = []
+
+        async def on_preview(frame):
+            frames.append(frame)
+
+        client.add_preview_listener("p1", on_preview, max_fps=0)
+        await client._handle_message(
+            json.dumps({"type": "executing", "data": {"node": "3", "prompt_id": "p1"}})
+        )
+        await client._handle_message(_preview_frame(b"\x89PNG-data"))
+        await asyncio.sleep(0)
+
+        assert len(frames) == 1
+        assert frames[0].prompt_id == "p1"
+        assert frames[0].node_id == "3"
+        assert frames[0].preview_format == "image/png"
+        assert isinstance(frames[0].preview_data, memoryview)
+        assert bytes(frames[0].preview_data) == b"\x89PNG-data"
+
+    async def test_preview_with_metadata(self):
+        """Test metadata frames name their prompt, node and image type."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        frames = []
+
+        async def on_preview(frame):
+            frames.append(frame)
+
+        client.add_preview_listener("", on_preview, max_fps=0)
+        metadata = json.dumps(
+            {"prompt_id": "p2", "node_id": "9", "image_type": "image/webp"}
+        ).encode()
+        await client._handle_message(
+            (4).to_bytes(4, "big") + len(metadata).to_bytes(4, "big") + metadata + b"RIFF"
+        )
+        await asyncio.sleep(0)
+
+        assert (frames[0].prompt_id, frames[0].node_id) == ("p2", "9")
+        assert frames[0].preview_format == "image/webp"
+        assert bytes(frames[0].preview_data) == b"RIFF"
+
+    async def test_text_frame(self):
+        """Test progress text frames reach the prompt's listeners."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        client._running_prompt = "p1"
+        client._notify_listeners = AsyncMock()
+
+        await client._handle_message(
+            (3).to_bytes(4, "big") + (2).to_bytes(4, "big") + b"12" + b"loading model"
+        )
+
+        prompt_id, event = client._notify_listeners.call_args[0]
+        assert prompt_id == "p1"
+        assert (event.status, event.node_id, event.text) == ("text", "12", "loading model")
+
+    async def test_throttled_latest_frame_wins(self):
+        """Test bursts of previews reach a slow subscriber as their newest frame, rate-limited."""
+        import time
+
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        client._running_prompt = "p1"
+        received = []
+
+        async def slow(frame):
+            received.append((bytes(frame.preview_data), time.monotonic()))
+            await asyncio.sleep(0.02)
+
+        client.add_preview_listener("p1", slow, max_fps=10)
+        for step in range(30):
+            await client._handle_message(_preview_frame(str(step).encode()))
+        await asyncio.sleep(0.01)
+        for step in range(30, 60):
+            await client._handle_message(_preview_frame(str(step).encode()))
+        await asyncio.sleep(0.2)
+
+        assert [data for data, _ in received] == [b"29", b"59"]
+        assert received[1][1] - received[0][1] >= 0.09
+
+    async def test_previews_not_sent_to_progress_listeners(self):
+        """Test previews don't flow through the per-prompt event listeners."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        client._running_prompt = "p1"
+        client._notify_listeners = AsyncMock()
+
+        await client._handle_message(_preview_frame(b"jpeg", image_format=1))
+
+        client._notify_listeners.assert_not_called()
+
+    async def test_completion_clears_running_prompt(self):
+        """Test previews after a prompt finished are not attributed to it."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        await client._handle_message(
+            json.dumps({"type": "execution_start", "data": {"prompt_id": "p1"}})
+        )
+        await client._handle_message(
+            json.dumps({"type": "executing", "data": {"node": None, "prompt_id": "p1"}})
+        )
+
+        assert client._running_prompt is None
+
+
+@pytest.fixture
+async def ws_server():
+    """Local WebSocket server that records connections and can drop them."""
+    from types import SimpleNamespace
+
+    from websockets.asyncio.server import serve
+
+    state = SimpleNamespace(connections=[], paths=[])
+
+    async def handler(ws):
+        state.connections.append(ws)
+        state.paths.append(ws.request.path)
+        await ws.wait_closed()
+
+    async with serve(handler, "127.0.0.1", 0) as server:
+        state.server = server
+        state.url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        yield state
+
+
+async def _until(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+class TestComfyWSClientReconnect:
+    """Test background reconnect and missed-event recovery."""
+
+    async def test_reconnect_resolves_prompt_finished_while_down(self, ws_server):
+        """Test a waiter is resolved from /history after the socket comes back."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient(ws_server.url, client_id="cid", reconnect_delay=0.01)
+        client.get_queue = AsyncMock(return_value={"queue_running": [], "queue_pending": []})
+        client.get_history = AsyncMock(
+            return_value={"p1": {"status": {"completed": True, "status_str": "success"}}}
+        )
+        await client.connect()
+        try:
+            waiter = asyncio.create_task(client.wait_for_completion("p1", timeout=10))
+            await _until(lambda: "p1" in client._listeners)
+            await ws_server.connections[0].close()
+
+            result = await asyncio.wait_for(waiter, timeout=2)
+        finally:
+            await client.disconnect()
+
+        assert result.status == "completed"
+        assert len(ws_server.connections) == 2
+        assert all("clientId=cid" in path for path in ws_server.paths)
+        client.get_history.assert_awaited_once_with("p1")
+
+    async def test_still_queued_prompt_waits_for_live_events(self, ws_server):
+        """Test prompts still queued after a reconnect keep waiting for their events."""
+        import json
+
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient(ws_server.url, reconnect_delay=0.01)
+        client.get_queue = AsyncMock(
+            return_value={"queue_running": [[0, "p1", {}, {}, []]], "queue_pending": []}
+        )
+        client.get_history = AsyncMock()
+        await client.connect()
+        try:
+            waiter = asyncio.create_task(client.wait_for_completion("p1", timeout=10))
+            await _until(lambda: "p1" in client._listeners)
+            await ws_server.connections[0].close()
+            await _until(lambda: len(ws_server.connections) == 2 and client.connected)
+            await _until(lambda: client.get_queue.await_count == 1)
+            assert not waiter.done()
+
+            await ws_server.connections[1].send(
+                json.dumps({"type": "executing", "data": {"node": None, "prompt_id": "p1"}})
+            )
+            result = await asyncio.wait_for(waiter, timeout=2)
+        finally:
+            await client.disconnect()
+
+        assert result.status == "completed"
+        client.get_history.assert_not_awaited()
+
+    async def test_gives_up_with_disconnected_event(self, ws_server):
+        """Test waiters return "disconnected" once reconnecting times out."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient(ws_server.url, reconnect_delay=0.01)
+        await client.connect()
+        ws_server.server.close()
+        try:
+            with patch(
+                "comfy_headless.websocket_client.settings.comfyui.ws_reconnect_timeout", 0.1
+            ):
+                result = await client.wait_for_completion("p1", timeout=5)
+        finally:
+            await client.disconnect()
+
+        assert result.status == "disconnected"
+        assert not client.reconnecting
+
+    async def test_session_watches_recovered(self):
+        """Test WSSession watches are recovered through the prompt source."""
+        from comfy_headless.websocket_client import ComfyWSClient
+        from comfy_headless.ws_session import WSSession
+
+        client = ComfyWSClient("http://localhost:8188")
+        client.get_queue = AsyncMock(return_value={})
+        client.get_history = AsyncMock(
+            return_value={
+                "p1": {
+                    "status": {
+                        "completed": False,
+                        "status_str": "error",
+                        "messages": [["execution_interrupted", {}]],
+                    }
+                }
+            }
+        )
+        session = WSSession(client, key=("test",))
+        watch = session.watch("p1")
+
+        await client._recover_missed_events()
+
+        assert (await watch.wait(timeout=1)).status == "interrupted"
+
+
+def _executing(node, prompt_id):
+    return json.dumps({"type": "executing", "data": {"node": node, "prompt_id": prompt_id}})
+
+
+class TestComfyWSClientEarlyEvents:
+    """Test buffering of events for prompts nobody listens to yet."""
+
+    async def test_late_waiter_sees_early_completion(self):
+        """Test a prompt that finished before wait_for_completion resolves at once."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        await client._handle_message(_executing("3", "p1"))
+        await client._handle_message(_executing(None, "p1"))
+        seen = []
+
+        async def on_progress(progress):
+            seen.append(progress.status)
+
+        result = await client.wait_for_completion("p1", timeout=0.5, on_progress=on_progress)
+
+        assert result.status == "completed"
+        assert seen == ["executing", "completed"]
+        assert client.pop_early_events("p1") == []
+
+    async def test_watched_prompts_not_buffered(self):
+        """Test events delivered to a listener are not kept."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        client.add_listener("p1", AsyncMock())
+        await client._handle_message(_executing(None, "p1"))
+
+        assert client._early_events == {}
+
+    async def test_buffer_bounds_and_ttl(self):
+        """Test the buffer caps prompts and events per prompt and drops old events."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        client.EARLY_EVENT_PROMPTS = 2
+        client.EARLY_EVENTS_PER_PROMPT = 3
+        for node in range(5):
+            await client._handle_message(_executing(str(node), "p1"))
+        await client._handle_message(_executing("1", "p2"))
+        await client._handle_message(_executing("1", "p3"))
+
+        assert "p1" not in client._early_events  # Oldest prompt evicted
+        client.EARLY_EVENT_TTL = 0
+        await asyncio.sleep(0.01)
+        assert client.pop_early_events("p2") == []
+
+        client.EARLY_EVENT_TTL = 60
+        for node in range(5):
+            await client._handle_message(_executing(str(node), "p4"))
+        assert [e.node_id for e in client.pop_early_events("p4")] == ["2", "3", "4"]
+
+    async def test_submit_and_track_listens_before_queueing(self):
+        """Test events emitted while /prompt is in flight reach the tracker."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        sent = {}
+
+        async def queue_prompt(workflow, prompt_id=None):
+            sent["prompt_id"] = prompt_id
+            assert client._listeners[prompt_id]
+            await client._handle_message(_executing(None, prompt_id))
+            return prompt_id
+
+        client.queue_prompt = queue_prompt
+        result = await client.submit_and_track({"1": {}}, timeout=0.5)
+
+        assert result.status == "completed"
+        assert result.prompt_id == sent["prompt_id"]
+        assert sent["prompt_id"] not in client._listeners
+        assert client._early_events == {}
+
+    async def test_submit_and_track_follows_server_assigned_id(self):
+        """Test a server-chosen prompt ID is tracked through the buffer."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+
+        async def queue_prompt(workflow, prompt_id=None):
+            await client._handle_message(_executing(None, "server-id"))
+            return "server-id"
+
+        client.queue_prompt = queue_prompt
+        result = await client.submit_and_track({"1": {}}, timeout=0.5)
+
+        assert result.status == "completed"
+        assert result.prompt_id == "server-id"
+
+    async def test_queue_prompt_sends_prompt_id(self):
+        """Test a chosen prompt ID is included in the /prompt payload."""
+        import httpx
+
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        payloads = []
+
+        def handler(request):
+            payloads.append(json.loads(request.content))
+            return httpx.Response(200, json={"prompt_id": "mine"})
+
+        client = ComfyWSClient("http://localhost:8188", client_id="cid")
+        client.http._client = httpx.AsyncClient(
+            base_url=client.http_url, transport=httpx.MockTransport(handler)
+        )
+
+        assert await client.queue_prompt({"1": {}}, prompt_id="mine") == "mine"
+        assert payloads == [{"prompt": {"1": {}}, "client_id": "cid", "prompt_id": "mine"}]
+        await client.disconnect()
+
+    async def test_session_watch_replays_buffer(self):
+        """Test a WSSession watch started late receives the buffered events."""
+        from comfy_headless.websocket_client import ComfyWSClient
+        from comfy_headless.ws_session import WSSession
+
+        client = ComfyWSClient("http://localhost:8188")
+        session = WSSession(client, key=("test",))
+        await client._handle_message(_executing(None, "p1"))
+
+        watch = session.watch("p1")
+        await client._handle_message(_executing(None, "p2"))
+
+        assert (await watch.wait(timeout=1)).status == "completed"
+        assert "p2" in client._early_events
+
+
+class TestComfyWSClientHttp:
+    """Test the REST calls share one pooled HTTP client."""
+
+    @staticmethod
+    def _client(handler, **kwargs):
+        import httpx
+
+        from comfy_headless.retry import get_circuit_breaker
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        get_circuit_breaker("comfyui").reset()
+        client = ComfyWSClient("http://localhost:8188", **kwargs)
+        client.http._client = httpx.AsyncClient(
+            base_url=client.http_url, transport=httpx.MockTransport(handler)
+        )
+        return client
+
+    async def test_calls_reuse_pooled_client(self):
+        """Test queue, history, queue state and images go through one client."""
+        import httpx
+
+        paths = []
+
+        def handler(request):
+            paths.append(request.url.path)
+            if request.url.path == "/view":
+                return httpx.Response(200, content=b"png" * 1000)
+            return httpx.Response(200, json={"prompt_id": "p1"})
+
+        client = self._client(handler)
+        pooled = client.http._client
+
+        await client.queue_prompt({"1": {}})
+        await client.get_history("p1")
+        await client.get_queue()
+        image = await client.get_image("a.png")
+
+        assert client.http._client is pooled
+        assert paths == ["/prompt", "/history/p1", "/queue", "/view"]
+        assert image == b"png" * 1000
+
+        await client.disconnect()
+        assert pooled.is_closed
+        assert client._http is None
+
+    async def test_missing_image_returns_none(self):
+        """Test a non-200 /view response gives None."""
+        import httpx
+
+        client = self._client(lambda request: httpx.Response(404))
+        assert await client.get_image("missing.png") is None
+        await client.disconnect()
+
+    async def test_shared_http_client_not_closed(self):
+        """Test an injected AsyncHttpClient outlives the WS client."""
+        from comfy_headless.http_client import AsyncHttpClient
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        http = AsyncHttpClient("http://localhost:8188")
+        client = ComfyWSClient("http://localhost:8188", http_client=http)
+        inner = http.client
+
+        await client.disconnect()
+
+        assert client.http is http
+        assert not inner.is_closed
+        await http.close()
+
+    def test_http_url(self):
+        """Test the REST base URL is derived from the backend URL."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        assert ComfyWSClient("https://comfy.example").http_url == "https://comfy.example"
+        assert ComfyWSClient("localhost:8188").http_url == "http://localhost:8188"
+
+
+class TestComfyWSClientListenerQueues:
+    """Test per-listener queued dispatch."""
+
+    async def test_slow_listener_does_not_block_others(self):
+        """Test dispatch never waits for a listener's callback."""
+        from comfy_headless.websocket_client import ComfyWSClient, WSProgress
+
+        client = ComfyWSClient()
+        release = asyncio.Event()
+        fast = []
+
+        async def slow(progress):
+            await release.wait()
+
+        async def quick(progress):
+            fast.append(progress.step)
+
+        client.add_listener("p1", slow)
+        client.add_listener("", quick)
+        for step in range(3):
+            await asyncio.wait_for(
+                client._notify_listeners("p1", WSProgress("p1", step=step, status="progress")),
+                timeout=0.1,
+            )
+        await client.flush_listeners("")
+
+        assert fast == [0, 1, 2]
+        release.set()
+        await client.flush_listeners()
+
+    async def test_drop_oldest(self):
+        """Test a full queue drops its oldest event."""
+        from comfy_headless.websocket_client import ComfyWSClient, WSProgress
+
+        client = ComfyWSClient()
+        got = []
+
+        async def callback(progress):
+            got.append(progress.step)
+
+        client.add_listener("p1", callback, max_queue=2, overflow="drop_oldest")
+        for step in range(5):
+            await client._notify_listeners("p1", WSProgress("p1", step=step, status="progress"))
+        await client.flush_listeners()
+
+        assert got == [3, 4]
+        assert client._listeners["p1"][callback].dropped == 3
+
+    async def test_coalesce_progress_keeps_terminal(self):
+        """Test progress updates merge and terminal events survive overflow."""
+        from comfy_headless.websocket_client import ComfyWSClient, WSProgress
+
+        client = ComfyWSClient()
+        got = []
+
+        async def callback(progress):
+            got.append((progress.status, progress.step))
+
+        client.add_listener("p1", callback, max_queue=2, overflow="coalesce")
+        await client._notify_listeners("p1", WSProgress("p1", node_id="3", status="executing"))
+        for step in (1, 2, 3):
+            await client._notify_listeners(
+                "p1", WSProgress("p1", node_id="3", step=step, status="progress")
+            )
+        await client._notify_listeners("p1", WSProgress("p1", status="completed"))
+        await client.flush_listeners()
+
+        assert got == [("progress", 3), ("completed", 0)]
+
+    async def test_terminal_events_never_dropped(self):
+        """Test a queue holding only terminal events grows rather than drop one."""
+        from comfy_headless.websocket_client import ComfyWSClient, WSProgress
+
+        client = ComfyWSClient()
+        got = []
+
+        async def callback(progress):
+            got.append(progress.prompt_id)
+
+        client.add_listener("", callback, max_queue=1, overflow="drop_oldest")
+        for prompt_id in ("p1", "p2", "p3"):
+            await client._notify_listeners(prompt_id, WSProgress(prompt_id, status="completed"))
+        await client.flush_listeners()
+
+        assert got == ["p1", "p2", "p3"]
+
+    def test_unknown_overflow_policy(self):
+        """Test an unknown overflow policy is rejected."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        with pytest.raises(ValueError):
+            ComfyWSClient().add_listener("p1", AsyncMock(), overflow="block")
+
+
+class TestComfyWSClientTrackProgress:
+    """Test the async-iterator progress API."""
+
+    async def test_yields_events_and_outputs(self):
+        """Test events stream in order and completion carries the outputs."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        images = {"images": [{"filename": "a.png", "subfolder": "", "type": "output"}]}
+        client.get_history = AsyncMock(return_value={"p1": {"outputs": {"9": images}}})
+        await client._handle_message(_executing("3", "p1"))  # Before tracking starts
+
+        async def run():
+            await asyncio.sleep(0.01)
+            await client._handle_message(
+                json.dumps({"type": "progress", "data": {"prompt_id": "p1", "value": 5, "max": 10}})
+            )
+            await client._handle_message(
+                json.dumps(
+                    {"type": "executed", "data": {"prompt_id": "p1", "node": "9", "output": images}}
+                )
+            )
+            await client._handle_message(_executing(None, "p1"))
+
+        feeder = asyncio.create_task(run())
+        events = [event async for event in client.track_progress("p1", timeout=2)]
+        await feeder
+
+        assert [e.status for e in events] == ["executing", "progress", "node_complete", "completed"]
+        assert events[1].percent == 50
+        assert events[2].outputs == {"9": images}
+        assert events[-1].outputs == {"9": images}
+        assert "p1" not in client._listeners
+
+    async def test_timeout_ends_iteration(self):
+        """Test an unfinished prompt ends with a timeout event."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        events = [event async for event in client.track_progress("p1", timeout=0.05)]
+
+        assert [e.status for e in events] == ["timeout"]
+        assert "p1" not in client._listeners
+
+    async def test_closing_releases_listeners(self):
+        """Test leaving the loop early stops tracking, even with deliveries waiting."""
+        from contextlib import aclosing
+
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        for node in range(5):
+            await client._handle_message(_executing(str(node), "p1"))
+
+        async with aclosing(client.track_progress("p1", timeout=2, max_pending=1)) as events:
+            async for event in events:
+                assert event.node_id == "0"
+                break
+
+        assert "p1" not in client._listeners
+        await asyncio.sleep(0.01)
+        assert not [t for t in asyncio.all_tasks() if "_deliver" in repr(t.get_coro())]
+
+    async def test_previews_included(self):
+        """Test previews=True interleaves preview events."""
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        client = ComfyWSClient()
+        client.get_history = AsyncMock(return_value={})
+
+        async def run():
+            await asyncio.sleep(0.01)
+            await client._handle_message(_executing("3", "p1"))
+            await client._handle_message(_preview_frame(b"\x89PNG"))
+            await asyncio.sleep(0.01)
+            await client._handle_message(_executing(None, "p1"))
+
+        feeder = asyncio.create_task(run())
+        with patch("comfy_headless.websocket_client.settings.comfyui.preview_max_fps", 0):
+            events = [e async for e in client.track_progress("p1", timeout=2, previews=True)]
+        await feeder
+
+        assert [e.status for e in events] == ["executing", "preview", "completed"]
+        assert events[-1].outputs == {}
+
+    async def test_queue_workflow_chooses_prompt_id(self):
+        """Test queue_workflow sends a fresh prompt ID and returns it."""
+        from unittest.mock import MagicMock
+
+        from comfy_headless.websocket_client import ComfyWSClient
+
+        sent = {}
+
+        async def post(endpoint, content, headers, timeout):
+            sent.update(json.loads(content))
+            response = MagicMock()
+            response.content = json.dumps({"prompt_id": sent["prompt_id"]}).encode()
+            return response
+
+        http = AsyncMock()
+        http.post.side_effect = post
+        client = ComfyWSClient(http_client=http)
+
+        prompt_id = await client.queue_workflow({"1": {}})
+
+        assert prompt_id == sent["prompt_id"]
+        assert len(prompt_id) == 36
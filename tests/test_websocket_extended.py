@@ -10,6 +10,7 @@ Covers:
 """
 
 import asyncio
+import json
 from dataclasses import is_dataclass
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -298,25 +299,21 @@ class TestComfyWSClientQueuePrompt:
         """queue_prompt returns prompt_id."""
         from comfy_headless.websocket_client import ComfyWSClient
 
-        client = ComfyWSClient()
-        client._connected = True
-
         # Create a mock response
         mock_response = MagicMock()
-        mock_response.json.return_value = {"prompt_id": "queued-123"}
+        mock_response.content = json.dumps({"prompt_id": "queued-123"}).encode()
         mock_response.raise_for_status = MagicMock()
 
-        # Create a mock async client
-        mock_async_client = AsyncMock()
-        mock_async_client.post.return_value = mock_response
+        # Mock the pooled HTTP client
+        mock_http = AsyncMock()
+        mock_http.post.return_value = mock_response
 
-        # Mock httpx.AsyncClient as context manager
-        with patch("httpx.AsyncClient") as mock_client_class:
-            mock_client_class.return_value.__aenter__.return_value = mock_async_client
-            mock_client_class.return_value.__aexit__.return_value = None
+        client = ComfyWSClient(http_client=mock_http)
+        client._connected = True
 
-            result = await client.queue_prompt({"workflow": "data"})
-            assert result == "queued-123"
+        result = await client.queue_prompt({"workflow": "data"})
+        assert result == "queued-123"
+        assert mock_http.post.call_args.args[0] == "/prompt"
 
 
 class TestWebsocketsAvailableFlag:
@@ -0,0 +1,176 @@
+"""Tests for ws_session module."""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+
+def _fake_ws_class():
+    """ComfyWSClient stand-in that records connects and listeners."""
+
+    def factory(base_url, client_id=None, reconnect_attempts=1):
+        ws = Mock()
+        ws.client_id = client_id
+        ws.ws_url = f"{base_url}/ws"
+        ws.connected = False
+        ws.reconnecting = False
+        ws.pop_early_events.return_value = []
+
+        async def connect():
+            await asyncio.sleep(0)
+            ws.connected = True
+            return True
+
+        ws.connect = AsyncMock(side_effect=connect)
+        ws.disconnect = AsyncMock()
+        return ws
+
+    return Mock(side_effect=factory)
+
+
+class TestWSSessionManager:
+    """Test reference-counted session sharing."""
+
+    async def test_acquire_shares_one_connection(self):
+        """Test concurrent acquires for one backend share a session."""
+        from comfy_headless.ws_session import WSSessionManager
+
+        manager = WSSessionManager()
+        fake_cls = _fake_ws_class()
+        with patch("comfy_headless.ws_session.ComfyWSClient", fake_cls):
+            sessions = await asyncio.gather(
+                *(manager.acquire("http://localhost:8188", "cid") for _ in range(10))
+            )
+
+        assert fake_cls.call_count == 1
+        assert all(s is sessions[0] for s in sessions)
+        assert sessions[0].refcount == 10
+        sessions[0].ws.connect.assert_awaited_once()
+
+    async def test_different_client_ids_get_different_sessions(self):
+        """Test sessions are keyed by client_id."""
+        from comfy_headless.ws_session import WSSessionManager
+
+        manager = WSSessionManager()
+        with patch("comfy_headless.ws_session.ComfyWSClient", _fake_ws_class()):
+            a = await manager.acquire("http://localhost:8188", "a")
+            b = await manager.acquire("http://localhost:8188", "b")
+
+        assert a is not b
+        assert a.client_id == "a"
+        assert len(manager.sessions) == 2
+
+    async def test_last_release_closes(self):
+        """Test the connection closes only when the last reference is released."""
+        from comfy_headless.ws_session import WSSessionManager
+
+        manager = WSSessionManager()
+        with patch("comfy_headless.ws_session.ComfyWSClient", _fake_ws_class()):
+            session = await manager.acquire("http://localhost:8188", "cid")
+            await manager.acquire("http://localhost:8188", "cid")
+
+        await manager.release(session)
+        session.ws.disconnect.assert_not_awaited()
+        assert manager.sessions == [session]
+
+        await manager.release(session)
+        session.ws.disconnect.assert_awaited_once()
+        assert manager.sessions == []
+
+    async def test_connect_failure_propagates(self):
+        """Test a failed connect raises and leaves no session behind."""
+        from comfy_headless.exceptions import ComfyUIConnectionError
+        from comfy_headless.ws_session import WSSessionManager
+
+        manager = WSSessionManager()
+        fake_cls = _fake_ws_class()
+        with patch("comfy_headless.ws_session.ComfyWSClient", fake_cls):
+            fake_cls.side_effect = None
+            fake_cls.return_value.connect = AsyncMock(
+                side_effect=ComfyUIConnectionError(message="refused")
+            )
+            with pytest.raises(ComfyUIConnectionError):
+                await manager.acquire("http://localhost:8188", "cid")
+
+        assert manager.sessions == []
+
+    def test_process_wide_manager(self):
+        """Test get_ws_session_manager returns a singleton."""
+        from comfy_headless.ws_session import get_ws_session_manager
+
+        assert get_ws_session_manager() is get_ws_session_manager()
+
+
+class TestPromptRouting:
+    """Test per-prompt event routing."""
+
+    async def _session(self):
+        from comfy_headless.ws_session import WSSessionManager
+
+        with patch("comfy_headless.ws_session.ComfyWSClient", _fake_ws_class()):
+            return await WSSessionManager().acquire("http://localhost:8188", "cid")
+
+    async def test_events_routed_by_prompt_id(self):
+        """Test events only reach watches of their prompt."""
+        from comfy_headless.websocket_client import WSProgress
+
+        session = await self._session()
+        a = session.watch("a")
+        b = session.watch("b")
+
+        session._route(WSProgress(prompt_id="a", status="progress", progress=1))
+        session._route(WSProgress(prompt_id="unknown", status="progress"))
+
+        assert (await a.get(timeout=0.1)).progress == 1
+        assert await b.get(timeout=0.01) is None
+
+    async def test_terminal_event_resolves_wait(self):
+        """Test wait returns the terminal event."""
+        from comfy_headless.websocket_client import WSProgress
+
+        session = await self._session()
+        watch = session.watch("p1")
+        session._route(WSProgress(prompt_id="p1", status="completed"))
+
+        final = await watch.wait(timeout=1)
+        assert final.status == "completed"
+        assert watch.done
+
+    async def test_wait_timeout(self):
+        """Test wait reports a timeout status."""
+        session = await self._session()
+        final = await session.watch("p1").wait(timeout=0.01)
+        assert final.status == "timeout"
+
+    async def test_bounded_queue_drops_oldest(self):
+        """Test a full event queue drops the oldest events."""
+        from comfy_headless.websocket_client import WSProgress
+
+        session = await self._session()
+        watch = session.watch("p1", max_events=2)
+        for step in range(5):
+            session._route(WSProgress(prompt_id="p1", status="progress", progress=step))
+
+        assert watch.dropped == 3
+        assert (await watch.get(timeout=0.1)).progress == 3
+
+    async def test_close_unregisters(self):
+        """Test closed watches are removed from the routing table."""
+        session = await self._session()
+        watch = session.watch("p1")
+        assert session.watch_count == 1
+
+        watch.close()
+        assert session.watch_count == 0
+
+    async def test_session_close_aborts_watches(self):
+        """Test closing the session fails outstanding waits."""
+        from comfy_headless.exceptions import ComfyUIConnectionError
+
+        session = await self._session()
+        watch = session.watch("p1")
+        await session.close()
+
+        with pytest.raises(ComfyUIConnectionError):
+            await watch.wait(timeout=1)